@@ -0,0 +1,86 @@
+# benchmarks/bench_backend_router.py
+#
+# 여러 로컬 mock ComfyUI 서버로 백엔드 라우터를 검증합니다.
+#   1) 처리 속도가 다른 인스턴스 3대에 작업을 보내 대기열 길이 기반 분산을 확인
+#   2) i2i 입력 이미지를 이미 가진 인스턴스가 우선 선택되는지 확인
+#   3) 한 인스턴스를 장애 상태로 만들어 회로가 열려 제외(eject)되고, 복구 후 헬스 체크/시험 요청을 거쳐 다시 편입되는지 확인
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_backend_router [작업 수]
+
+import asyncio
+import sys
+import time
+from collections import Counter
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator.comfy_api_client import ComfyAPIClient
+from image_generator.comfy_backends import ComfyBackendRouter
+
+
+async def run_job(router, input_key=None):
+    await router.refresh()
+    backend = router.acquire(input_key)
+    try:
+        prompt_id = (await backend.client.queue_prompt({}))['prompt_id']
+        while prompt_id not in await backend.client.get_history(prompt_id):
+            await asyncio.sleep(0.01)
+        if input_key is not None:
+            backend.remember_input(input_key, f"{input_key}.png")
+        return backend.host
+    finally:
+        router.release(backend)
+
+
+async def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    servers = [
+        MockComfyUIServer(execution_time=0.05).start(),
+        MockComfyUIServer(execution_time=0.05).start(),
+        MockComfyUIServer(execution_time=0.20).start(), # 느린 GPU
+    ]
+    names = {s.url: f"backend{i} ({s.execution_time * 1000:.0f} ms/job)" for i, s in enumerate(servers)}
+    router = ComfyBackendRouter(
+        [ComfyAPIClient(s.url, max_retries=0, failure_threshold=2, probe_interval=0.1) for s in servers],
+        probe_interval=0.05,
+    )
+
+    # 1) 분산 (동시성 6으로 계속 작업 투입)
+    semaphore = asyncio.Semaphore(6)
+
+    async def limited_job():
+        async with semaphore:
+            return await run_job(router)
+
+    start = time.perf_counter()
+    counts = Counter(await asyncio.gather(*(limited_job() for _ in range(jobs))))
+    print(f"1) {jobs} jobs in {time.perf_counter() - start:.2f}s")
+    for s in servers:
+        print(f"   {names[s.url]:<26} {counts[s.url]:>4} jobs")
+
+    # 2) 입력 이미지 친화도
+    await run_job(router, input_key='photo-a')
+    holder = next(b.host for b in router.backends if 'photo-a' in b.uploaded_inputs)
+    repeats = Counter([await run_job(router, input_key='photo-a') for _ in range(5)])
+    print(f"2) follow-up i2i jobs on the same photo: {repeats[holder]}/5 routed to {names[holder]}")
+
+    # 3) 장애 및 복구
+    servers[0].fail_all = True
+    await asyncio.sleep(0.06)
+    await router.refresh(force=True)
+    await router.refresh(force=True)
+    print(f"3) after failure: {[(names[b['host']], b['healthy']) for b in router.snapshot()]}")
+    hosts = await asyncio.gather(*(run_job(router) for _ in range(6)))
+    print(f"   jobs routed to failed backend while ejected: {hosts.count(servers[0].url)}")
+    servers[0].fail_all = False
+    await asyncio.sleep(0.3) # 회로 차단기의 백그라운드 /system_stats 확인 -> 반쯤 열림(half-open)
+    await router.refresh(force=True) # 상태 조회가 시험 요청이 되어 회로가 닫힘
+    print(f"   after recovery: {[(names[b['host']], b['healthy']) for b in router.snapshot()]}")
+
+    for backend in router.backends:
+        await backend.client.aclose()
+    for s in servers:
+        s.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+# benchmarks/bench_batch_generation.py
+#
+# 배치 생성 API(/api/batch_generate/) 검증. mock ComfyUI 백엔드 2개와 임시 DB/MEDIA_ROOT로 오프라인 실행됩니다.
+#   1) 프롬프트 2개 x seed 2 x cfg 2 x style 2 = 16개 작업: NDJSON 스트림의 첫 결과까지 걸린 시간과 전체 시간,
+#      번역 호출 수(프롬프트당 한 번), ComfyUI로 간 seed/cfg 조합이 그리드와 같은지
+#   2) 같은 배치를 동시 실행 1개로 돌린 시간과 비교 (병렬 처리 효과)
+#   3) WSGI용 동기 스트림이 같은 결과를 내는지, 첫 결과 후 닫으면 남은 작업이 취소되는지
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_batch_generation [mock 실행 시간 (초, 기본 0.3)]
+
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import time
+
+from benchmarks.load_test import configure_in_process
+from benchmarks.mock_comfyui import MockComfyUIServer
+
+from django.conf import settings
+
+PROMPTS = ['해변의 등대', '눈 덮인 마을']
+GRID = {'seed': [11, 22], 'cfg': [7, 9], 'style': ['impressionism_style', ['ghibli_style', 'texture_detail']]}
+
+
+def sampler_params(servers, since):
+    """mock ComfyUI가 받은 워크플로우의 KSampler (seed, cfg) 목록을 반환합니다."""
+    params = []
+    for server in servers:
+        for prompt_id, record in list(server.prompts.items())[since.get(server, 0):]:
+            for node in record['payload']['prompt'].values():
+                if node.get('class_type') == 'KSampler':
+                    params.append((node['inputs']['seed'], node['inputs']['cfg']))
+    return params
+
+
+async def stream_batch(client):
+    start = time.perf_counter()
+    response = await client.post('/api/batch_generate/', json.dumps({'prompts': PROMPTS, 'grid': GRID, 'deterministic': False}),
+                                 content_type='application/json')
+    assert response.status_code == 200, response.content
+    first, events = None, []
+    async for chunk in response.streaming_content:
+        for line in chunk.decode('utf-8').splitlines():
+            event = json.loads(line)
+            events.append(event)
+            if event['event'] == 'job' and first is None:
+                first = time.perf_counter() - start
+    return events, first, time.perf_counter() - start
+
+
+async def sequential(jobs):
+    from image_generator.batch import run_batch
+    start = time.perf_counter()
+    async for _ in run_batch(jobs, deterministic=False, max_parallel=1):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    execution_time = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    servers = [MockComfyUIServer(execution_time=execution_time).start() for _ in range(2)]
+    workdir = configure_in_process(argparse.Namespace(translate=False), [server.url for server in servers], 'http://127.0.0.1:9')
+    # 모두 같은 모델을 쓰는 작업이므로 친화도 여유를 0으로 두어 두 백엔드에 나눠 보냅니다 (기본값 2면 한 백엔드에 몰립니다).
+    settings.COMFYUI_BACKEND_AFFINITY_SLACK = 0
+    try:
+        from django.test import AsyncClient
+        from image_generator import image_logic_parser
+        from image_generator.batch import expand_jobs, run_batch_sync
+        from image_generator.views import extract_categories_from_text
+
+        translations = []
+        image_logic_parser.translate_text = lambda text, source_lang, target_lang: translations.append(text) or text
+
+        events, first, total = asyncio.run(stream_batch(AsyncClient()))
+        jobs = [event for event in events if event['event'] == 'job']
+        summary = events[-1]
+        sent = sampler_params(servers, {})
+        expected = sorted((seed, float(cfg)) for seed in GRID['seed'] for cfg in GRID['cfg']) * (len(PROMPTS) * len(GRID['style']))
+        print(f"1) {len(jobs)} jobs over {len(servers)} mock backends ({execution_time}s per prompt): first result {first:.2f}s, "
+              f"all {total:.2f}s, completed {summary['completed']}, failed {summary['failed']}, "
+              f"translations {len(translations)} for {len(PROMPTS)} prompts")
+        assert events[0]['event'] == 'batch' and summary['event'] == 'summary'
+        assert summary['completed'] == len(jobs) == 16 and len(translations) == len(PROMPTS)
+        assert sorted(sent) == sorted(expected), sent
+        assert all(job['image_urls'] for job in jobs)
+
+        batch_jobs = expand_jobs(PROMPTS, GRID, categorize=extract_categories_from_text)
+        serial = asyncio.run(sequential(batch_jobs))
+        print(f"2) same batch with 1 job at a time: {serial:.2f}s ({serial / total:.1f}x slower)")
+
+        sync_events = list(run_batch_sync(jobs=batch_jobs, deterministic=False))
+        print(f"3) sync (WSGI) stream: {sum(event['event'] == 'job' for event in sync_events)} job events, "
+              f"summary {sync_events[-1]['completed']} completed")
+        assert sync_events[-1]['completed'] == len(batch_jobs)
+
+        since = {server: len(server.prompts) for server in servers}
+        stream = run_batch_sync(jobs=batch_jobs, deterministic=False)
+        for event in stream:
+            if event['event'] == 'job':
+                break
+        stream.close()
+        time.sleep(execution_time * 4) # 닫은 뒤에는 새 프롬프트가 가지 않아야 합니다
+        sent = len(sampler_params(servers, since))
+        cancelled = sum(server.deleted + server.interrupted for server in servers)
+        print(f"   closed after the first result: {sent} of {len(batch_jobs)} prompts sent to ComfyUI, {cancelled} cancelled there")
+        assert sent <= settings.BATCH_MAX_PARALLEL + 1
+    finally:
+        for server in servers:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_cancellation.py
+#
+# 취소된 요청의 ComfyUI 작업 정리 검증. mock ComfyUI에서 작업이 실제로 빠지는지와 절약한 GPU 시간 추정치를 확인합니다.
+#   1) 실행 중인 작업을 기다리던 요청이 취소되면 /interrupt로 중단되는지
+#   2) 대기 중인 작업을 기다리던 요청이 취소되면 /queue에서 삭제되고, 뒤의 작업이 그만큼 빨리 끝나는지
+#   3) task_id가 있는 요청을 아무도 조회하지 않으면(버려진 작업) 감시기가 취소하는지, 조회 중이면 취소하지 않는지
+#   4) 취소된 i2i 작업이 COMFYUI_INPUT_DIR에 복사한 입력 이미지를 지우는지
+# 번역 모델 로딩을 피하기 위해 번역 함수는 입력을 그대로 돌려주도록 바꿔서 실행합니다.
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_cancellation
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator import image_logic_parser
+from image_generator.cancellation import TaskWatchdog, get_job_tracker
+
+EXECUTION_TIME = 1.0
+
+
+def generate(prompt, image_path=None):
+    return image_logic_parser.generate_image_based_on_json_logic(prompt, image_path, 'image_generation', [], [])
+
+
+async def cancel_after(coro, delay):
+    task = asyncio.create_task(coro)
+    await asyncio.sleep(delay)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def main():
+    media_root = tempfile.mkdtemp(prefix='bench_cancellation_')
+    settings.MEDIA_ROOT = media_root
+    settings.COMFYUI_OUTPUT_DIR = os.path.join(media_root, 'comfyui_output')
+    settings.COMFYUI_INPUT_DIR = os.path.join(media_root, 'comfyui_input')
+    image_logic_parser.translate_text = lambda text, source_lang, target_lang: text
+    image_logic_parser.COMFYUI_USE_WEBSOCKET = False
+    tracker = get_job_tracker()
+
+    with MockComfyUIServer(execution_time=EXECUTION_TIME) as server:
+        settings.COMFYUI_BACKENDS = [server.url]
+
+        # 1) 실행 중 취소
+        await cancel_after(generate('running job'), 0.3)
+        assert server.interrupted == 1, server.interrupted
+        print(f"1) cancelled while running -> /interrupt, stats={tracker.stats()}")
+
+        # 2) 대기 중 취소: 작업 3개 중 두 번째를 취소
+        start = time.perf_counter()
+        first = asyncio.create_task(generate('first'))
+        await asyncio.sleep(0.05)
+        await cancel_after(generate('second'), 0.2)
+        third = await generate('third')
+        await first
+        elapsed = time.perf_counter() - start
+        assert server.deleted == 1 and third["image_names"], (server.deleted, tracker.stats(), server.requests)
+        print(f"2) cancelled while queued -> deleted from /queue; 3 submitted, 2 ran in {elapsed:.2f}s "
+              f"(~{3 * EXECUTION_TIME:.0f}s without cancellation)")
+
+        # 3) 버려진 작업 감시
+        watchdog = TaskWatchdog(timeout=0.5)
+        task = asyncio.create_task(generate('nobody is polling'))
+        watchdog.register('abandoned', task)
+        outcome = (await asyncio.gather(task, return_exceptions=True))[0]
+        assert isinstance(outcome, asyncio.CancelledError) and watchdog.is_abandoned('abandoned')
+
+        task = asyncio.create_task(generate('someone is watching'))
+        watchdog.register('watched', task)
+        with watchdog.watching('watched'):
+            result = await task
+        watchdog.unregister('watched')
+        assert result['image_names']
+        print(f"3) unpolled task cancelled after {watchdog.timeout}s; watched task completed, watchdog={watchdog.stats()}")
+
+        # 4) 입력 이미지 정리
+        image_path = default_storage.save('temp_uploads/cancel.png', ContentFile(os.urandom(1024)))
+        await cancel_after(generate('i2i job', image_path), 0.3)
+        leftovers = os.listdir(settings.COMFYUI_INPUT_DIR) if os.path.isdir(settings.COMFYUI_INPUT_DIR) else []
+        assert not leftovers, leftovers
+        print(f"4) cancelled i2i job removed its copied input image, stats={tracker.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+# benchmarks/bench_circuit_breaker.py
+#
+# ComfyUI 회로 차단기/적응형 타임아웃 검증. mock ComfyUI의 응답 지연(latency)을 크게 주어 멈춘 서버를 흉내 냅니다.
+#   1) 멈춘 서버에 대한 호출 비용: 고정 타임아웃(설정값)만 쓰는 클라이언트 vs 회로 차단기 + p99 적응형 타임아웃
+#   2) 복구: 백그라운드 /system_stats 확인 -> 반쯤 열림(half-open)에서 시험 요청 1개만 통과 -> 성공 후 닫힘
+#   3) 제출한 작업이 끝나지 않을 때 최근 작업 시간의 p99로 정한 시한에 작업을 취소하고 실패하는지
+# 번역 모델 로딩을 피하기 위해 번역 함수는 입력을 그대로 돌려주도록 바꿔서 실행합니다.
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_circuit_breaker
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator import comfy_api_client, image_logic_parser
+from image_generator.cancellation import get_job_tracker
+from image_generator.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from image_generator.comfy_api_client import CircuitOpenError, ComfyAPIClient, ComfyAPIError
+
+CONFIGURED_TIMEOUT = 10.0 # 고정 타임아웃 (get_history 기본값)
+HANG_SECONDS = 30.0 # 멈춘 서버의 응답 지연
+CALLS_DURING_OUTAGE = 20
+
+
+async def timed_call(client, call):
+    start = time.perf_counter()
+    try:
+        await call(client)
+        outcome = 'ok'
+    except CircuitOpenError:
+        outcome = 'rejected'
+    except ComfyAPIError:
+        outcome = 'failed'
+    return outcome, time.perf_counter() - start
+
+
+async def main():
+    # 적응형 타임아웃 하한을 낮춰 mock의 ms 단위 응답 시간에 비례하는 타임아웃을 확인합니다.
+    comfy_api_client.ADAPTIVE_TIMEOUT_FLOOR = 0.2
+
+    def history(client):
+        return client.get_history('warmup')
+
+    with MockComfyUIServer() as server:
+        timeouts = {'get_history': CONFIGURED_TIMEOUT, 'get_system_stats': CONFIGURED_TIMEOUT}
+        fixed = ComfyAPIClient(server.url, max_retries=0, timeouts=timeouts,
+                               failure_threshold=10 ** 9, adaptive_timeouts=False)
+        guarded = ComfyAPIClient(server.url, max_retries=0, timeouts=timeouts,
+                                 failure_threshold=3, probe_interval=0.2)
+        for _ in range(50):
+            await guarded.get_history('warmup')
+            await guarded.get_system_stats()
+        print(f"warm-up: get_history p99 -> timeout {guarded.timeout_for('get_history'):.2f}s "
+              f"(configured {CONFIGURED_TIMEOUT:.0f}s)")
+
+        # 1) 장애 중 호출 비용
+        server.latency = HANG_SECONDS
+        outcome, fixed_seconds = await timed_call(fixed, history)
+        assert outcome == 'failed'
+        results = [await timed_call(guarded, history) for _ in range(CALLS_DURING_OUTAGE)]
+        guarded_seconds = sum(seconds for _, seconds in results)
+        rejected = [seconds for outcome, seconds in results if outcome == 'rejected']
+        assert guarded.breaker.state == OPEN and len(rejected) == CALLS_DURING_OUTAGE - 3, results
+        print(f"1) hung server ({HANG_SECONDS:.0f}s latency)")
+        print(f"   fixed timeout         : {fixed_seconds:6.2f}s for 1 call (x{CALLS_DURING_OUTAGE} = "
+              f"{fixed_seconds * CALLS_DURING_OUTAGE:.0f}s)")
+        print(f"   breaker + p99 timeout : {guarded_seconds:6.2f}s for {CALLS_DURING_OUTAGE} calls "
+              f"(3 timed out, {len(rejected)} rejected in max {max(rejected) * 1000:.2f} ms)")
+
+        # 2) 복구
+        server.latency = 0.0
+        start = time.perf_counter()
+        while guarded.breaker.state != HALF_OPEN:
+            await asyncio.sleep(0.01)
+        probed = time.perf_counter() - start
+        outcomes = await asyncio.gather(*(timed_call(guarded, history) for _ in range(5)))
+        trials = [outcome for outcome, _ in outcomes]
+        assert trials.count('ok') >= 1 and guarded.breaker.state == CLOSED, trials
+        print(f"2) recovery: health probe reopened the circuit to half-open after {probed:.2f}s; "
+              f"5 concurrent calls -> {trials.count('ok')} trial ok, {trials.count('rejected')} rejected; "
+              f"circuit {guarded.breaker.state}")
+        print(f"   stats={guarded.stats()}")
+        await fixed.aclose()
+        await guarded.aclose()
+
+    # 3) 작업 대기 시한
+    media_root = tempfile.mkdtemp(prefix='bench_circuit_breaker_')
+    settings.MEDIA_ROOT = media_root
+    settings.COMFYUI_OUTPUT_DIR = os.path.join(media_root, 'comfyui_output')
+    settings.COMFYUI_INPUT_DIR = os.path.join(media_root, 'comfyui_input')
+    image_logic_parser.translate_text = lambda text, source_lang, target_lang: text
+    image_logic_parser.COMFYUI_USE_WEBSOCKET = False
+    tracker = get_job_tracker()
+    tracker.min_job_timeout = 0.5
+    with MockComfyUIServer(execution_time=0.05) as server:
+        settings.COMFYUI_BACKENDS = [server.url]
+        for i in range(20):
+            await image_logic_parser.generate_image_based_on_json_logic(f'job {i}', None, 'image_generation', [], [])
+        deadline = tracker.job_timeout()
+        server.execution_time = 60.0 # 멈춘 GPU
+        start = time.perf_counter()
+        try:
+            await image_logic_parser.generate_image_based_on_json_logic('stuck job', None, 'image_generation', [], [])
+            raise AssertionError("stuck job did not time out")
+        except ComfyAPIError:
+            elapsed = time.perf_counter() - start
+        assert server.interrupted == 1 and tracker.timed_out == 1, (server.interrupted, tracker.stats())
+        print(f"3) job deadline from p99 of 20 jobs: {deadline:.2f}s; stuck job failed after {elapsed:.2f}s "
+              f"and was interrupted on ComfyUI (instead of waiting {server.execution_time:.0f}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
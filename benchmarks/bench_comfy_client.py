@@ -0,0 +1,90 @@
+# benchmarks/bench_comfy_client.py
+#
+# 로컬 mock ComfyUI 서버를 대상으로 한 부하 테스트:
+#   - 기존 방식: 생성 요청마다 httpx.AsyncClient를 새로 만들어 /prompt -> /history -> /view 호출
+#   - 공유 방식: 프로세스 공유 ComfyAPIClient(keep-alive 연결 풀)로 같은 호출 수행
+# 서버가 수락한 TCP 연결 수와 작업별 지연 시간(p50/p99)을 비교합니다.
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_comfy_client [작업 수] [동시성]
+
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator.comfy_api_client import ComfyAPIClient
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def legacy_job(url):
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        response = await client.post(f"{url}/prompt", json={'prompt': {}})
+        response.raise_for_status()
+        prompt_id = response.json()['prompt_id']
+        while True:
+            history = (await client.get(f"{url}/history?prompt_id={prompt_id}")).json()
+            if prompt_id in history:
+                break
+            await asyncio.sleep(0.01)
+        image = history[prompt_id]['outputs']['9']['images'][0]
+        response = await client.get(f"{url}/view", params={
+            'filename': image['filename'], 'subfolder': image['subfolder'], 'type': image['type']})
+        response.raise_for_status()
+
+
+async def pooled_job(client):
+    prompt_id = (await client.queue_prompt({}))['prompt_id']
+    while True:
+        history = await client.get_history(prompt_id)
+        if prompt_id in history:
+            break
+        await asyncio.sleep(0.01)
+    image = history[prompt_id]['outputs']['9']['images'][0]
+    await client.get_image(image['filename'], image['subfolder'], image['type'])
+
+
+async def run(job_factory, jobs, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await job_factory()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(jobs)))
+    return latencies, time.perf_counter() - start
+
+
+async def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    with MockComfyUIServer(latency=0.001) as server:
+        client = ComfyAPIClient(server.url, max_connections=concurrency, max_keepalive_connections=concurrency)
+        scenarios = [
+            ('new client per job', lambda: legacy_job(server.url)),
+            ('shared pooled client', lambda: pooled_job(client)),
+        ]
+        print(f"{jobs} jobs, concurrency {concurrency}")
+        print(f"{'scenario':<24}{'connections':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'jobs/s':>9}")
+        for name, factory in scenarios:
+            server.reset_stats()
+            latencies, elapsed = await run(factory, jobs, concurrency)
+            print(f"{name:<24}{server.connections:>12}{statistics.median(latencies) * 1e3:>10.1f}"
+                  f"{percentile(latencies, 99) * 1e3:>10.1f}{jobs / elapsed:>9.1f}")
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+# benchmarks/bench_control_maps.py
+#
+# ControlNet 전처리 맵 캐시 검증. mock ComfyUI는 워크플로우의 전처리기 노드(Canny, LineArt, 깊이, 밝기)마다 실행 시간을 더합니다.
+#   1) 같은 사진으로 프롬프트만 바꿔 여러 번 생성할 때, 첫 요청만 전처리를 실행하고 이후 요청은 캐시된 맵을 LoadImage로 읽는지
+#   2) 다른 사진은 캐시를 공유하지 않는지
+# 번역 모델 로딩을 피하기 위해 번역 함수는 입력을 그대로 돌려주도록 바꿔서 실행합니다.
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_control_maps [같은 사진으로 다시 생성할 횟수]
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator import image_logic_parser
+from image_generator.control_maps import get_control_map_cache
+
+EXECUTION_TIME = 0.3
+PREPROCESSOR_TIME = 0.5 # 전처리기 하나당
+
+
+def generate(prompt, image_path):
+    return image_logic_parser.generate_image_based_on_json_logic(
+        prompt, image_path, 'image_generation', [], [], generation_mode=image_logic_parser.GENERATION_MODE_CONTROLNET)
+
+
+def preprocessors_in(payload):
+    return sorted(node['class_type'] for node in payload['prompt'].values()
+                  if node['class_type'].endswith(('Preprocessor', 'Detector')))
+
+
+async def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    media_root = tempfile.mkdtemp(prefix='bench_control_maps_')
+    settings.MEDIA_ROOT = media_root
+    settings.COMFYUI_OUTPUT_DIR = os.path.join(media_root, 'comfyui_output')
+    settings.COMFYUI_INPUT_DIR = os.path.join(media_root, 'comfyui_input')
+    image_logic_parser.translate_text = lambda text, source_lang, target_lang: text
+    image_logic_parser.COMFYUI_USE_WEBSOCKET = False
+    photo = default_storage.save('temp_uploads/photo.png', ContentFile(os.urandom(2048)))
+    other_photo = default_storage.save('temp_uploads/other.png', ContentFile(os.urandom(2048)))
+    cache = get_control_map_cache()
+
+    with MockComfyUIServer(execution_time=EXECUTION_TIME, preprocessor_time=PREPROCESSOR_TIME) as server:
+        settings.COMFYUI_BACKENDS = [server.url]
+
+        # 1) 같은 사진, 다른 프롬프트
+        timings = []
+        for i in range(repeats + 1):
+            start = time.perf_counter()
+            result = await generate(f'prompt {i}', photo)
+            timings.append(time.perf_counter() - start)
+            assert result['image_names']
+        payloads = [p['payload'] for p in server.prompts.values()]
+        assert len(preprocessors_in(payloads[0])) == 4, preprocessors_in(payloads[0])
+        assert all(not preprocessors_in(p) for p in payloads[1:]), [preprocessors_in(p) for p in payloads]
+        print(f"1) {repeats + 1} ControlNet generations on the same photo "
+              f"({EXECUTION_TIME * 1000:.0f} ms sampling + {PREPROCESSOR_TIME * 1000:.0f} ms per preprocessor, /history polled every 1 s)")
+        print(f"   first (runs 4 preprocessors, stores maps) : {timings[0]:.2f}s")
+        print(f"   follow-ups (cached maps via LoadImage)    : {', '.join(f'{t:.2f}s' for t in timings[1:])}")
+
+        # 2) 다른 사진
+        await generate('prompt on another photo', other_photo)
+        last = list(server.prompts.values())[-1]['payload']
+        assert len(preprocessors_in(last)) == 4
+        stored = os.listdir(os.path.join(media_root, settings.COMFYUI_CONTROLNET_MAP_CACHE_DIR))
+        print(f"2) another photo ran its own preprocessors; {len(stored)} maps stored, stats={cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+# benchmarks/bench_image_derivatives.py
+#
+# 아카이브용 WebP 파생 이미지 검증. 임시 DB/MEDIA_ROOT에 media/comfyui_output의 PNG(없으면 합성 이미지)를 전시 이미지로 등록하고
+#   1) /api/images/?size=thumb 첫 호출(파생 이미지 생성 포함)과 두 번째 호출의 응답 시간
+#   2) 그리드 하나가 받는 바이트: 원본 PNG vs thumb/medium WebP
+#   3) 멱등성: 다시 호출해도 파일을 새로 만들지 않는지 (수정 시각 비교)
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_image_derivatives [이미지 수]
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from PIL import Image
+
+
+def prepare(count):
+    """임시 DB/MEDIA_ROOT를 만들고 이미지를 등록합니다 (실제 db.sqlite3와 media/는 건드리지 않습니다)."""
+    sources = sorted(glob.glob(os.path.join(settings.BASE_DIR, 'media', 'comfyui_output', '*.png')))[:count]
+    workdir = tempfile.mkdtemp(prefix='bench_derivatives_')
+    connections['default'].close()
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'db.sqlite3')
+    call_command('migrate', verbosity=0, interactive=False)
+    settings.MEDIA_ROOT = os.path.join(workdir, 'media')
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'comfyui_output'))
+
+    from image_generator.models import GeneratedImage
+    for i in range(count):
+        name = f'comfyui_output/image_{i:03d}.png'
+        if i < len(sources):
+            shutil.copy(sources[i], os.path.join(settings.MEDIA_ROOT, name))
+        else:
+            Image.effect_mandelbrot((1024, 1024), (-2.0 + i * 0.01, -1.5, 1.0, 1.5), 100).convert('RGB').save(
+                os.path.join(settings.MEDIA_ROOT, name))
+        GeneratedImage.objects.create(image_file=name, title=f'image {i}', prompt='bench', style='impressionism', is_showcase=True)
+    return workdir
+
+
+async def fetch(client, size):
+    start = time.perf_counter()
+    response = await client.get('/api/images/', {'size': size})
+    assert response.status_code == 200, response.content
+    return json.loads(response.content)['images'], time.perf_counter() - start
+
+
+def media_bytes(url):
+    return os.path.getsize(os.path.join(settings.MEDIA_ROOT, url[len(settings.MEDIA_URL):]))
+
+
+async def main(count):
+    from django.test import AsyncClient
+    client = AsyncClient()
+    settings.ALLOWED_HOSTS = ['*']
+
+    images, first = await fetch(client, 'thumb')
+    _, second = await fetch(client, 'thumb')
+    print(f"1) {len(images)} images, size=thumb: first call {first:.2f}s (builds derivatives), second call {second * 1000:.0f} ms")
+
+    original = sum(media_bytes(image['original_url']) for image in images)
+    print(f"2) bytes per grid of {len(images)}:")
+    print(f"   original PNG : {original / 1024 / 1024:7.2f} MB ({original / len(images) / 1024:.0f} KB per tile)")
+    for size in ('thumb', 'medium', 'full'):
+        total = sum(media_bytes(image['variants'][size]['url']) for image in images)
+        sample = images[0]['variants'][size]
+        print(f"   {size:6s} WebP  : {total / 1024 / 1024:7.2f} MB ({total / len(images) / 1024:.0f} KB per tile, "
+              f"{sample['width']}x{sample['height']})")
+    thumb_total = sum(media_bytes(image['url']) for image in images)
+    assert thumb_total * 10 < original
+
+    paths = glob.glob(os.path.join(settings.MEDIA_ROOT, settings.IMAGE_DERIVATIVE_DIR, '*', '*', '*.webp'))
+    before = {path: os.path.getmtime(path) for path in paths}
+    from image_generator.models import GeneratedImage
+    await GeneratedImage.objects.all().aupdate(derivatives={}) # DB 정보가 없어도 파일은 다시 만들지 않아야 합니다
+    await fetch(client, 'medium')
+    after = {path: os.path.getmtime(path) for path in paths}
+    print(f"3) {len(paths)} derivative files, rebuilt after clearing the DB record: {sum(before[p] != after[p] for p in paths)}")
+    assert before == after
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    workdir = prepare(count)
+    try:
+        asyncio.run(main(count))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
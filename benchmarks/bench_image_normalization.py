@@ -0,0 +1,75 @@
+# benchmarks/bench_image_normalization.py
+#
+# 업로드 이미지 정규화 검증. 휴대폰 사진처럼 큰 JPEG(EXIF 방향 6 = 90도 회전)를 만들어
+#   1) 정규화 전후의 크기(픽셀, 바이트)와 처리 시간 (draft 모드 디코딩 포함)
+#   2) EXIF 방향이 픽셀에 적용되었는지
+#   3) 이미 작은 JPEG는 다시 인코딩하지 않고 그대로 통과하는지
+#   4) 워커 풀에서 여러 업로드를 동시에 처리할 때의 처리량 (Pillow는 GIL을 놓습니다)
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_image_normalization [동시 업로드 수]
+
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from PIL import Image
+
+from image_generator.image_normalization import normalize_image, normalize_image_async
+
+PHOTO_SIZE = (4032, 3024) # 12MP 휴대폰 사진
+MAX_SIDE = 1024
+
+
+def make_photo(size, orientation=6):
+    # 가로 방향 픽셀 + EXIF 방향 6 (실제로는 세로 사진)
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=95, exif=exif)
+    return output.getvalue()
+
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    photo = make_photo(PHOTO_SIZE)
+
+    # 1), 2)
+    start = time.perf_counter()
+    result = normalize_image(photo, MAX_SIDE)
+    elapsed = time.perf_counter() - start
+    assert max(result.width, result.height) == MAX_SIDE and result.height > result.width, result[1:]
+    with Image.open(io.BytesIO(result.content)) as image:
+        assert image.size == (result.width, result.height) and image.getexif().get(0x0112, 1) == 1
+    print(f"1) {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]} JPEG ({len(photo) / 1024:.0f} KB) -> "
+          f"{result.width}x{result.height}{result.extension} ({len(result.content) / 1024:.0f} KB) in {elapsed * 1000:.0f} ms")
+    print("2) EXIF orientation 6 applied to pixels (portrait output, no orientation tag)")
+
+    # 3)
+    small = make_photo((800, 600), orientation=1)
+    passthrough = normalize_image(small, MAX_SIDE)
+    assert passthrough.content is small
+    print("3) 800x600 JPEG without rotation passed through unchanged")
+
+    # 4)
+    start = time.perf_counter()
+    for _ in range(concurrency):
+        normalize_image(photo, MAX_SIDE)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    await asyncio.gather(*(normalize_image_async(photo, MAX_SIDE) for _ in range(concurrency)))
+    pooled = time.perf_counter() - start
+    print(f"4) {concurrency} uploads: sequential {sequential:.2f}s, worker pool {pooled:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
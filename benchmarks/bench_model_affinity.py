@@ -0,0 +1,104 @@
+# benchmarks/bench_model_affinity.py
+#
+# 생성 스케줄러의 모델 친화도(같은 체크포인트/IPAdapter/CLIP Vision을 쓰는 요청끼리 묶기) 검증.
+# 실제 ComfyUI 대신, 직전 작업과 모델 시그니처가 다르면 가중치 교체 시간을 더하는 가상 GPU를 사용합니다.
+# 시그니처는 comfyui_workflows/의 실제 워크플로우 템플릿에서 구합니다.
+#   1) 여러 대화가 t2i/i2i를 번갈아 요청할 때, 친화도 없이(라운드 로빈만) vs 친화도 사용 시 모델 교체 횟수와 총 시간
+#   2) 기아 방지: 다른 대화의 t2i 요청이 잔뜩 밀려 있어도 i2i 요청이 affinity_max_wait 안에 실행되는지
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_model_affinity [대화 수]
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from image_generator.scheduler import FairShareScheduler
+from image_generator.workflow_templates import IMAGE_TO_IMAGE_WORKFLOW, TEXT_TO_IMAGE_WORKFLOW, get_workflow_registry
+
+JOB_SECONDS = 0.05
+SWAP_SECONDS = 0.2
+
+
+class FakeGPU:
+    """ComfyUI처럼 한 번에 하나씩 실행하고, 모델 시그니처가 바뀌면 교체 시간을 더합니다."""
+
+    def __init__(self):
+        self.loaded = None
+        self.swaps = 0
+        self._lock = asyncio.Lock()
+
+    async def run(self, signature):
+        async with self._lock:
+            if self.loaded is not None and signature != self.loaded:
+                self.swaps += 1
+                await asyncio.sleep(SWAP_SECONDS)
+            self.loaded = signature
+            await asyncio.sleep(JOB_SECONDS)
+
+
+async def job(scheduler, gpu, owner, signature, waits=None):
+    enqueued = time.perf_counter()
+    async with scheduler.slot(owner, signature):
+        if waits is not None:
+            waits.append(time.perf_counter() - enqueued)
+        await gpu.run(signature)
+
+
+async def interleaved(scheduler, owners, t2i, i2i):
+    gpu = FakeGPU()
+    start = time.perf_counter()
+    # 대화마다 t2i, i2i를 번갈아 2개씩, 대화끼리도 엇갈리게 요청
+    await asyncio.gather(*(
+        job(scheduler, gpu, f'conversation{i}', signature)
+        for i in range(owners)
+        for signature in ((t2i, i2i) if i % 2 else (i2i, t2i))
+    ))
+    return gpu.swaps, time.perf_counter() - start
+
+
+async def main():
+    owners = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    registry = get_workflow_registry()
+    t2i = registry.get(TEXT_TO_IMAGE_WORKFLOW).model_signature
+    i2i = registry.get(IMAGE_TO_IMAGE_WORKFLOW).model_signature
+    assert t2i and i2i and t2i != i2i, (t2i, i2i)
+    print(f"signatures: t2i={t2i}")
+    print(f"            i2i={i2i}")
+
+    # 1) 교체 횟수
+    limits = dict(max_in_flight=1, max_queued=1000, max_queued_per_owner=1000)
+    plain_swaps, plain_seconds = await interleaved(FairShareScheduler(**limits, affinity_max_batch=0), owners, t2i, i2i)
+    scheduler = FairShareScheduler(**limits, affinity_max_batch=owners)
+    grouped_swaps, grouped_seconds = await interleaved(scheduler, owners, t2i, i2i)
+    stats = scheduler.stats()
+    print(f"1) {owners * 2} interleaved t2i/i2i jobs from {owners} conversations "
+          f"({JOB_SECONDS * 1000:.0f} ms job, {SWAP_SECONDS * 1000:.0f} ms model swap)")
+    print(f"   round-robin only : {plain_swaps:2d} swaps, {plain_seconds:.2f}s")
+    print(f"   model affinity   : {grouped_swaps:2d} swaps, {grouped_seconds:.2f}s "
+          f"(scheduler: {stats['model_swaps_avoided']} swaps avoided)")
+    assert grouped_swaps < plain_swaps
+
+    # 2) 기아 방지
+    max_wait = 0.3
+    scheduler = FairShareScheduler(**limits, affinity_max_wait=max_wait, affinity_max_batch=1000)
+    gpu = FakeGPU()
+    i2i_waits = []
+    stream = [asyncio.create_task(job(scheduler, gpu, 'gallery', t2i)) for _ in range(30)]
+    await asyncio.sleep(0.01)
+    stream.append(asyncio.create_task(job(scheduler, gpu, 'visitor', i2i, i2i_waits)))
+    await asyncio.gather(*stream)
+    print(f"2) one i2i request while another conversation has 30 t2i queued: started after {i2i_waits[0]:.2f}s "
+          f"(affinity_max_wait={max_wait}s; without the bound it would wait {30 * JOB_SECONDS:.2f}s)")
+    assert i2i_waits[0] < max_wait + JOB_SECONDS * 3
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
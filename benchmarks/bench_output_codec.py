@@ -0,0 +1,103 @@
+# benchmarks/bench_output_codec.py
+#
+# 출력 코덱 단계 검증. media/comfyui_output의 PNG를 임시 MEDIA_ROOT로 복사한 뒤 코덱별로
+#   1) 디스크 사용량(= 이미지를 내려받을 때의 전송량) 감소와 처리 시간 (프로세스 풀)
+#   2) 무손실 여부: 다시 인코딩한 파일의 픽셀이 원본 PNG와 같은지
+#   3) ComfyUI 메타데이터(prompt/workflow)가 사이드카 JSON에 남았는지
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_output_codec [파일 수 (기본: 전부)]
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+from PIL import Image
+
+from image_generator.output_codec import CODECS, SIDECAR_SUFFIX, OutputCodec
+
+
+def is_image(path):
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        return True
+    except Exception: # media/comfyui_output에 이미지가 아닌 파일이 섞여 있을 수 있습니다
+        return False
+
+
+async def run_codec(codec, sources):
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, codec))
+    names = []
+    for source in sources:
+        name = f"{codec}/{os.path.basename(source)}"
+        shutil.copy(source, os.path.join(settings.MEDIA_ROOT, name))
+        names.append(name)
+    stage = OutputCodec(codec=codec, max_workers=os.cpu_count() or 2)
+    start = time.perf_counter()
+    new_names = await asyncio.gather(*(stage.process(name) for name in names))
+    elapsed = time.perf_counter() - start
+    stage._executor.shutdown()
+    return stage.stats(), elapsed, list(zip(sources, new_names))
+
+
+def verify(pairs):
+    """(원본 경로, 새 스토리지 이름) 쌍의 픽셀/메타데이터를 비교하고 (픽셀이 다른 파일 수, 사이드카 누락 수)를 반환합니다."""
+    different = missing_sidecar = 0
+    for source, name in pairs:
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        with Image.open(source) as original, Image.open(path) as encoded:
+            if original.convert('RGBA').tobytes() != encoded.convert('RGBA').tobytes():
+                different += 1
+            metadata = dict(getattr(original, 'text', {}) or {})
+        if metadata:
+            try:
+                with open(path + SIDECAR_SUFFIX, encoding='utf-8') as f:
+                    sidecar = json.load(f)['metadata']
+                if set(sidecar) != set(metadata):
+                    missing_sidecar += 1
+            except FileNotFoundError:
+                missing_sidecar += 1
+    return different, missing_sidecar
+
+
+async def main():
+    sources = [source for source in sorted(glob.glob(os.path.join(settings.BASE_DIR, 'media', 'comfyui_output', '*.png')))
+               if is_image(source)]
+    if len(sys.argv) > 1:
+        sources = sources[:int(sys.argv[1])]
+    if not sources:
+        print("No PNG files in media/comfyui_output.")
+        return
+    total = sum(os.path.getsize(source) for source in sources)
+    print(f"{len(sources)} ComfyUI outputs, {total / 1024 / 1024:.1f} MB ({total / len(sources) / 1024:.0f} KB per image)")
+    workdir = tempfile.mkdtemp(prefix='bench_output_codec_')
+    settings.MEDIA_ROOT = workdir # default_storage가 처음 쓰이기 전에 바꿉니다 (실제 media/는 건드리지 않습니다)
+    try:
+        for codec in CODECS:
+            stats, elapsed, pairs = await run_codec(codec, sources)
+            different, missing_sidecar = verify(pairs)
+            stored = stats['original_bytes'] - stats['bytes_saved']
+            print(f"{codec:14s}: {stored / 1024 / 1024:6.1f} MB on disk / per download "
+                  f"(-{stats['saved_ratio'] * 100:.1f}%, {stored / len(sources) / 1024:.0f} KB per image), "
+                  f"{elapsed:.2f}s ({elapsed / len(sources) * 1000:.0f} ms per image), kept original {stats['kept_original']}, "
+                  f"pixel mismatches {different}, missing metadata {missing_sidecar}")
+            assert stats['failures'] == 0 and different == 0 and missing_sidecar == 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
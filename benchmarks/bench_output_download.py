@@ -0,0 +1,64 @@
+# benchmarks/bench_output_download.py
+#
+# ComfyUI 출력 다운로드 방식별 최대 메모리 사용량(tracemalloc) 비교:
+#   - 기존 방식: /view 응답 전체를 메모리에 읽은 뒤 ContentFile로 저장
+#   - 스트리밍: ComfyAPIClient.download_image()로 청크 단위 임시 파일 저장 후 commit_file()로 원자적 이동
+# 이미지 크기와 배치 크기(동시 다운로드 수)를 바꿔 가며 측정합니다.
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_output_download
+
+import asyncio
+import logging
+import os
+import tempfile
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator.comfy_api_client import ComfyAPIClient
+from image_generator.output_storage import commit_file
+
+
+async def buffered(client, index):
+    content = await client.get_image(f'{index}.png', '', 'output')
+    await asyncio.to_thread(default_storage.save, f'buffered/{index}.png', ContentFile(content))
+
+
+async def streamed(client, index):
+    temp_path = await client.download_image(f'{index}.png', '', 'output', default_storage.path('streamed'))
+    await asyncio.to_thread(commit_file, temp_path, f'streamed/{index}.png')
+
+
+async def measure(job, client, batch):
+    tracemalloc.start()
+    await asyncio.gather(*(job(client, i) for i in range(batch)))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+async def main():
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='bench_output_download_')
+    print(f"{'image MB':>9}{'batch':>7}{'buffered peak MB':>18}{'streamed peak MB':>18}")
+    for size_mb in (2, 8, 32):
+        with MockComfyUIServer(image_bytes=os.urandom(size_mb * 1024 * 1024)) as server:
+            client = ComfyAPIClient(server.url)
+            await client.get_system_stats() # 연결 풀 준비
+            for batch in (1, 4):
+                buffered_peak = await measure(buffered, client, batch)
+                streamed_peak = await measure(streamed, client, batch)
+                print(f"{size_mb:>9}{batch:>7}{buffered_peak:>18.1f}{streamed_peak:>18.1f}")
+            await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
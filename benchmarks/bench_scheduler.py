@@ -0,0 +1,119 @@
+# benchmarks/bench_scheduler.py
+#
+# 생성 스케줄러(FairShareScheduler) 공정성/백프레셔 검증. 실제 ComfyUI 대신 일정 시간 sleep하는 작업을 사용합니다.
+#   1) 한 대화가 요청 N개를 먼저 몰아 넣은 직후 다른 대화 3개가 1개씩 요청할 때,
+#      FIFO(대화 구분 없음)와 대화별 라운드 로빈에서 나중 대화들의 대기 시간 비교
+#   2) 대기열이 가득 차면 GenerationQueueFull(retry_after)로 거절되는지
+#   3) 대기 중 취소된 요청이 슬롯을 잃지 않고 다음 요청으로 넘어가는지
+#   4) 생성 워커 풀(GenerationWorkerPool)도 같은 규칙으로 시작 순서를 정하고, 대화별 대기 한도를 넘으면 submit()에서 거절하는지
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_scheduler [몰아 넣는 요청 수]
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from image_generator.scheduler import FairShareScheduler, GenerationQueueFull
+from image_generator.task_pool import GenerationWorkerPool
+
+JOB_SECONDS = 0.05
+
+
+async def job(scheduler, owner, waits):
+    enqueued = time.perf_counter()
+    async with scheduler.slot(owner):
+        waits.setdefault(owner, []).append(time.perf_counter() - enqueued)
+        await asyncio.sleep(JOB_SECONDS)
+
+
+async def burst(scheduler, heavy_requests, fair):
+    waits = {}
+    owner = (lambda name: name) if fair else (lambda name: None)
+    tasks = [asyncio.create_task(job(scheduler, owner('heavy'), waits)) for _ in range(heavy_requests)]
+    await asyncio.sleep(0.01)
+    tasks += [asyncio.create_task(job(scheduler, owner(f'light{i}'), waits)) for i in range(3)]
+    await asyncio.gather(*tasks)
+    if not fair:
+        return waits[None][heavy_requests:]
+    return [w for name, ws in waits.items() if name != 'heavy' for w in ws]
+
+
+async def main():
+    heavy_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+
+    # 1) 공정성
+    unlimited = dict(max_in_flight=2, max_queued=1000, max_queued_per_owner=1000)
+    fifo = await burst(FairShareScheduler(**unlimited), heavy_requests, fair=False)
+    fair = await burst(FairShareScheduler(**unlimited), heavy_requests, fair=True)
+    print(f"1) {heavy_requests} requests from one conversation, then 3 others (2 slots, {JOB_SECONDS * 1000:.0f} ms jobs)")
+    print(f"   FIFO        : other conversations waited max {max(fifo) * 1000:6.0f} ms")
+    print(f"   round-robin : other conversations waited max {max(fair) * 1000:6.0f} ms")
+    assert max(fair) < max(fifo) / 2
+
+    # 2) 백프레셔
+    scheduler = FairShareScheduler(max_in_flight=2, max_queued=4, max_queued_per_owner=2, expected_service_time=10)
+    waits = {}
+    outcomes = await asyncio.gather(
+        *(job(scheduler, f'user{i % 4}', waits) for i in range(12)), return_exceptions=True)
+    rejected = [o for o in outcomes if isinstance(o, GenerationQueueFull)]
+    assert len(rejected) == 6, outcomes
+    print(f"2) 12 requests, 2 slots + queue of 4: {12 - len(rejected)} served, {len(rejected)} rejected "
+          f"(retry_after={sorted({e.retry_after for e in rejected})}s)")
+    per_owner = FairShareScheduler(max_in_flight=1, max_queued=100, max_queued_per_owner=3)
+    outcomes = await asyncio.gather(*(job(per_owner, 'spammer', {}) for _ in range(10)), return_exceptions=True)
+    assert sum(isinstance(o, GenerationQueueFull) for o in outcomes) == 6
+    print(f"   one conversation sending 10 (1 slot, 3 per conversation): 4 served, 6 rejected")
+
+    # 3) 대기 중 취소
+    scheduler = FairShareScheduler(max_in_flight=1, max_queued=10, max_queued_per_owner=10)
+    waits = {}
+    tasks = [asyncio.create_task(job(scheduler, f'user{i}', waits)) for i in range(4)]
+    await asyncio.sleep(0.01)
+    tasks[1].cancel()
+    tasks[2].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    stats = scheduler.stats()
+    assert stats['in_flight'] == 0 and stats['queued'] == 0 and stats['admitted'] == 2, stats
+    print(f"3) 2 of 4 queued requests cancelled: stats={stats}")
+
+    # 4) 워커 풀: 한 대화가 한도까지 몰아 넣은 뒤 다른 대화 3개가 1개씩 제출
+    pool = GenerationWorkerPool(max_workers=2, max_pending=64, max_pending_per_owner=4)
+    started, rejected = [], 0
+    done = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def factory(name):
+        async def run():
+            started.append(name)
+            await asyncio.sleep(JOB_SECONDS)
+            if len(started) == len(names):
+                loop.call_soon_threadsafe(done.set)
+        return run
+
+    names = []
+    for i in range(heavy_requests):
+        try:
+            pool.submit(f'heavy{i}', factory(f'heavy{i}'), owner='heavy')
+            names.append(f'heavy{i}')
+        except GenerationQueueFull:
+            rejected += 1
+    for i in range(3):
+        pool.submit(f'light{i}', factory(f'light{i}'), owner=f'light{i}')
+        names.append(f'light{i}')
+    await asyncio.wait_for(done.wait(), 10)
+    last_light = max(started.index(f'light{i}') for i in range(3))
+    print(f"4) worker pool, 2 workers, 4 waiting per conversation: {len(names) - 3} of {heavy_requests} heavy requests accepted, "
+          f"{rejected} rejected; other conversations started by position {last_light + 1} of {len(started)}")
+    assert rejected == heavy_requests - 6 and last_light < 2 + 2 * 3, started
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+# benchmarks/bench_single_flight.py
+#
+# 동일 요청 병합(single-flight) 동시성 검증. mock ComfyUI가 받은 /prompt 수를 셉니다.
+#   1) 같은 요청 N개를 동시에 보내면 ComfyUI 작업은 1개만 큐에 들어가고, 모든 요청이 같은 결과를 받는지
+#   2) 서로 다른 프롬프트 3종을 섞어 보내면 작업이 3개만 생성되는지
+#   3) 작업이 실패하면 기다리던 모든 요청이 같은 예외를 받는지
+#   4) 기다리던 요청 하나가 취소되어도 나머지는 결과를 받고, 모두 취소되면 작업도 취소되는지
+# 번역 모델 로딩을 피하기 위해 번역 함수는 입력을 그대로 돌려주도록 바꿔서 실행합니다.
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_single_flight [동시 요청 수]
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL) # 3)의 의도된 오류 로그도 숨깁니다.
+
+from django.conf import settings
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from image_generator import image_logic_parser
+from image_generator.comfy_api_client import ComfyAPIError
+from image_generator.single_flight import get_single_flight
+
+
+def generate(prompt):
+    return image_logic_parser.generate_image_single_flight(prompt, None, 'image_generation', [], [])
+
+
+async def timed(concurrency, prompts):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(generate(prompts[i % len(prompts)]) for i in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    media_root = tempfile.mkdtemp(prefix='bench_single_flight_')
+    settings.MEDIA_ROOT = media_root
+    settings.COMFYUI_OUTPUT_DIR = os.path.join(media_root, 'comfyui_output')
+    image_logic_parser.translate_text = lambda text, source_lang, target_lang: text
+    image_logic_parser.COMFYUI_USE_WEBSOCKET = False
+    # 병합하지 않는 비교 실행에서 동시 요청이 생성 스케줄러의 대기열 제한에 걸리지 않도록 합니다.
+    settings.COMFYUI_MAX_IN_FLIGHT = settings.COMFYUI_MAX_QUEUED = settings.COMFYUI_MAX_QUEUED_PER_CONVERSATION = concurrency
+
+    with MockComfyUIServer(execution_time=0.1) as server:
+        settings.COMFYUI_BACKENDS = [server.url]
+        flights = get_single_flight()
+
+        # 병합하지 않을 때와 비교
+        image_logic_parser.COMFYUI_SINGLE_FLIGHT = False
+        _, elapsed = await timed(concurrency, ['a cat in a spacesuit'])
+        print(f"without single-flight: {concurrency} identical requests -> {server.prompt_count} prompts, {elapsed:.2f}s")
+        image_logic_parser.COMFYUI_SINGLE_FLIGHT = True
+
+        # 1) 같은 요청 N개
+        before = server.prompt_count
+        results, elapsed = await timed(concurrency, ['a cat in a spacesuit'])
+        prompts = server.prompt_count - before
+        assert prompts == 1, prompts
+        assert len({r['image_file_path'] for r in results}) == 1
+        print(f"1) with single-flight: {concurrency} identical requests -> {prompts} prompt, {elapsed:.2f}s")
+
+        # 2) 프롬프트 3종 (공백/유니코드 정규화 포함)
+        before = server.prompt_count
+        variants = ['모나리자', '  모나리자 ', 'starry night', 'starry   night', 'great wave']
+        await timed(concurrency, variants)
+        prompts = server.prompt_count - before
+        assert prompts == 3, prompts
+        print(f"2) {concurrency} requests over 3 distinct prompts -> {prompts} prompts")
+
+        # 3) 실패 전파
+        server.fail_all = True
+        server.reset_stats()
+        outcomes = await asyncio.gather(*(generate('broken') for _ in range(concurrency)), return_exceptions=True)
+        server.fail_all = False
+        errors = [o for o in outcomes if isinstance(o, ComfyAPIError)]
+        assert len(errors) == concurrency, outcomes
+        print(f"3) failing job: {len(errors)}/{concurrency} waiters got {type(errors[0]).__name__}, "
+              f"POST /prompt sent {server.requests.get('POST /prompt', 0)} time(s)")
+
+        # 4) 취소
+        before = server.prompt_count
+        tasks = [asyncio.create_task(generate('cancel me')) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        tasks[0].cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert isinstance(results[0], asyncio.CancelledError) and all(isinstance(r, dict) for r in results[1:])
+        print(f"4) one of 3 waiters cancelled: {sum(isinstance(r, dict) for r in results)} still got the result, "
+              f"{server.prompt_count - before} prompt")
+
+        tasks = [asyncio.create_task(generate('abandoned')) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        stats = flights.stats()
+        assert stats['cancelled'] == 1 and stats['in_flight'] == 0, stats
+        print(f"   all 3 waiters cancelled: job cancelled, stats={stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
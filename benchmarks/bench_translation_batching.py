@@ -0,0 +1,187 @@
+# benchmarks/bench_translation_batching.py
+#
+# 번역 마이크로 배치 검증. 동시 사용자 --users명(기본 16)이 각자 서로 다른 문장 --per-user개를 translate_text로 번역할 때
+#   1) 현재 경로(TRANSLATION_BATCH_MAX_SIZE=1, 요청마다 파이프라인 호출) vs 마이크로 배치: 처리량(문장/초)과 지연 시간 p50/p95
+#   2) 배치 통계: 평균/최대 배치 크기, 긴 입력의 문장 분할
+#   3) 각 호출자가 자기 입력의 번역을 받았는지
+#   4) 배치 안의 입력 하나가 모델 오류를 내도 같은 배치의 다른 호출자는 번역을 받는지
+# 번역 캐시는 끄고 실행합니다. 기본값은 다운로드 없이 CPU에서 실제로 계산하는 작은 인코더-디코더(torch.nn.Transformer, 탐욕 디코딩)를
+# MarianMT 대신 쓰며, 출력은 입력을 표시한 문자열입니다. --real이면 Helsinki-NLP/opus-mt-ko-en을 불러옵니다 (검증 3은 건너뜀).
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_translation_batching [--users 16] [--per-user 8] [--max-batch 16] [--wait-ms 5] [--real]
+
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+import warnings
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore', module='torch') # nested tensor 프로토타입 경고
+
+import torch
+from django.conf import settings
+
+from llm_cores import translation_cache, translation_service
+from llm_cores.translation_batcher import TranslationBatcher, split_sentences
+
+PHRASES = ['고흐 스타일로 밤하늘의 별을 그려줘', '바다 위의 등대를 인상주의 풍경화로', '눈 덮인 산과 작은 오두막', '지브리 스타일의 시골 마을',
+           '르네상스 정물화처럼 과일 바구니를', '해질녘의 들판과 허수아비', '수채화 느낌의 고양이 초상화', '비 오는 날의 파리 거리']
+
+
+class TorchTranslator:
+    """
+    MarianMT 파이프라인 대신 쓰는 작은 인코더-디코더입니다. 입력 바이트를 임베딩해 인코딩하고 steps 토큰을 탐욕 디코딩하므로
+    배치 크기에 따른 CPU 비용이 실제 모델과 같은 방식으로 늘어납니다. 파이프라인처럼 문자열 또는 목록(batch_size)을 받습니다.
+    """
+
+    def __init__(self, d_model=256, layers=3, steps=24):
+        torch.manual_seed(0)
+        self.embed = torch.nn.Embedding(257, d_model)
+        self.model = torch.nn.Transformer(d_model, nhead=4, num_encoder_layers=layers, num_decoder_layers=layers,
+                                          dim_feedforward=1024, batch_first=True).eval()
+        self.head = torch.nn.Linear(d_model, 257)
+        self.steps = steps
+
+    def __call__(self, texts, batch_size=None):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        ids = [list(text.encode('utf-8'))[:256] for text in texts]
+        width = max(len(i) for i in ids)
+        source = torch.tensor([i + [256] * (width - len(i)) for i in ids])
+        padding = source == 256
+        with torch.inference_mode():
+            memory = self.model.encoder(self.embed(source), src_key_padding_mask=padding)
+            target = torch.zeros(len(texts), 1, dtype=torch.long)
+            for _ in range(self.steps):
+                decoded = self.model.decoder(self.embed(target), memory, memory_key_padding_mask=padding)
+                target = torch.cat([target, self.head(decoded[:, -1]).argmax(-1, keepdim=True)], dim=1)
+        return [{'translation_text': f'EN({text})'} for text in texts]
+
+
+def make_texts(users, per_user, long_ratio, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for user in range(users):
+        own = []
+        for i in range(per_user):
+            text = f'{rng.choice(PHRASES)} #{user}-{i}'
+            if rng.random() < long_ratio:
+                # 여러 문장으로 된 긴 입력 (문장 단위로 나뉩니다)
+                text = '. '.join(f'{rng.choice(PHRASES)} #{user}-{i}-{k}' for k in range(10)) + '.'
+            own.append(text)
+        texts.append(own)
+    return texts
+
+
+def run_users(texts):
+    latencies, outputs = [], {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(texts) + 1)
+
+    def user(own):
+        barrier.wait()
+        for text in own:
+            start = time.perf_counter()
+            result = translation_service.translate_text(text, source_lang='ko', target_lang='en')
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                outputs[text] = result
+
+    threads = [threading.Thread(target=user, args=(own,)) for own in texts]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies), outputs
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation micro-batching benchmark')
+    parser.add_argument('--users', type=int, default=16, help='concurrent users')
+    parser.add_argument('--per-user', type=int, default=8, help='texts translated by each user, one after another')
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--wait-ms', type=float, default=5.0)
+    parser.add_argument('--long-ratio', type=float, default=0.1, help='fraction of long multi-sentence inputs')
+    parser.add_argument('--real', action='store_true', help='use the real translation model')
+    args = parser.parse_args()
+
+    settings.TRANSLATION_CACHE_PATH = None # 모든 문장이 모델을 거치도록 캐시를 끕니다
+    settings.TRANSLATION_CACHE_MAX_ENTRIES = 0
+    translation_cache._translation_cache = None
+    if args.real:
+        translation_service.get_translator_instance_for_lang('ko')
+    else:
+        translation_service._translators['ko-en'] = TorchTranslator()
+    translation_service.translate_text('워밍업', source_lang='ko', target_lang='en')
+    texts = make_texts(args.users, args.per_user, args.long_ratio)
+    total = sum(len(own) for own in texts)
+    print(f"{args.users} concurrent users x {args.per_user} texts ({total} texts, {args.long_ratio:.0%} long), "
+          f"{'real MarianMT' if args.real else 'CPU encoder-decoder stand-in'}, torch threads {torch.get_num_threads()}")
+
+    results = {}
+    for label, max_batch in (('current (batch size 1)', 1), (f'micro-batch (<= {args.max_batch}, {args.wait_ms:g} ms)', args.max_batch)):
+        settings.TRANSLATION_BATCH_MAX_SIZE = max_batch
+        settings.TRANSLATION_BATCH_MAX_WAIT_MS = args.wait_ms
+        translation_service._batchers.clear()
+        elapsed, latencies, outputs = run_users(texts)
+        results[label] = (elapsed, outputs)
+        print(f"1) {label:32s}: {total / elapsed:6.1f} texts/s, latency p50 {percentile(latencies, 0.5) * 1000:6.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms, total {elapsed:.2f}s")
+    stats = translation_service.translation_batch_stats()['ko-en']
+    print(f"2) batches {stats['batches']} for {stats['sentences']} sentences from {stats['requests']} calls: "
+          f"avg batch {stats['avg_batch_size']}, largest {stats['largest_batch']}, failures {stats['failures']}")
+
+    (current, _), (batched, outputs) = results.values()
+    print(f"   throughput {current / batched:.1f}x of the current path")
+    if not args.real:
+        split = settings.TRANSLATION_BATCH_SPLIT_CHARS
+        mismatched = [text for text, output in outputs.items()
+                      if output != ' '.join(f'EN({s})' for s in split_sentences(text, split))]
+        print(f"3) callers that got another caller's translation: {len(mismatched)}")
+        assert not mismatched and stats['failures'] == 0
+        poisoned_batch_isolation()
+
+
+def poisoned_batch_isolation():
+    def translate_batch(texts):
+        if any('POISON' in text for text in texts):
+            raise RuntimeError('model failed on a bad input')
+        return [f'EN({text})' for text in texts]
+
+    batcher = TranslationBatcher(translate_batch, max_batch_size=16, max_wait=0.05, name='poison')
+    texts = [f'문장 {i}' for i in range(7)] + ['POISON']
+    outcomes = {}
+    threads = [threading.Thread(target=lambda t=t: outcomes.__setitem__(t, _outcome(batcher, t))) for t in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = batcher.stats()
+    failed = [text for text, outcome in outcomes.items() if isinstance(outcome, Exception)]
+    print(f"4) batch of {len(texts)} with one bad input: failed callers {failed}, batches {stats['batches']}, "
+          f"retried one by one {stats['batch_retries']}x")
+    assert failed == ['POISON'] and all(outcomes[t] == f'EN({t})' for t in texts[:-1])
+
+
+def _outcome(batcher, text):
+    try:
+        return batcher.translate(text)
+    except Exception as e:
+        return e
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# benchmarks/bench_translation_cache.py
+#
+# 번역 캐시(메모리 LRU + SQLite) 검증. 임시 SQLite 파일을 사용하며, 기본값은 MarianMT 대신 --forward-ms만큼 걸리는
+# 가짜 번역기로 실행합니다 (--real이면 실제 Helsinki-NLP/opus-mt-ko-en 모델을 불러옵니다).
+#   1) 자주 반복되는 프롬프트 분포(Zipf)에서 캐시 없음 vs 캐시 있음: 모델 호출 수, 적중률, 전체 시간
+#   2) 재시작: 새 프로세스 상태(메모리 비움)에서 warm()으로 많이 쓰인 항목을 올린 뒤의 메모리/디스크 적중
+#   3) 여러 워커 프로세스: 다른 프로세스들이 같은 SQLite 파일의 번역을 재사용하는지
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_translation_cache [--calls 2000] [--prompts 200] [--forward-ms 40] [--real]
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+
+from llm_cores import translation_cache, translation_service
+
+PHRASES = ['고흐 스타일로 그려줘', '인상주의 풍경화', '밤하늘의 별', '바다 위의 등대', '눈 덮인 산', '지브리 스타일 마을',
+           '초상화로 그려줘', '수채화 느낌으로', '르네상스 정물화', '해질녘의 들판']
+
+
+class FakeTranslator:
+    """
+    MarianMT 파이프라인 대신 문장마다 forward_ms만큼 CPU를 쓰고 입력을 표시한 문자열을 돌려줍니다.
+    파이프라인처럼 문자열 또는 목록(batch_size, 마이크로 배치 계층이 사용)을 받으며, calls는 번역한 문장 수입니다.
+    """
+
+    def __init__(self, forward_ms):
+        self.forward_ms = forward_ms
+        self.calls = 0
+
+    def __call__(self, texts, batch_size=None):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        self.calls += len(texts)
+        deadline = time.perf_counter() + self.forward_ms * len(texts) / 1000
+        while time.perf_counter() < deadline:
+            pass
+        return [{'translation_text': f'EN({text})'} for text in texts]
+
+
+def prompts(count):
+    return [f'{PHRASES[i % len(PHRASES)]} #{i}' for i in range(count)]
+
+
+def workload(args, seed=0):
+    """상위 몇 개의 프롬프트가 대부분을 차지하는 반복 요청 분포 (Zipf, s=1.1)."""
+    rng = random.Random(seed)
+    candidates = prompts(args.prompts)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(candidates))]
+    return rng.choices(candidates, weights=weights, k=args.calls)
+
+
+def install_translator(args):
+    if args.real:
+        translation_service.get_translator_instance_for_lang('ko')
+        return None
+    translator = FakeTranslator(args.forward_ms)
+    translation_service._translators['ko-en'] = translator
+    translation_service._batchers.clear()
+    return translator
+
+
+def reset_cache():
+    """프로세스를 새로 시작한 것처럼 메모리 캐시를 버립니다 (SQLite 파일은 남습니다)."""
+    translation_cache._translation_cache = None
+    return translation_cache.get_translation_cache()
+
+
+def run(texts):
+    start = time.perf_counter()
+    for text in texts:
+        translation_service.translate_text(text, source_lang='ko', target_lang='en')
+    return time.perf_counter() - start
+
+
+def worker(path, texts):
+    # fork된 워커 프로세스: 메모리 캐시는 비어 있고 SQLite 파일만 공유합니다.
+    settings.TRANSLATION_CACHE_PATH = path
+    cache = reset_cache()
+    translator = FakeTranslator(1000) # 모델을 실행하면 눈에 띄게 느려집니다
+    translation_service._translators['ko-en'] = translator
+    translation_service._batchers.clear() # 부모의 번역기를 잡고 있는 배치 계층을 버립니다
+    elapsed = run(texts)
+    return translator.calls, cache.stats(), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation cache benchmark')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--prompts', type=int, default=200, help='number of distinct prompts')
+    parser.add_argument('--forward-ms', type=float, default=40.0, help='simulated MarianMT forward pass (ms)')
+    parser.add_argument('--real', action='store_true', help='use the real translation model')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_translation_cache_')
+    path = os.path.join(workdir, 'translation_cache.sqlite3')
+    try:
+        translator = install_translator(args)
+        texts = workload(args)
+        distinct = len(set(texts))
+
+        settings.TRANSLATION_CACHE_PATH = None
+        settings.TRANSLATION_CACHE_MAX_ENTRIES = 0
+        reset_cache()
+        sample = texts[:200]
+        uncached = run(sample) / len(sample) * len(texts)
+
+        settings.TRANSLATION_CACHE_PATH = path
+        settings.TRANSLATION_CACHE_MAX_ENTRIES = 64 # 작은 LRU: 자주 쓰지 않는 프롬프트는 SQLite에서 다시 읽습니다
+        cache = reset_cache()
+        calls_before = translator.calls if translator else 0
+        cached = run(texts)
+        cache.flush_hits()
+        stats = cache.stats()
+        model_calls = (translator.calls - calls_before) if translator else stats['misses']
+        print(f"1) {len(texts)} calls over {distinct} distinct prompts: no cache {uncached:.2f}s (estimated), "
+              f"cached {cached:.2f}s ({uncached / cached:.0f}x), model calls {model_calls}, "
+              f"memory hits {stats['memory_hits']}, disk hits {stats['disk_hits']}, hit rate {stats['hit_rate'] * 100:.1f}%")
+        assert model_calls == distinct
+
+        cache = reset_cache()
+        warmed = cache.warm(settings.TRANSLATION_CACHE_WARM_ENTRIES)
+        calls_before = translator.calls if translator else 0
+        hot = workload(args, seed=1)[:500]
+        elapsed = run(hot)
+        stats = cache.stats()
+        print(f"2) restart: warm-loaded {warmed} entries, next {len(hot)} calls in {elapsed * 1000:.0f} ms, "
+              f"memory hits {stats['memory_hits']}, disk hits {stats['disk_hits']}, "
+              f"model calls {(translator.calls - calls_before) if translator else stats['misses']}")
+        assert warmed == min(settings.TRANSLATION_CACHE_MAX_ENTRIES, distinct) and stats['memory_hits'] > stats['disk_hits']
+
+        if translator is not None:
+            chunks = [texts[i::4] for i in range(4)]
+            with ProcessPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(worker, [path] * 4, chunks))
+            calls = sum(result[0] for result in results)
+            disk_hits = sum(result[1]['disk_hits'] for result in results)
+            print(f"3) 4 worker processes sharing {os.path.basename(path)}: {sum(len(c) for c in chunks)} calls, "
+                  f"model calls {calls}, disk hits {disk_hits}, slowest worker {max(result[2] for result in results):.2f}s")
+            assert calls == 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
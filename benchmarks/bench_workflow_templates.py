@@ -0,0 +1,95 @@
+# benchmarks/bench_workflow_templates.py
+#
+# 요청당 워크플로우 준비 비용 비교:
+#   - 기존 방식: 매 요청마다 JSON 파일을 열어 json.load 후 하드코딩된 노드 ID를 in/inputs로 확인하며 값 주입
+#   - 템플릿 방식: 시작 시 컴파일된 템플릿을 구조적으로 복사하고 패치 플랜대로 값 주입
+#
+# 실행 (프로젝트 루트에서): python -m benchmarks.bench_workflow_templates [반복 횟수]
+
+import json
+import os
+import random
+import sys
+import timeit
+
+from image_generator.workflow_templates import WorkflowTemplateRegistry
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKFLOWS_DIR = os.path.join(BASE_DIR, 'comfyui_workflows')
+
+POSITIVE = "a portrait in the style of van gogh, masterpiece, best quality"
+NEGATIVE = "low quality, bad quality, blurry"
+
+
+def legacy_prepare(json_file_name):
+    """기존 generate_image_based_on_json_logic의 1~5단계와 같은 방식으로 워크플로우를 준비합니다."""
+    json_path = os.path.join(WORKFLOWS_DIR, json_file_name)
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+    json_data = json_data.get('prompt', json_data)
+
+    if json_file_name == 'text_to_image.json':
+        prompt_nodes, prompt_key, ksampler_node_id = ('6', '7'), 'text', '3'
+    else:
+        prompt_nodes, prompt_key, ksampler_node_id = ('11', '10'), 'user_prompt', '5'
+    for node_id, text in zip(prompt_nodes, (POSITIVE, NEGATIVE)):
+        if node_id in json_data and 'inputs' in json_data[node_id] and prompt_key in json_data[node_id]['inputs']:
+            json_data[node_id]['inputs'][prompt_key] = text
+
+    if ksampler_node_id in json_data and 'inputs' in json_data[ksampler_node_id]:
+        inputs = json_data[ksampler_node_id]['inputs']
+        if 'seed' in inputs:
+            inputs['seed'] = random.randint(0, 2**32 - 1)
+        if 'denoise' in inputs:
+            inputs['denoise'] = 0.7
+        if 'cfg' in inputs:
+            inputs['cfg'] = 9.0
+
+    if json_file_name == 'image_to_image.json':
+        if '7' in json_data and 'inputs' in json_data['7'] and 'weight' in json_data['7']['inputs']:
+            json_data['7']['inputs']['weight'] = 1.0
+        if '9' in json_data and 'inputs' in json_data['9'] and 'image' in json_data['9']['inputs']:
+            json_data['9']['inputs']['image'] = 'input.jpg'
+    return json_data
+
+
+def template_prepare(registry, json_file_name):
+    template = registry.get(json_file_name)
+    return template.instantiate(
+        positive_prompt=POSITIVE,
+        negative_prompt=NEGATIVE,
+        seed=random.randint(0, 2**32 - 1),
+        denoise=0.7,
+        cfg=9.0,
+        ipadapter_weight=1.0 if template.has_slot('ipadapter_weight') else None,
+        load_image='input.jpg' if template.has_slot('load_image') else None,
+    )
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    registry = WorkflowTemplateRegistry(WORKFLOWS_DIR)
+    registry.preload(['text_to_image.json', 'image_to_image.json'])
+
+    print(f"{'workflow':<22}{'legacy (us/req)':>18}{'template (us/req)':>20}{'speedup':>10}")
+    for name in ('text_to_image.json', 'image_to_image.json'):
+        # 두 방식이 같은 결과를 내는지 먼저 확인 (seed 제외)
+        legacy = legacy_prepare(name)
+        compiled = template_prepare(registry, name)
+        for node_id, node in legacy.items():
+            expected = {k: v for k, v in node['inputs'].items() if k != 'seed'}
+            actual = {k: v for k, v in compiled[node_id]['inputs'].items() if k != 'seed'}
+            if name == 'text_to_image.json':
+                expected.pop('denoise', None)
+                actual.pop('denoise', None)
+            assert expected == actual, f"{name} node {node_id} differs: {expected} != {actual}"
+
+        legacy_time = min(timeit.repeat(lambda: legacy_prepare(name), number=number, repeat=3)) / number
+        template_time = min(timeit.repeat(lambda: template_prepare(registry, name), number=number, repeat=3)) / number
+        print(f"{name:<22}{legacy_time * 1e6:>18.2f}{template_time * 1e6:>20.2f}{legacy_time / template_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# benchmarks/load_test.py
+#
+# process_request_api 부하 테스트. GPU/Ollama 없이 CPU만으로 오프라인 실행됩니다.
+# 기본 모드에서는 mock ComfyUI(/ws 포함)와 mock Ollama를 띄우고, 임시 DB/MEDIA_ROOT를 사용하는 Django를 같은 프로세스에서
+# ASGI 요청(django.test.AsyncClient)으로 호출합니다. --target을 주면 이미 실행 중인 서버에 HTTP로 요청합니다
+# (이 경우 서버의 COMFYUI_BACKENDS/OLLAMA_API_URL이 python -m benchmarks.mock_comfyui / mock_ollama를 가리키게 설정하세요).
+# 동시 사용자 수(--concurrency)만큼의 가상 사용자가 각자 대화 하나에서 요청을 연달아 보내며,
+# 모드별(도슨트/t2i/i2i) 처리량과 지연 시간 백분위수(p50/p90/p99)를 출력합니다.
+# 이미지 생성 요청은 202(task_id)를 받은 뒤 /api/tasks/<task_id>/status/를 COMPLETED/FAILED가 될 때까지 조회하며,
+# 지연 시간은 요청부터 완료까지(접수 응답 시간은 submit 열에 따로) 잽니다.
+#
+# 실행 (프로젝트 루트에서):
+#   python -m benchmarks.load_test --concurrency 8 --requests 64 --curator-ratio 0.3 --image-ratio 0.3
+#   python -m benchmarks.load_test --backends 2 --execution-time 1.0 --failure-rate 0.02 --image-size 1024x1024
+#   python -m benchmarks.load_test --target http://127.0.0.1:8000 --concurrency 4
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+logging.disable(logging.CRITICAL)
+
+from django.conf import settings
+
+from benchmarks.mock_comfyui import MockComfyUIServer
+from benchmarks.mock_ollama import MockOllamaServer
+
+API_PATH = '/api/process_request/'
+TASK_STATUS_PATH = '/api/tasks/{task_id}/status/'
+MODE_CURATOR = 'curator'
+MODE_T2I = 't2i'
+MODE_I2I = 'i2i'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def make_photo(size=(1600, 1200)):
+    """업로드용 JPEG 사진(Data URL)을 만듭니다."""
+    from PIL import Image
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=90)
+    return 'data:image/jpeg;base64,' + base64.b64encode(output.getvalue()).decode('ascii')
+
+
+class InProcessTransport:
+    """같은 프로세스의 Django에 ASGI 요청을 보냅니다."""
+
+    def __init__(self):
+        from django.test import AsyncClient
+        self.client = AsyncClient()
+
+    async def post(self, body):
+        response = await self.client.post(API_PATH, data=json.dumps(body), content_type='application/json')
+        return response.status_code, json.loads(response.content or b'{}')
+
+    async def get(self, path):
+        response = await self.client.get(path)
+        return response.status_code, json.loads(response.content or b'{}')
+
+    async def aclose(self):
+        pass
+
+
+class HTTPTransport:
+    """실행 중인 서버(--target)에 HTTP로 요청합니다."""
+
+    def __init__(self, target, timeout):
+        import httpx
+        self.client = httpx.AsyncClient(base_url=target.rstrip('/'), timeout=timeout,
+                                        limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+
+    async def post(self, body):
+        return self._decode(await self.client.post(API_PATH, json=body))
+
+    async def get(self, path):
+        return self._decode(await self.client.get(path))
+
+    @staticmethod
+    def _decode(response):
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def pick_mode(rng, args):
+    roll = rng.random()
+    if roll < args.curator_ratio:
+        return MODE_CURATOR
+    return MODE_I2I if rng.random() < args.image_ratio else MODE_T2I
+
+
+def build_request(mode, index, conversation_id, photo):
+    body = {'conversation_id': conversation_id, 'deterministic': False}
+    if mode == MODE_CURATOR:
+        body.update(current_mode='curator', user_message=f'이 그림에 대해 설명해 주세요 ({index})', image_data=photo)
+    else:
+        body.update(current_mode='image_generation', user_message=f'a quiet lake at sunset, impressionism {index}')
+        if mode == MODE_I2I:
+            body['image_data'] = photo
+    return body
+
+
+async def wait_for_task(transport, task_id, args):
+    """작업이 COMPLETED/FAILED가 될 때까지 상태를 조회하고 (HTTP 상태, 마지막 상태 데이터)를 반환합니다."""
+    deadline = time.perf_counter() + args.timeout
+    while time.perf_counter() < deadline:
+        status, data = await transport.get(TASK_STATUS_PATH.format(task_id=task_id))
+        if status != 200 or data.get('status') in ('COMPLETED', 'FAILED'):
+            return status, data
+        await asyncio.sleep(args.poll_interval)
+    return 'Timeout', {}
+
+
+async def virtual_user(user_id, transport, args, counter, results, photo):
+    rng = random.Random(args.seed + user_id)
+    conversation_id = 'new-chat'
+    while True:
+        index = next(counter)
+        if index >= args.requests:
+            return
+        mode = pick_mode(rng, args)
+        start = time.perf_counter()
+        submit_elapsed = None
+        try:
+            status, data = await transport.post(build_request(mode, index, conversation_id, photo))
+            conversation_id = data.get('conversation_id') or conversation_id
+            if status == 202 and data.get('task_id'):
+                submit_elapsed = time.perf_counter() - start
+                status, data = await wait_for_task(transport, data['task_id'], args)
+        except Exception as e: # 연결 오류, 타임아웃 등
+            status, data = type(e).__name__, {}
+        elapsed = time.perf_counter() - start
+        if mode == MODE_CURATOR:
+            ok = status == 200 and data.get('status') == 'success'
+        else:
+            ok = status == 200 and data.get('status') == 'COMPLETED' and bool(data.get('image_url'))
+            if status == 200 and data.get('status') == 'FAILED':
+                status = 'FAILED'
+        results.append((mode, ok, status, elapsed, submit_elapsed))
+
+
+async def run_load(transport, args):
+    photo = make_photo()
+    counter = iter(range(1 << 62))
+    results = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(virtual_user(i, transport, args, counter, results, photo) for i in range(args.concurrency)))
+    finally:
+        await transport.aclose()
+    return results, time.perf_counter() - start
+
+
+def report(results, elapsed, args):
+    ok_total = sum(1 for _, ok, _, _, _ in results if ok)
+    print(f"{len(results)} requests, concurrency {args.concurrency}: {elapsed:.2f}s, "
+          f"{len(results) / elapsed:.2f} req/s, {ok_total / elapsed:.2f} successful req/s")
+    print(f"{'mode':9s} {'count':>5s} {'ok':>5s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s} {'submit':>8s}  statuses")
+    for mode in (MODE_CURATOR, MODE_T2I, MODE_I2I):
+        rows = [r for r in results if r[0] == mode]
+        if not rows:
+            continue
+        latencies = [elapsed for _, ok, _, elapsed, _ in rows if ok]
+        # 생성 요청이 202를 받기까지 걸린 시간의 p99 (도슨트는 '-')
+        submits = [submit for _, _, _, _, submit in rows if submit is not None]
+        statuses = Counter(str(status) for _, ok, status, _, _ in rows if not ok)
+        print(f"{mode:9s} {len(rows):5d} {len(latencies):5d} "
+              + ' '.join(f"{percentile(latencies, q):7.2f}s" for q in (0.5, 0.9, 0.99))
+              + f" {max(latencies, default=0.0):7.2f}s "
+              + (f"{percentile(submits, 0.99):7.2f}s  " if submits else f"{'-':>8s}  ")
+              + (', '.join(f'{status} x{count}' for status, count in statuses.items()) or '-'))
+
+
+def configure_in_process(args, comfy_urls, ollama_url):
+    """임시 DB/MEDIA_ROOT와 mock 서버를 쓰도록 설정합니다 (실제 db.sqlite3와 media/는 건드리지 않습니다)."""
+    from django.core.management import call_command
+    from django.db import connections
+
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    connections['default'].close()
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'db.sqlite3')
+    call_command('migrate', verbosity=0, interactive=False)
+    settings.MEDIA_ROOT = os.path.join(workdir, 'media')
+    settings.COMFYUI_OUTPUT_DIR = os.path.join(settings.MEDIA_ROOT, 'comfyui_output')
+    settings.COMFYUI_INPUT_DIR = os.path.join(settings.MEDIA_ROOT, 'comfyui_input')
+    settings.COMFYUI_BACKENDS = comfy_urls
+    settings.ALLOWED_HOSTS = ['*']
+
+    from image_generator import image_logic_parser
+    from llm_cores import gemma_service
+    gemma_service.OLLAMA_API_URL = ollama_url
+    if not args.translate:
+        # 번역 모델(transformers) 다운로드/로딩 없이 실행합니다.
+        image_logic_parser.translate_text = lambda text, source_lang, target_lang: text
+    return workdir
+
+
+def print_server_stats(comfy_servers, ollama_server):
+    from image_generator.scheduler import get_generation_scheduler
+    stats = get_generation_scheduler().stats()
+    from image_generator.task_pool import get_generation_worker_pool
+    pool = get_generation_worker_pool().stats()
+    print(f"generation workers: {pool['workers']} workers, submitted {pool['submitted']}, completed {pool['completed']}, "
+          f"failed {pool['failed']}, rejected {pool['rejected']}, avg job {pool['job_time_seconds']}s")
+    print(f"scheduler: wait avg {stats['wait_avg_seconds']}s / p95 {stats['wait_p95_seconds']}s, "
+          f"admitted {stats['admitted']}, rejected {stats['rejected']}, model swaps {stats['model_swaps']}")
+    for server in comfy_servers:
+        print(f"mock ComfyUI {server.url}: {server.prompt_count} prompts, {server.model_swaps} model swaps, "
+              f"{server.interrupted + server.deleted} cancelled, websocket clients {server.websocket_clients}")
+    print(f"mock Ollama: {ollama_server.requests} requests, {ollama_server.images_received} images "
+          f"({ollama_server.image_bytes_received / 1024:.0f} KB base64)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test for /api/process_request/')
+    parser.add_argument('--concurrency', type=int, default=8, help='number of virtual users')
+    parser.add_argument('--requests', type=int, default=64, help='total number of requests')
+    parser.add_argument('--curator-ratio', type=float, default=0.3, help='fraction of docent (Ollama) requests')
+    parser.add_argument('--image-ratio', type=float, default=0.3, help='fraction of generation requests with an uploaded image (i2i)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--target', default=None, help='base URL of a running server (skips the in-process setup and mocks)')
+    parser.add_argument('--timeout', type=float, default=600.0, help='per-request timeout, including waiting for generation tasks (seconds)')
+    parser.add_argument('--poll-interval', type=float, default=0.2, help='seconds between task status checks')
+    parser.add_argument('--translate', action='store_true', help='use the real translation models')
+    parser.add_argument('--backends', type=int, default=1, help='number of mock ComfyUI instances')
+    parser.add_argument('--execution-time', type=float, default=0.5, help='mock ComfyUI seconds per prompt')
+    parser.add_argument('--comfy-latency', type=float, default=0.0, help='mock ComfyUI latency per HTTP request')
+    parser.add_argument('--model-swap-time', type=float, default=0.0, help='mock ComfyUI seconds per model swap')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='mock ComfyUI HTTP failure probability')
+    parser.add_argument('--image-size', default='512x512', help='WIDTHxHEIGHT of generated images served by mock ComfyUI')
+    parser.add_argument('--ollama-latency', type=float, default=0.3, help='mock Ollama time to first token')
+    parser.add_argument('--tokens-per-second', type=float, default=200.0, help='mock Ollama generation speed')
+    parser.add_argument('--ollama-failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.target:
+        results, elapsed = asyncio.run(run_load(HTTPTransport(args.target, args.timeout), args))
+        report(results, elapsed, args)
+        return
+
+    image_size = tuple(int(v) for v in args.image_size.lower().split('x'))
+    comfy_servers = [
+        MockComfyUIServer(execution_time=args.execution_time, latency=args.comfy_latency, image_size=image_size,
+                          failure_rate=args.failure_rate, model_swap_time=args.model_swap_time).start()
+        for _ in range(args.backends)
+    ]
+    ollama_server = MockOllamaServer(first_token_latency=args.ollama_latency, tokens_per_second=args.tokens_per_second,
+                                     failure_rate=args.ollama_failure_rate).start()
+    try:
+        workdir = configure_in_process(args, [server.url for server in comfy_servers], ollama_server.generate_url)
+        print(f"in-process Django (workdir {workdir}), {args.backends} mock ComfyUI ({args.execution_time}s/prompt), "
+              f"mock Ollama at {ollama_server.url}")
+        results, elapsed = asyncio.run(run_load(InProcessTransport(), args))
+        report(results, elapsed, args)
+        print_server_stats(comfy_servers, ollama_server)
+    finally:
+        for server in comfy_servers:
+            server.stop()
+        ollama_server.stop()
+
+
+if __name__ == "__main__":
+    main()
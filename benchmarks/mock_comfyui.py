@@ -0,0 +1,428 @@
+# benchmarks/mock_comfyui.py
+#
+# 벤치마크/부하 테스트용 로컬 ComfyUI 대체 서버 (표준 라이브러리만 사용, GPU 불필요)
+#
+# 단독 실행: python -m benchmarks.mock_comfyui --port 8188 --execution-time 2.0 [--failure-rate 0.05] [--image-size 1024x1024]
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import select
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 1x1 투명 PNG
+TINY_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6300010000000500010d0a2db40000'
+    '000049454e44ae426082'
+)
+
+# RFC 6455 핸드셰이크에 쓰는 GUID
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# 웹소켓 이벤트를 확인하는 주기 (초)
+WEBSOCKET_TICK = 0.02
+# 실행 중 보내는 progress 이벤트 수 (KSampler 단계 흉내)
+PROGRESS_STEPS = 4
+
+
+def make_png(width, height, color=(128, 96, 160)):
+    """width x height 단색 RGB PNG를 만듭니다 (/view 응답 크기 조절용)."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    row = b'\x00' + bytes(color) * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 6))
+            + chunk(b'IEND', b''))
+
+
+def _websocket_frame(text):
+    payload = text.encode('utf-8')
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('>BB', 0x81, length)
+    elif length < 65536:
+        header = struct.pack('>BBH', 0x81, 126, length)
+    else:
+        header = struct.pack('>BBQ', 0x81, 127, length)
+    return header + payload
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive 지원
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _send(self, status, body=b'', content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _route(self, method):
+        parsed = urlparse(self.path)
+        self.mock._record_request(method, parsed.path)
+        if method == 'GET' and parsed.path.rstrip('/') == '/ws':
+            return self._websocket(parsed)
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+        if self.mock.fail_all or (self.mock.failure_rate and random.random() < self.mock.failure_rate):
+            self._read_body()
+            return self._send(503, {'error': 'mock failure'})
+        handler = getattr(self, f'_{method.lower()}_{parsed.path.strip("/").split("/")[0] or "root"}', None)
+        if handler is None:
+            self._read_body()
+            return self._send(404, {'error': 'not found'})
+        return handler(parsed)
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    # --- 엔드포인트 ---
+
+    def _post_prompt(self, parsed):
+        payload = json.loads(self._read_body() or b'{}')
+        prompt_id = self.mock._submit(payload)
+        self._send(200, {'prompt_id': prompt_id, 'number': self.mock.prompt_count, 'node_errors': {}})
+
+    def _get_history(self, parsed):
+        parts = parsed.path.strip('/').split('/')
+        prompt_id = parts[1] if len(parts) > 1 else parse_qs(parsed.query).get('prompt_id', [None])[0]
+        self._send(200, self.mock._history(prompt_id))
+
+    def _get_view(self, parsed):
+        self._send(200, self.mock.image_bytes, content_type='image/png')
+
+    def _get_queue(self, parsed):
+        self._send(200, self.mock._queue())
+
+    def _post_queue(self, parsed):
+        payload = json.loads(self._read_body() or b'{}')
+        for prompt_id in payload.get('delete', []):
+            self.mock._cancel(prompt_id, running=False)
+        self._send(200, b'', content_type='text/plain')
+
+    def _post_interrupt(self, parsed):
+        body = self._read_body()
+        payload = json.loads(body) if body else {}
+        self.mock.interrupts += 1
+        self.mock._cancel(payload.get('prompt_id'), running=True)
+        self._send(200, b'', content_type='text/plain')
+
+    def _post_upload(self, parsed):
+        self._read_body()
+        name = f"upload_{uuid.uuid4().hex}.png"
+        self._send(200, {'name': name, 'subfolder': '', 'type': 'input'})
+
+    def _get_system_stats(self, parsed):
+        self._send(200, {'system': {'os': 'mock'}, 'devices': [{'name': 'cpu', 'type': 'cpu'}]})
+
+    def _websocket(self, parsed):
+        """
+        /ws?clientId=...: 이 client_id로 제출된 프롬프트의 실행 이벤트를 ComfyUI와 같은 순서로 보냅니다
+        (execution_start -> executing -> progress... -> executed -> executing(node=None) -> execution_success).
+        """
+        key = self.headers.get('Sec-WebSocket-Key')
+        if self.mock.fail_all or not key or self.headers.get('Upgrade', '').lower() != 'websocket':
+            return self._send(400 if not self.mock.fail_all else 503, {'error': 'websocket upgrade required'})
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+        client_id = parse_qs(parsed.query).get('clientId', [None])[0]
+        with self.mock._lock:
+            self.mock.websocket_clients += 1
+        sent = {} # prompt_id -> 보낸 progress 수 (완료 후에는 None)
+        try:
+            self._send_event('status', {'status': {'exec_info': {'queue_remaining': 0}}, 'sid': client_id})
+            while not self.mock._stopping.is_set() and not self.mock.fail_all:
+                readable, _, _ = select.select([self.connection], [], [], WEBSOCKET_TICK)
+                if readable and not self.connection.recv(4096, 0):
+                    return # 클라이언트가 연결을 닫음 (close 프레임은 읽고 버립니다)
+                for prompt_id, prompt in self.mock._prompts_for(client_id):
+                    self._advance(prompt_id, prompt, sent)
+        except OSError:
+            return
+        finally:
+            with self.mock._lock:
+                self.mock.websocket_clients -= 1
+
+    def _send_event(self, event_type, data):
+        self.wfile.write(_websocket_frame(json.dumps({'type': event_type, 'data': data})))
+        self.wfile.flush()
+
+    def _advance(self, prompt_id, prompt, sent):
+        if prompt_id in sent and sent[prompt_id] is None:
+            return
+        now = time.monotonic()
+        if now < prompt['starts'] and not prompt.get('cancelled'):
+            return
+        if prompt_id not in sent:
+            sent[prompt_id] = 0
+            self._send_event('execution_start', {'prompt_id': prompt_id})
+            self._send_event('executing', {'node': '3', 'display_node': '3', 'prompt_id': prompt_id})
+        if prompt.get('cancelled'):
+            sent[prompt_id] = None
+            self._send_event('execution_interrupted', {'prompt_id': prompt_id, 'node_id': '3', 'node_type': 'KSampler'})
+            return
+        duration = max(prompt['finishes'] - prompt['starts'], 1e-6)
+        steps = min(PROGRESS_STEPS, int(PROGRESS_STEPS * (now - prompt['starts']) / duration))
+        while sent[prompt_id] < steps:
+            sent[prompt_id] += 1
+            self._send_event('progress', {'value': sent[prompt_id], 'max': PROGRESS_STEPS, 'prompt_id': prompt_id, 'node': '3'})
+        if now < prompt['finishes']:
+            return
+        sent[prompt_id] = None
+        for node_id, output in self.mock._outputs(prompt_id, prompt).items():
+            self._send_event('executed', {'node': node_id, 'display_node': node_id, 'output': output, 'prompt_id': prompt_id})
+        self._send_event('executing', {'node': None, 'prompt_id': prompt_id})
+        self._send_event('execution_success', {'prompt_id': prompt_id, 'timestamp': int(time.time() * 1000)})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        # 새 TCP 연결이 수락될 때마다 호출됩니다.
+        with self.mock._lock:
+            self.mock.connections += 1
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        # 클라이언트가 타임아웃으로 먼저 끊은 연결(멈춘 서버 흉내)에 응답하다 나는 오류는 무시합니다.
+        import sys
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockComfyUIServer:
+    """
+    /prompt, /history, /view, /queue (조회/삭제), /interrupt, /upload/image, /system_stats, /ws(실행 이벤트)를 흉내 내는 로컬 서버입니다.
+    실제 ComfyUI처럼 프롬프트를 한 번에 하나씩 실행한다고 가정하여 완료 시각을 계산합니다.
+    :param execution_time: 프롬프트 하나의 (가상) 실행 시간 (초)
+    :param latency: 모든 HTTP 응답 전에 추가되는 지연 (초)
+    :param preprocessor_time: 워크플로우의 ControlNet 전처리기 노드 하나당 추가되는 실행 시간 (초)
+    :param model_swap_time: 직전 프롬프트와 로더 노드의 모델(체크포인트, IPAdapter 등)이 다를 때 추가되는 가중치 교체 시간 (초)
+    :param image_bytes: /view가 반환할 이미지 데이터
+    :param image_size: (width, height). 지정하면 image_bytes 대신 이 크기의 PNG를 /view로 돌려줍니다.
+    :param failure_rate: HTTP 요청(/ws 제외)이 503으로 실패할 확률 (0.0 ~ 1.0)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, execution_time=0.0, latency=0.0, image_bytes=TINY_PNG, preprocessor_time=0.0,
+                 model_swap_time=0.0, image_size=None, failure_rate=0.0):
+        if image_size is not None:
+            image_bytes = make_png(*image_size)
+        self.execution_time = execution_time
+        self.preprocessor_time = preprocessor_time
+        self.model_swap_time = model_swap_time
+        self.model_swaps = 0
+        self._loaded_models = None
+        self.latency = latency
+        self.image_bytes = image_bytes
+        self.fail_all = False # True면 모든 요청에 503을 반환하고 웹소켓을 끊습니다 (장애 흉내)
+        self.failure_rate = failure_rate
+        self.connections = 0
+        self.websocket_clients = 0
+        self._stopping = threading.Event()
+        self.requests = {}
+        self.prompt_count = 0
+        self.interrupts = 0
+        self.deleted = 0 # /queue에서 삭제된 대기 프롬프트 수
+        self.interrupted = 0 # 실행 중 중단된 프롬프트 수
+        self.prompts = {} # prompt_id -> {'submitted': t, 'finishes': t, 'payload': ...}
+        self._last_finish = 0.0
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mock-comfyui', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = {}
+
+    # --- 내부 상태 ---
+
+    def _record_request(self, method, path):
+        key = f"{method} /{path.strip('/').split('/')[0]}"
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def _submit(self, payload):
+        prompt_id = str(uuid.uuid4())
+        with self._lock:
+            now = time.monotonic()
+            run_time = self.execution_time + self.preprocessor_time * self._preprocessors(payload)
+            models = self._models(payload)
+            if self._loaded_models is not None and models != self._loaded_models:
+                self.model_swaps += 1
+                run_time += self.model_swap_time
+            self._loaded_models = models
+            starts = max(self._last_finish, now)
+            self._last_finish = starts + run_time
+            self.prompt_count += 1
+            self.prompts[prompt_id] = {'submitted': now, 'starts': starts, 'finishes': self._last_finish, 'payload': payload}
+        return prompt_id
+
+    def _is_done(self, prompt):
+        return time.monotonic() >= prompt['finishes']
+
+    def _cancel(self, prompt_id, running):
+        """
+        ComfyUI처럼 대기 중인 프롬프트 삭제(running=False) 또는 실행 중인 프롬프트 중단(running=True)을 흉내 냅니다.
+        취소된 프롬프트가 차지하던 남은 실행 시간만큼 뒤의 프롬프트들이 앞당겨집니다.
+        """
+        with self._lock:
+            now = time.monotonic()
+            active = [(pid, p) for pid, p in self.prompts.items() if not p.get('cancelled') and now < p['finishes']]
+            if not active:
+                return
+            current_id = active[0][0]
+            if running:
+                # prompt_id가 없거나 실행 중인 프롬프트와 같을 때만 중단합니다.
+                if prompt_id is not None and prompt_id != current_id:
+                    return
+                prompt_id = current_id
+            elif prompt_id == current_id or prompt_id not in dict(active):
+                return # 실행 중이거나 이미 끝난 프롬프트는 대기열에서 삭제되지 않습니다.
+            prompt = self.prompts[prompt_id]
+            freed = prompt['finishes'] - max(now, prompt['finishes'] - self.execution_time)
+            prompt['cancelled'] = True
+            prompt['finishes'] = now
+            for pid, p in active:
+                if p['finishes'] > now and pid != prompt_id and p['submitted'] >= prompt['submitted']:
+                    p['finishes'] -= freed
+                    p['starts'] = max(now, p['starts'] - freed)
+            self._last_finish -= freed
+            if running:
+                self.interrupted += 1
+            else:
+                self.deleted += 1
+
+    def _history(self, prompt_id):
+        with self._lock:
+            prompt = self.prompts.get(prompt_id)
+        if prompt is None or not self._is_done(prompt):
+            return {}
+        if prompt.get('cancelled'):
+            return {prompt_id: {'outputs': {}, 'status': {'status_str': 'error', 'completed': False}}}
+        return {
+            prompt_id: {
+                'outputs': self._outputs(prompt_id, prompt),
+                'status': {'status_str': 'success', 'completed': True},
+            }
+        }
+
+    def _outputs(self, prompt_id, prompt):
+        images = [{'filename': f'ComfyUI_{prompt_id[:8]}_{i:05d}_.png', 'subfolder': '', 'type': 'output'}
+                  for i in range(self._batch_size(prompt['payload']))]
+        outputs = {'9': {'images': images}}
+        # PreviewImage 노드(전처리 맵 확인 등)는 temp 이미지를 하나씩 돌려줍니다.
+        for node_id, node in (prompt['payload'].get('prompt') or {}).items():
+            if isinstance(node, dict) and node.get('class_type') == 'PreviewImage':
+                outputs[node_id] = {'images': [{'filename': f'ComfyUI_temp_{prompt_id[:8]}_{node_id}.png', 'subfolder': '', 'type': 'temp'}]}
+        return outputs
+
+    def _prompts_for(self, client_id):
+        """client_id로 제출된 프롬프트 목록 [(prompt_id, prompt), ...] (웹소켓 이벤트용)"""
+        with self._lock:
+            return [(pid, p) for pid, p in self.prompts.items() if p['payload'].get('client_id') == client_id]
+
+    @staticmethod
+    def _preprocessors(payload):
+        # ControlNet 전처리기 노드 수 (Canny/LineArt/깊이 등 'Preprocessor', 'Detector'로 끝나는 class_type)
+        nodes = payload.get('prompt') or {}
+        return sum(1 for node in nodes.values()
+                   if isinstance(node, dict) and str(node.get('class_type', '')).endswith(('Preprocessor', 'Detector')))
+
+    @staticmethod
+    def _models(payload):
+        # 로더 노드('Loader'로 끝나는 class_type)가 읽는 모델 파일 이름 집합
+        nodes = payload.get('prompt') or {}
+        return frozenset((node['class_type'], value)
+                         for node in nodes.values() if isinstance(node, dict) and str(node.get('class_type', '')).endswith('Loader')
+                         for value in node.get('inputs', {}).values() if isinstance(value, str))
+
+    @staticmethod
+    def _batch_size(payload):
+        # EmptyLatentImage의 batch_size만큼 이미지를 돌려줍니다.
+        nodes = payload.get('prompt') or {}
+        for node in nodes.values():
+            if isinstance(node, dict) and node.get('class_type') == 'EmptyLatentImage':
+                return int(node.get('inputs', {}).get('batch_size', 1))
+        return 1
+
+    def _queue(self):
+        with self._lock:
+            pending = [[i, pid, {}, {}, ['9']] for i, (pid, p) in enumerate(self.prompts.items())
+                       if not self._is_done(p) and not p.get('cancelled')]
+        return {'queue_running': pending[:1], 'queue_pending': pending[1:]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock ComfyUI server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8188)
+    parser.add_argument('--execution-time', type=float, default=2.0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--image-size', default=None, help='WIDTHxHEIGHT of the PNG served by /view (default: 1x1)')
+    parser.add_argument('--model-swap-time', type=float, default=0.0)
+    args = parser.parse_args()
+    image_size = tuple(int(v) for v in args.image_size.lower().split('x')) if args.image_size else None
+    server = MockComfyUIServer(args.host, args.port, execution_time=args.execution_time, latency=args.latency,
+                               image_size=image_size, failure_rate=args.failure_rate, model_swap_time=args.model_swap_time)
+    print(f"Mock ComfyUI listening on {server.url}")
+    server._httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# benchmarks/mock_ollama.py
+#
+# 벤치마크/부하 테스트용 로컬 Ollama 대체 서버 (표준 라이브러리만 사용, GPU 불필요)
+# /api/generate를 stream=false(JSON 하나)와 stream=true(NDJSON 청크, 마지막 청크에 done=true) 두 형식으로 흉내 냅니다.
+#
+# 단독 실행: python -m benchmarks.mock_ollama --port 11434 --first-token-latency 0.5 --tokens-per-second 30
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = ("이 작품은 부드러운 붓질과 따뜻한 색감으로 빛의 변화를 표현한 인상주의 풍경화입니다. "
+                    "화면 왼쪽의 강물에 비친 하늘과 오른쪽의 나무 그림자가 대비를 이루며 고요한 오후의 분위기를 전합니다.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/api/tags':
+            return self._send_json(200, {'models': [{'name': self.mock.model}]})
+        self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.path.rstrip('/') != '/api/generate':
+            return self._send_json(404, {'error': 'not found'})
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': 'invalid JSON'})
+        self.mock._record(payload)
+        if self.mock.failure_rate and random.random() < self.mock.failure_rate:
+            return self._send_json(500, {'error': 'mock failure'})
+        time.sleep(self.mock.first_token_latency)
+        if payload.get('stream', True): # Ollama는 stream을 지정하지 않으면 스트리밍합니다.
+            self._stream(payload)
+        else:
+            time.sleep(self.mock._generation_seconds())
+            self._send_json(200, self.mock._final_chunk(payload, self.mock.response_text))
+
+    def _stream(self, payload):
+        # Content-Length 없이 한 줄씩 보내고 연결을 닫습니다 (requests의 iter_lines로 읽을 수 있습니다).
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        delay = 1.0 / self.mock.tokens_per_second if self.mock.tokens_per_second else 0.0
+        for token in self.mock._tokens():
+            chunk = {'model': payload.get('model', self.mock.model), 'created_at': _now(), 'response': token, 'done': False}
+            self.wfile.write(json.dumps(chunk, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(json.dumps(self.mock._final_chunk(payload, ''), ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        import sys
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockOllamaServer:
+    """
+    Ollama /api/generate (스트리밍/비스트리밍)와 /api/tags를 흉내 내는 로컬 서버입니다.
+    :param first_token_latency: 첫 토큰까지의 지연 (초, 프롬프트/이미지 처리 시간 흉내)
+    :param tokens_per_second: 응답 토큰 생성 속도 (0이면 지연 없음)
+    :param failure_rate: 요청이 500으로 실패할 확률 (0.0 ~ 1.0)
+    :param response_text: 돌려줄 응답 텍스트 (공백 단위로 토큰을 나눕니다)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, first_token_latency=0.0, tokens_per_second=0.0, failure_rate=0.0,
+                 response_text=DEFAULT_RESPONSE, model='gemma3:latest'):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.response_text = response_text
+        self.model = model
+        self.requests = 0
+        self.images_received = 0
+        self.image_bytes_received = 0 # 받은 이미지의 Base64 문자열 길이 합
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def generate_url(self):
+        return f"{self.url}/api/generate"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mock-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- 내부 상태 ---
+
+    def _record(self, payload):
+        images = payload.get('images') or []
+        with self._lock:
+            self.requests += 1
+            self.images_received += len(images)
+            self.image_bytes_received += sum(len(image) for image in images)
+
+    def _tokens(self):
+        words = self.response_text.split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def _generation_seconds(self):
+        return len(self._tokens()) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _final_chunk(self, payload, text):
+        tokens = len(self._tokens())
+        return {
+            'model': payload.get('model', self.model),
+            'created_at': _now(),
+            'response': text,
+            'done': True,
+            'done_reason': 'stop',
+            'total_duration': int((self.first_token_latency + self._generation_seconds()) * 1e9),
+            'prompt_eval_count': len(str(payload.get('prompt', ''))),
+            'eval_count': tokens,
+            'eval_duration': int(self._generation_seconds() * 1e9),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Ollama server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--first-token-latency', type=float, default=0.5)
+    parser.add_argument('--tokens-per-second', type=float, default=30.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server = MockOllamaServer(args.host, args.port, first_token_latency=args.first_token_latency,
+                              tokens_per_second=args.tokens_per_second, failure_rate=args.failure_rate)
+    print(f"Mock Ollama listening on {server.generate_url}")
+    server._httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
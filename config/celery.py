@@ -0,0 +1,16 @@
+# config/celery.py
+
+import os
+
+from celery import Celery
+
+# Celery 워커도 Django 설정을 사용합니다.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+
+# settings.py의 CELERY_로 시작하는 설정을 읽습니다 (예: CELERY_BROKER_URL -> broker_url).
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# 설치된 앱의 tasks.py를 자동으로 찾습니다 (image_generator/tasks.py).
+app.autodiscover_tasks()
@@ -131,6 +131,106 @@ COMFYUI_API_URL = "http://127.0.0.1:8188"
 COMFYUI_HISTORY_URL = "http://127.0.0.1:8188/history"
 COMFYUI_IMAGE_URL = "http://127.0.0.1:8188/view"
 
+# [추가] 여러 ComfyUI 인스턴스를 사용할 경우 주소 목록을 지정합니다.
+# 작업은 /queue 기준으로 가장 한가한 정상 인스턴스로 보내지고, 연속 실패한 인스턴스는 잠시 제외됩니다.
+COMFYUI_BACKENDS = [
+    COMFYUI_API_URL,
+    # "http://192.168.0.11:8188",
+]
+COMFYUI_BACKEND_PROBE_INTERVAL = 5 # /queue, /system_stats 조회 주기 (초)
+# [수정] 인스턴스별 회로 차단기: 연속 실패가 이 횟수에 이르면 회로가 열려 요청을 보내지 않고 바로 실패합니다.
+# 열려 있는 동안 백그라운드에서 /system_stats를 COMFYUI_BACKEND_PROBE_INTERVAL마다 확인하고, 응답하면 시험 요청 1개로 복구를 확인합니다.
+COMFYUI_BACKEND_FAILURE_THRESHOLD = 3 # 회로가 열리기까지의 연속 실패 횟수
+COMFYUI_BACKEND_EJECT_SECONDS = 30 # 회로를 열어 두는 최대 시간 (초). /system_stats가 계속 실패해도 이 시간이 지나면 시험 요청을 보냅니다
+COMFYUI_BACKEND_AFFINITY_SLACK = 2 # i2i 입력 이미지를 이미 가진 인스턴스를 고를 때 허용하는 추가 대기 작업 수
+# i2i 입력 이미지를 /upload/image로 보낼지 여부.
+# None이면 백엔드가 여러 대일 때만 업로드하고, 한 대일 때는 COMFYUI_INPUT_DIR에 직접 복사합니다.
+COMFYUI_UPLOAD_INPUTS = None
+
+# [추가] ComfyUI /ws 웹소켓으로 완료 이벤트를 받을지 여부 (프로세스당 하나의 연결을 공유합니다.)
+# 연결이 끊기면 자동으로 1초 간격 /history 폴링으로 대체됩니다.
+COMFYUI_USE_WEBSOCKET = True
+# 웹소켓 이벤트 대기 중에도 이 간격(초)마다 /history를 한 번씩 확인합니다 (이벤트 누락 대비).
+COMFYUI_WS_HISTORY_RECHECK_INTERVAL = 30
+
+# [추가] 공유 ComfyAPIClient 연결 풀 및 재시도 설정
+COMFYUI_MAX_CONNECTIONS = 20 # 연결 풀 최대 연결 수
+COMFYUI_MAX_KEEPALIVE_CONNECTIONS = 10 # 유휴 상태로 유지할 keep-alive 연결 수
+COMFYUI_MAX_RETRIES = 2 # 일시적인 오류(연결 실패, 502/503/504) 시 재시도 횟수
+# 호출별 타임아웃 (초). 지정하지 않은 호출은 comfy_api_client.DEFAULT_TIMEOUTS를 사용합니다.
+COMFYUI_TIMEOUTS = {
+    'queue_prompt': 30,
+    'get_history': 10,
+    'get_image': 120,
+}
+# [추가] 호출별 최근 응답 시간의 p99 x 3으로 타임아웃을 줄입니다 (위 값이 상한). 응답 없는 서버를 몇 분씩 기다리지 않습니다.
+COMFYUI_ADAPTIVE_TIMEOUTS = True
+# [추가] 제출한 작업이 끝나기를 기다리는 최대 시간도 최근 작업 시간(이미지 1장당)의 p99 x 3으로 정하고, 이 범위로 제한합니다 (초).
+COMFYUI_JOB_TIMEOUT_MIN = 60
+COMFYUI_JOB_TIMEOUT_MAX = 900
+
+# [추가] 요청 하나로 생성할 수 있는 최대 이미지 수 (EmptyLatentImage batch_size로 한 번의 샘플링에서 생성)
+COMFYUI_MAX_IMAGES_PER_REQUEST = 4
+
+# [추가] 결정적 시드 모드 기본값. True면 요청 해시(번역된 프롬프트, 카테고리, 워크플로우, 입력 이미지, 파라미터)로
+# 시드를 정하고, 같은 요청은 아래 결과 캐시에서 ComfyUI 실행 없이 바로 반환합니다.
+# (요청 JSON의 "deterministic" 값으로 요청별로 켜고 끌 수 있습니다.)
+COMFYUI_DETERMINISTIC_SEED = False
+COMFYUI_RESULT_CACHE_MAX_ENTRIES = 256 # 보관할 최대 결과 수 (0이면 사용 안 함)
+COMFYUI_RESULT_CACHE_TTL = 60 * 60 * 24 # 결과 재사용 시간 (초)
+# [추가] ControlNet 모드(generation_mode='controlnet')의 전처리 맵(Canny/LineArt/깊이/밝기) 캐시.
+# 입력 이미지 해시 + 전처리기 설정별로 MEDIA_ROOT/COMFYUI_CONTROLNET_MAP_CACHE_DIR에 저장하고, 같은 사진의 다음 요청은 전처리를 건너뜁니다.
+COMFYUI_CONTROLNET_MAP_CACHE_DIR = 'controlnet_maps'
+COMFYUI_CONTROLNET_MAP_CACHE_MAX_ENTRIES = 512 # 보관할 최대 맵 수 (0이면 사용 안 함)
+# [추가] 동시에 들어온 동일 요청(정규화된 프롬프트, 입력 이미지, 카테고리, 파라미터)을 하나의 ComfyUI 작업으로 합칩니다.
+COMFYUI_SINGLE_FLIGHT = True
+# [추가] 생성 스케줄러: ComfyUI에 동시에 보내는 작업 수를 제한하고, 대기 요청은 대화별로 번갈아(라운드 로빈) 실행합니다.
+# 대기열이 가득 차면 HTTP 429와 Retry-After(최근 작업 시간으로 추정)를 반환합니다.
+COMFYUI_MAX_IN_FLIGHT = 2 # 동시에 실행하는 최대 생성 작업 수 (보통 백엔드 수 x 1~2)
+COMFYUI_MAX_QUEUED = 32 # 전체 대기열 크기
+COMFYUI_MAX_QUEUED_PER_CONVERSATION = 4 # 대화 하나가 대기시킬 수 있는 최대 요청 수
+COMFYUI_EXPECTED_GENERATION_SECONDS = 30 # 측정값이 쌓이기 전 Retry-After 계산에 쓰는 작업 시간
+# [추가] 모델 친화도: 대기 중인 요청 중 마지막 작업과 같은 모델(체크포인트/IPAdapter/CLIP Vision/ControlNet)을 쓰는 요청을 먼저 보내
+# ComfyUI의 VRAM 가중치 교체를 줄입니다. 다른 모델의 요청은 최대 MAX_WAIT초 또는 MAX_BATCH번까지만 밀립니다 (MAX_BATCH=0이면 사용 안 함).
+COMFYUI_MODEL_AFFINITY_MAX_WAIT = 60
+COMFYUI_MODEL_AFFINITY_MAX_BATCH = 8
+# [추가] 이미지 생성 워커 풀: process_request_api는 작업을 대기열에 넣고 task_id와 함께 202를 바로 반환하며,
+# 전용 이벤트 루프의 워커가 생성을 실행해 상태(PENDING/RUNNING/COMPLETED/FAILED)를 캐시에, 결과를 대화에 기록합니다.
+# [수정] 기다리는 작업은 생성 스케줄러와 같은 규칙(대화별 라운드 로빈, COMFYUI_MAX_QUEUED_PER_CONVERSATION, 모델 친화도)으로 시작됩니다.
+GENERATION_WORKERS = 4 # 동시에 실행하는 생성 작업 수 (ComfyUI 동시 실행 수는 COMFYUI_MAX_IN_FLIGHT가 제한)
+GENERATION_MAX_PENDING_TASKS = 64 # 실행을 기다리는 작업의 최대 수 (넘으면 429, 워커 풀의 전체 대기열 크기)
+# [추가] 작업 상태(task_status_<task_id> 캐시)의 보관 시간 (초). 상태가 바뀔 때마다 다시 기록되며, 대기열 맨 뒤의 작업이
+# 앞선 작업들이 모두 최대 실행 시간(COMFYUI_JOB_TIMEOUT_MAX)까지 걸린 뒤 끝나더라도 PENDING/RUNNING 상태가 사라지지 않는 길이입니다.
+TASK_STATUS_TTL = COMFYUI_JOB_TIMEOUT_MAX * (GENERATION_MAX_PENDING_TASKS // GENERATION_WORKERS + 1)
+# [추가] 배치 생성(/api/batch_generate/): 한 요청에서 펼칠 수 있는 최대 작업 수(프롬프트 x 그리드 조합)와 동시에 보내는 작업 수
+# (동시 작업 수는 COMFYUI_MAX_QUEUED_PER_CONVERSATION을 넘지 않습니다)
+BATCH_MAX_JOBS = 64
+BATCH_MAX_PARALLEL = 4
+# [추가] 'celery'로 바꾸면 생성 작업을 워커 풀 대신 Celery generation 큐로 보냅니다 (아래 Celery Settings 참고).
+GENERATION_TASK_BACKEND = 'local'
+# [추가] 이미지 생성 진행 상황 스트림(/api/tasks/<task_id>/events/)의 keep-alive 간격과 최대 연결 시간 (초)
+TASK_EVENTS_HEARTBEAT = 15
+TASK_EVENTS_MAX_DURATION = 600
+# [추가] 진행 스트림이 캐시의 작업 상태를 다시 읽는 간격 (초). Celery 워커처럼 다른 프로세스에서 끝난 작업의 완료를 이 간격 안에 전달합니다.
+# (Celery 모드에서는 웹 프로세스와 워커가 같은 캐시를 봐야 하므로 CACHES를 Redis 등 공유 캐시로 설정하세요.)
+TASK_EVENTS_STATUS_POLL = 2
+# [추가] task_id가 있는 생성 작업을 클라이언트가 이 시간(초) 동안 조회하지 않고 진행 스트림도 열려 있지 않으면
+# 버려진 작업으로 보고 취소합니다. ComfyUI 작업은 대기 중이면 /queue에서 삭제하고, 실행 중이면 /interrupt로 중단합니다.
+TASK_ABANDON_TIMEOUT = 30
+COMFYUI_CANCEL_TIMEOUT = 5 # ComfyUI 작업 취소 요청의 최대 대기 시간 (초)
+# [추가] 업로드된 이미지는 한 번만 디코딩해 EXIF 방향을 적용하고, 워크플로우가 실제로 쓰는 해상도로 줄여 다시 인코딩합니다.
+# 목표 크기는 워크플로우의 EmptyLatentImage/전처리기 resolution에서 정하고, 입력 이미지로 latent를 만드는
+# 워크플로우(ControlNet)는 COMFYUI_INPUT_IMAGE_MAX_SIDE를 사용합니다.
+COMFYUI_INPUT_IMAGE_MAX_SIDE = 1024
+IMAGE_NORMALIZE_WORKERS = 2 # 이미지 정규화 워커 스레드 수 (동시에 쓰는 CPU 코어 수)
+IMAGE_NORMALIZE_JPEG_QUALITY = 90
+# [추가] 아카이브/갤러리용 WebP 파생 이미지 (api_get_images?size=thumb|medium|full). 처음 요청될 때 프로세스 풀에서 만들고
+# MEDIA_ROOT/IMAGE_DERIVATIVE_DIR/<크기>_<긴 변>/ 아래에 저장합니다. 크기 이름 -> 긴 변 최대 크기 (None이면 원본 크기).
+IMAGE_DERIVATIVE_SIZES = {'thumb': 320, 'medium': 1024, 'full': None}
+IMAGE_DERIVATIVE_DIR = 'derivatives'
+IMAGE_DERIVATIVE_WEBP_QUALITY = 80
+IMAGE_DERIVATIVE_WORKERS = 2 # 파생 이미지 생성 프로세스 수
+
 # [수정 부분] ComfyUI의 'input' 폴더의 실제 경로를 지정합니다.
 # 이 경로는 ComfyUI가 설치된 디렉토리 내의 'input' 폴더여야 합니다.
 # 사용자님이 지정하신 경로에 맞게 수정했습니다.
@@ -141,12 +241,41 @@ COMFYUI_INPUT_DIR = os.path.join(BASE_DIR, 'media', 'comfyui_input') # [수정
 # 이 값은 views.py의 generate_image_task에서 사용됩니다.
 COMFYUI_OUTPUT_DIR = os.path.join(BASE_DIR, 'media', 'comfyui_output') # [추가됨]
 
+# [추가] ComfyUI와 Django가 같은 서버(파일시스템)에서 실행되는 경우, 백엔드 주소별 ComfyUI 'output' 폴더 경로를 지정하면
+# 생성 결과를 /view로 다시 받지 않고 COMFYUI_OUTPUT_DIR로 하드링크(또는 rename)합니다.
+# 두 경로가 다른 드라이브/장치에 있으면 자동으로 HTTP 다운로드로 대체됩니다.
+COMFYUI_SHARED_OUTPUT_DIRS = {
+    # COMFYUI_API_URL: r"D:\ComfyUI\output",
+}
+COMFYUI_SHARED_OUTPUT_MODE = 'link' # 'link': 하드링크 (ComfyUI output에도 남김), 'move': 옮기기
+# [추가] 출력 코덱: 다운로드한 ComfyUI PNG를 프로세스 풀에서 무손실로 다시 인코딩해 디스크/전송량을 줄입니다 (픽셀은 같습니다).
+# 'webp_lossless': .webp로 바꾸고 PNG는 지움, 'png_optimized': PNG를 최대 압축으로 다시 씀, None: 그대로 저장.
+# PNG 텍스트 청크의 ComfyUI prompt/workflow는 <파일>.json 사이드카로 남깁니다 (python -m benchmarks.bench_output_codec로 효과 확인).
+COMFYUI_OUTPUT_CODEC = None
+COMFYUI_OUTPUT_CODEC_WORKERS = 2 # 인코딩 프로세스 수
+COMFYUI_OUTPUT_WEBP_METHOD = 4 # WebP 압축 노력 (0~6, 클수록 작고 느림)
+COMFYUI_OUTPUT_METADATA_SIDECAR = True
+
 
 # --- Ollama API Settings ---
 # Ollama가 실행 중인 주소와 사용할 모델을 설정합니다.
 # gemma_service.py에서 이 설정을 가져다 사용합니다.
 OLLAMA_API_URL = "http://localhost:11434/api/generate" # Ollama API 엔드포인트
 OLLAMA_MODEL_NAME = "gemma3:latest" # Ollama에 pull한 Gemma 모델 이름
+# [추가] 도슨트 모드에서 Ollama로 보내기 전에 이미지를 이 크기(긴 변, 픽셀)로 줄입니다 (Gemma 3 비전 인코더 입력은 896x896).
+OLLAMA_IMAGE_MAX_SIDE = 896
+
+# [추가] 번역 캐시 (llm_cores/translation_cache.py): 프로세스별 메모리 LRU 뒤에 SQLite 파일을 두어,
+# 같은 문장은 MarianMT를 다시 실행하지 않습니다. SQLite 파일은 재시작 후에도 남고 같은 호스트의 워커 프로세스들이 함께 씁니다.
+TRANSLATION_CACHE_PATH = BASE_DIR / 'translation_cache.sqlite3' # None이면 메모리 LRU만 사용
+TRANSLATION_CACHE_MAX_ENTRIES = 1024 # 프로세스별 메모리 LRU 크기 (0이면 사용 안 함)
+TRANSLATION_CACHE_MAX_DISK_ENTRIES = 100000 # SQLite에 보관할 최대 번역 수
+TRANSLATION_CACHE_WARM_ENTRIES = 256 # 시작 시 메모리에 미리 올리는 (가장 많이 쓰인) 번역 수
+# [추가] 번역 마이크로 배치 (llm_cores/translation_batcher.py): 동시에 들어온 번역 요청을 모델별로 최대 MAX_WAIT_MS 동안
+# 또는 MAX_SIZE개까지 모아 파이프라인을 한 번 호출합니다 (MAX_SIZE가 1이면 요청마다 따로 호출). SPLIT_CHARS보다 긴 입력은 문장 단위로 나눕니다.
+TRANSLATION_BATCH_MAX_SIZE = 16
+TRANSLATION_BATCH_MAX_WAIT_MS = 5
+TRANSLATION_BATCH_SPLIT_CHARS = 200
 
 # --- Cache Settings (Django Cache Framework) ---
 # 이미지 생성 상태 및 대화 기록을 임시 저장하는 데 사용됩니다.
@@ -155,6 +284,8 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake', # 캐시 이름을 고유하게 지정
+        # [추가] 작업 상태는 TASK_STATUS_TTL 동안 남으므로 기본 항목 수(300)에서 진행 중인 작업의 상태가 밀려나지 않게 늘립니다.
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
@@ -203,6 +334,56 @@ LOGGING = {
     }
 }
 
+# --- Celery Settings ---
+# [추가] 분산 작업 큐 (image_generator/tasks.py). 생성(GPU), 번역(CPU), 도슨트(I/O, Ollama 응답 대기) 작업은 각자의 큐로 보내고
+# 큐마다 워커를 따로 띄워 서로 다른 프로세스/호스트에서 늘립니다:
+#   python manage.py run_celery_worker generation   (CELERY_WORKER_QUEUES의 동시 실행 수/풀을 사용)
+#   python manage.py run_celery_worker translation
+#   python manage.py run_celery_worker docent
+# 생성 작업을 워커로 보내려면(GENERATION_TASK_BACKEND = 'celery') 웹 서버와 워커가 같은 캐시(작업 상태, 예: django-redis)와
+# MEDIA_ROOT(업로드/결과 이미지)를 공유해야 합니다.
+# 환경 변수 CELERY_EAGER=1이면 브로커 없이 호출한 프로세스에서 바로 실행합니다 (메모리 브로커/결과 백엔드, 오프라인 테스트용).
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_EAGER', '0') == '1'
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'memory://' if CELERY_TASK_ALWAYS_EAGER else 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'cache+memory://' if CELERY_TASK_ALWAYS_EAGER else 'redis://localhost:6379/1')
+CELERY_RESULT_EXPIRES = 60 * 60 # 결과 보관 시간 (초)
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'image_generator.tasks.generate_image': {'queue': 'generation'},
+    'image_generator.tasks.translate': {'queue': 'translation'},
+    'image_generator.tasks.docent_reply': {'queue': 'docent'},
+}
+# 작업이 길기 때문에 워커는 한 번에 하나씩만 미리 가져오고, 작업이 끝난 뒤 ack합니다 (워커가 죽으면 다른 워커가 다시 실행).
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# 큐별 워커 설정 (run_celery_worker가 사용).
+# generation: ComfyUI 응답을 기다리는 작업이라 스레드 풀로 ComfyUI 인스턴스 수 x 1~2개를 동시에 실행합니다.
+# translation: 번역 모델이 프로세스마다 올라가므로 prefork로 코어 수에 맞춰 적게 실행합니다.
+# docent: 대부분 Ollama 응답 대기이므로 스레드를 많이 둡니다.
+CELERY_WORKER_QUEUES = {
+    'generation': {'concurrency': 2, 'pool': 'threads'},
+    'translation': {'concurrency': 1, 'pool': 'prefork'},
+    'docent': {'concurrency': 8, 'pool': 'threads'},
+    'default': {'concurrency': 2, 'pool': 'threads'},
+}
+
+# --- Media GC Settings ---
+# [추가] DB(Message/GeneratedImage)가 참조하지 않고 MEDIA_GC_TTL보다 오래된 미디어 파일을 지웁니다.
+#   python manage.py sweep_media --dry-run   (지울 파일/용량만 보고)
+# MEDIA_GC_INTERVAL(초)을 정하면 Celery beat(celery -A config beat)가 image_generator.tasks.sweep_media를 주기적으로 실행합니다.
+MEDIA_GC_DIRECTORIES = ['temp_uploads', 'uploaded_temp', 'uploads', 'user_uploads', 'comfyui_input'] # 임시 업로드/ComfyUI 입력 사본
+# [추가] True면 생성 결과(comfyui_output)와 파생 이미지(derivatives)도 정리합니다. 배치 생성 API 결과처럼 메시지로 저장되지 않은
+# 결과는 MEDIA_GC_TTL이 지나면 지워져 URL이 404가 되므로, 그런 결과를 따로 보관하지 않는다면 켜지 마세요.
+MEDIA_GC_SWEEP_OUTPUTS = False
+MEDIA_GC_TTL = 24 * 60 * 60 # 진행 중인 작업의 파일을 지우지 않도록 가장 긴 작업 시간보다 충분히 길게 (초)
+MEDIA_GC_BATCH_SIZE = 500 # 한 번에 지우는 파일 수
+MEDIA_GC_BATCH_PAUSE = 0.1 # 배치 사이에 쉬는 시간 (초)
+MEDIA_GC_INTERVAL = None # 예: 6 * 60 * 60
+CELERY_BEAT_SCHEDULE = {
+    'sweep-media': {'task': 'image_generator.tasks.sweep_media', 'schedule': MEDIA_GC_INTERVAL},
+} if MEDIA_GC_INTERVAL else {}
+
 # --- CORS (Cross-Origin Resource Sharing) Settings ---
 CORS_ALLOW_ALL_ORIGINS = True # 개발용: 모든 출처 허용. 운영 환경에서는 특정 도메인으로 제한해야 합니다.
 CORS_ALLOW_CREDENTIALS = True # 쿠키를 포함한 요청 허용 (CSRF 토큰 처리에 필요)
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ImageGeneratorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "image_generator"
+
+    def ready(self):
+        # 시작 시 ComfyUI 워크플로우 템플릿을 미리 로드·컴파일합니다.
+        from .workflow_templates import get_workflow_registry
+        get_workflow_registry().preload()
+        # [추가] 번역 캐시(SQLite)에서 가장 많이 쓰인 번역을 메모리 LRU에 미리 올립니다 (파일이 없으면 아무것도 하지 않습니다).
+        from llm_cores.translation_cache import get_translation_cache
+        get_translation_cache().warm(getattr(settings, 'TRANSLATION_CACHE_WARM_ENTRIES', 256))
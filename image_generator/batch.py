@@ -0,0 +1,288 @@
+# image_generator/batch.py
+
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from llm_cores.positive_prompts import POSITIVE_PROMPT_MAP
+
+from .comfy_api_client import close_comfy_clients
+from .image_logic_parser import generate_image_based_on_json_logic, read_input_image, translate_prompt, GENERATION_MODE_DEFAULT
+from .scheduler import GenerationQueueFull
+
+logger = logging.getLogger(__name__)
+
+# 그리드에서 조합할 수 있는 파라미터 (요청의 grid 키)
+GRID_PARAMS = ('seed', 'cfg', 'denoise', 'style')
+# 대기열이 가득 차 거절된 작업을 다시 시도하는 횟수와 한 번에 기다리는 최대 시간 (초)
+QUEUE_FULL_RETRIES = 3
+QUEUE_FULL_MAX_WAIT = 30
+
+
+def _unique(values):
+    """순서를 유지하며 중복을 제거합니다 (같은 작업을 두 번 만들지 않습니다)."""
+    seen, result = set(), []
+    for value in values:
+        key = tuple(value) if isinstance(value, list) else value
+        if key not in seen:
+            seen.add(key)
+            result.append(value)
+    return result
+
+
+def _validate_seed(value):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < 2**32:
+        raise ValueError(f"seed는 0 ~ {2**32 - 1} 사이의 정수여야 합니다: {value!r}")
+    return value
+
+
+def _validate_cfg(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= 30:
+        raise ValueError(f"cfg는 0보다 크고 30 이하인 숫자여야 합니다: {value!r}")
+    return float(value)
+
+
+def _validate_denoise(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= 1:
+        raise ValueError(f"denoise는 0보다 크고 1 이하인 숫자여야 합니다: {value!r}")
+    return float(value)
+
+
+def _validate_style(value):
+    # 스타일은 긍정 프롬프트 카테고리 하나 또는 카테고리 목록입니다 (예: "impressionism_style", ["ghibli_style", "texture_detail"]).
+    categories = [value] if isinstance(value, str) else value
+    if not isinstance(categories, list) or not categories or not all(isinstance(c, str) for c in categories):
+        raise ValueError(f"style은 카테고리 이름 또는 카테고리 이름 목록이어야 합니다: {value!r}")
+    unknown = [c for c in categories if c not in POSITIVE_PROMPT_MAP]
+    if unknown:
+        raise ValueError(f"알 수 없는 스타일 카테고리: {', '.join(unknown)}")
+    return sorted(set(categories))
+
+
+_VALIDATORS = {'seed': _validate_seed, 'cfg': _validate_cfg, 'denoise': _validate_denoise, 'style': _validate_style}
+
+
+def expand_jobs(prompts, grid=None, categorize=None, max_jobs=None):
+    """
+    프롬프트 목록과 파라미터 그리드(seed/cfg/denoise/style 값 목록)의 모든 조합을 생성 작업 목록으로 펼칩니다.
+    그리드에 없는 파라미터는 기본값(None, 단일 생성과 같은 값)을 사용하며, 작업은 프롬프트 순서대로 나옵니다.
+    :param categorize: 프롬프트 -> (긍정 카테고리, 부정 카테고리). 스타일 카테고리는 긍정 카테고리에 더해집니다.
+    :param max_jobs: 조합 수 상한 (기본: settings.BATCH_MAX_JOBS)
+    :return: [{'index', 'prompt', 'seed', 'cfg', 'denoise', 'style', 'positive_categories', 'negative_categories'}, ...]
+    :raises ValueError: 프롬프트/그리드 값이 잘못되었거나 조합 수가 max_jobs를 넘는 경우
+    """
+    if max_jobs is None:
+        max_jobs = getattr(settings, 'BATCH_MAX_JOBS', 64)
+    if isinstance(prompts, str):
+        prompts = [prompts]
+    if not isinstance(prompts, list) or not prompts:
+        raise ValueError("prompts는 하나 이상의 프롬프트 목록이어야 합니다.")
+    if not all(isinstance(p, str) and p.strip() for p in prompts):
+        raise ValueError("프롬프트는 비어 있지 않은 문자열이어야 합니다.")
+    grid = grid or {}
+    if not isinstance(grid, dict):
+        raise ValueError("grid는 파라미터 이름 -> 값 목록이어야 합니다.")
+    unknown = set(grid) - set(GRID_PARAMS)
+    if unknown:
+        raise ValueError(f"grid에 사용할 수 없는 파라미터: {', '.join(sorted(unknown))} (가능: {', '.join(GRID_PARAMS)})")
+
+    axes = [_unique(p.strip() for p in prompts)]
+    for param in GRID_PARAMS:
+        values = grid.get(param)
+        if values is None:
+            axes.append([None])
+            continue
+        if not isinstance(values, list):
+            values = [values]
+        if not values:
+            raise ValueError(f"grid.{param}에 값이 없습니다.")
+        axes.append(_unique(_VALIDATORS[param](value) for value in values))
+
+    total = 1
+    for axis in axes:
+        total *= len(axis)
+    if total > max_jobs:
+        raise ValueError(f"작업 수({total})가 한 번에 생성할 수 있는 최대 수({max_jobs})를 넘습니다.")
+
+    categories = {prompt: (categorize(prompt) if categorize else ([], [])) for prompt in axes[0]}
+    jobs = []
+    for index, (prompt, seed, cfg, denoise, style) in enumerate(itertools.product(*axes)):
+        positive, negative = categories[prompt]
+        jobs.append({
+            'index': index,
+            'prompt': prompt,
+            'seed': seed,
+            'cfg': cfg,
+            'denoise': denoise,
+            'style': style,
+            'positive_categories': sorted(set(positive) | set(style or [])),
+            'negative_categories': list(negative),
+        })
+    return jobs
+
+
+def _params(job):
+    return {key: job[key] for key in ('prompt',) + GRID_PARAMS}
+
+
+async def _translate_all(prompts, translations):
+    # 번역 모델(transformers 파이프라인)은 스레드 안전하지 않으므로 한 번에 하나씩 번역하고,
+    # 번역이 끝난 프롬프트의 작업은 다른 프롬프트의 번역을 기다리지 않고 바로 시작합니다.
+    for prompt in prompts:
+        try:
+            translations[prompt].set_result(await asyncio.to_thread(translate_prompt, prompt))
+        except Exception as e:
+            logger.warning(f"Translation failed for batch prompt '{prompt[:50]}', using original text: {e}")
+            translations[prompt].set_result(prompt)
+
+
+async def _run_job(job, translations, semaphore, batch_id, uploaded_image_path, input_image, generation_mode, num_images, deterministic):
+    translated = await translations[job['prompt']]
+    # 입력 이미지는 배치 전체에서 한 번만 읽고 해시합니다 (읽기에 실패하면 모든 작업이 그 오류로 실패합니다).
+    image = await input_image if input_image is not None else None
+    async with semaphore:
+        started = time.monotonic()
+        for attempt in range(QUEUE_FULL_RETRIES + 1):
+            try:
+                result = await generate_image_based_on_json_logic(
+                    user_input=job['prompt'],
+                    uploaded_image_path=uploaded_image_path,
+                    mode='image_generation',
+                    positive_categories=job['positive_categories'],
+                    negative_categories=job['negative_categories'],
+                    num_images=num_images,
+                    deterministic=deterministic,
+                    owner=batch_id,
+                    generation_mode=generation_mode,
+                    seed=job['seed'],
+                    cfg=job['cfg'],
+                    denoise=job['denoise'],
+                    translated_input=translated,
+                    input_image=image,
+                )
+                break
+            except GenerationQueueFull as e:
+                # 다른 사용자의 요청으로 전체 대기열이 찼으면 Retry-After만큼 기다렸다가 다시 시도합니다.
+                if attempt == QUEUE_FULL_RETRIES:
+                    raise
+                await asyncio.sleep(min(e.retry_after, QUEUE_FULL_MAX_WAIT))
+    image_urls = [await sync_to_async(default_storage.url)(name) for name in result['image_names']]
+    return {'image_urls': image_urls, 'cached': bool(result.get('cached')), 'seconds': round(time.monotonic() - started, 3)}
+
+
+async def run_batch(jobs, uploaded_image_path=None, generation_mode=GENERATION_MODE_DEFAULT, num_images=1, deterministic=None,
+                    max_parallel=None, batch_id=None):
+    """
+    expand_jobs()의 작업들을 최대 max_parallel개씩 동시에 ComfyUI로 보내고, 작업이 끝나는 순서대로 이벤트를 내보내는 비동기 제너레이터입니다.
+    같은 프롬프트는 한 번만 번역하며, 워크플로우 템플릿은 모드별로 컴파일된 것을 모든 작업이 함께 씁니다.
+    작업은 batch_id를 소유자로 생성 스케줄러에 들어가므로 다른 대화의 요청과 차례를 나눠 실행됩니다.
+    제너레이터가 닫히면(클라이언트 연결 끊김) 아직 끝나지 않은 작업을 취소합니다 (ComfyUI 작업도 대기열에서 제거됩니다).
+    이벤트:
+      {'event': 'batch', 'batch_id', 'jobs'}
+      {'event': 'job', 'index', 'status': 'COMPLETED'|'FAILED', 'params', 'image_urls', 'cached', 'seconds'[, 'error']}
+      {'event': 'summary', 'batch_id', 'jobs', 'completed', 'failed', 'seconds'}
+    :param max_parallel: 동시에 실행하는 작업 수 (기본: settings.BATCH_MAX_PARALLEL. 대화별 최대 대기 수를 넘지 않습니다)
+    """
+    batch_id = batch_id or str(uuid.uuid4())
+    if max_parallel is None:
+        max_parallel = getattr(settings, 'BATCH_MAX_PARALLEL', 4)
+    # 스케줄러의 소유자별 대기 한도를 넘으면 배치 자신의 작업이 429로 거절되므로 그 이하로 제한합니다.
+    max_parallel = max(1, min(max_parallel, getattr(settings, 'COMFYUI_MAX_QUEUED_PER_CONVERSATION', 4)))
+    started = time.monotonic()
+    yield {'event': 'batch', 'batch_id': batch_id, 'jobs': len(jobs)}
+
+    loop = asyncio.get_running_loop()
+    prompts = _unique(job['prompt'] for job in jobs)
+    translations = {prompt: loop.create_future() for prompt in prompts}
+    translator = asyncio.ensure_future(_translate_all(prompts, translations))
+    input_image = asyncio.ensure_future(asyncio.to_thread(read_input_image, uploaded_image_path)) if uploaded_image_path else None
+    semaphore = asyncio.Semaphore(max_parallel)
+    pending = {
+        asyncio.ensure_future(_run_job(job, translations, semaphore, batch_id, uploaded_image_path, input_image,
+                                       generation_mode, num_images, deterministic)): job
+        for job in jobs
+    }
+    completed = failed = 0
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                event = {'event': 'job', 'index': job['index'], 'params': _params(job)}
+                if future.exception() is None:
+                    completed += 1
+                    event.update(status='COMPLETED', **future.result())
+                else:
+                    failed += 1
+                    logger.warning(f"Batch {batch_id} job {job['index']} failed: {future.exception()}")
+                    event.update(status='FAILED', image_urls=[], cached=False, seconds=None, error=str(future.exception()))
+                yield event
+    finally:
+        for future in list(pending) + [translator] + ([input_image] if input_image is not None else []):
+            future.cancel()
+        if pending:
+            logger.info(f"Batch {batch_id} closed with {len(pending)} unfinished jobs; cancelling them.")
+            await asyncio.gather(*pending, translator, return_exceptions=True)
+    logger.info(f"Batch {batch_id} finished: {completed} completed, {failed} failed in {time.monotonic() - started:.1f}s")
+    yield {'event': 'summary', 'batch_id': batch_id, 'jobs': len(jobs), 'completed': completed, 'failed': failed,
+           'seconds': round(time.monotonic() - started, 3)}
+
+
+_DONE = object()
+
+
+def run_batch_sync(**kwargs):
+    """
+    run_batch()를 전용 스레드의 이벤트 루프에서 실행하고 이벤트를 동기 제너레이터로 돌려줍니다.
+    WSGI(runserver)는 비동기 이터레이터를 끝까지 모은 뒤에 응답을 보내므로, 작업이 끝날 때마다 줄을 보내려면 이 함수를 씁니다.
+    제너레이터가 닫히면(클라이언트 연결 끊김) 배치를 취소합니다.
+    """
+    events = queue.Queue()
+    state = {}
+    ready = threading.Event()
+
+    async def drain():
+        state['loop'], state['task'] = asyncio.get_running_loop(), asyncio.current_task()
+        ready.set()
+        try:
+            async for event in run_batch(**kwargs):
+                events.put(event)
+        finally:
+            # [수정] asyncio.run이 만든 루프가 끝나기 전에 그 루프에서 만든 ComfyUI 연결 풀을 닫습니다.
+            await close_comfy_clients()
+            events.put(_DONE)
+
+    def run():
+        try:
+            asyncio.run(drain())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Batch generation failed: {e}", exc_info=True)
+        finally:
+            ready.set()
+            events.put(_DONE)
+
+    thread = threading.Thread(target=run, name='batch-generation', daemon=True)
+    thread.start()
+    ready.wait()
+    try:
+        while True:
+            event = events.get()
+            if event is _DONE:
+                return
+            yield event
+    finally:
+        if thread.is_alive() and 'task' in state:
+            try:
+                state['loop'].call_soon_threadsafe(state['task'].cancel)
+            except RuntimeError:
+                pass # 이미 끝나 루프가 닫힘
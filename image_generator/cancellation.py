@@ -0,0 +1,290 @@
+# image_generator/cancellation.py
+
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .comfy_events import add_event_observer
+
+logger = logging.getLogger(__name__)
+
+# 실행 시간 이동 평균(EWMA)의 가중치
+RUN_TIME_ALPHA = 0.2
+# 작업 대기 시한: 최근 작업 시간(제출~완료, 이미지 1장당) 표본의 p99 * JOB_TIMEOUT_FACTOR
+JOB_TIME_SAMPLES_MAX = 200
+JOB_TIMEOUT_MIN_SAMPLES = 20
+JOB_TIMEOUT_FACTOR = 3.0
+
+
+class GenerationJobTracker:
+    """
+    제출된 ComfyUI 작업의 실행 시간을 기록하고, 요청이 취소된 작업을 ComfyUI에서 제거합니다.
+    - 대기 중인 작업은 /queue에서 삭제하고, 실행 중인 작업은 /interrupt로 중단합니다.
+    - 절약한 GPU 시간은 최근 작업들의 평균 실행 시간에서 이미 실행된 시간을 뺀 추정치입니다.
+    - 완료된 작업 시간의 p99로 작업 대기 시한(job_timeout)을 정합니다.
+    """
+
+    def __init__(self, expected_run_time=30.0, min_job_timeout=60.0, max_job_timeout=900.0):
+        self._lock = threading.Lock()
+        self._submitted = {} # prompt_id -> 제출 시각
+        self._images = {} # prompt_id -> 생성할 이미지 수
+        self._started = {} # prompt_id -> 실행 시작 시각 (웹소켓 execution_start 이벤트)
+        self._run_time = expected_run_time
+        self._job_times = deque(maxlen=JOB_TIME_SAMPLES_MAX) # 완료된 작업의 이미지 1장당 제출~완료 시간
+        self.min_job_timeout = min_job_timeout
+        self.max_job_timeout = max_job_timeout
+        self.timed_out = 0
+        self.dequeued = 0
+        self.interrupted = 0
+        self.already_finished = 0
+        self.cancel_failures = 0
+        self.gpu_seconds_saved = 0.0
+        self.temp_files_removed = 0
+
+    def job_submitted(self, prompt_id, images=1):
+        with self._lock:
+            self._submitted[str(prompt_id)] = time.monotonic()
+            self._images[str(prompt_id)] = max(1, images)
+
+    def job_finished(self, prompt_id, completed=True):
+        """작업이 끝났거나 취소된 뒤 호출합니다. completed면 실행 시간을 평균과 대기 시한 표본에 반영합니다."""
+        now = time.monotonic()
+        with self._lock:
+            submitted = self._submitted.pop(str(prompt_id), None)
+            images = self._images.pop(str(prompt_id), 1)
+            started = self._started.pop(str(prompt_id), submitted)
+            if completed and started is not None:
+                self._run_time += RUN_TIME_ALPHA * ((now - started) - self._run_time)
+                self._job_times.append((now - submitted) / images)
+
+    def job_timeout(self, images=1):
+        """
+        images장을 생성하는 작업의 완료를 기다릴 최대 시간(초)을 반환합니다.
+        표본이 JOB_TIMEOUT_MIN_SAMPLES개 미만이면 max_job_timeout을 사용합니다.
+        """
+        with self._lock:
+            samples = sorted(self._job_times)
+        if len(samples) < JOB_TIMEOUT_MIN_SAMPLES:
+            return self.max_job_timeout
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return min(self.max_job_timeout, max(self.min_job_timeout, p99 * max(1, images) * JOB_TIMEOUT_FACTOR))
+
+    def record_timeout(self):
+        with self._lock:
+            self.timed_out += 1
+
+    def on_comfy_event(self, host, prompt_id, event_type, data):
+        # 웹소켓 수신 스레드에서 호출됩니다.
+        if event_type == 'execution_start':
+            with self._lock:
+                if prompt_id in self._submitted:
+                    self._started[prompt_id] = time.monotonic()
+
+    async def cancel(self, client, prompt_id):
+        """
+        ComfyUI에서 작업을 제거합니다.
+        :return: 'dequeued' (대기열에서 삭제), 'interrupted' (실행 중 중단), 'finished' (이미 끝남)
+        """
+        prompt_id = str(prompt_id)
+        running, pending = await self._queue_state(client)
+        deleted = False
+        if prompt_id in pending:
+            await client.delete_queued([prompt_id])
+            deleted = True
+            # 조회와 삭제 사이에 실행이 시작되었으면 삭제는 효과가 없으므로 다시 확인합니다.
+            running, pending = await self._queue_state(client)
+        now = time.monotonic()
+        if prompt_id in running:
+            await client.interrupt(prompt_id)
+            with self._lock:
+                started = self._started.get(prompt_id, self._submitted.get(prompt_id, now))
+            outcome, saved = 'interrupted', max(0.0, self._run_time - (now - started))
+        elif deleted:
+            outcome, saved = 'dequeued', self._run_time
+        else:
+            outcome, saved = 'finished', 0.0
+        with self._lock:
+            if outcome == 'dequeued':
+                self.dequeued += 1
+            elif outcome == 'interrupted':
+                self.interrupted += 1
+            else:
+                self.already_finished += 1
+            self.gpu_seconds_saved += saved
+        self.job_finished(prompt_id, completed=False)
+        logger.info(f"Cancelled ComfyUI prompt {prompt_id} on {client.host}: {outcome} (~{saved:.1f} GPU-seconds saved).")
+        return outcome
+
+    @staticmethod
+    async def _queue_state(client):
+        queue = await client.get_queue(max_retries=0)
+        running = {item[1] for item in queue.get('queue_running', []) if len(item) > 1}
+        pending = {item[1] for item in queue.get('queue_pending', []) if len(item) > 1}
+        return running, pending
+
+    def record_cancel_failure(self, prompt_id):
+        with self._lock:
+            self.cancel_failures += 1
+        self.job_finished(prompt_id, completed=False)
+
+    def record_temp_files_removed(self, count=1):
+        with self._lock:
+            self.temp_files_removed += count
+
+    def stats(self):
+        job_timeout = self.job_timeout()
+        with self._lock:
+            return {
+                'tracked_jobs': len(self._submitted),
+                'cancelled': self.dequeued + self.interrupted,
+                'dequeued': self.dequeued,
+                'interrupted': self.interrupted,
+                'already_finished': self.already_finished,
+                'cancel_failures': self.cancel_failures,
+                'gpu_seconds_saved': round(self.gpu_seconds_saved, 1),
+                'average_run_seconds': round(self._run_time, 3),
+                'job_timeout_seconds': round(job_timeout, 1),
+                'timed_out': self.timed_out,
+                'temp_files_removed': self.temp_files_removed,
+            }
+
+
+class _WatchedTask:
+    __slots__ = ('task', 'last_seen', 'watchers')
+
+    def __init__(self, task):
+        self.task = task
+        self.last_seen = time.monotonic()
+        self.watchers = 0
+
+
+class TaskWatchdog:
+    """
+    task_id가 있는 생성 작업을 지켜보다가, 클라이언트가 timeout 동안 상태를 조회하지 않고
+    진행 이벤트 스트림(SSE)도 열려 있지 않으면 버려진 작업으로 보고 asyncio 태스크를 취소합니다.
+    요청마다 이벤트 루프가 다를 수 있으므로(WSGI) 별도 스레드에서 검사하고 call_soon_threadsafe로 취소합니다.
+    """
+
+    def __init__(self, timeout=30.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._tasks = {} # task_id -> _WatchedTask
+        self._seen = {} # 아직 등록되지 않은 task_id -> 열린 스트림 수 (SSE를 먼저 연 경우)
+        self._abandoned = set()
+        self._thread = None
+        self.abandoned_count = 0
+
+    def register(self, task_id, task):
+        """task(asyncio.Task)를 task_id로 지켜봅니다. 작업이 끝나면 unregister()를 호출해야 합니다."""
+        task_id = str(task_id)
+        with self._lock:
+            watched = _WatchedTask(task)
+            watched.watchers = self._seen.pop(task_id, 0)
+            self._tasks[task_id] = watched
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='task-watchdog', daemon=True)
+                self._thread.start()
+
+    def unregister(self, task_id):
+        with self._lock:
+            self._tasks.pop(str(task_id), None)
+            self._abandoned.discard(str(task_id))
+
+    def touch(self, task_id):
+        """클라이언트가 작업 상태를 조회했음을 기록합니다."""
+        with self._lock:
+            watched = self._tasks.get(str(task_id))
+            if watched is not None:
+                watched.last_seen = time.monotonic()
+
+    @contextlib.contextmanager
+    def watching(self, task_id):
+        """블록이 실행되는 동안(진행 이벤트 스트림이 열려 있는 동안) 작업을 버려진 것으로 보지 않습니다."""
+        task_id = str(task_id)
+        self._add_watcher(task_id, 1)
+        try:
+            yield
+        finally:
+            self._add_watcher(task_id, -1)
+
+    def _add_watcher(self, task_id, delta):
+        with self._lock:
+            watched = self._tasks.get(task_id)
+            if watched is not None:
+                watched.watchers += delta
+                watched.last_seen = time.monotonic()
+            else:
+                # 작업 등록 전에 스트림을 연 경우 (브라우저는 요청을 보내기 전에 EventSource를 엽니다)
+                count = self._seen.get(task_id, 0) + delta
+                if count > 0:
+                    self._seen[task_id] = count
+                else:
+                    self._seen.pop(task_id, None)
+
+    def is_abandoned(self, task_id):
+        with self._lock:
+            return str(task_id) in self._abandoned
+
+    def _run(self):
+        interval = max(0.5, self.timeout / 4)
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                abandoned = [
+                    (task_id, watched) for task_id, watched in self._tasks.items()
+                    if watched.watchers <= 0 and now - watched.last_seen > self.timeout
+                ]
+                for task_id, _ in abandoned:
+                    del self._tasks[task_id]
+                    self._abandoned.add(task_id)
+                self.abandoned_count += len(abandoned)
+            for task_id, watched in abandoned:
+                logger.info(f"Task {task_id} was not polled for {self.timeout:.0f}s; cancelling it.")
+                try:
+                    watched.task.get_loop().call_soon_threadsafe(watched.task.cancel)
+                except RuntimeError: # 작업의 이벤트 루프가 이미 닫힘
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'watched_tasks': len(self._tasks),
+                'abandoned': self.abandoned_count,
+                'timeout_seconds': self.timeout,
+            }
+
+
+_tracker = None
+_watchdog = None
+_lock = threading.Lock()
+
+
+def get_job_tracker():
+    """프로세스 전역 ComfyUI 작업 추적기를 반환합니다 (처음 호출 시 실행 시작 이벤트 구독을 시작합니다)."""
+    global _tracker
+    if _tracker is None:
+        with _lock:
+            if _tracker is None:
+                tracker = GenerationJobTracker(
+                    getattr(settings, 'COMFYUI_EXPECTED_GENERATION_SECONDS', 30),
+                    min_job_timeout=getattr(settings, 'COMFYUI_JOB_TIMEOUT_MIN', 60),
+                    max_job_timeout=getattr(settings, 'COMFYUI_JOB_TIMEOUT_MAX', 900),
+                )
+                add_event_observer(tracker.on_comfy_event)
+                _tracker = tracker
+    return _tracker
+
+
+def get_task_watchdog():
+    """버려진 작업을 찾는 프로세스 전역 감시기를 반환합니다 (settings.TASK_ABANDON_TIMEOUT)."""
+    global _watchdog
+    if _watchdog is None:
+        with _lock:
+            if _watchdog is None:
+                _watchdog = TaskWatchdog(getattr(settings, 'TASK_ABANDON_TIMEOUT', 30))
+    return _watchdog
@@ -0,0 +1,147 @@
+# image_generator/circuit_breaker.py
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    서버 하나에 대한 회로 차단기입니다.
+    - CLOSED: 모든 요청을 보냅니다. 연속 실패가 failure_threshold회에 이르면 OPEN이 됩니다.
+    - OPEN: 요청을 보내지 않고 즉시 실패시킵니다 (타임아웃을 기다리지 않음).
+      reset_timeout이 지나면 HALF_OPEN으로 바뀌고, probe가 있으면 별도 스레드가 probe_interval마다 호출해 성공하면 그 전에 HALF_OPEN으로 바뀝니다.
+      [수정] probe가 계속 실패해도(예: /system_stats만 고장) reset_timeout마다 시험 요청을 보내므로 서버가 영구히 제외되지 않습니다.
+    - HALF_OPEN: 시험 요청을 half_open_max_calls개까지만 보내고, 성공하면 CLOSED, 실패하면 다시 OPEN이 됩니다.
+    호출자는 allow_request()가 True를 반환한 요청마다 record_success(), record_failure(), record_abort() 중 하나를 호출해야 합니다.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, half_open_max_calls=1, probe=None, probe_interval=5.0):
+        """
+        :param name: 로그에 표시할 이름 (서버 주소)
+        :param failure_threshold: OPEN으로 바뀌기까지 허용하는 연속 실패 횟수
+        :param reset_timeout: OPEN 상태를 유지하는 최대 시간 (초). probe가 먼저 성공하면 더 빨리 HALF_OPEN이 됩니다.
+        :param half_open_max_calls: HALF_OPEN 상태에서 동시에 보낼 수 있는 시험 요청 수
+        :param probe: 인자 없는 동기 함수. 서버가 정상이면 반환하고, 아니면 예외를 발생시킵니다 (예: /system_stats 조회).
+        :param probe_interval: OPEN 상태에서 probe를 호출하는 간격 (초)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._probe_thread = None
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    @property
+    def consecutive_failures(self):
+        return self._failures
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+
+    def available(self):
+        """지금 요청을 보낼 수 있는지 확인합니다 (상태를 바꾸거나 시험 요청 자리를 차지하지 않습니다)."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state == CLOSED or (self._state == HALF_OPEN and self._trials < self.half_open_max_calls)
+
+    def allow_request(self):
+        """요청을 보내도 되면 True를 반환합니다. HALF_OPEN에서는 시험 요청 자리를 하나 차지합니다."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                logger.info(f"Circuit for {self.name} closed after a successful trial request.")
+                self._state = CLOSED
+                self._trials = 0
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+                self._open_locked("trial request failed")
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._open_locked(f"{self._failures} consecutive failures")
+
+    def record_abort(self):
+        """요청이 결과 없이 끝났을 때(취소 등) 시험 요청 자리만 돌려줍니다."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+
+    def _open_locked(self, reason):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        if self.probe is not None:
+            logger.error(f"Circuit for {self.name} opened ({reason}); failing fast until /system_stats responds "
+                         f"or for at most {self.reset_timeout:.0f}s.")
+            if self._probe_thread is None:
+                self._probe_thread = threading.Thread(target=self._run_probe, name='circuit-probe', daemon=True)
+                self._probe_thread.start()
+        else:
+            logger.error(f"Circuit for {self.name} opened ({reason}); failing fast for {self.reset_timeout:.0f}s.")
+
+    def _run_probe(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                if self._state != OPEN:
+                    self._probe_thread = None
+                    return
+            try:
+                self.probe()
+            except Exception as e:
+                logger.debug(f"Health probe for {self.name} failed: {e!r}")
+                continue
+            with self._lock:
+                if self._state == OPEN:
+                    logger.info(f"Health probe for {self.name} succeeded; allowing a trial request.")
+                    self._state = HALF_OPEN
+                    self._trials = 0
+                self._probe_thread = None
+                return
+
+    def snapshot(self):
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'open_seconds': round(time.monotonic() - self._opened_at, 1) if self._state != CLOSED else 0.0,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+            }
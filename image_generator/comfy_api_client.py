@@ -1,115 +1,309 @@
 # image_generator/comfy_api_client.py
 
+import asyncio
 import json
-import requests
-import uuid
+import logging
 import os
+import random
+import tempfile
 import time
+import uuid
+import weakref
+from collections import deque
+
+import httpx
+
+from .circuit_breaker import OPEN, CircuitBreaker
+
+# 웹소켓 이벤트 수신은 comfy_events.ComfyEventListener가 담당합니다.
+
+logger = logging.getLogger(__name__)
+
+# 호출별 기본 타임아웃 (초)
+DEFAULT_TIMEOUTS = {
+    'queue_prompt': 30.0,
+    'get_history': 10.0,
+    'get_image': 120.0,
+    'upload_image': 60.0,
+    'interrupt': 10.0,
+    'delete_queued': 10.0,
+    'get_queue': 10.0,
+    'get_system_stats': 5.0,
+}
+CONNECT_TIMEOUT = 5.0
+
+# /view 응답을 파일로 스트리밍할 때의 청크 크기 (바이트)
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# 재시도 시 대기 시간 = RETRY_BACKOFF_BASE * 2^시도횟수 + 지터 (최대 RETRY_BACKOFF_MAX)
+RETRY_BACKOFF_BASE = 0.2
+RETRY_BACKOFF_MAX = 3.0
+RETRYABLE_STATUS_CODES = (502, 503, 504)
+
+# 적응형 타임아웃: 호출별 최근 성공 응답 시간의 p99 * ADAPTIVE_TIMEOUT_FACTOR (설정된 타임아웃이 상한, ADAPTIVE_TIMEOUT_FLOOR가 하한)
+LATENCY_SAMPLES_MAX = 200
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_FACTOR = 3.0
+ADAPTIVE_TIMEOUT_FLOOR = 2.0
+
+
+class ComfyAPIError(Exception):
+    """ComfyUI 서버와의 통신 또는 응답 처리 중 오류가 발생했을 때 발생합니다."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(ComfyAPIError):
+    """회로 차단기가 열려 있어 ComfyUI 서버에 요청을 보내지 않고 바로 실패했을 때 발생합니다."""
 
-# 웹소켓 관련 라이브러리 (get_image_from_ws 함수를 다시 활성화할 경우 필요)
-# import websocket
-# import io
-# from PIL import Image
-# import base64 # image_to_base64 함수로 대체됨
 
 class ComfyAPIClient:
-    def __init__(self, host):
+    def __init__(self, host, max_connections=20, max_keepalive_connections=10, max_retries=2, timeouts=None,
+                 failure_threshold=3, reset_timeout=30.0, probe_interval=5.0, adaptive_timeouts=True):
         """
-        ComfyUI API 클라이언트를 초기화합니다.
+        ComfyUI API 비동기 클라이언트를 초기화합니다.
+        keep-alive 연결 풀을 가진 httpx.AsyncClient를 이벤트 루프마다 하나씩 만들어 재사용합니다.
+        연결 풀은 오래 사는 루프(ASGI 서버의 루프, 생성 워커 풀의 루프)에서만 요청 사이에 유지됩니다.
+        모든 요청은 서버별 회로 차단기(self.breaker)를 거치며, 회로가 열려 있으면 CircuitOpenError로 바로 실패합니다.
         :param host: ComfyUI 서버의 주소 (예: "http://127.0.0.1:8188")
+        :param max_connections: 연결 풀의 최대 연결 수
+        :param max_keepalive_connections: 유휴 상태로 유지할 최대 연결 수
+        :param max_retries: 일시적인 오류 시 최대 재시도 횟수
+        :param timeouts: 호출별 타임아웃 덮어쓰기 (예: {"get_image": 60}). 적응형 타임아웃의 상한이기도 합니다.
+        :param failure_threshold: 회로가 열리기까지 허용하는 연속 실패 횟수
+        :param reset_timeout: 회로를 열어 두는 최대 시간 (초). 헬스 체크가 먼저 성공하면 더 빨리, 계속 실패해도 이 시간이 지나면 시험 요청을 보냅니다.
+        :param probe_interval: 회로가 열려 있는 동안 /system_stats를 조회하는 간격 (초)
+        :param adaptive_timeouts: 최근 응답 시간의 p99로 호출별 타임아웃을 줄일지 여부
         """
-        self.host = host
-        # 웹소켓 연결 시 사용되는 클라이언트 ID (현재 버전에서는 직접 사용 안함)
+        self.host = host.rstrip('/')
+        # 웹소켓 연결 시 사용되는 클라이언트 ID
+        # (comfy_events.ComfyEventListener가 이 ID로 /ws 이벤트를 구독합니다.)
         self.client_id = str(uuid.uuid4())
+        self.max_retries = max_retries
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.adaptive_timeouts = adaptive_timeouts
+        self._latencies = {} # call_name -> 최근 성공 응답 시간(초) deque
+        self.breaker = CircuitBreaker(
+            self.host, failure_threshold=failure_threshold, reset_timeout=reset_timeout,
+            probe=self.check_health, probe_interval=probe_interval,
+        )
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        # httpx.AsyncClient는 생성된 이벤트 루프에 묶이므로 루프별로 하나씩 보관합니다.
+        # keep-alive 풀링은 ASGI에서만 요청 사이에 유지됩니다 (프로세스당 하나의 루프 = 하나의 연결 풀).
+        # WSGI의 비동기 뷰, Celery 작업(async_to_sync), run_batch_sync는 호출마다 새 루프를 쓰므로 클라이언트도 그 호출 동안만 살고,
+        # 그 루프를 만든 코드가 루프를 끝내기 전에 close_comfy_clients()로 닫습니다. (WSGI에서도 생성 작업은 워커 풀의 루프에서 풀을 공유하며,
+        # 워커 풀이 종료될 때 닫습니다)
+        self._http_clients = weakref.WeakKeyDictionary()
+
+    def _http(self):
+        loop = asyncio.get_running_loop()
+        client = self._http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.host,
+                limits=self._limits,
+                timeout=httpx.Timeout(DEFAULT_TIMEOUTS['get_history'], connect=CONNECT_TIMEOUT),
+            )
+            self._http_clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """현재 이벤트 루프의 연결 풀을 닫습니다."""
+        client = self._http_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
-    def queue_prompt(self, prompt_workflow):
+    def timeout_for(self, call_name):
         """
-        ComfyUI에 워크플로우를 큐에 추가하고 실행을 요청합니다.
-        :param prompt_workflow: ComfyUI 워크플로우 JSON 데이터 (딕셔너리 형태).
-                                이 딕셔너리는 반드시 최상위 'prompt' 키를 포함해야 합니다.
-                                예: {"prompt": { "3": {...}, "4": {...} }}
-        :return: ComfyUI API의 응답 (주로 prompt_id를 포함하는 딕셔너리)
+        호출에 적용할 타임아웃(초)을 반환합니다.
+        성공 표본이 ADAPTIVE_TIMEOUT_MIN_SAMPLES개 이상이면 p99 * ADAPTIVE_TIMEOUT_FACTOR를 사용하므로,
+        응답이 없는 서버를 설정값(최대 수 분)만큼 기다리지 않고 평소 응답 시간에 비례해 포기합니다.
         """
-        url = f"{self.host}/prompt"
-        headers = {'Content-Type': 'application/json'}
+        configured = self.timeouts[call_name]
+        samples = self._latencies.get(call_name)
+        if not self.adaptive_timeouts or samples is None or len(samples) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return configured
+        return min(configured, max(ADAPTIVE_TIMEOUT_FLOOR, _p99(samples) * ADAPTIVE_TIMEOUT_FACTOR))
 
-        # prompt_workflow 자체가 이미 {"prompt": ...} 형태를 가지고 있어야 합니다.
-        # 따라서, data 딕셔너리에서 prompt_workflow를 직접 prompt 값으로 사용합니다.
-        data = {
-            "prompt": prompt_workflow,
-            "client_id": self.client_id
-        }
+    def _record_latency(self, call_name, seconds):
+        samples = self._latencies.get(call_name)
+        if samples is None:
+            samples = self._latencies.setdefault(call_name, deque(maxlen=LATENCY_SAMPLES_MAX))
+        samples.append(seconds)
 
+    async def _request(self, method, path, call_name, idempotent=True, max_retries=None, consume=None, **kwargs):
+        """
+        회로 차단기와 재시도/지터를 포함해 요청을 보냅니다.
+        멱등이 아닌 요청(/prompt 등)은 서버에 도달하지 않은 연결 오류일 때만 재시도합니다.
+        연결 오류, 타임아웃, 5xx 응답은 회로 차단기에 실패로 기록되고, 서버가 응답하면(4xx 포함) 성공으로 기록됩니다.
+        :param consume: 지정하면 응답 본문을 메모리에 읽지 않고 스트리밍 응답을 이 코루틴 함수에 넘겨 그 반환값을 돌려줍니다.
+                        본문 수신 중 연결이 끊기면 처음부터 다시 호출되므로, 호출될 때마다 처음부터 처리해야 합니다.
+        :raises CircuitOpenError: 회로가 열려 있어 요청을 보내지 않은 경우
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"ComfyUI 서버 {self.host}의 회로 차단기가 열려 있어 요청하지 않았습니다 ({call_name}).")
+        if max_retries is None:
+            max_retries = self.max_retries
+        timeout = httpx.Timeout(self.timeout_for(call_name), connect=CONNECT_TIMEOUT)
+        healthy = None # True: 서버가 응답함, False: 서버 장애, None: 결과 없음 (취소, 로컬 오류 등)
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=120) # 타임아웃을 넉넉히 늘림
-            response.raise_for_status() # 4xx 또는 5xx HTTP 에러 발생 시 예외 발생
+            attempt = 0
+            while True:
+                status_code = None
+                started = time.monotonic()
+                try:
+                    if consume is None:
+                        response = await self._http().request(method, path, timeout=timeout, **kwargs)
+                    else:
+                        async with self._http().stream(method, path, timeout=timeout, **kwargs) as response:
+                            if not response.is_error:
+                                result = await consume(response)
+                                healthy = True
+                                self._record_latency(call_name, time.monotonic() - started)
+                                return result
+                            await response.aread() # 오류 메시지용 본문
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    # 요청이 서버에 도달하지 않았으므로 항상 재시도할 수 있습니다.
+                    error = e
+                except httpx.TransportError as e:
+                    if not idempotent:
+                        healthy = False
+                        logger.error(f"ComfyUI {call_name} 요청 오류: {e}")
+                        raise ComfyAPIError(f"ComfyUI 서버 통신 오류 ({call_name}): {e}") from e
+                    error = e
+                else:
+                    if not response.is_error:
+                        healthy = True
+                        self._record_latency(call_name, time.monotonic() - started)
+                        return response
+                    status_code = response.status_code
+                    error = f"HTTP {status_code}: {response.text[:500]}"
+                    if not (idempotent and status_code in RETRYABLE_STATUS_CODES):
+                        healthy = status_code < 500
+                        logger.error(f"ComfyUI {call_name} 요청 오류: {error}")
+                        raise ComfyAPIError(f"ComfyUI 서버 통신 오류 ({call_name}): {error}", status_code=status_code)
 
-            return response.json()
+                if attempt >= max_retries:
+                    healthy = False
+                    logger.error(f"ComfyUI {call_name} 요청 실패 ({attempt + 1}회 시도): {error}")
+                    raise ComfyAPIError(f"ComfyUI 서버 통신 오류 ({call_name}): {error}", status_code=status_code)
+                if self.breaker.state == OPEN:
+                    # 다른 요청들의 실패로 회로가 열렸으면 재시도하지 않고 바로 포기합니다.
+                    healthy = False
+                    raise CircuitOpenError(f"ComfyUI 서버 {self.host}의 회로 차단기가 열려 재시도를 중단했습니다 ({call_name}): {error}",
+                                           status_code=status_code)
+                delay = min(RETRY_BACKOFF_BASE * (2 ** attempt), RETRY_BACKOFF_MAX)
+                delay = delay / 2 + random.uniform(0, delay / 2) # 지터 추가
+                logger.warning(f"ComfyUI {call_name} 요청 재시도 {attempt + 1}/{max_retries} ({delay:.2f}s 후): {error}")
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            if healthy is True:
+                self.breaker.record_success()
+            elif healthy is False:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_abort()
+
+    def check_health(self):
+        """
+        /system_stats를 동기 요청으로 조회해 서버가 응답하는지 확인합니다 (실패 시 예외 발생).
+        회로가 열려 있는 동안 회로 차단기의 백그라운드 스레드가 호출합니다.
+        """
+        response = httpx.get(f"{self.host}/system_stats",
+                             timeout=httpx.Timeout(self.timeout_for('get_system_stats'), connect=CONNECT_TIMEOUT))
+        response.raise_for_status()
+
+    def stats(self):
+        """모니터링용 회로 차단기 상태와 호출별 응답 시간 p99/적용 중인 타임아웃을 반환합니다."""
+        return {
+            'circuit': self.breaker.snapshot(),
+            'timeouts': {
+                call_name: {
+                    'samples': len(samples),
+                    'p99_seconds': round(_p99(samples), 3),
+                    'timeout_seconds': round(self.timeout_for(call_name), 3),
+                } for call_name, samples in list(self._latencies.items()) if samples
+            },
+        }
 
-        except requests.exceptions.RequestException as e:
-            print(f"ComfyUI queue_prompt 요청 오류: {e}")
-            if response is not None:
-                print(f"응답 상태 코드: {response.status_code}")
-                print(f"응답 본문: {response.text[:500]}...") # 응답의 일부를 출력
-            raise Exception(f"ComfyUI 서버 통신 오류: {e}")
+    @staticmethod
+    def _json(response, call_name):
+        try:
+            return response.json()
         except json.JSONDecodeError as e:
-            print(f"ComfyUI queue_prompt JSON 파싱 오류: {e}")
-            if response is not None:
-                print(f"ComfyUI 서버 원본 응답: {response.text[:500]}...")
-            raise Exception(f"ComfyUI 응답 데이터 파싱 오류: {e}")
-        except Exception as e:
-            print(f"queue_prompt에서 예상치 못한 오류 발생: {e}")
-            raise Exception(f"예상치 못한 오류: {e}")
+            logger.error(f"ComfyUI {call_name} JSON 파싱 오류: {e}. 원본 응답: {response.text[:500]}...")
+            raise ComfyAPIError(f"ComfyUI 응답 데이터 파싱 오류 ({call_name}): {e}")
+
+    async def queue_prompt(self, prompt_workflow):
+        """
+        ComfyUI에 워크플로우를 큐에 추가하고 실행을 요청합니다.
+        :param prompt_workflow: ComfyUI 워크플로우 노드 딕셔너리 ('prompt' 키 아래에 들어갈 내용)
+        :return: ComfyUI API의 응답 (주로 prompt_id를 포함하는 딕셔너리)
+        """
+        data = {
+            "prompt": prompt_workflow,
+            "client_id": self.client_id
+        }
+        response = await self._request('POST', '/prompt', 'queue_prompt', idempotent=False, json=data)
+        return self._json(response, 'queue_prompt')
 
-    def get_history(self, prompt_id):
+    async def get_history(self, prompt_id):
         """
         특정 prompt_id에 대한 ComfyUI의 실행 이력을 조회합니다.
         :param prompt_id: 조회할 프롬프트 ID
-        :return: ComfyUI의 실행 이력 데이터 (딕셔너리 형태)
+        :return: ComfyUI의 실행 이력 데이터 (딕셔너리 형태, 아직 기록이 없으면 빈 딕셔너리)
         """
-        url = f"{self.host}/history/{prompt_id}"
-        try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"ComfyUI get_history 요청 오류: {e}")
-            raise Exception(f"ComfyUI 이력 조회 통신 오류: {e}")
-        except json.JSONDecodeError as e:
-            print(f"ComfyUI get_history JSON 파싱 오류: {e}")
-            if response is not None:
-                print(f"ComfyUI 서버 원본 응답: {response.text[:500]}...")
-            raise Exception(f"ComfyUI 이력 응답 파싱 오류: {e}")
-        except Exception as e:
-            print(f"get_history에서 예상치 못한 오류 발생: {e}")
-            raise Exception(f"예상치 못한 오류: {e}")
+        response = await self._request('GET', f'/history/{prompt_id}', 'get_history')
+        return self._json(response, 'get_history')
 
-    def get_image(self, filename, subfolder, folder_type):
+    async def get_image(self, filename, subfolder, folder_type):
         """
         ComfyUI 서버에서 이미지를 다운로드합니다.
         :param filename: 이미지 파일 이름
-        :param subfolder: 이미지 서브 폴더 (예: "ComfyUI/output/")
+        :param subfolder: 이미지 서브 폴더
         :param folder_type: 폴더 타입 (예: "output", "input", "temp")
         :return: 이미지의 바이너리 데이터
         """
-        url = f"{self.host}/view"
         params = {
             "filename": filename,
             "subfolder": subfolder,
             "type": folder_type
         }
-        try:
-            response = requests.get(url, params=params, timeout=60)
-            response.raise_for_status()
-            return response.content # 이미지 바이너리 데이터 반환
-        except requests.exceptions.RequestException as e:
-            print(f"ComfyUI get_image 요청 오류: {e}")
-            raise Exception(f"ComfyUI 이미지 다운로드 통신 오류: {e}")
-        except Exception as e:
-            print(f"get_image에서 예상치 못한 오류 발생: {e}")
-            raise Exception(f"예상치 못한 오류: {e}")
+        response = await self._request('GET', '/view', 'get_image', params=params)
+        return response.content # 이미지 바이너리 데이터 반환
+
+    async def download_image(self, filename, subfolder, folder_type, target_dir, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        /view 응답을 메모리에 모으지 않고 청크 단위로 target_dir 안의 임시 파일에 씁니다.
+        디스크 쓰기는 워커 스레드에서 실행되므로 이벤트 루프를 막지 않고, 작업당 메모리 사용량은 청크 크기로 일정합니다.
+        :param target_dir: 임시 파일을 만들 디렉토리. 최종 위치와 같은 파일시스템이어야 원자적 rename이 가능합니다.
+        :return: 다운로드가 끝난 임시 파일 경로. 호출자가 최종 위치로 옮기거나 삭제해야 합니다.
+        """
+        params = {
+            "filename": filename,
+            "subfolder": subfolder,
+            "type": folder_type
+        }
+        await asyncio.to_thread(os.makedirs, target_dir, exist_ok=True)
 
-    def upload_image(self, image_path, image_type="input", overwrite=True):
+        async def consume(response):
+            fd, temp_path = await asyncio.to_thread(
+                tempfile.mkstemp, prefix='.download_', suffix=os.path.splitext(filename)[1], dir=target_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        await asyncio.to_thread(f.write, chunk)
+            except BaseException:
+                await asyncio.to_thread(_remove_quietly, temp_path)
+                raise
+            return temp_path
+
+        return await self._request('GET', '/view', 'get_image', consume=consume, params=params)
+
+    async def upload_image(self, image_path, image_type="input", overwrite=True):
         """
         로컬 이미지를 ComfyUI 서버로 업로드합니다.
         :param image_path: 업로드할 로컬 이미지 파일 경로
@@ -117,34 +311,73 @@ class ComfyAPIClient:
         :param overwrite: 기존 파일이 있을 경우 덮어쓸지 여부
         :return: ComfyUI API의 이미지 업로드 응답 (딕셔너리)
         """
-        url = f"{self.host}/upload/image"
-        
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"업로드할 이미지를 찾을 수 없습니다: {image_path}")
 
+        image_bytes = await asyncio.to_thread(_read_file, image_path)
+        return await self.upload_image_data(os.path.basename(image_path), image_bytes, image_type, overwrite)
+
+    async def upload_image_data(self, filename, image_bytes, image_type="input", overwrite=True):
+        """
+        메모리에 있는 이미지 데이터를 ComfyUI 서버로 업로드합니다.
+        :return: ComfyUI API의 이미지 업로드 응답 (예: {"name": ..., "subfolder": ..., "type": ...})
+        """
         files = {
-            'image': (os.path.basename(image_path), open(image_path, 'rb'), 'application/octet-stream'),
+            'image': (filename, image_bytes, 'application/octet-stream'),
         }
         data = {
             'type': image_type,
             'overwrite': 'true' if overwrite else 'false'
         }
+        response = await self._request('POST', '/upload/image', 'upload_image', files=files, data=data)
+        return self._json(response, 'upload_image')
 
-        try:
-            response = requests.post(url, files=files, data=data, timeout=60)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"ComfyUI upload_image 요청 오류: {e}")
-            raise Exception(f"ComfyUI 이미지 업로드 통신 오류: {e}")
-        except json.JSONDecodeError as e:
-            print(f"ComfyUI upload_image JSON 파싱 오류: {e}")
-            if response is not None:
-                print(f"ComfyUI 서버 원본 응답: {response.text[:500]}...")
-            raise Exception(f"ComfyUI 업로드 응답 파싱 오류: {e}")
-        except Exception as e:
-            print(f"upload_image에서 예상치 못한 오류 발생: {e}")
-            raise Exception(f"예상치 못한 오류: {e}")
+    async def interrupt(self, prompt_id=None):
+        """
+        현재 실행 중인 ComfyUI 작업을 중단합니다.
+        :param prompt_id: 지정하면 그 작업이 실행 중일 때만 중단합니다 (이를 지원하지 않는 이전 버전은 무시하고 현재 작업을 중단).
+        """
+        kwargs = {'json': {'prompt_id': prompt_id}} if prompt_id is not None else {}
+        await self._request('POST', '/interrupt', 'interrupt', idempotent=False, **kwargs)
+
+    async def delete_queued(self, prompt_ids):
+        """
+        아직 실행되지 않은 작업을 ComfyUI 대기열에서 제거합니다. 실행 중인 작업에는 영향이 없습니다.
+        :param prompt_ids: 제거할 prompt_id 목록
+        """
+        await self._request('POST', '/queue', 'delete_queued', json={'delete': list(prompt_ids)})
+
+    async def get_queue(self, max_retries=None):
+        """
+        ComfyUI 큐 상태를 조회합니다.
+        :return: {"queue_running": [...], "queue_pending": [...]} 형태의 딕셔너리
+        """
+        response = await self._request('GET', '/queue', 'get_queue', max_retries=max_retries)
+        return self._json(response, 'get_queue')
+
+    async def get_system_stats(self, max_retries=None):
+        """
+        ComfyUI 서버의 시스템 상태(장치, VRAM 등)를 조회합니다. 헬스 체크에 사용됩니다.
+        """
+        response = await self._request('GET', '/system_stats', 'get_system_stats', max_retries=max_retries)
+        return self._json(response, 'get_system_stats')
+
+
+def _p99(samples):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 
 def load_workflow_json(file_path):
@@ -259,6 +492,44 @@ def find_node_id_by_class_type(workflow_api_format, target_class_type, hint=None
     print(f"{target_class_type} 노드를 찾을 수 없습니다.")
     return None
 
+_shared_clients = {}
+
+
+def get_comfy_client(host=None):
+    """
+    ComfyUI 서버(host)별 프로세스 전역 ComfyAPIClient 인스턴스를 반환합니다.
+    연결 풀을 재사용하고, 웹소켓 이벤트 구독과 /prompt 요청이 같은 client_id를 사용하도록 인스턴스를 공유합니다.
+    :param host: ComfyUI 서버 주소. 지정하지 않으면 settings.COMFYUI_API_URL을 사용합니다.
+    """
+    from django.conf import settings
+    host = (host or settings.COMFYUI_API_URL).rstrip('/')
+    client = _shared_clients.get(host)
+    if client is None:
+        client = _shared_clients.setdefault(host, ComfyAPIClient(
+            host,
+            max_connections=getattr(settings, 'COMFYUI_MAX_CONNECTIONS', 20),
+            max_keepalive_connections=getattr(settings, 'COMFYUI_MAX_KEEPALIVE_CONNECTIONS', 10),
+            max_retries=getattr(settings, 'COMFYUI_MAX_RETRIES', 2),
+            timeouts=getattr(settings, 'COMFYUI_TIMEOUTS', None),
+            failure_threshold=getattr(settings, 'COMFYUI_BACKEND_FAILURE_THRESHOLD', 3),
+            reset_timeout=getattr(settings, 'COMFYUI_BACKEND_EJECT_SECONDS', 30.0),
+            probe_interval=getattr(settings, 'COMFYUI_BACKEND_PROBE_INTERVAL', 5.0),
+            adaptive_timeouts=getattr(settings, 'COMFYUI_ADAPTIVE_TIMEOUTS', True),
+        ))
+    return client
+
+
+async def close_comfy_clients():
+    """
+    현재 이벤트 루프에서 만든 모든 공유 ComfyAPIClient의 연결 풀을 닫습니다.
+    호출마다 새 루프를 만드는 코드(Celery 작업, WSGI 뷰, run_batch_sync)와 워커 풀이 자기 루프를 끝내기 전에 호출합니다.
+    """
+    for client in list(_shared_clients.values()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Could not close the HTTP connection pool of ComfyUI {client.host}: {e}")
+
 # # 이미지 파일을 Base64로 인코딩하는 헬퍼 함수 (필요시 사용, 현재는 upload_image 함수가 더 편리)
 # def image_to_base64(image_path):
 #     import base64
@@ -0,0 +1,203 @@
+# image_generator/comfy_backends.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from .comfy_api_client import ComfyAPIError, get_comfy_client
+
+logger = logging.getLogger(__name__)
+
+# 백엔드별로 기억할 업로드된 입력 이미지 수 (i2i 친화도 라우팅용)
+UPLOADED_INPUTS_MAX = 512
+
+
+class NoHealthyBackendError(ComfyAPIError):
+    """사용 가능한(정상 상태의) ComfyUI 백엔드가 하나도 없을 때 발생합니다."""
+
+
+class ComfyBackend:
+    """
+    라우터가 관리하는 ComfyUI 인스턴스 하나의 상태입니다.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.host = client.host
+        self.queue_depth = 0 # 마지막 /queue 조회 시 실행 중 + 대기 중 작업 수
+        self.in_flight = 0 # 이 프로세스가 보낸 뒤 아직 끝나지 않은 작업 수
+        self.in_flight_at_probe = 0
+        self.last_probe = 0.0
+        self.system_stats = {}
+        # 마지막으로 보낸 작업의 모델 시그니처 (이 백엔드의 VRAM에 올라가 있다고 보는 모델)
+        self.model_signature = None
+        # 입력 이미지 해시 -> 이 백엔드에서의 입력 파일 이름
+        self.uploaded_inputs = OrderedDict()
+
+    @property
+    def ejected(self):
+        # 회로 차단기가 열려 있거나, 반쯤 열린 상태에서 이미 시험 요청이 진행 중이면 제외됩니다.
+        return not self.client.breaker.available()
+
+    @property
+    def consecutive_failures(self):
+        return self.client.breaker.consecutive_failures
+
+    @property
+    def load(self):
+        # 다른 프로세스가 넣은 작업 수(마지막 조회 기준) + 이 프로세스의 진행 중 작업 수
+        external = max(0, self.queue_depth - self.in_flight_at_probe)
+        return external + self.in_flight
+
+    def get_input(self, input_key):
+        filename = self.uploaded_inputs.get(input_key)
+        if filename is not None:
+            self.uploaded_inputs.move_to_end(input_key)
+        return filename
+
+    def remember_input(self, input_key, filename):
+        self.uploaded_inputs[input_key] = filename
+        self.uploaded_inputs.move_to_end(input_key)
+        while len(self.uploaded_inputs) > UPLOADED_INPUTS_MAX:
+            self.uploaded_inputs.popitem(last=False)
+
+    def forget_input(self, input_key):
+        self.uploaded_inputs.pop(input_key, None)
+
+    def __repr__(self):
+        return f"<ComfyBackend {self.host} load={self.load} ejected={self.ejected}>"
+
+
+class ComfyBackendRouter:
+    """
+    여러 ComfyUI 인스턴스 중 가장 한가한 정상 인스턴스로 작업을 보내는 라우터입니다.
+    각 백엔드의 /system_stats(헬스 체크)와 /queue(대기열 길이)를 probe_interval마다 조회합니다.
+    장애 판단은 각 클라이언트의 회로 차단기(ComfyAPIClient.breaker)가 담당하며, 회로가 열린 백엔드는 제외(eject)되었다가
+    차단기의 백그라운드 헬스 체크와 시험 요청이 성공하면 다시 편입됩니다.
+    """
+
+    def __init__(self, clients, probe_interval=5.0, affinity_slack=2):
+        """
+        :param clients: 백엔드별 ComfyAPIClient 목록
+        :param probe_interval: 상태 조회 주기 (초)
+        :param affinity_slack: 입력 이미지나 같은 모델을 이미 가진 백엔드를 선택할 때 허용하는 추가 부하
+        """
+        if not clients:
+            raise ValueError("At least one ComfyUI backend is required.")
+        self.backends = [ComfyBackend(client) for client in clients]
+        self.probe_interval = probe_interval
+        self.affinity_slack = affinity_slack
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    def __len__(self):
+        return len(self.backends)
+
+    # --- 상태 조회 ---
+
+    async def refresh(self, force=False):
+        """마지막 조회 후 probe_interval이 지났으면 모든 백엔드의 상태를 조회합니다."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_refresh < self.probe_interval:
+                return
+            self._last_refresh = now
+        await asyncio.gather(*(self._probe(backend) for backend in self.backends))
+
+    async def _probe(self, backend):
+        if backend.ejected:
+            return
+        try:
+            stats = await backend.client.get_system_stats(max_retries=0)
+            queue = await backend.client.get_queue(max_retries=0)
+        except ComfyAPIError as e:
+            # 실패는 클라이언트의 회로 차단기에 이미 기록되었습니다.
+            logger.warning(f"Health probe failed for ComfyUI backend {backend.host}: {e}")
+            return
+        with self._lock:
+            backend.system_stats = stats
+            backend.queue_depth = len(queue.get('queue_running', [])) + len(queue.get('queue_pending', []))
+            backend.in_flight_at_probe = backend.in_flight
+            backend.last_probe = time.monotonic()
+
+    # --- 작업 배정 ---
+
+    def acquire(self, input_key=None, exclude=(), model_signature=None):
+        """
+        작업을 보낼 백엔드를 선택하고 진행 중 작업 수를 늘립니다. 작업이 끝나면 반드시 release()를 호출하세요.
+        :param input_key: i2i 입력 이미지의 해시. 이 이미지를 이미 가진 백엔드를 우선합니다.
+        :param model_signature: 작업의 모델 시그니처. 입력 이미지 친화도가 없으면 같은 모델이 올라가 있는 백엔드를 우선합니다.
+        :param exclude: 제외할 백엔드 host 목록 (재시도 시 사용)
+        :raises NoHealthyBackendError: 선택 가능한 백엔드가 없을 때
+        """
+        with self._lock:
+            candidates = [b for b in self.backends if not b.ejected and b.host not in exclude]
+            if not candidates:
+                raise NoHealthyBackendError("사용 가능한 ComfyUI 백엔드가 없습니다.")
+
+            min_load = min(b.load for b in candidates)
+            chosen = None
+            if input_key is not None:
+                holders = [b for b in candidates
+                           if input_key in b.uploaded_inputs and b.load <= min_load + self.affinity_slack]
+                if holders:
+                    chosen = min(holders, key=lambda b: b.load)
+            if chosen is None and model_signature is not None:
+                warm = [b for b in candidates
+                        if b.model_signature == model_signature and b.load <= min_load + self.affinity_slack]
+                if warm:
+                    chosen = min(warm, key=lambda b: b.load)
+            if chosen is None:
+                chosen = random.choice([b for b in candidates if b.load == min_load])
+            chosen.in_flight += 1
+            if model_signature is not None:
+                chosen.model_signature = model_signature
+        logger.debug(f"Routing ComfyUI job to {chosen.host} (load before dispatch: {chosen.load - 1})")
+        return chosen
+
+    def release(self, backend, success=True):
+        """
+        작업이 끝난 백엔드의 진행 중 작업 수를 줄입니다.
+        HTTP 호출의 성공/실패는 회로 차단기에 이미 기록되므로, success=False는 호출 밖에서 발견한 장애
+        (예: 작업이 끝나지 않아 시간 초과)일 때만 넘깁니다.
+        """
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+        if not success:
+            backend.client.breaker.record_failure()
+
+    def snapshot(self):
+        """모니터링용 백엔드 상태 목록을 반환합니다."""
+        with self._lock:
+            return [{
+                'host': b.host,
+                'healthy': not b.ejected,
+                'load': b.load,
+                'queue_depth': b.queue_depth,
+                'in_flight': b.in_flight,
+                'consecutive_failures': b.consecutive_failures,
+                **b.client.stats(),
+            } for b in self.backends]
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_backend_router():
+    """settings.COMFYUI_BACKENDS로 구성된 프로세스 전역 백엔드 라우터를 반환합니다."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                from django.conf import settings
+                hosts = getattr(settings, 'COMFYUI_BACKENDS', None) or [settings.COMFYUI_API_URL]
+                _router = ComfyBackendRouter(
+                    [get_comfy_client(host) for host in hosts],
+                    probe_interval=getattr(settings, 'COMFYUI_BACKEND_PROBE_INTERVAL', 5.0),
+                    affinity_slack=getattr(settings, 'COMFYUI_BACKEND_AFFINITY_SLACK', 2),
+                )
+    return _router
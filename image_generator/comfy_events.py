@@ -0,0 +1,305 @@
+# image_generator/comfy_events.py
+
+import asyncio
+import json
+import logging
+import struct
+import threading
+from collections import OrderedDict
+
+try:
+    import websocket # websocket-client 패키지
+except ImportError: # pragma: no cover - websocket-client가 없으면 폴링만 사용합니다.
+    websocket = None
+
+logger = logging.getLogger(__name__)
+
+# 완료된 프롬프트 결과를 보관하는 최대 개수
+# (웹소켓 이벤트가 /prompt 응답보다 먼저 도착하는 경우를 대비합니다.)
+FINISHED_PROMPTS_MAX = 256
+
+# 재연결 대기 시간 (초, 지수 백오프 최대값)
+RECONNECT_DELAY_MIN = 1.0
+RECONNECT_DELAY_MAX = 30.0
+
+# ComfyUI 바이너리 웹소켓 메시지 종류 (앞 4바이트, big-endian)
+BINARY_PREVIEW_IMAGE = 1
+BINARY_PREVIEW_IMAGE_WITH_METADATA = 4
+# 미리보기 이미지 형식 (BINARY_PREVIEW_IMAGE의 다음 4바이트)
+PREVIEW_IMAGE_TYPES = {1: 'image/jpeg', 2: 'image/png'}
+
+# 진행 이벤트 구독자: callback(host, prompt_id, event_type, data). 웹소켓 수신 스레드에서 호출됩니다.
+_observers = []
+
+
+def add_event_observer(callback):
+    """
+    모든 리스너가 받은 실행 이벤트(progress, executing, executed, execution_start 등)와
+    미리보기('preview', data={'mime': ..., 'image': bytes})를 전달받을 콜백을 등록합니다.
+    콜백은 수신 스레드에서 호출되므로 빨리 반환해야 합니다.
+    """
+    if callback not in _observers:
+        _observers.append(callback)
+
+
+def remove_event_observer(callback):
+    if callback in _observers:
+        _observers.remove(callback)
+
+
+class ComfyEventStreamDisconnected(ConnectionError):
+    """웹소켓 연결이 없거나 대기 중에 끊어졌을 때 발생합니다. 호출자는 /history 폴링으로 전환해야 합니다."""
+
+
+class ComfyExecutionError(RuntimeError):
+    """ComfyUI가 프롬프트 실행 중 오류(execution_error/execution_interrupted)를 보고했을 때 발생합니다."""
+
+
+def _resolve_future(future, result=None, exception=None):
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+class ComfyEventListener:
+    """
+    프로세스당 하나의 ComfyUI /ws 웹소켓 연결을 유지하는 이벤트 리스너입니다.
+    백그라운드 스레드에서 이벤트를 받아 prompt_id별 asyncio future로 전달하므로,
+    동시에 실행 중인 여러 생성 작업이 하나의 연결을 공유합니다.
+    """
+
+    def __init__(self, host, client_id):
+        """
+        :param host: ComfyUI 서버의 주소 (예: "http://127.0.0.1:8188")
+        :param client_id: /prompt 요청에 함께 보내는 클라이언트 ID (ComfyAPIClient.client_id)
+        """
+        self.host = host.rstrip('/')
+        self.client_id = client_id
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._connected = threading.Event()
+        self._ws = None
+        # prompt_id -> [(loop, future), ...]
+        self._waiters = {}
+        # prompt_id -> {node_id: output} (실행 중 'executed' 이벤트로 받은 출력)
+        self._outputs = {}
+        # prompt_id -> (outputs, exception)
+        self._finished = OrderedDict()
+        # 지금 실행 중인 prompt_id (prompt_id가 없는 바이너리 미리보기를 연결하는 데 사용)
+        self._current_prompt = None
+
+    @property
+    def ws_url(self):
+        if self.host.startswith('https://'):
+            base = 'wss://' + self.host[len('https://'):]
+        elif self.host.startswith('http://'):
+            base = 'ws://' + self.host[len('http://'):]
+        else:
+            base = 'ws://' + self.host
+        return f"{base}/ws?clientId={self.client_id}"
+
+    @property
+    def available(self):
+        return websocket is not None
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def start(self):
+        """백그라운드 수신 스레드를 시작합니다. 이미 실행 중이면 아무것도 하지 않습니다."""
+        if websocket is None:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='comfyui-ws-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def wait_until_connected(self, timeout):
+        """연결될 때까지 최대 timeout초 동안 (동기적으로) 기다립니다."""
+        return self._connected.wait(timeout)
+
+    async def wait_for_completion(self, prompt_id, timeout=None):
+        """
+        prompt_id의 실행이 끝날 때까지 기다립니다.
+        :return: 실행 중 'executed' 이벤트로 수집된 출력 딕셔너리 {node_id: output}. 비어 있을 수 있습니다.
+        :raises ComfyEventStreamDisconnected: 연결이 없거나 대기 중 끊어진 경우
+        :raises ComfyExecutionError: ComfyUI가 실행 오류를 보고한 경우
+        :raises asyncio.TimeoutError: timeout 안에 완료되지 않은 경우
+        """
+        prompt_id = str(prompt_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if prompt_id in self._finished:
+                outputs, exception = self._finished[prompt_id]
+                if exception is not None:
+                    raise exception
+                return outputs
+            if not self._connected.is_set():
+                raise ComfyEventStreamDisconnected("ComfyUI websocket is not connected.")
+            self._waiters.setdefault(prompt_id, []).append((loop, future))
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(prompt_id)
+                if waiters:
+                    waiters[:] = [(l, f) for l, f in waiters if f is not future]
+                    if not waiters:
+                        del self._waiters[prompt_id]
+
+    # --- 백그라운드 스레드 ---
+
+    def _run(self):
+        delay = RECONNECT_DELAY_MIN
+        while not self._stop.is_set():
+            try:
+                self._ws = websocket.create_connection(self.ws_url, timeout=10)
+                self._ws.settimeout(None)
+                self._connected.set()
+                delay = RECONNECT_DELAY_MIN
+                logger.info(f"Connected to ComfyUI websocket: {self.ws_url}")
+                while not self._stop.is_set():
+                    message = self._ws.recv()
+                    if isinstance(message, str):
+                        self._handle_message(message)
+                    elif message and _observers:
+                        self._handle_binary(message)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"ComfyUI websocket disconnected ({e}); falling back to /history polling, "
+                                   f"reconnecting in {delay:.0f}s.")
+            finally:
+                self._on_disconnect()
+            self._stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def _on_disconnect(self):
+        self._connected.clear()
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        # 대기 중인 작업은 모두 폴링으로 전환하도록 알립니다.
+        with self._lock:
+            waiters, self._waiters = self._waiters, {}
+            self._outputs.clear()
+        for prompt_waiters in waiters.values():
+            for loop, future in prompt_waiters:
+                exc = ComfyEventStreamDisconnected("ComfyUI websocket disconnected while waiting.")
+                loop.call_soon_threadsafe(_resolve_future, future, None, exc)
+
+    def _handle_message(self, message):
+        try:
+            event = json.loads(message)
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring non-JSON ComfyUI websocket message: {message[:200]}")
+            return
+        event_type = event.get('type')
+        data = event.get('data') or {}
+        prompt_id = data.get('prompt_id')
+        if prompt_id is None:
+            return
+        prompt_id = str(prompt_id)
+        if event_type == 'execution_start' or (event_type == 'executing' and data.get('node') is not None):
+            self._current_prompt = prompt_id
+        self._notify(prompt_id, event_type, data)
+
+        if event_type == 'executed':
+            node_id = data.get('node')
+            if node_id is not None and data.get('output'):
+                with self._lock:
+                    self._outputs.setdefault(prompt_id, {})[str(node_id)] = data['output']
+        elif event_type == 'executing' and data.get('node') is None:
+            # node가 None인 executing 이벤트는 프롬프트 실행 완료를 의미합니다.
+            self._finish(prompt_id)
+        elif event_type == 'execution_success':
+            self._finish(prompt_id)
+        elif event_type in ('execution_error', 'execution_interrupted'):
+            detail = data.get('exception_message') or event_type
+            self._finish(prompt_id, ComfyExecutionError(f"ComfyUI prompt {prompt_id} failed: {detail}"))
+
+    def _handle_binary(self, message):
+        """잠재 공간 미리보기(바이너리 메시지)를 구독자에게 전달합니다."""
+        if len(message) < 8:
+            return
+        message_type = struct.unpack('>I', message[:4])[0]
+        if message_type == BINARY_PREVIEW_IMAGE:
+            mime = PREVIEW_IMAGE_TYPES.get(struct.unpack('>I', message[4:8])[0], 'image/jpeg')
+            prompt_id, image = self._current_prompt, message[8:]
+        elif message_type == BINARY_PREVIEW_IMAGE_WITH_METADATA:
+            length = struct.unpack('>I', message[4:8])[0]
+            try:
+                metadata = json.loads(message[8:8 + length])
+            except ValueError:
+                return
+            prompt_id = metadata.get('prompt_id') or self._current_prompt
+            mime, image = metadata.get('image_type', 'image/jpeg'), message[8 + length:]
+        else:
+            return
+        if prompt_id is not None:
+            self._notify(str(prompt_id), 'preview', {'mime': mime, 'image': image})
+
+    def _notify(self, prompt_id, event_type, data):
+        for callback in list(_observers):
+            try:
+                callback(self.host, prompt_id, event_type, data)
+            except Exception:
+                logger.exception(f"ComfyUI event observer failed for {event_type} event.")
+
+    def _finish(self, prompt_id, exception=None):
+        if self._current_prompt == prompt_id:
+            self._current_prompt = None
+        with self._lock:
+            if prompt_id in self._finished:
+                return
+            outputs = self._outputs.pop(prompt_id, {})
+            self._finished[prompt_id] = (outputs, exception)
+            while len(self._finished) > FINISHED_PROMPTS_MAX:
+                self._finished.popitem(last=False)
+            waiters = self._waiters.pop(prompt_id, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve_future, future, outputs, exception)
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def get_event_listener(client=None):
+    """
+    ComfyUI 서버별 프로세스 전역 이벤트 리스너를 반환합니다 (처음 호출 시 연결을 시작합니다).
+    공유 ComfyAPIClient의 client_id로 구독하므로, /prompt 요청에도 같은 client_id를 보내야 합니다.
+    :param client: 구독할 서버의 ComfyAPIClient. 지정하지 않으면 기본 서버의 공유 클라이언트를 사용합니다.
+    """
+    if client is None:
+        from .comfy_api_client import get_comfy_client
+        client = get_comfy_client()
+    listener = _listeners.get(client.host)
+    if listener is None:
+        with _listeners_lock:
+            listener = _listeners.get(client.host)
+            if listener is None:
+                listener = ComfyEventListener(client.host, client.client_id)
+                _listeners[client.host] = listener
+    listener.start()
+    return listener
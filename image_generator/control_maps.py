@@ -0,0 +1,140 @@
+# image_generator/control_maps.py
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .result_cache import compute_request_hash
+
+logger = logging.getLogger(__name__)
+
+
+def _is_link(value):
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[1], int)
+
+
+class ControlMapCache:
+    """
+    ControlNet 전처리기(Canny, LineArt, MiDaS 깊이, 밝기 등)의 출력 맵을 입력 이미지 해시 + 전처리기 설정으로 보관하는 캐시입니다.
+    같은 사진에 프롬프트만 바꿔 다시 생성할 때 ComfyUI가 전처리를 다시 하지 않고 저장된 맵을 LoadImage로 읽게 합니다.
+    맵은 Django 스토리지의 directory 아래 <key>.png 파일로 저장되므로 프로세스가 다시 시작되어도 재사용되며,
+    max_entries를 넘으면 가장 오래 사용되지 않은(수정 시각 기준) 파일부터 지웁니다.
+    """
+
+    def __init__(self, directory='controlnet_maps', max_entries=512):
+        """
+        :param directory: 맵 파일을 저장할 스토리지 디렉토리 (MEDIA_ROOT 기준)
+        :param max_entries: 보관할 최대 맵 수 (0이면 캐시 사용 안 함)
+        """
+        self.directory = directory.strip('/')
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key_for(input_key, node):
+        """입력 이미지 해시와 전처리기 노드(class_type, 링크가 아닌 입력값)로 맵 키를 만듭니다."""
+        return compute_request_hash(
+            input_image=input_key,
+            preprocessor=node['class_type'],
+            settings={name: value for name, value in node.get('inputs', {}).items() if not _is_link(value)},
+        )
+
+    def path_for(self, key):
+        return default_storage.path(f"{self.directory}/{key}.png")
+
+    def get(self, key):
+        """
+        캐시된 맵 이미지의 바이트를 반환합니다. 없으면 None을 반환합니다.
+        (블로킹 파일 읽기이므로 이벤트 루프에서는 asyncio.to_thread로 호출하세요.)
+        """
+        if not self.enabled:
+            return None
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path) # LRU 순서 갱신
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key, source_path):
+        """
+        다운로드한 맵 파일(source_path, 캐시 디렉토리와 같은 파일시스템)을 캐시에 넣습니다. 원본 파일은 옮겨집니다.
+        (블로킹 파일시스템 호출이므로 이벤트 루프에서는 asyncio.to_thread로 호출하세요.)
+        """
+        if not self.enabled:
+            os.remove(source_path)
+            return
+        target_path = self.path_for(key)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        os.chmod(source_path, default_storage.file_permissions_mode or 0o644)
+        # 같은 키는 같은 내용이므로 동시에 저장되어도 덮어쓰면 됩니다.
+        os.replace(source_path, target_path)
+        with self._lock:
+            self.stored += 1
+        self._trim()
+
+    def _trim(self):
+        directory = os.path.dirname(self.path_for('x'))
+        try:
+            entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.png')]
+        except FileNotFoundError:
+            return
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.evictions += 1
+        logger.info(f"Evicted {excess} ControlNet preprocessor map(s) from {directory}.")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'stored': self.stored,
+                'evictions': self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_control_map_cache():
+    """ControlNet 전처리 맵 캐시를 반환합니다 (settings.COMFYUI_CONTROLNET_MAP_CACHE_DIR, COMFYUI_CONTROLNET_MAP_CACHE_MAX_ENTRIES)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ControlMapCache(
+                    directory=getattr(settings, 'COMFYUI_CONTROLNET_MAP_CACHE_DIR', 'controlnet_maps'),
+                    max_entries=getattr(settings, 'COMFYUI_CONTROLNET_MAP_CACHE_MAX_ENTRIES', 512),
+                )
+    return _cache
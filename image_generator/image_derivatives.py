@@ -0,0 +1,141 @@
+# image_generator/image_derivatives.py
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from PIL import Image
+
+from .models import GeneratedImage
+
+logger = logging.getLogger(__name__)
+
+# 원본 이미지를 그대로 돌려줄 때 쓰는 크기 이름 (api_get_images?size=original)
+ORIGINAL_SIZE = 'original'
+
+
+def derivative_sizes():
+    """파생 이미지 이름 -> 긴 변 최대 크기(픽셀, None이면 원본 크기)를 반환합니다 (settings.IMAGE_DERIVATIVE_SIZES)."""
+    return getattr(settings, 'IMAGE_DERIVATIVE_SIZES', {'thumb': 320, 'medium': 1024, 'full': None})
+
+
+def derivative_name(source_name, size, max_side):
+    """
+    원본 스토리지 이름에 대한 파생 이미지의 스토리지 이름을 반환합니다.
+    디렉터리에 최대 크기를 넣어 IMAGE_DERIVATIVE_SIZES를 바꾸면 새 파일을 만들고, 같은 설정이면 항상 같은 이름이 나옵니다.
+    """
+    directory = getattr(settings, 'IMAGE_DERIVATIVE_DIR', 'derivatives')
+    stem = os.path.splitext(source_name)[0]
+    return f"{directory}/{size}_{max_side or 'full'}/{stem}.webp"
+
+
+def build_derivatives(media_root, source_name, targets, quality=80):
+    """
+    원본 이미지를 한 번 디코딩해 targets의 각 크기로 WebP 파생 이미지를 만들고 크기 정보를 반환합니다.
+    원본보다 새로운 파생 이미지가 이미 있으면 다시 만들지 않으므로 여러 번(동시에) 호출해도 결과가 같습니다.
+    파일은 임시 이름으로 쓴 뒤 os.replace로 바꾸므로 읽는 쪽이 덜 쓰인 파일을 보지 않습니다.
+    (Django 설정에 의존하지 않는 CPU 작업이며, 프로세스 풀에서 실행됩니다.)
+    :param targets: [(크기 이름, 긴 변 최대 크기 또는 None, 파생 이미지 스토리지 이름), ...]
+    :return: {'width', 'height', 'derivatives': {크기 이름: {'name', 'width', 'height', 'bytes'}}}
+    :raises OSError: 원본 파일이 없거나 이미지로 읽을 수 없는 경우
+    """
+    source_path = os.path.join(media_root, source_name)
+    source_mtime = os.path.getmtime(source_path)
+    result = {'derivatives': {}}
+    with Image.open(source_path) as image:
+        result['width'], result['height'] = image.size
+        for size, max_side, name in targets:
+            path = os.path.join(media_root, name)
+            if os.path.exists(path) and os.path.getmtime(path) >= source_mtime:
+                with Image.open(path) as existing:
+                    width, height = existing.size
+            else:
+                variant = image.copy()
+                if max_side and max(variant.size) > max_side:
+                    variant.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                if variant.mode not in ('RGB', 'RGBA'):
+                    variant = variant.convert('RGBA' if 'transparency' in variant.info or variant.mode in ('LA', 'PA') else 'RGB')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                variant.save(temp_path, format='WEBP', quality=quality, method=4)
+                os.replace(temp_path, path)
+                width, height = variant.size
+            result['derivatives'][size] = {'name': name, 'width': width, 'height': height, 'bytes': os.path.getsize(path)}
+    return result
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = {} # 원본 스토리지 이름 -> concurrent.futures.Future (같은 이미지를 동시에 두 번 만들지 않습니다)
+_in_flight_lock = threading.Lock()
+
+
+def get_derivative_executor():
+    """
+    파생 이미지 생성 전용 프로세스 풀을 반환합니다 (settings.IMAGE_DERIVATIVE_WORKERS).
+    큰 PNG 디코딩과 WebP 인코딩은 CPU를 오래 쓰므로 웹 서버 프로세스와 분리된 프로세스에서 실행합니다.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2))
+    return _executor
+
+
+def _submit(source_name, targets, quality):
+    executor = get_derivative_executor()
+    with _in_flight_lock:
+        future = _in_flight.get(source_name)
+        if future is None:
+            future = executor.submit(build_derivatives, os.path.abspath(settings.MEDIA_ROOT), source_name, targets, quality)
+            _in_flight[source_name] = future
+    # 이미 끝난 작업이면 콜백이 바로 실행되므로 잠금 밖에서 등록합니다.
+    future.add_done_callback(lambda f: _discard_in_flight(source_name, f))
+    return future
+
+
+def _discard_in_flight(source_name, future):
+    with _in_flight_lock:
+        if _in_flight.get(source_name) is future:
+            del _in_flight[source_name]
+
+
+def _is_current(image, targets):
+    if not image.width or not image.height:
+        return False
+    derivatives = image.derivatives or {}
+    for size, _, name in targets:
+        if (derivatives.get(size) or {}).get('name') != name:
+            return False
+    return True
+
+
+async def ensure_derivatives(image):
+    """
+    GeneratedImage의 파생 이미지가 현재 설정대로 있는지 확인하고, 없으면 프로세스 풀에서 만든 뒤
+    원본/파생 이미지 크기를 GeneratedImage(width, height, derivatives)에 저장합니다.
+    :return: image.derivatives (실패하면 빈 dict. 호출자는 원본을 사용합니다)
+    """
+    source_name = image.image_file.name
+    if not source_name:
+        return {}
+    targets = [(size, max_side, derivative_name(source_name, size, max_side)) for size, max_side in derivative_sizes().items()]
+    if _is_current(image, targets):
+        return image.derivatives
+    quality = getattr(settings, 'IMAGE_DERIVATIVE_WEBP_QUALITY', 80)
+    try:
+        result = await asyncio.wrap_future(_submit(source_name, targets, quality))
+    except Exception as e: # 원본 파일 없음, 손상된 이미지 등
+        logger.warning(f"Could not build derivatives for {source_name}: {e}")
+        return {}
+    image.width, image.height, image.derivatives = result['width'], result['height'], result['derivatives']
+    await sync_to_async(GeneratedImage.objects.filter(pk=image.pk).update)(
+        width=image.width, height=image.height, derivatives=image.derivatives)
+    logger.info(f"Built derivatives for {source_name}: " + ', '.join(
+        f"{size} {d['width']}x{d['height']} ({d['bytes'] / 1024:.0f} KB)" for size, d in image.derivatives.items()))
+    return image.derivatives
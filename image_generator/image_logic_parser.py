@@ -1,12 +1,15 @@
 import json
 import time
-import httpx
 import random
 import traceback
 import logging
 import os
+import errno
 import uuid # uuid 모듈 임포트 추가
+import hashlib # 입력 이미지 해시 계산
+import unicodedata # 단일 실행(single-flight) 키 정규화
 import base64 # Base64 인코딩/디코딩을 위해 임포트
+from collections import Counter
 from django.conf import settings # settings를 참조하기 위해 추가
 import asyncio # asyncio를 사용하고 있습니다.
 from django.core.files.base import ContentFile # 파일을 저장하기 위해 임포트
@@ -18,22 +21,395 @@ from llm_cores.negative_prompts import NEGATIVE_PROMPT_MAP
 from llm_cores.positive_prompts import POSITIVE_PROMPT_MAP
 # [수정] Ollama 번역 함수 대신 기존 translation_service의 translate_text 함수 임포트
 from llm_cores.translation_service import translate_text 
+from .comfy_api_client import CircuitOpenError, ComfyAPIError
+from .cancellation import get_job_tracker
+from .comfy_backends import NoHealthyBackendError, get_backend_router
+from .comfy_events import get_event_listener, ComfyEventStreamDisconnected
+from .control_maps import get_control_map_cache
+from .output_codec import get_output_codec
+from .output_storage import commit_file, resolve_shared_output, storage_name
+from .progress import get_progress_hub
+from .result_cache import compute_request_hash, get_result_cache, seed_from_hash
+from .scheduler import GenerationQueueFull, get_generation_scheduler
+from .single_flight import get_single_flight
+from .workflow_templates import get_workflow_registry, control_map_output_id, TEXT_TO_IMAGE_WORKFLOW, IMAGE_TO_IMAGE_WORKFLOW, CONTROLNET_WORKFLOW
 
 logger = logging.getLogger(__name__)
 
-# JSON 파일들이 위치한 디렉토리 경로 (프로젝트 루트 기준으로 설정)
 BASE_DIR = settings.BASE_DIR
-JSON_DEFINITIONS_DIR = os.path.join(BASE_DIR, 'comfyui_workflows')
 
 # ComfyUI API 호출 설정 (settings에서 직접 가져옴)
 COMFYUI_API_URL = settings.COMFYUI_API_URL
 COMFYUI_HISTORY_URL = settings.COMFYUI_HISTORY_URL
 COMFYUI_IMAGE_URL = settings.COMFYUI_IMAGE_URL
 COMFYUI_INPUT_DIR = getattr(settings, 'COMFYUI_INPUT_DIR', os.path.join(BASE_DIR, 'comfyui_input'))
+# 웹소켓(/ws) 완료 이벤트 사용 여부 및 이벤트 대기 중 /history 재확인 간격 (초)
+COMFYUI_USE_WEBSOCKET = getattr(settings, 'COMFYUI_USE_WEBSOCKET', True)
+COMFYUI_WS_HISTORY_RECHECK_INTERVAL = getattr(settings, 'COMFYUI_WS_HISTORY_RECHECK_INTERVAL', 30)
+# i2i 입력 이미지를 /upload/image로 업로드할지 여부 (None이면 백엔드가 여러 대일 때만 업로드)
+COMFYUI_UPLOAD_INPUTS = getattr(settings, 'COMFYUI_UPLOAD_INPUTS', None)
+# 요청 해시에서 시드를 정하는 결정적 모드 기본값 (요청별로 deterministic 인자로 덮어쓸 수 있습니다)
+COMFYUI_DETERMINISTIC_SEED = getattr(settings, 'COMFYUI_DETERMINISTIC_SEED', False)
+# ComfyUI와 같은 파일시스템을 쓰는 경우 백엔드 주소 -> ComfyUI output 디렉토리 (HTTP 대신 하드링크/rename으로 가져옴)
+COMFYUI_SHARED_OUTPUT_DIRS = {
+    host.rstrip('/'): path for host, path in (getattr(settings, 'COMFYUI_SHARED_OUTPUT_DIRS', None) or {}).items()
+}
+# 'link': 하드링크 (ComfyUI output에도 남음), 'move': rename (ComfyUI output에서 옮김)
+COMFYUI_SHARED_OUTPUT_MODE = getattr(settings, 'COMFYUI_SHARED_OUTPUT_MODE', 'link')
+# 동시에 들어온 동일 요청을 하나의 ComfyUI 작업으로 합칠지 여부
+COMFYUI_SINGLE_FLIGHT = getattr(settings, 'COMFYUI_SINGLE_FLIGHT', True)
+# 취소된 작업을 ComfyUI 대기열에서 제거(/queue, /interrupt)할 때 기다리는 최대 시간 (초)
+COMFYUI_CANCEL_TIMEOUT = getattr(settings, 'COMFYUI_CANCEL_TIMEOUT', 5)
+
+# 입력 이미지로 latent를 만드는 워크플로우(ControlNet 등)에 넣을 입력 이미지의 최대 크기 (긴 변, 픽셀)
+COMFYUI_INPUT_IMAGE_MAX_SIDE = getattr(settings, 'COMFYUI_INPUT_IMAGE_MAX_SIDE', 1024)
+
+# 생성 방식: 'default'는 입력 이미지가 있으면 i2i(IPAdapter), 없으면 t2i,
+# 'controlnet'은 입력 이미지의 Canny/LineArt/깊이/밝기 맵으로 구도를 유지하는 i2i_controlnet 워크플로우를 사용합니다.
+GENERATION_MODE_DEFAULT = 'default'
+GENERATION_MODE_CONTROLNET = 'controlnet'
+GENERATION_MODES = (GENERATION_MODE_DEFAULT, GENERATION_MODE_CONTROLNET)
+
+# 진행 중인 작업이 사용하는 입력 이미지 (input_key -> 작업 수)
+_inputs_in_use = Counter()
+
+
+def input_image_max_side(generation_mode=GENERATION_MODE_DEFAULT):
+    """
+    generation_mode에서 입력 이미지를 받는 워크플로우가 실제로 쓰는 최대 해상도(긴 변, 픽셀)를 반환합니다.
+    업로드된 이미지를 이 크기로 줄여 두면 복사/업로드 비용이 줄고 결과는 같습니다.
+    """
+    json_file_name = CONTROLNET_WORKFLOW if generation_mode == GENERATION_MODE_CONTROLNET else IMAGE_TO_IMAGE_WORKFLOW
+    return get_workflow_registry().get(json_file_name).input_resolution or COMFYUI_INPUT_IMAGE_MAX_SIDE
+
+
+def _has_images(outputs):
+    return bool(outputs) and any('images' in output for output in outputs.values())
+
+
+async def _fetch_history_outputs(client, prompt_id):
+    """/history에서 prompt_id의 출력을 조회합니다. 아직 기록이 없으면 None을 반환합니다."""
+    history_data = await client.get_history(prompt_id)
+
+    if 'history' in history_data and str(prompt_id) in history_data['history']:
+        return history_data['history'][str(prompt_id)]['outputs']
+    elif str(prompt_id) in history_data:
+        return history_data[str(prompt_id)]['outputs']
+    return None
+
+
+async def _wait_for_outputs(client, prompt_id):
+    """
+    ComfyUI 작업이 끝날 때까지 기다린 뒤 출력 딕셔너리({node_id: output})를 반환합니다.
+    해당 서버의 공유 웹소켓 리스너 완료 이벤트를 기다리고, 연결이 끊겨 있으면 1초 간격 /history 폴링으로 대체합니다.
+    """
+    listener = get_event_listener(client) if COMFYUI_USE_WEBSOCKET else None
+
+    while True:
+        timed_out = False
+        if listener is not None and listener.connected:
+            try:
+                outputs = await listener.wait_for_completion(prompt_id, timeout=COMFYUI_WS_HISTORY_RECHECK_INTERVAL)
+                if _has_images(outputs):
+                    return outputs
+            except asyncio.TimeoutError:
+                # 이벤트를 놓쳤을 경우에 대비해 주기적으로 /history를 확인합니다.
+                timed_out = True
+            except ComfyEventStreamDisconnected:
+                logger.info(f"Websocket unavailable while waiting for prompt {prompt_id}; polling /history.")
+
+        outputs = await _fetch_history_outputs(client, prompt_id)
+        if _has_images(outputs):
+            return outputs
+        if not timed_out:
+            await asyncio.sleep(1) # 1초 대기 후 다시 확인
+
+
+def _collect_images(outputs):
+    """
+    출력 딕셔너리에서 모든 이미지 정보를 노드 순서대로 모읍니다.
+    SaveImage가 저장한 'output' 타입 이미지를 우선하고, 없으면 미리보기(temp) 이미지를 사용합니다.
+    """
+    images = [image for output in outputs.values() for image in output.get('images', [])]
+    saved = [image for image in images if image.get('type') == 'output']
+    return saved or images
+
+
+async def _get_cached_result(request_hash):
+    """캐시된 생성 결과를 반환합니다. 가리키는 파일이 하나라도 사라졌으면 항목을 버리고 None을 반환합니다."""
+    cache = get_result_cache()
+    result = cache.get(request_hash)
+    if result is None:
+        return None
+    # [수정] 파일 확인은 블로킹 I/O이므로 워커 풀의 이벤트 루프(다른 작업과 공유)를 막지 않도록 스레드에서 실행합니다.
+    exists = await asyncio.to_thread(lambda: all(default_storage.exists(name) for name in result['image_names']))
+    if not exists:
+        logger.info(f"Cached result {request_hash[:12]} points to missing files; regenerating.")
+        cache.invalidate(request_hash)
+        return None
+    return {**result, 'cached': True}
+
+
+# 공유 파일시스템 설정이 있지만 Django 스토리지와 다른 장치여서 HTTP로만 받아야 하는 백엔드
+_cross_device_hosts = set()
+
+
+async def _handoff_shared_output(backend, image_info, name):
+    """
+    공유 파일시스템 모드: ComfyUI output 파일을 내용 복사 없이 하드링크/rename으로 스토리지에 넣습니다.
+    :return: 저장된 스토리지 이름. 공유 모드가 아니거나 불가능하면 None (호출자는 HTTP로 받습니다).
+    """
+    output_root = COMFYUI_SHARED_OUTPUT_DIRS.get(backend.host)
+    if output_root is None or backend.host in _cross_device_hosts:
+        return None
+    source_path = await asyncio.to_thread(
+        resolve_shared_output, output_root, image_info['filename'], image_info['subfolder'], image_info['type'])
+    if source_path is None:
+        logger.info(f"{image_info['filename']} not found under shared ComfyUI output {output_root}; downloading over HTTP.")
+        return None
+    try:
+        return await asyncio.to_thread(commit_file, source_path, name, COMFYUI_SHARED_OUTPUT_MODE != 'move')
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            _cross_device_hosts.add(backend.host)
+            logger.warning(f"ComfyUI output {output_root} is on a different device from Django media; "
+                           f"using HTTP downloads for {backend.host}.")
+        else:
+            logger.warning(f"Shared-filesystem handoff of {source_path} failed ({e}); downloading over HTTP.")
+        return None
+
+
+async def _download_output(backend, image_info):
+    """
+    ComfyUI 출력 이미지 하나를 COMFYUI_OUTPUT_DIR에 저장하고 저장된 스토리지 이름을 반환합니다.
+    공유 파일시스템 모드면 하드링크/rename으로, 아니면 /view를 스트리밍 다운로드합니다.
+    """
+    name = storage_name(os.path.join(settings.COMFYUI_OUTPUT_DIR, image_info['subfolder'], image_info['filename']))
+    # default_storage.path()는 MEDIA_ROOT 밖을 가리키는 이름(../ 등)을 거부하므로 다운로드 전에 경로를 검증합니다.
+    target_path = default_storage.path(name)
+    saved_name = await _handoff_shared_output(backend, image_info, name)
+    if saved_name is not None:
+        return saved_name
+
+    temp_path = await backend.client.download_image(
+        image_info['filename'], image_info['subfolder'], image_info['type'], os.path.dirname(target_path))
+    try:
+        return await asyncio.to_thread(commit_file, temp_path, name)
+    except BaseException:
+        await asyncio.shield(asyncio.to_thread(_discard_temp_file, temp_path))
+        raise
+
+
+async def _prepare_input_image(backend, image_content, input_key, file_extension, upload):
+    """
+    i2i 입력 이미지를 백엔드가 읽을 수 있는 곳에 두고, LoadImage 노드에 넣을 파일 이름을 반환합니다.
+    파일 이름은 내용 해시로 정하므로 같은 이미지는 다시 복사/업로드하지 않습니다.
+    :param upload: True면 /upload/image로 업로드하고, False면 공유 COMFYUI_INPUT_DIR에 복사합니다.
+    """
+    input_filename = backend.get_input(input_key)
+    if upload:
+        if input_filename is None:
+            result = await backend.client.upload_image_data(f"input_{input_key[:32]}{file_extension}", image_content)
+            input_filename = f"{result['subfolder']}/{result['name']}" if result.get('subfolder') else result['name']
+            backend.remember_input(input_key, input_filename)
+            logger.info(f"Uploaded image to ComfyUI backend {backend.host} as {input_filename}")
+        return input_filename
+
+    # [수정] 파일 복사는 블로킹 I/O이므로 스레드에서 실행합니다.
+    input_filename = await asyncio.to_thread(_copy_input_image, f"input_{input_key[:32]}{file_extension}", image_content)
+    backend.remember_input(input_key, input_filename)
+    return input_filename
+
+
+def _copy_input_image(input_filename, image_content):
+    """업로드된 이미지 파일을 ComfyUI input 디렉토리에 저장하고 파일 이름을 반환합니다 (이미 같은 내용의 파일이 있으면 재사용)."""
+    comfyui_target_path = os.path.join(settings.COMFYUI_INPUT_DIR, input_filename)
+    if not os.path.exists(comfyui_target_path):
+        # ComfyUI input 디렉토리에 ContentFile로 저장
+        saved_input_file_name = default_storage.save(storage_name(comfyui_target_path), ContentFile(image_content))
+        logger.info(f"Uploaded image copied to ComfyUI input: {default_storage.path(saved_input_file_name)}")
+        return os.path.basename(saved_input_file_name)
+    # [추가] 재사용한 입력 사본의 수정 시각을 갱신해 미디어 정리(sweep_media)가 최근에 쓴 파일로 보게 합니다.
+    os.utime(comfyui_target_path)
+    return input_filename
+
+
+def _discard_temp_file(path):
+    """저장에 실패한 임시 다운로드 파일을 지웁니다 (asyncio.to_thread로 호출합니다)."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def _lookup_control_maps(template, input_key):
+    """
+    템플릿의 ControlNet 전처리기마다 같은 입력 이미지/설정의 맵이 캐시에 있는지 확인합니다.
+    :return: (cached, missing). cached는 {node_id: (map_key, 맵 이미지 바이트)}, missing은 {node_id: map_key}
+    """
+    cache = get_control_map_cache()
+    cached, missing = {}, {}
+    if not cache.enabled:
+        return cached, missing
+    for node_id in template.control_preprocessors:
+        map_key = cache.key_for(input_key, template.nodes[node_id])
+        content = await asyncio.to_thread(cache.get, map_key)
+        if content is not None:
+            cached[node_id] = (map_key, content)
+        else:
+            missing[node_id] = map_key
+    if cached:
+        logger.info(f"Reusing {len(cached)}/{len(template.control_preprocessors)} cached ControlNet preprocessor map(s).")
+    return cached, missing
+
+
+async def _store_control_maps(backend, outputs, capture_maps):
+    """
+    작업 출력에서 전처리기 맵(PreviewImage)을 받아 캐시에 저장합니다.
+    캐시 저장 실패는 생성 결과에 영향을 주지 않도록 기록만 합니다.
+    """
+    cache = get_control_map_cache()
+
+    async def store(node_id, map_key):
+        images = (outputs.get(control_map_output_id(node_id)) or {}).get('images') or []
+        if not images:
+            raise ValueError(f"no output for preprocessor node {node_id}")
+        info = images[0]
+        temp_path = await backend.client.download_image(
+            info['filename'], info['subfolder'], info['type'], os.path.dirname(cache.path_for(map_key)))
+        try:
+            await asyncio.to_thread(cache.put, map_key, temp_path)
+        except BaseException:
+            await asyncio.shield(asyncio.to_thread(_discard_temp_file, temp_path))
+            raise
+
+    results = await asyncio.gather(*(store(node_id, map_key) for node_id, map_key in capture_maps.items()), return_exceptions=True)
+    for node_id, result in zip(capture_maps, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not cache ControlNet preprocessor map of node {node_id}: {result!r}")
+
+
+def _should_upload_inputs(router):
+    return COMFYUI_UPLOAD_INPUTS if COMFYUI_UPLOAD_INPUTS is not None else len(router) > 1
+
+
+async def _cancel_comfy_job(backend, prompt_id):
+    """요청이 취소된 작업을 ComfyUI에서 제거합니다 (대기 중이면 /queue에서 삭제, 실행 중이면 /interrupt)."""
+    tracker = get_job_tracker()
+    try:
+        await asyncio.wait_for(tracker.cancel(backend.client, prompt_id), COMFYUI_CANCEL_TIMEOUT)
+    except Exception as e: # 정리 실패가 원래의 취소를 가리지 않도록 모든 오류를 기록만 합니다.
+        tracker.record_cancel_failure(prompt_id)
+        logger.warning(f"Could not cancel ComfyUI prompt {prompt_id} on {backend.host}: {e!r}")
+
+
+async def _remove_cancelled_input(backend, input_key):
+    """
+    취소된 작업을 위해 COMFYUI_INPUT_DIR에 복사해 둔 입력 이미지를 지웁니다. 같은 이미지를 쓰는 다른 작업이 없을 때만 호출합니다.
+    (/upload/image로 올린 파일은 ComfyUI 서버에 있으므로 지우지 않습니다.)
+    """
+    input_filename = backend.get_input(input_key)
+    if input_filename is None:
+        return
+    backend.forget_input(input_key)
+    input_path = os.path.join(settings.COMFYUI_INPUT_DIR, input_filename)
+    try:
+        await asyncio.to_thread(os.remove, input_path)
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        logger.warning(f"Could not remove input image {input_path} of cancelled job: {e}")
+        return
+    get_job_tracker().record_temp_files_removed()
+    logger.info(f"Removed input image {input_path} of cancelled job.")
+
+
+async def _submit_prompt(router, template, template_values, input_image_content=None, input_key=None, file_extension='',
+                         control_maps=None, capture_maps=()):
+    """
+    라우터가 고른 백엔드에 워크플로우를 제출합니다. 연결 오류가 나면 아직 시도하지 않은 백엔드로 다시 제출합니다.
+    :param control_maps: {전처리기 node_id: (map_key, 맵 이미지 바이트)}. 이 전처리기들은 캐시된 맵을 읽는 LoadImage로 바뀝니다.
+    :param capture_maps: 출력을 받아 캐시에 저장할 전처리기 node_id 목록
+    :return: (backend, prompt_id). 호출자는 작업이 끝나면 router.release(backend)를 호출해야 합니다.
+    """
+    upload = _should_upload_inputs(router)
+    tried = []
+    while True:
+        backend = router.acquire(input_key, exclude=tried, model_signature=template.model_signature)
+        try:
+            load_image = None
+            if input_image_content is not None:
+                load_image = await _prepare_input_image(backend, input_image_content, input_key, file_extension, upload)
+            # 템플릿 복사본에 패치 플랜대로 값 주입
+            json_data = template.instantiate(load_image=load_image, **template_values)
+            if control_maps or capture_maps:
+                # 캐시된 전처리 맵도 입력 이미지처럼 내용 해시 이름으로 백엔드에 한 번만 복사/업로드합니다.
+                map_files = {
+                    node_id: await _prepare_input_image(backend, content, map_key, '.png', upload)
+                    for node_id, (map_key, content) in (control_maps or {}).items()
+                }
+                template.apply_control_maps(json_data, map_files, capture=capture_maps)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Final JSON data to send to ComfyUI: {json.dumps(json_data, indent=2)}")
+            prompt_id = (await backend.client.queue_prompt(json_data))['prompt_id']
+        except ComfyAPIError as e:
+            router.release(backend) # 실패는 클라이언트의 회로 차단기에 이미 기록되었습니다.
+            tried.append(backend.host)
+            if e.status_code is None and len(tried) < len(router):
+                logger.warning(f"Submitting to ComfyUI backend {backend.host} failed ({e}); trying another backend.")
+                continue
+            raise
+        except BaseException:
+            router.release(backend)
+            raise
+        logger.info(f"ComfyUI prompt submitted to {backend.host}, ID: {prompt_id}")
+        return backend, prompt_id
+
+
+def select_workflow(generation_mode, has_input_image):
+    """생성 방식과 입력 이미지 유무로 사용할 워크플로우 파일 이름을 고릅니다."""
+    if generation_mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode: {generation_mode!r}")
+    if generation_mode == GENERATION_MODE_CONTROLNET:
+        # [추가] ControlNet 모드: 입력 이미지의 윤곽/선화/깊이/밝기 맵으로 구도를 유지합니다.
+        if not has_input_image:
+            raise ValueError("ControlNet generation mode requires an input image.")
+        return CONTROLNET_WORKFLOW
+    return IMAGE_TO_IMAGE_WORKFLOW if has_input_image else TEXT_TO_IMAGE_WORKFLOW
+
+
+def model_signature_for(generation_mode, has_input_image):
+    """
+    [추가] 작업이 사용할 모델 시그니처를 반환합니다 (생성 워커 풀이 대기 작업을 모델별로 묶는 데 사용합니다).
+    워크플로우를 고를 수 없으면 None(어떤 모델과도 묶임)을 반환하고, 오류는 생성 단계에서 보고됩니다.
+    """
+    try:
+        return get_workflow_registry().get(select_workflow(generation_mode, has_input_image)).model_signature
+    except (ValueError, FileNotFoundError):
+        return None
+
+
+def read_input_image(uploaded_image_path):
+    """
+    업로드된 입력 이미지를 읽어 (내용, sha256 해시)를 반환합니다. 블로킹 I/O이므로 asyncio.to_thread로 호출합니다.
+    해시는 단일 실행 키, 결과 캐시 키, 백엔드 선택에 함께 쓰이므로 요청마다 한 번만 계산해 넘겨줍니다.
+    """
+    with default_storage.open(uploaded_image_path, 'rb') as f:
+        content = f.read()
+    return content, hashlib.sha256(content).hexdigest()
 
 
 # [수정] generate_image_based_on_json_logic 함수의 매개변수 이름을 'uploaded_image_path'로 명확히 일치시켰습니다.
-async def generate_image_based_on_json_logic(user_input, uploaded_image_path, mode, positive_categories, negative_categories):
+def translate_prompt(user_input):
+    """사용자 입력을 영어로 번역합니다. 번역에 실패하면 원문을 그대로 사용합니다 (블로킹 함수입니다)."""
+    # 사용자 입력(user_input)을 기존 translation_service를 사용하여 영어로 번역
+    translated_user_input = translate_text(user_input, source_lang='ko', target_lang='en')
+    if not translated_user_input or "Translation failed" in translated_user_input: # 번역 실패 시 원본 사용 또는 오류 처리
+        logger.warning(f"Translation failed for '{user_input}', using original text.")
+        translated_user_input = user_input # 번역 실패 시 원본 텍스트 사용
+    return translated_user_input
+
+
+async def generate_image_based_on_json_logic(user_input, uploaded_image_path, mode, positive_categories, negative_categories, num_images=1, deterministic=None, progress_channel=None, owner=None, generation_mode=GENERATION_MODE_DEFAULT,
+                                             seed=None, cfg=None, denoise=None, translated_input=None, input_image=None):
     """
     주어진 사용자 입력, 이미지 파일 경로, 모드 및 프롬프트 카테고리에 따라 ComfyUI를 사용하여 이미지를 생성합니다.
 
@@ -43,33 +419,38 @@ async def generate_image_based_on_json_logic(user_input, uploaded_image_path, mo
         mode (str): 'image_generation' 또는 'curator'.
         positive_categories (list): 적용할 긍정 프롬프트 카테고리 목록.
         negative_categories (list): 적용할 부정 프롬프트 카테고리 목록.
+        num_images (int): 한 번의 샘플링으로 생성할 이미지 수 (EmptyLatentImage batch_size).
+        deterministic (bool or None): True면 요청 해시에서 시드를 정하고 같은 요청의 결과를 캐시에서 재사용합니다.
+                                      None이면 settings.COMFYUI_DETERMINISTIC_SEED를 따릅니다.
+        progress_channel (str or None): 지정하면 ComfyUI 진행 이벤트(progress/executing/preview)를 이 채널로 중계합니다.
+        owner (str or None): 요청한 대화의 session_id. 생성 스케줄러가 대화별로 차례를 나누는 데 사용합니다.
+        generation_mode (str): GENERATION_MODES 중 하나. 'controlnet'은 입력 이미지가 필요하며,
+                               같은 사진의 전처리 맵(Canny, 깊이 등)은 캐시에서 재사용합니다.
+        seed, cfg, denoise (int/float or None): [추가] 지정하면 기본값(무작위/결정적 시드, cfg 9.0, 모드별 denoise) 대신 사용합니다.
+        translated_input (str or None): [추가] 이미 번역한 user_input. 배치 생성에서 같은 프롬프트를 한 번만 번역하는 데 사용합니다.
+        input_image (tuple or None): [추가] read_input_image(uploaded_image_path)의 결과. 지정하면 파일을 다시 읽고 해시하지 않습니다.
 
     Returns:
         dict: 생성된 이미지의 파일 경로 및 ComfyUI URL을 포함하는 딕셔너리.
+              'image_file_path'/'comfyui_image_url'은 첫 번째 이미지이고,
+              'image_file_paths'/'image_names'/'comfyui_image_urls'에 모든 이미지가 순서대로 들어 있습니다.
+              캐시에서 재사용한 결과에는 'cached': True가 추가됩니다.
     """
     try:
-        # 1. 워크플로우 JSON 파일 로드
-        # [수정] image_file 대신 uploaded_image_path의 존재 여부로 모드 판단
-        json_file_name = 'image_to_image.json' if uploaded_image_path else 'text_to_image.json'
-        json_path = os.path.join(JSON_DEFINITIONS_DIR, json_file_name)
-
-        if not os.path.exists(json_path):
-            logger.error(f"JSON config file not found: {json_path}")
-            raise FileNotFoundError(f"JSON config file not found: {json_path}")
-
-        with open(json_path, 'r', encoding='utf-8') as f:
-            prompt_workflow = json.load(f)
-
-        # ComfyUI API는 'prompt' 키 아래에 실제 워크플로우 그래프를 기대합니다.
-        # JSON 파일 자체가 워크플로우인 경우도 있으므로, 'prompt' 키가 없으면 전체를 사용합니다.
-        json_data = prompt_workflow.get('prompt', prompt_workflow)
+        # 1. 워크플로우 템플릿 선택
+        # [수정] 요청마다 JSON 파일을 읽지 않고, 시작 시 컴파일된 템플릿을 레지스트리에서 가져옵니다.
+        # 템플릿에는 프롬프트/시드/denoise/cfg/IPAdapter/LoadImage 주입 위치(패치 플랜)가 미리 계산되어 있습니다.
+        controlnet = generation_mode == GENERATION_MODE_CONTROLNET
+        json_file_name = select_workflow(generation_mode, bool(uploaded_image_path))
+        template = get_workflow_registry().get(json_file_name)
 
         # 2. 프롬프트 업데이트 (긍정/부정)
-        # 사용자 입력(user_input)을 기존 translation_service를 사용하여 영어로 번역
-        translated_user_input = translate_text(user_input, source_lang='ko', target_lang='en')
-        if not translated_user_input or "Translation failed" in translated_user_input: # 번역 실패 시 원본 사용 또는 오류 처리
-            logger.warning(f"Translation failed for '{user_input}', using original text.")
-            translated_user_input = user_input # 번역 실패 시 원본 텍스트 사용
+        # [수정] 번역은 모델 호출이 끝날 때까지 블로킹하므로 스레드에서 실행합니다. 이벤트 루프(워커 풀/ASGI)의 다른 작업이 멈추지 않고,
+        # 같은 루프에서 동시에 들어온 번역들이 한 마이크로 배치로 묶입니다.
+        if translated_input is not None:
+            translated_user_input = translated_input
+        else:
+            translated_user_input = await asyncio.to_thread(translate_prompt, user_input)
 
         # 긍정 프롬프트 조합: 번역된 사용자 입력 + 선택된 긍정 카테고리 프롬프트
         combined_positive_prompt_parts = [translated_user_input]
@@ -95,181 +476,178 @@ async def generate_image_based_on_json_logic(user_input, uploaded_image_path, mo
         
         combined_negative_prompt_text = ", ".join(filter(None, combined_negative_prompt_parts))
 
-        # 워크플로우 JSON에서 긍정/부정 프롬프트 노드 찾기 및 업데이트
-        if json_file_name == 'text_to_image.json':
-            # text_to_image.json의 경우 "6"과 "7" 노드가 CLIPTextEncode에 해당
-            if '6' in json_data and 'inputs' in json_data['6'] and 'text' in json_data['6']['inputs']:
-                json_data['6']['inputs']['text'] = combined_positive_prompt_text
-                logger.info(f"Updated positive prompt in node 6: {combined_positive_prompt_text}")
-            else:
-                logger.warning("Node '6' or its 'inputs.text' not found for positive prompt in text_to_image workflow.")
-
-            if '7' in json_data and 'inputs' in json_data['7'] and 'text' in json_data['7']['inputs']:
-                json_data['7']['inputs']['text'] = combined_negative_prompt_text
-                logger.info(f"Updated negative prompt in node 7: {combined_negative_prompt_text}")
-            else:
-                logger.warning("Node '7' or its 'inputs.text' not found for negative prompt in text_to_image workflow.")
-        
-        elif json_file_name == 'image_to_image.json':
-            # image_to_image.json의 경우 "11"과 "10" 노드가 CLIPTextEncodeLumina2에 해당
-            if '11' in json_data and 'inputs' in json_data['11'] and 'user_prompt' in json_data['11']['inputs']:
-                json_data['11']['inputs']['user_prompt'] = combined_positive_prompt_text
-                logger.info(f"Updated positive user_prompt in node 11 (Lumina2): {combined_positive_prompt_text}")
-            else:
-                logger.warning("Node '11' or its 'inputs.user_prompt' not found for Lumina2 positive prompt in image_to_image workflow.")
-
-            if '10' in json_data and 'inputs' in json_data['10'] and 'user_prompt' in json_data['10']['inputs']:
-                json_data['10']['inputs']['user_prompt'] = combined_negative_prompt_text
-                logger.info(f"Updated negative user_prompt in node 10 (Lumina2): {combined_negative_prompt_text}")
-            else:
-                logger.warning("Node '10' or its 'inputs.user_prompt' not found for Lumina2 negative prompt in image_to_image workflow.")
-
-
-        # 3. KSampler (Seed, Denoise, CFG) 가중치 업데이트
-        ksampler_node_id = None
-        if json_file_name == 'text_to_image.json':
-            ksampler_node_id = '3' # text_to_image.json의 KSampler 노드 ID
-        elif json_file_name == 'image_to_image.json':
-            ksampler_node_id = '5' # image_to_image.json의 KSampler 노드 ID
-
-        if ksampler_node_id and ksampler_node_id in json_data and \
-           'inputs' in json_data[ksampler_node_id]:
-            # 시드 값 랜덤 설정
-            if 'seed' in json_data[ksampler_node_id]['inputs']:
-                json_data[ksampler_node_id]['inputs']['seed'] = random.randint(0, 2**32 - 1)
-                logger.info(f"Updated KSampler seed in node {ksampler_node_id}: {json_data[ksampler_node_id]['inputs']['seed']}")
-
-            # Denoise 값 조절 (특히 image-to-image 모드에서)
-            if 'denoise' in json_data[ksampler_node_id]['inputs']:
-                if uploaded_image_path: # Image-to-Image 모드일 때
-                    # 원본 이미지의 형태를 보존하면서 스타일을 적용하기 위한 값 (0.5 ~ 0.8)
-                    json_data[ksampler_node_id]['inputs']['denoise'] = 0.7 
-                    logger.info(f"Updated KSampler denoise for image-to-image in node {ksampler_node_id}: {json_data[ksampler_node_id]['inputs']['denoise']}")
-                else: # Text-to-Image 모드일 때
-                    # Text-to-Image에서는 완전히 무작위 노이즈에서 시작하므로 1.0이 기본값입니다.
-                    json_data[ksampler_node_id]['inputs']['denoise'] = 1.0 
-                    logger.info(f"Set KSampler denoise for text-to-image in node {ksampler_node_id}: {json_data[ksampler_node_id]['inputs']['denoise']}")
-            else:
-                logger.warning(f"Node '{ksampler_node_id}' has no 'denoise' input.")
-            
-            # CFG (Classifier Free Guidance) 값 조절
-            if 'cfg' in json_data[ksampler_node_id]['inputs']:
-                # 프롬프트의 영향력을 조절합니다. 스타일 적용을 강화하기 위해 8.0에서 9.0으로 상향 조정.
-                # 일반적으로 7.0 ~ 10.0 사이에서 최적값을 찾습니다.
-                json_data[ksampler_node_id]['inputs']['cfg'] = 9.0 # 제안값: 9.0
-                logger.info(f"Updated KSampler cfg in node {ksampler_node_id}: {json_data[ksampler_node_id]['inputs']['cfg']}")
-            else:
-                logger.warning(f"Node '{ksampler_node_id}' has no 'cfg' input.")
-
-        else:
-            logger.warning(f"Node '{ksampler_node_id}' or its 'inputs' not found for KSampler in workflow {json_file_name}.")
-
-        # 4. IPAdapter Weight 업데이트 (Image-to-Image 전용)
-        if uploaded_image_path and json_file_name == 'image_to_image.json':
-            ipadapter_node_id = '7' # IPAdapter Advanced 노드 ID
-            if ipadapter_node_id in json_data and \
-               'inputs' in json_data[ipadapter_node_id] and 'weight' in json_data[ipadapter_node_id]['inputs']:
-                # IPAdapter의 weight 조절.
-                # 이 값이 높을수록 원본 이미지의 스타일이나 내용이 더 강하게 반영됩니다.
-                # 'denoise'와 함께 조절하여 원본 형태 보존과 새로운 화풍 적용의 조화를 찾습니다.
-                # 현재는 1.0으로 유지하여 원본 이미지의 내용 반영을 돕고, 화풍은 CFG와 프롬프트에 더 의존합니다.
-                json_data[ipadapter_node_id]['inputs']['weight'] = 1.0 # 제안값: 1.0
-                logger.info(f"Updated IPAdapter weight in node {ipadapter_node_id}: {json_data[ipadapter_node_id]['inputs']['weight']}")
-            else:
-                logger.warning(f"Node '{ipadapter_node_id}' or its 'inputs.weight' not found for IPAdapter.")
-
-
-        # 5. image-to-image 특정 로직 처리 (LoadImage 노드 업데이트)
+        # 3. KSampler (Denoise, CFG) 값 결정 (시드는 입력 이미지를 읽은 뒤 정합니다)
+        # Denoise: Image-to-Image 모드에서는 원본 형태를 보존하면서 스타일을 적용하기 위해 0.7,
+        # Text-to-Image에서는 완전히 무작위 노이즈에서 시작하므로 1.0이 기본값입니다.
+        # ControlNet 모드는 구도를 ControlNet이 잡으므로 워크플로우에 저장된 값을 그대로 사용합니다.
+        if denoise is None:
+            denoise = None if controlnet else (0.7 if uploaded_image_path else 1.0)
+        # CFG: 스타일 적용을 강화하기 위해 9.0 사용 (일반적으로 7.0 ~ 10.0 사이에서 최적값을 찾습니다.)
+        if cfg is None:
+            cfg = 9.0
+
+        # 4. IPAdapter Weight (Image-to-Image 전용)
+        # 1.0으로 유지하여 원본 이미지의 내용 반영을 돕고, 화풍은 CFG와 프롬프트에 더 의존합니다.
+        ipadapter_weight = 1.0 if uploaded_image_path else None
+
+        # 5. image-to-image 입력 이미지 읽기
+        # [수정] 입력 이미지의 해시는 이미 같은 이미지를 가진 백엔드를 고르는 데 사용됩니다.
+        input_image_content = None
+        input_key = None
+        file_extension = ''
         if uploaded_image_path:
-            # 업로드된 이미지 파일을 ComfyUI input 디렉토리에 저장
-            # Django storage를 통해 이미 저장된 파일이므로, 해당 경로에서 읽어와 ComfyUI input에 복사합니다.
-            # 파일명을 UUID로 생성하여 중복 방지
+            # [수정] 이벤트 루프를 막지 않도록 스레드에서 읽고, 호출자가 이미 읽은 경우(단일 실행 키, 배치 생성)에는 그 결과를 씁니다.
+            if input_image is None:
+                input_image = await asyncio.to_thread(read_input_image, uploaded_image_path)
+            input_image_content, input_key = input_image
             file_extension = os.path.splitext(uploaded_image_path)[1] # 경로에서 확장자 추출
-            input_filename = f"{uuid.uuid4()}{file_extension}"
-            comfyui_target_path = os.path.join(settings.COMFYUI_INPUT_DIR, input_filename)
-
-            # [수정] default_storage.open을 사용하여 이미 저장된 파일을 읽습니다.
-            with default_storage.open(uploaded_image_path, 'rb') as f:
-                image_content = f.read()
-                # ComfyUI input 디렉토리에 ContentFile로 저장
-                saved_input_file_name = default_storage.save(comfyui_target_path, ContentFile(image_content))
-            
-            full_input_file_path = default_storage.path(saved_input_file_name)
-            logger.info(f"Uploaded image copied to ComfyUI input: {full_input_file_path}")
-
-            # ComfyUI 워크플로우의 LoadImage 노드 업데이트 (일반적으로 "9"번 노드)
-            if '9' in json_data and 'inputs' in json_data['9'] and 'image' in json_data['9']['inputs']:
-                json_data['9']['inputs']['image'] = input_filename
-                logger.info(f"Updated LoadImage node 9 with filename: {input_filename}")
-            else:
-                logger.warning("Node '9' or its 'inputs.image' not found for LoadImage in workflow.")
-
-
-        # 6. ComfyUI API 호출 및 이미지 생성 완료 대기, 다운로드
-        logger.info(f"Final JSON data to send to ComfyUI: {json.dumps(json_data, indent=2)}")
-
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(f"{COMFYUI_API_URL}/prompt", json={'prompt': json_data})
-            response.raise_for_status() # HTTP 오류가 발생하면 예외를 발생시킵니다.
-
-            prompt_id = response.json()['prompt_id']
-            logger.info(f"ComfyUI prompt submitted, ID: {prompt_id}")
-
-            # 이미지 생성 완료 대기 및 다운로드
-            while True:
-                history_response = await client.get(f"{COMFYUI_HISTORY_URL}?prompt_id={prompt_id}")
-                history_response.raise_for_status()
-                history_data = history_response.json()
-
-                if 'history' in history_data and str(prompt_id) in history_data['history']:
-                    outputs = history_data['history'][str(prompt_id)]['outputs']
-                elif str(prompt_id) in history_data:
-                    outputs = history_data[str(prompt_id)]['outputs']
-                else:
-                    await asyncio.sleep(1)
-                    continue
-
-                image_info = None
-                for node_id in outputs:
-                    if 'images' in outputs[node_id]:
-                        image_info = outputs[node_id]['images'][0] # 첫 번째 이미지를 가져옵니다.
-                        break
-                if image_info:
-                    filename = image_info['filename']
-                    subfolder = image_info['subfolder']
-                    type = image_info['type']
-                    break
-                await asyncio.sleep(1) # 1초 대기 후 다시 폴링
-
-            comfyui_served_image_url = f"{COMFYUI_IMAGE_URL}?filename={filename}&subfolder={subfolder}&type={type}"
-            logger.info(f"Generated image URL from ComfyUI: {comfyui_served_image_url}")
-
-            # 7. 생성된 이미지 다운로드 및 Django 스토리지에 저장
-            image_response = await client.get(comfyui_served_image_url, timeout=300)
-            image_response.raise_for_status()
-        
-        if subfolder:
-            django_storage_path = os.path.join(settings.COMFYUI_OUTPUT_DIR, subfolder, filename)
-        else:
-            django_storage_path = os.path.join(settings.COMFYUI_OUTPUT_DIR, filename)
-
-        saved_file_name = default_storage.save(django_storage_path, ContentFile(image_response.content))
-        
-        full_image_file_path = default_storage.path(saved_file_name)
-        logger.info(f"Image saved to Django media: {full_image_file_path}")
 
-        return {
-            'image_file_path': full_image_file_path,
-            'comfyui_image_url': comfyui_served_image_url
+        # 6. 시드 결정
+        # [추가] 결정적 모드에서는 결과에 영향을 주는 모든 값의 해시로 시드를 정하고, 같은 해시의 결과가 있으면 재사용합니다.
+        if deterministic is None:
+            deterministic = COMFYUI_DETERMINISTIC_SEED
+        request_hash = None
+        if deterministic:
+            # [추가] 시드를 직접 지정한 경우에만 해시에 넣어, 지정하지 않은 요청의 기존 해시(캐시)는 그대로 유지합니다.
+            explicit_seed = {'seed': seed} if seed is not None else {}
+            request_hash = compute_request_hash(
+                workflow=json_file_name,
+                workflow_mtime=template.mtime,
+                positive_prompt=combined_positive_prompt_text,
+                negative_prompt=combined_negative_prompt_text,
+                positive_categories=sorted(positive_categories),
+                negative_categories=sorted(negative_categories),
+                input_image=input_key,
+                denoise=denoise,
+                cfg=cfg,
+                ipadapter_weight=ipadapter_weight,
+                num_images=num_images,
+                **explicit_seed,
+            )
+            if seed is None:
+                seed = seed_from_hash(request_hash)
+            cached_result = await _get_cached_result(request_hash)
+            if cached_result is not None:
+                logger.info(f"Reusing cached generation result {request_hash[:12]}: {cached_result['image_names']}")
+                return cached_result
+        elif seed is None:
+            # 시드 값 랜덤 설정
+            seed = random.randint(0, 2**32 - 1)
+
+        # [추가] ControlNet 전처리 맵 캐시: 같은 사진의 맵이 있으면 전처리기 대신 LoadImage로 넣고, 없으면 이번 작업에서 받아 저장합니다.
+        control_maps, capture_maps = {}, {}
+        if template.control_preprocessors:
+            control_maps, capture_maps = await _lookup_control_maps(template, input_key)
+
+        template_values = {
+            'positive_prompt': combined_positive_prompt_text,
+            'negative_prompt': combined_negative_prompt_text,
+            'seed': seed,
+            'denoise': denoise,
+            'cfg': cfg,
+            'ipadapter_weight': ipadapter_weight,
+        }
+        # [추가] 여러 장 요청 시 N번 제출하지 않고 한 번의 샘플링에서 batch_size장을 생성합니다.
+        if num_images > 1:
+            if template.has_slot('batch_size'):
+                template_values['batch_size'] = num_images
+            else:
+                logger.warning(f"Workflow '{json_file_name}' has no EmptyLatentImage; generating a single image.")
+        logger.info(f"Prepared workflow '{json_file_name}': seed={seed}, denoise={denoise}, cfg={cfg}, images={num_images}, "
+                    f"positive='{combined_positive_prompt_text}', negative='{combined_negative_prompt_text}'")
+
+        # 7. 생성 슬롯을 얻은 뒤 가장 한가한 ComfyUI 백엔드에 제출하고 이미지 생성 완료 대기
+        # [추가] 동시 실행 수를 제한하고, 슬롯이 없으면 대화별 라운드 로빈 대기열에서 차례를 기다립니다.
+        # [추가] 대기 중에는 같은 모델을 쓰는 요청끼리 묶어 보내 ComfyUI의 모델 교체를 줄입니다.
+        async with get_generation_scheduler().slot(owner, template.model_signature):
+            router = get_backend_router()
+            await router.refresh()
+            backend, prompt_id = await _submit_prompt(router, template, template_values, input_image_content, input_key, file_extension,
+                                                      control_maps=control_maps, capture_maps=tuple(capture_maps))
+            backend_ok = True
+            cancelled = False
+            outputs = None
+            tracker = get_job_tracker()
+            tracker.job_submitted(prompt_id, images=num_images)
+            if input_key is not None:
+                _inputs_in_use[input_key] += 1
+            hub = get_progress_hub() if progress_channel is not None else None
+            if hub is not None:
+                hub.bind_prompt(prompt_id, progress_channel, template.nodes)
+                hub.publish(progress_channel, 'queued', {'prompt_id': prompt_id})
+            try:
+                # 이미지 생성 완료 대기 (웹소켓 이벤트 우선, 연결이 없으면 /history 폴링)
+                # [추가] 최근 작업 시간의 p99로 정한 시한 안에 끝나지 않으면 멈춘 백엔드로 보고 작업을 취소합니다.
+                job_timeout = tracker.job_timeout(num_images)
+                try:
+                    outputs = await asyncio.wait_for(_wait_for_outputs(backend.client, prompt_id), job_timeout)
+                except asyncio.TimeoutError:
+                    backend_ok = False
+                    tracker.record_timeout()
+                    await asyncio.shield(_cancel_comfy_job(backend, prompt_id))
+                    raise ComfyAPIError(f"ComfyUI 작업 {prompt_id}이(가) {job_timeout:.0f}초 안에 끝나지 않았습니다 ({backend.host}).")
+                tracker.job_finished(prompt_id)
+
+                image_infos = _collect_images(outputs)
+                comfyui_served_image_urls = [
+                    f"{backend.host}/view?filename={info['filename']}&subfolder={info['subfolder']}&type={info['type']}"
+                    for info in image_infos
+                ]
+                logger.info(f"Generated {len(image_infos)} image(s) on ComfyUI: {comfyui_served_image_urls}")
+
+                # 8. 생성된 이미지를 모두 동시에 다운로드하여 Django 스토리지(COMFYUI_OUTPUT_DIR)에 저장
+                # [수정] 응답을 메모리에 모으지 않고 청크 단위로 임시 파일에 쓴 뒤 최종 이름으로 원자적으로 옮깁니다.
+                # 공유 파일시스템 모드에서는 HTTP 전송 없이 ComfyUI output 파일을 하드링크/rename합니다.
+                saved_file_names = await asyncio.gather(*(_download_output(backend, info) for info in image_infos))
+                # [추가] 선택적 출력 코덱 단계: 무손실 WebP/최적화 PNG로 다시 인코딩하고 ComfyUI 메타데이터는 사이드카로 남깁니다.
+                saved_file_names = await asyncio.gather(*(get_output_codec().process(name) for name in saved_file_names))
+                if capture_maps:
+                    await _store_control_maps(backend, outputs, capture_maps)
+            except asyncio.CancelledError:
+                # [추가] 요청이 취소되면(클라이언트 연결 끊김, 버려진 작업) 아무도 받지 않을 이미지를 계속 만들지 않도록
+                # ComfyUI에서도 작업을 제거합니다. shield: 정리 도중 다시 취소되어도 정리는 끝까지 진행됩니다.
+                cancelled = True
+                if outputs is None:
+                    await asyncio.shield(_cancel_comfy_job(backend, prompt_id))
+                raise
+            finally:
+                router.release(backend, success=backend_ok)
+                tracker.job_finished(prompt_id, completed=False) # 끝나지 않은 작업의 기록 정리
+                if hub is not None:
+                    hub.release_prompt(prompt_id)
+                if input_key is not None:
+                    _inputs_in_use[input_key] -= 1
+                    if _inputs_in_use[input_key] <= 0:
+                        del _inputs_in_use[input_key]
+                        if cancelled and not _should_upload_inputs(router):
+                            await asyncio.shield(_remove_cancelled_input(backend, input_key))
+
+        full_image_file_paths = [default_storage.path(name) for name in saved_file_names]
+        logger.info(f"Image(s) saved to Django media: {full_image_file_paths}")
+
+        result = {
+            'image_file_path': full_image_file_paths[0],
+            'comfyui_image_url': comfyui_served_image_urls[0],
+            'image_file_paths': full_image_file_paths,
+            'image_names': saved_file_names,
+            'comfyui_image_urls': comfyui_served_image_urls,
         }
+        if request_hash is not None:
+            get_result_cache().put(request_hash, result)
+        return result
 
+    except GenerationQueueFull as e:
+        logger.warning(f"Rejected image generation for {owner}: {e} (retry after {e.retry_after}s)")
+        raise
     except FileNotFoundError as e:
         logger.error(f"JSON config file error: {e}", exc_info=True)
         raise
-    except httpx.RequestError as e:
+    except (CircuitOpenError, NoHealthyBackendError) as e:
+        # [추가] 회로가 열려 바로 실패한 경우는 예상된 상황이므로 스택 트레이스 없이 기록합니다.
+        logger.warning(f"ComfyUI unavailable, failing fast: {e}")
+        raise
+    except ComfyAPIError as e:
         logger.error(f"Error connecting to ComfyUI API or during image download: {e}", exc_info=True)
-        if "client has been closed" in str(e).lower():
-            logger.error("HTTPX client closed error. Ensure AsyncClient is properly used within 'async with' context or manually closed.")
         raise
     except ValueError as e:
         logger.error(f"Value error in image generation logic: {e}", exc_info=True)
@@ -283,3 +661,45 @@ async def generate_image_based_on_json_logic(user_input, uploaded_image_path, mo
     except Exception as e:
         logger.error(f"An unexpected error occurred during image generation: {e}", exc_info=True)
         raise
+
+
+def _single_flight_key(user_input, input_key, mode, positive_categories, negative_categories, num_images, deterministic, generation_mode=GENERATION_MODE_DEFAULT):
+    """동일 요청 판별용 키를 만듭니다. 프롬프트는 유니코드(NFC)/공백을 정규화하고, 입력 이미지는 파일 경로 대신 내용 해시(input_key)를 씁니다."""
+    return compute_request_hash(
+        user_input=' '.join(unicodedata.normalize('NFC', user_input or '').split()),
+        input_image=input_key,
+        mode=mode,
+        positive_categories=sorted(positive_categories),
+        negative_categories=sorted(negative_categories),
+        num_images=num_images,
+        deterministic=bool(COMFYUI_DETERMINISTIC_SEED if deterministic is None else deterministic),
+        generation_mode=generation_mode,
+    )
+
+
+async def generate_image_single_flight(user_input, uploaded_image_path, mode, positive_categories, negative_categories, num_images=1, deterministic=None, task_id=None, owner=None, generation_mode=GENERATION_MODE_DEFAULT):
+    """
+    generate_image_based_on_json_logic 앞단의 단일 실행(single-flight) 계층입니다.
+    같은 요청이 이미 진행 중이면 ComfyUI 작업을 새로 큐에 넣지 않고 진행 중인 작업의 결과를 함께 기다립니다.
+    task_id를 지정하면 (합류한 작업이더라도) 그 작업의 진행 이벤트가 task_id 구독자에게 전달됩니다.
+    합류한 요청은 생성 슬롯을 따로 차지하지 않으며, 작업은 처음 요청한 owner의 차례로 스케줄됩니다.
+    나머지 인자와 반환값은 generate_image_based_on_json_logic과 같습니다.
+    """
+    # [수정] 입력 이미지는 여기서 한 번만 읽고 해시해 단일 실행 키와 생성(결과 캐시 키, 백엔드 선택)에 함께 넘깁니다.
+    input_image = await asyncio.to_thread(read_input_image, uploaded_image_path) if uploaded_image_path else None
+
+    def run(channel):
+        return generate_image_based_on_json_logic(
+            user_input, uploaded_image_path, mode, positive_categories, negative_categories,
+            num_images=num_images, deterministic=deterministic, progress_channel=channel, owner=owner,
+            generation_mode=generation_mode, input_image=input_image,
+        )
+
+    if not COMFYUI_SINGLE_FLIGHT:
+        channel = f"task:{task_id}" if task_id is not None else None
+        get_progress_hub().attach(task_id, channel)
+        return await run(channel)
+    key = _single_flight_key(user_input, input_image[1] if input_image else None, mode, positive_categories, negative_categories,
+                             num_images, deterministic, generation_mode)
+    get_progress_hub().attach(task_id, key)
+    return await get_single_flight().run(key, lambda: run(key))
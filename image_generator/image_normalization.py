@@ -0,0 +1,85 @@
+# image_generator/image_normalization.py
+
+import asyncio
+import io
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# content: 인코딩된 이미지 바이트, extension: '.jpg' 또는 '.png', width/height: 정규화 후 크기, original_*: 원본 크기
+NormalizedImage = namedtuple('NormalizedImage', 'content extension width height original_width original_height')
+
+# 이 형식으로 들어온 이미지는 크기/방향을 바꿀 필요가 없으면 다시 인코딩하지 않고 그대로 사용합니다.
+PASSTHROUGH_FORMATS = {'JPEG': '.jpg', 'PNG': '.png'}
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def normalize_image(data, max_side, jpeg_quality=90):
+    """
+    업로드된 이미지를 한 번만 디코딩해 긴 변이 max_side 이하가 되도록 줄이고, EXIF 방향을 적용해 다시 인코딩합니다.
+    - JPEG는 draft 모드로 디코딩하므로 DCT 단계에서 1/2~1/8로 줄여 읽어 큰 사진도 빠르고 메모리를 적게 씁니다.
+    - 투명도가 있는 이미지는 PNG(RGBA)로, 나머지는 JPEG로 인코딩합니다 (LoadImage의 마스크 출력은 알파 채널입니다).
+    - 크기와 방향을 바꿀 필요가 없는 JPEG/PNG는 원본 바이트를 그대로 돌려줍니다.
+    (CPU를 쓰는 블로킹 함수이므로 이벤트 루프에서는 normalize_image_async를 사용하세요.)
+    :raises PIL.UnidentifiedImageError: 이미지가 아닌 데이터인 경우
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        source_format = image.format
+        original_size = image.size
+        if source_format == 'JPEG':
+            image.draft('RGB', (max_side, max_side)) # 요청 크기 이상인 가장 작은 1/2^n 배율로 디코딩
+        orientation = image.getexif().get(0x0112, 1) # EXIF Orientation
+        if max(original_size) <= max_side and orientation == 1 and source_format in PASSTHROUGH_FORMATS:
+            return NormalizedImage(data, PASSTHROUGH_FORMATS[source_format], *original_size, *original_size)
+
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        if _has_alpha(image):
+            image.convert('RGBA').save(output, format='PNG', optimize=False)
+            extension = '.png'
+        else:
+            image.convert('RGB').save(output, format='JPEG', quality=jpeg_quality, optimize=True)
+            extension = '.jpg'
+        return NormalizedImage(output.getvalue(), extension, *image.size, *original_size)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_normalization_executor():
+    """
+    이미지 정규화 전용 워커 풀을 반환합니다 (settings.IMAGE_NORMALIZE_WORKERS).
+    Pillow는 디코딩/리샘플링/인코딩 중 GIL을 놓으므로 스레드 풀로 충분하며, 풀 크기로 동시에 쓰는 CPU 코어 수를 제한합니다.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_NORMALIZE_WORKERS', 2),
+                    thread_name_prefix='image-normalize',
+                )
+    return _executor
+
+
+async def normalize_image_async(data, max_side):
+    """normalize_image를 워커 풀에서 실행합니다 (이벤트 루프를 막지 않습니다)."""
+    loop = asyncio.get_running_loop()
+    quality = getattr(settings, 'IMAGE_NORMALIZE_JPEG_QUALITY', 90)
+    result = await loop.run_in_executor(get_normalization_executor(), normalize_image, data, max_side, quality)
+    if result.content is not data:
+        logger.info(f"Normalized uploaded image {result.original_width}x{result.original_height} ({len(data) / 1024:.0f} KB) -> "
+                    f"{result.width}x{result.height} ({len(result.content) / 1024:.0f} KB)")
+    return result
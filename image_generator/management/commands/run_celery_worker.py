@@ -0,0 +1,33 @@
+# image_generator/management/commands/run_celery_worker.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.celery import app
+
+
+class Command(BaseCommand):
+    help = "Celery 워커를 큐 하나에 대해 settings.CELERY_WORKER_QUEUES의 동시 실행 수/풀로 실행합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queue', help="처리할 큐 (generation, translation, docent, default)")
+        parser.add_argument('--concurrency', type=int, default=None, help="동시 실행 수 (기본값: 설정값)")
+        parser.add_argument('--pool', default=None, help="워커 풀 종류: prefork, threads, solo, eventlet (기본값: 설정값)")
+        parser.add_argument('--loglevel', default='INFO')
+
+    def handle(self, *args, **options):
+        queues = getattr(settings, 'CELERY_WORKER_QUEUES', {})
+        queue = options['queue']
+        if queue not in queues:
+            raise CommandError(f"Unknown queue '{queue}'. Configured queues: {', '.join(queues)}")
+        concurrency = options['concurrency'] or queues[queue].get('concurrency', 1)
+        pool = options['pool'] or queues[queue].get('pool', 'prefork')
+        self.stdout.write(f"Starting Celery worker for queue '{queue}' ({pool} pool, concurrency {concurrency})")
+        app.worker_main([
+            'worker',
+            '--queues', queue,
+            '--concurrency', str(concurrency),
+            '--pool', pool,
+            '--hostname', f'{queue}@%h',
+            '--loglevel', options['loglevel'],
+        ])
@@ -0,0 +1,45 @@
+# image_generator/management/commands/sweep_media.py
+
+from django.core.management.base import BaseCommand
+
+from image_generator.media_gc import sweeper_from_settings
+
+
+class Command(BaseCommand):
+    help = ("DB(Message/GeneratedImage)가 참조하지 않고 TTL보다 오래된 미디어 파일(임시 업로드, ComfyUI 입력 사본, "
+            "--include-outputs면 생성 결과와 파생 이미지도)을 지우고 회수한 용량을 보고합니다.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-hours', type=float, default=None, help="이보다 오래된 고아 파일만 지웁니다 (기본값: MEDIA_GC_TTL)")
+        parser.add_argument('--dir', action='append', dest='directories', default=None,
+                            help="MEDIA_ROOT 기준 정리할 디렉터리 (여러 번 지정 가능, 기본값: MEDIA_GC_DIRECTORIES)")
+        parser.add_argument('--include-outputs', action='store_true', default=None,
+                            help="생성 결과(comfyui_output)와 파생 이미지(derivatives)도 정리합니다 (기본값: MEDIA_GC_SWEEP_OUTPUTS)")
+        parser.add_argument('--batch-size', type=int, default=None, help="한 번에 지우는 파일 수")
+        parser.add_argument('--dry-run', action='store_true', help="지우지 않고 지울 파일과 용량만 보고합니다")
+        parser.add_argument('--verbose-list', action='store_true', help="지울(지운) 파일 이름을 모두 출력합니다")
+
+    def handle(self, *args, **options):
+        sweeper = sweeper_from_settings(
+            ttl=options['ttl_hours'] * 3600 if options['ttl_hours'] is not None else None,
+            directories=tuple(options['directories']) if options['directories'] else None,
+            include_outputs=options['include_outputs'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if options['verbose_list']:
+            orphans, _ = sweeper.find_orphans()
+            for name, size in orphans:
+                self.stdout.write(f"  {name} ({size / 1024:.0f} KB)")
+        report = sweeper.sweep()
+        action = "Would delete" if report['dry_run'] else "Deleted"
+        self.stdout.write(
+            f"Scanned {report['scanned']} files ({report['scanned_bytes'] / 1024 / 1024:.1f} MB) in {report['seconds']}s: "
+            f"{report['referenced']} referenced, {report['recent']} newer than TTL, {report['orphans']} orphaned."
+        )
+        for directory, size in sorted(report['by_directory'].items()):
+            self.stdout.write(f"  {directory}: {size / 1024 / 1024:.1f} MB")
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {report['deleted']} files, {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB reclaimed"
+            + (f" ({report['errors']} errors)" if report['errors'] else "")
+        ))
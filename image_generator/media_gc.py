@@ -0,0 +1,179 @@
+# image_generator/media_gc.py
+
+import logging
+import os
+import time
+from collections import Counter
+from urllib.parse import unquote
+
+from django.conf import settings
+
+from .models import GeneratedImage, Message
+from .output_codec import SIDECAR_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# MEDIA_ROOT 기준으로 기본 정리할 디렉터리. 임시 업로드와 ComfyUI 입력 사본이 쌓이는 곳입니다.
+# ControlNet 맵 캐시(COMFYUI_CONTROLNET_MAP_CACHE_DIR)는 자체적으로 항목 수를 제한하므로 포함하지 않습니다.
+DEFAULT_DIRECTORIES = ('temp_uploads', 'uploaded_temp', 'uploads', 'user_uploads', 'comfyui_input')
+# [추가] 생성 결과와 파생 이미지. 메시지로 저장되지 않는 결과(배치 생성 API 등)도 URL로 제공되므로
+# MEDIA_GC_SWEEP_OUTPUTS=True(또는 sweep_media --include-outputs)로 명시했을 때만 정리합니다.
+OUTPUT_DIRECTORIES = ('comfyui_output', 'derivatives')
+
+
+def _file_name(reference):
+    """경로/URL/스토리지 이름에서 파일 이름만 꺼냅니다 (Windows 경로와 URL 인코딩도 처리합니다)."""
+    if not reference:
+        return None
+    name = unquote(str(reference)).replace('\\', '/').rstrip('/').rsplit('/', 1)[-1]
+    return name or None
+
+
+def collect_references():
+    """
+    DB가 가리키는 미디어 파일의 파일 이름 집합을 만듭니다.
+    Message.image_file_path(절대 경로)/image_url(/media/ URL), GeneratedImage.image_file과 파생 이미지를 포함합니다.
+    다른 OS나 다른 MEDIA_ROOT에서 저장된 행(D:\\...\\media\\..., /media/D%3A/...)도 있으므로 경로 전체가 아니라
+    파일 이름으로 비교합니다. 이름이 같은 다른 파일도 남게 되지만, 참조 중인 파일을 지우는 일은 없습니다.
+    """
+    references = set()
+    messages = Message.objects.exclude(image_file_path__isnull=True, image_url__isnull=True)
+    for file_path, image_url in messages.values_list('image_file_path', 'image_url').iterator(chunk_size=2000):
+        references.add(_file_name(file_path))
+        references.add(_file_name(image_url))
+    for image_file, derivatives in GeneratedImage.objects.values_list('image_file', 'derivatives').iterator(chunk_size=2000):
+        references.add(_file_name(image_file))
+        for derivative in (derivatives or {}).values():
+            references.add(_file_name(derivative.get('name')))
+    references.discard(None)
+    return references
+
+
+def _walk(path):
+    """os.scandir로 path 아래의 모든 파일 DirEntry를 돌려줍니다 (심볼릭 링크는 따라가지 않습니다)."""
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+class MediaSweeper:
+    """
+    MEDIA_ROOT의 임시 파일(선택적으로 생성 결과) 중 DB가 참조하지 않고 ttl보다 오래된 파일(고아 파일)을 찾아 batch_size개씩 지웁니다.
+    참조 여부는 Message/GeneratedImage를 한 번 읽어 만든 파일 이름 집합으로 확인하며, 이미지의 메타데이터 사이드카(<파일>.json)는
+    이미지가 참조되는 동안 함께 남깁니다. 진행 중인 작업의 파일(아직 메시지로 저장되지 않은 결과, ComfyUI 입력 사본)은
+    ttl로 보호되므로 ttl은 가장 긴 작업 시간보다 충분히 길어야 합니다.
+    """
+
+    def __init__(self, media_root=None, directories=DEFAULT_DIRECTORIES, ttl=24 * 60 * 60, batch_size=500,
+                 batch_pause=0.0, dry_run=False):
+        """
+        :param directories: MEDIA_ROOT 기준 디렉터리 이름들
+        :param ttl: 이보다 오래 수정되지 않은 고아 파일만 지웁니다 (초)
+        :param batch_size: 한 번에 지우는 파일 수
+        :param batch_pause: 배치 사이에 쉬는 시간 (초, 디스크 I/O 폭주 방지)
+        :param dry_run: True면 지우지 않고 결과만 계산합니다
+        """
+        self.media_root = os.path.abspath(media_root or settings.MEDIA_ROOT)
+        self.directories = directories
+        self.ttl = ttl
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.dry_run = dry_run
+
+    def _is_referenced(self, file_name, references):
+        if file_name in references:
+            return True
+        # 메타데이터 사이드카는 이미지가 참조되는 동안 유지합니다.
+        return file_name.endswith(SIDECAR_SUFFIX) and file_name[:-len(SIDECAR_SUFFIX)] in references
+
+    def find_orphans(self, references=None, now=None):
+        """
+        :return: (고아 파일 목록 [(스토리지 이름, 크기)], 통계 dict)
+        """
+        references = collect_references() if references is None else references
+        cutoff = (time.time() if now is None else now) - self.ttl
+        orphans = []
+        scanned = Counter()
+        for directory in self.directories:
+            for entry in _walk(os.path.join(self.media_root, directory)):
+                stat = entry.stat(follow_symlinks=False)
+                name = os.path.relpath(entry.path, self.media_root).replace(os.sep, '/')
+                scanned['files'] += 1
+                scanned['bytes'] += stat.st_size
+                if self._is_referenced(entry.name, references):
+                    scanned['referenced'] += 1
+                elif stat.st_mtime > cutoff:
+                    scanned['recent'] += 1
+                else:
+                    orphans.append((name, stat.st_size))
+        return orphans, dict(scanned)
+
+    def sweep(self):
+        """
+        고아 파일을 찾아 지우고 결과를 반환합니다.
+        :return: {'scanned', 'referenced', 'recent', 'orphans', 'deleted', 'bytes_reclaimed', 'errors', 'by_directory', 'dry_run'}
+        """
+        started = time.monotonic()
+        orphans, scanned = self.find_orphans()
+        deleted = errors = reclaimed = 0
+        by_directory = Counter()
+        for start in range(0, len(orphans), self.batch_size):
+            for name, size in orphans[start:start + self.batch_size]:
+                if not self.dry_run:
+                    try:
+                        os.remove(os.path.join(self.media_root, name))
+                    except FileNotFoundError:
+                        continue # 다른 정리 작업이 먼저 지움
+                    except OSError as e:
+                        errors += 1
+                        logger.warning(f"Could not remove orphaned media file {name}: {e}")
+                        continue
+                deleted += 1
+                reclaimed += size
+                by_directory[name.split('/', 1)[0]] += size
+            if self.batch_pause and start + self.batch_size < len(orphans):
+                time.sleep(self.batch_pause)
+        report = {
+            'scanned': scanned.get('files', 0),
+            'scanned_bytes': scanned.get('bytes', 0),
+            'referenced': scanned.get('referenced', 0),
+            'recent': scanned.get('recent', 0),
+            'orphans': len(orphans),
+            'deleted': deleted,
+            'bytes_reclaimed': reclaimed,
+            'errors': errors,
+            'by_directory': dict(by_directory),
+            'dry_run': self.dry_run,
+            'seconds': round(time.monotonic() - started, 3),
+        }
+        logger.info(f"Media sweep{' (dry run)' if self.dry_run else ''}: {deleted}/{len(orphans)} orphaned files, "
+                    f"{reclaimed / 1024 / 1024:.1f} MB reclaimed, {report['scanned']} files scanned, {errors} errors")
+        return report
+
+
+def sweeper_from_settings(include_outputs=None, **overrides):
+    """
+    settings.MEDIA_GC_*로 MediaSweeper를 만듭니다. overrides로 일부 값을 바꿀 수 있습니다.
+    :param include_outputs: True면 OUTPUT_DIRECTORIES도 정리합니다 (None이면 settings.MEDIA_GC_SWEEP_OUTPUTS)
+    """
+    if include_outputs is None:
+        include_outputs = getattr(settings, 'MEDIA_GC_SWEEP_OUTPUTS', False)
+    directories = overrides.pop('directories', None) or tuple(getattr(settings, 'MEDIA_GC_DIRECTORIES', DEFAULT_DIRECTORIES))
+    if include_outputs:
+        directories += tuple(directory for directory in OUTPUT_DIRECTORIES if directory not in directories)
+    options = {
+        'directories': directories,
+        'ttl': getattr(settings, 'MEDIA_GC_TTL', 24 * 60 * 60),
+        'batch_size': getattr(settings, 'MEDIA_GC_BATCH_SIZE', 500),
+        'batch_pause': getattr(settings, 'MEDIA_GC_BATCH_PAUSE', 0.0),
+    }
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    return MediaSweeper(**options)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("image_generator", "0007_conversation_start_time_message_image_file_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="generatedimage",
+            name="derivatives",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="파생 이미지"
+            ),
+        ),
+        migrations.AddField(
+            model_name="generatedimage",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="높이"
+            ),
+        ),
+        migrations.AddField(
+            model_name="generatedimage",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="너비"
+            ),
+        ),
+    ]
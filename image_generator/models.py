@@ -15,6 +15,10 @@ class GeneratedImage(models.Model):
     views = models.PositiveIntegerField(default=0, verbose_name="조회수")
     likes = models.PositiveIntegerField(default=0, verbose_name="좋아요 수")
     is_showcase = models.BooleanField(default=False, verbose_name="갤러리 전시 여부") # 새로 추가된 필드
+    # [추가] 원본 크기와 WebP 파생 이미지(썸네일/중간/전체) 정보. 파생 이미지는 처음 요청될 때 만들어집니다 (image_derivatives.py).
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="너비")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="높이")
+    derivatives = models.JSONField(default=dict, blank=True, verbose_name="파생 이미지") # 크기 이름 -> {name, width, height, bytes}
 
     def __str__(self):
         return self.title
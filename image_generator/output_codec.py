@@ -0,0 +1,195 @@
+# image_generator/output_codec.py
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, PngImagePlugin
+
+logger = logging.getLogger(__name__)
+
+CODEC_WEBP_LOSSLESS = 'webp_lossless'
+CODEC_PNG_OPTIMIZED = 'png_optimized'
+CODECS = (CODEC_WEBP_LOSSLESS, CODEC_PNG_OPTIMIZED)
+
+# 메타데이터 사이드카 파일 확장자 (<이미지 이름>.json)
+SIDECAR_SUFFIX = '.json'
+
+
+def _claim(temp_path, path):
+    """
+    임시 파일을 path(이미 있으면 path_1, path_2, ...)로 옮기고 실제 경로를 반환합니다.
+    os.link는 대상이 있으면 실패하므로 동시에 같은 이름을 고른 다른 작업의 파일을 덮어쓰지 않습니다.
+    """
+    stem, extension = os.path.splitext(path)
+    candidate, index = path, 0
+    while True:
+        try:
+            os.link(temp_path, candidate)
+            os.remove(temp_path)
+            return candidate
+        except FileExistsError:
+            index += 1
+            candidate = f"{stem}_{index}{extension}"
+        except OSError:
+            # 하드링크를 지원하지 않는 파일시스템
+            if os.path.exists(candidate):
+                index += 1
+                candidate = f"{stem}_{index}{extension}"
+                continue
+            os.replace(temp_path, candidate)
+            return candidate
+
+
+def transcode_output(path, codec, webp_method=4, sidecar=True):
+    """
+    ComfyUI 출력 PNG 하나를 무손실로 다시 인코딩합니다 (픽셀은 그대로입니다).
+    - webp_lossless: 같은 이름의 .webp로 저장하고 원본 PNG를 지웁니다.
+    - png_optimized: 텍스트 청크를 유지한 채 최대 압축(optimize)으로 PNG를 다시 씁니다.
+    ComfyUI가 PNG 텍스트 청크에 넣은 prompt/workflow는 sidecar=True면 <결과 파일>.json으로 함께 저장합니다.
+    결과가 원본보다 크면 원본을 그대로 둡니다.
+    (Django 설정에 의존하지 않는 CPU 작업이며, 프로세스 풀에서 실행됩니다.)
+    :return: {'path', 'codec', 'original_bytes', 'bytes', 'sidecar'} (codec은 실제로 적용한 코덱, 유지했으면 None)
+    """
+    original_bytes = os.path.getsize(path)
+    stem = os.path.splitext(path)[0]
+    with Image.open(path) as image:
+        metadata = dict(getattr(image, 'text', {}) or {})
+        image.load()
+        temp_path = f"{stem}.{os.getpid()}.transcode.tmp"
+        if codec == CODEC_WEBP_LOSSLESS:
+            image.save(temp_path, format='WEBP', lossless=True, quality=100, method=webp_method, exact=True)
+            target = f"{stem}.webp"
+        elif codec == CODEC_PNG_OPTIMIZED:
+            info = PngImagePlugin.PngInfo()
+            for key, value in metadata.items():
+                info.add_text(key, value)
+            image.save(temp_path, format='PNG', optimize=True, pnginfo=info)
+            target = path
+        else:
+            raise ValueError(f"Unknown output codec '{codec}'. Expected one of {CODECS}")
+
+    new_bytes = os.path.getsize(temp_path)
+    if new_bytes >= original_bytes:
+        os.remove(temp_path)
+        result = {'path': path, 'codec': None, 'original_bytes': original_bytes, 'bytes': original_bytes}
+    elif target == path:
+        os.replace(temp_path, path)
+        result = {'path': path, 'codec': codec, 'original_bytes': original_bytes, 'bytes': new_bytes}
+    else:
+        target = _claim(temp_path, target)
+        os.remove(path)
+        result = {'path': target, 'codec': codec, 'original_bytes': original_bytes, 'bytes': new_bytes}
+
+    result['sidecar'] = None
+    if sidecar and metadata:
+        # ComfyUI의 prompt/workflow는 JSON 문자열이므로 읽을 수 있으면 객체로 저장합니다.
+        values = {}
+        for key, value in metadata.items():
+            try:
+                values[key] = json.loads(value)
+            except ValueError:
+                values[key] = value
+        sidecar_path = result['path'] + SIDECAR_SUFFIX
+        with open(sidecar_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': os.path.basename(path), 'metadata': values}, f, ensure_ascii=False)
+        result['sidecar'] = sidecar_path
+    return result
+
+
+class OutputCodec:
+    """
+    다운로드한 ComfyUI 출력을 설정된 코덱(settings.COMFYUI_OUTPUT_CODEC)으로 다시 인코딩하는 출력 단계입니다.
+    인코딩은 프로세스 풀에서 실행되어 이벤트 루프와 웹 서버 프로세스의 CPU를 쓰지 않으며, 줄인 바이트 수를 기록합니다.
+    """
+
+    def __init__(self, codec=None, max_workers=2, webp_method=4, sidecar=True):
+        """
+        :param codec: 'webp_lossless', 'png_optimized' 또는 None (다시 인코딩하지 않음)
+        :param webp_method: WebP 압축 노력 (0~6, 클수록 작고 느림)
+        :param sidecar: ComfyUI 메타데이터를 <파일>.json으로 저장할지 여부
+        """
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"Unknown output codec '{codec}'. Expected one of {CODECS}")
+        self.codec = codec
+        self.max_workers = max_workers
+        self.webp_method = webp_method
+        self.sidecar = sidecar
+        self._executor = None
+        self._lock = threading.Lock()
+        self.files = 0
+        self.kept = 0 # 다시 인코딩해도 작아지지 않아 원본을 유지한 파일 수
+        self.failures = 0
+        self.original_bytes = 0
+        self.bytes_saved = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    async def process(self, name):
+        """
+        스토리지 이름 name의 출력 파일을 다시 인코딩하고 결과 파일의 스토리지 이름을 반환합니다.
+        코덱이 없거나 실패하면 name을 그대로 반환합니다 (원본 파일은 실패해도 남아 있습니다).
+        """
+        if self.codec is None:
+            return name
+        path = default_storage.path(name)
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(), transcode_output, path, self.codec, self.webp_method, self.sidecar)
+        except Exception as e: # 손상된 파일, 지원하지 않는 형식, 디스크 오류 등
+            with self._lock:
+                self.failures += 1
+            logger.warning(f"Could not transcode output {name} with {self.codec}: {e}")
+            return name
+        saved = result['original_bytes'] - result['bytes']
+        with self._lock:
+            self.files += 1
+            self.original_bytes += result['original_bytes']
+            self.bytes_saved += saved
+            if result['codec'] is None:
+                self.kept += 1
+        new_name = os.path.join(os.path.dirname(name), os.path.basename(result['path'])).replace(os.sep, '/')
+        logger.info(f"Transcoded {name} -> {new_name} ({result['original_bytes'] / 1024:.0f} KB -> "
+                    f"{result['bytes'] / 1024:.0f} KB, {self.codec})")
+        return new_name
+
+    def stats(self):
+        with self._lock:
+            return {
+                'codec': self.codec,
+                'files': self.files,
+                'kept_original': self.kept,
+                'failures': self.failures,
+                'original_bytes': self.original_bytes,
+                'bytes_saved': self.bytes_saved,
+                'saved_ratio': round(self.bytes_saved / self.original_bytes, 3) if self.original_bytes else 0.0,
+            }
+
+
+_codec = None
+_codec_lock = threading.Lock()
+
+
+def get_output_codec():
+    """프로세스 전역 출력 코덱 단계를 반환합니다 (settings.COMFYUI_OUTPUT_CODEC, COMFYUI_OUTPUT_CODEC_WORKERS 등)."""
+    global _codec
+    if _codec is None:
+        with _codec_lock:
+            if _codec is None:
+                _codec = OutputCodec(
+                    codec=getattr(settings, 'COMFYUI_OUTPUT_CODEC', None),
+                    max_workers=getattr(settings, 'COMFYUI_OUTPUT_CODEC_WORKERS', 2),
+                    webp_method=getattr(settings, 'COMFYUI_OUTPUT_WEBP_METHOD', 4),
+                    sidecar=getattr(settings, 'COMFYUI_OUTPUT_METADATA_SIDECAR', True),
+                )
+    return _codec
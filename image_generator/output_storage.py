@@ -0,0 +1,70 @@
+# image_generator/output_storage.py
+
+import errno
+import logging
+import os
+
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+
+def storage_name(path):
+    """
+    MEDIA_ROOT 아래의 절대 경로를 Django 스토리지 이름(MEDIA_ROOT 기준 상대 경로)으로 바꿉니다.
+    Django 스토리지는 POSIX 환경에서 절대 경로를 path traversal로 간주해 거부합니다.
+    """
+    from django.conf import settings
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(path)
+    if os.path.commonpath([media_root, path]) == media_root:
+        return os.path.relpath(path, media_root).replace(os.sep, '/')
+    return path
+
+
+def commit_file(source_path, name, keep_source=False):
+    """
+    파일을 내용 복사 없이 스토리지 이름 name의 위치로 옮기고 실제로 저장된 스토리지 이름을 반환합니다.
+    같은 이름이 이미 있으면 default_storage.get_available_name()으로 새 이름을 고르며,
+    os.link는 대상이 이미 있으면 실패하므로 동시에 같은 이름을 고른 다른 작업의 파일을 덮어쓰지 않습니다.
+    (이 함수는 블로킹 파일시스템 호출이므로 이벤트 루프에서는 asyncio.to_thread로 실행하세요.)
+    :param source_path: 옮길 파일. 대상과 같은 파일시스템에 있어야 합니다.
+    :param keep_source: True면 하드링크만 만들고 원본을 남겨 둡니다.
+    :raises OSError: 다른 장치(EXDEV) 등으로 링크/rename이 불가능한 경우
+    """
+    os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+    if not keep_source:
+        # 임시 파일(mkstemp)은 0600으로 만들어지므로 스토리지가 저장하는 파일과 같은 권한으로 맞춥니다.
+        os.chmod(source_path, default_storage.file_permissions_mode or 0o644)
+    while True:
+        name = default_storage.get_available_name(name)
+        target_path = default_storage.path(name)
+        try:
+            os.link(source_path, target_path)
+        except FileExistsError:
+            continue # 다른 작업이 방금 같은 이름을 가져갔으므로 다시 고릅니다.
+        except OSError as e:
+            if keep_source or e.errno == errno.EXDEV:
+                raise
+            # 하드링크를 지원하지 않는 파일시스템: 이름을 다시 확인한 뒤 rename으로 대체합니다.
+            if os.path.exists(target_path):
+                continue
+            os.replace(source_path, target_path)
+            return name
+        if not keep_source:
+            os.remove(source_path)
+        return name
+
+
+def resolve_shared_output(output_root, filename, subfolder='', folder_type='output'):
+    """
+    ComfyUI /history의 filename/subfolder/type을 ComfyUI와 파일시스템을 공유할 때의 실제 파일 경로로 바꿉니다.
+    'output' 타입만 지원하며, 경로가 output_root 밖을 가리키거나 파일이 없으면 None을 반환합니다.
+    """
+    if folder_type != 'output':
+        return None
+    root = os.path.abspath(output_root)
+    path = os.path.abspath(os.path.join(root, subfolder or '', filename))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
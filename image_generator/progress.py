@@ -0,0 +1,200 @@
+# image_generator/progress.py
+
+import asyncio
+import logging
+import queue
+import threading
+from collections import OrderedDict
+
+from .comfy_events import add_event_observer
+
+logger = logging.getLogger(__name__)
+
+# 구독자별 이벤트 대기열 크기 (느린 구독자의 대기열이 가득 차면 새 이벤트를 버립니다)
+SUBSCRIBER_QUEUE_SIZE = 256
+# 완료된 작업의 마지막 상태를 보관하는 최대 개수 (늦게 연결한 구독자용)
+FINISHED_TASKS_MAX = 512
+# 작업 완료 상태
+TERMINAL_STATUSES = ('COMPLETED', 'FAILED')
+# 브라우저로 전달하는 ComfyUI 이벤트 종류
+RELAYED_EVENTS = ('execution_start', 'execution_cached', 'executing', 'progress', 'executed', 'preview')
+
+
+class ProgressSubscription:
+    """
+    한 작업(task_id)의 진행 이벤트를 (event, data) 순서대로 받는 구독입니다. 사용 후 close()를 호출하세요.
+    이벤트 루프 안에서 만들면 await get()으로, 루프 밖(WSGI 스트리밍 응답)에서 만들면 get_blocking()으로 받습니다.
+    """
+
+    def __init__(self, hub, task_id, previews):
+        self.hub = hub
+        self.task_id = task_id
+        self.previews = previews
+        try:
+            self.loop = asyncio.get_running_loop()
+            self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        except RuntimeError:
+            self.loop = None
+            self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def get_blocking(self, timeout):
+        """:raises queue.Empty: timeout 동안 이벤트가 없을 때"""
+        return self.queue.get(timeout=timeout)
+
+    def offer(self, event, data):
+        # 이벤트 루프가 있으면 그 루프 스레드에서만 호출됩니다.
+        try:
+            self.queue.put_nowait((event, data))
+        except (asyncio.QueueFull, queue.Full):
+            pass
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+
+class ProgressHub:
+    """
+    ComfyUI 웹소켓 이벤트를 prompt_id -> 채널 -> task_id 순으로 찾아 구독자(SSE 응답)에게 전달합니다.
+    채널은 생성 작업 하나를 뜻하며, 동일 요청 병합(single-flight) 시 여러 task_id가 같은 채널을 공유합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._task_channels = {} # task_id -> channel
+        self._channel_tasks = {} # channel -> {task_id, ...}
+        self._prompts = {} # prompt_id -> (channel, {node_id: class_type})
+        self._subscribers = {} # task_id -> [ProgressSubscription]
+        self._last_progress = {} # channel -> 마지막 progress 이벤트 (늦게 연결한 구독자용)
+        self._finished = OrderedDict() # task_id -> 마지막 status 데이터
+
+    # --- 생성 작업 쪽 ---
+
+    def attach(self, task_id, channel):
+        """task_id가 channel(생성 작업)의 이벤트를 받도록 연결합니다."""
+        if task_id is None:
+            return
+        task_id = str(task_id)
+        with self._lock:
+            self._detach(task_id)
+            self._task_channels[task_id] = channel
+            self._channel_tasks.setdefault(channel, set()).add(task_id)
+            self._finished.pop(task_id, None)
+
+    def _detach(self, task_id):
+        channel = self._task_channels.pop(task_id, None)
+        if channel is not None:
+            task_ids = self._channel_tasks.get(channel)
+            if task_ids is not None:
+                task_ids.discard(task_id)
+                if not task_ids:
+                    del self._channel_tasks[channel]
+
+    def bind_prompt(self, prompt_id, channel, nodes=None):
+        """ComfyUI prompt_id의 이벤트를 channel로 보냅니다. nodes는 executing 이벤트에 노드 종류를 붙이는 데 사용합니다."""
+        class_types = {node_id: node.get('class_type') for node_id, node in (nodes or {}).items()}
+        with self._lock:
+            self._prompts[str(prompt_id)] = (channel, class_types)
+
+    def release_prompt(self, prompt_id):
+        with self._lock:
+            entry = self._prompts.pop(str(prompt_id), None)
+            if entry is not None:
+                self._last_progress.pop(entry[0], None)
+
+    def publish(self, channel, event, data):
+        """channel에 연결된 모든 task_id의 구독자에게 이벤트를 보냅니다."""
+        with self._lock:
+            task_ids = list(self._channel_tasks.get(channel, ()))
+        for task_id in task_ids:
+            self._deliver(task_id, event, data)
+
+    def finish(self, task_id, data):
+        """작업의 최종 상태(status 이벤트)를 보내고 채널 연결을 끊습니다. 이후 구독자는 이 상태를 바로 받습니다."""
+        task_id = str(task_id)
+        with self._lock:
+            self._detach(task_id)
+            self._finished[task_id] = data
+            while len(self._finished) > FINISHED_TASKS_MAX:
+                self._finished.popitem(last=False)
+        self._deliver(task_id, 'status', data)
+
+    # --- ComfyUI 이벤트 (웹소켓 수신 스레드) ---
+
+    def on_comfy_event(self, host, prompt_id, event_type, data):
+        if event_type not in RELAYED_EVENTS:
+            return
+        entry = self._prompts.get(prompt_id)
+        if entry is None:
+            return
+        channel, class_types = entry
+        if event_type == 'preview':
+            payload = data
+        else:
+            payload = {k: v for k, v in data.items() if k in ('node', 'value', 'max', 'nodes', 'display_node')}
+            if payload.get('node') is not None:
+                payload['class_type'] = class_types.get(str(payload['node']))
+        if event_type == 'progress':
+            with self._lock:
+                self._last_progress[channel] = payload
+        self.publish(channel, event_type, payload)
+
+    # --- 구독 ---
+
+    def subscribe(self, task_id, previews=False):
+        """
+        task_id의 이벤트 구독을 시작합니다.
+        이미 끝난 작업이면 최종 status가, 진행 중이면 마지막 progress가 먼저 들어 있습니다.
+        """
+        task_id = str(task_id)
+        subscription = ProgressSubscription(self, task_id, previews)
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append(subscription)
+            finished = self._finished.get(task_id)
+            channel = self._task_channels.get(task_id)
+            last_progress = self._last_progress.get(channel) if channel is not None else None
+        if finished is not None:
+            subscription.offer('status', finished)
+        elif last_progress is not None:
+            subscription.offer('progress', last_progress)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.task_id)
+            if subscriptions and subscription in subscriptions:
+                subscriptions.remove(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.task_id]
+
+    def _deliver(self, task_id, event, data):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(task_id, ()))
+        for subscription in subscriptions:
+            if event == 'preview' and not subscription.previews:
+                continue
+            if subscription.loop is None:
+                subscription.offer(event, data)
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event, data)
+            except RuntimeError: # 구독자의 이벤트 루프가 이미 닫힘
+                self._unsubscribe(subscription)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_progress_hub():
+    """프로세스 전역 진행 이벤트 허브를 반환합니다 (처음 호출 시 ComfyUI 이벤트 구독을 시작합니다)."""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                hub = ProgressHub()
+                add_event_observer(hub.on_comfy_event)
+                _hub = hub
+    return _hub
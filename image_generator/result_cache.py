@@ -0,0 +1,121 @@
+# image_generator/result_cache.py
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def compute_request_hash(**fields):
+    """
+    생성 결과에 영향을 주는 값(번역된 프롬프트, 카테고리, 워크플로우, 입력 이미지 해시, 파라미터 등)으로
+    요청 해시를 계산합니다. 같은 값이면 항상 같은 해시가 나오도록 키를 정렬한 JSON을 사용합니다.
+    """
+    canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def seed_from_hash(request_hash):
+    """요청 해시에서 KSampler 시드(0 ~ 2**32 - 1)를 결정적으로 만듭니다."""
+    return int(request_hash[:8], 16)
+
+
+class GenerationResultCache:
+    """
+    요청 해시 -> 저장된 생성 결과(COMFYUI_OUTPUT_DIR 아래 파일의 스토리지 이름 등)를 보관하는 LRU 캐시입니다.
+    max_entries를 넘으면 가장 오래 사용되지 않은 항목부터, ttl이 지난 항목은 조회 시 제거합니다.
+    캐시는 결과 파일을 가리키기만 하므로 항목이 제거되어도 파일은 지우지 않습니다.
+    """
+
+    def __init__(self, max_entries=256, ttl=86400):
+        """
+        :param max_entries: 보관할 최대 결과 수 (0이면 캐시 사용 안 함)
+        :param ttl: 결과를 재사용할 수 있는 시간 (초, None이면 무제한)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # request_hash -> (stored_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, request_hash):
+        """캐시된 결과를 반환합니다. 없거나 만료되었으면 None을 반환합니다."""
+        with self._lock:
+            entry = self._entries.get(request_hash)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[request_hash]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(request_hash)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, request_hash, result):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[request_hash] = (time.monotonic(), result)
+            self._entries.move_to_end(request_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, request_hash):
+        """결과 파일이 사라진 경우 등 항목을 버릴 때 사용합니다. 직전 get()의 적중은 실패로 다시 계산합니다."""
+        with self._lock:
+            if self._entries.pop(request_hash, None) is not None:
+                self.evictions += 1
+                self.hits = max(0, self.hits - 1)
+                self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """모니터링용 적중률 통계를 반환합니다."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """settings로 구성된 프로세스 전역 생성 결과 캐시를 반환합니다."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                from django.conf import settings
+                _result_cache = GenerationResultCache(
+                    max_entries=getattr(settings, 'COMFYUI_RESULT_CACHE_MAX_ENTRIES', 256),
+                    ttl=getattr(settings, 'COMFYUI_RESULT_CACHE_TTL', 86400),
+                )
+    return _result_cache
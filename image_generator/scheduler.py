@@ -0,0 +1,279 @@
+# image_generator/scheduler.py
+
+import asyncio
+import concurrent.futures
+import contextlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 대기 시간 통계(평균/p95)에 사용하는 최근 표본 수
+WAIT_SAMPLES_MAX = 256
+# 작업 시간 이동 평균(EWMA)의 가중치
+SERVICE_TIME_ALPHA = 0.2
+# Retry-After 상한 (초)
+RETRY_AFTER_MAX = 300
+
+
+class GenerationQueueFull(Exception):
+    """생성 대기열이 가득 차 요청을 받을 수 없을 때 발생합니다. retry_after는 다시 시도하기까지 권장 대기 시간(초)입니다."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """대기열에서 슬롯을 기다리는 요청 하나입니다."""
+
+    __slots__ = ('owner', 'signature', 'future', 'enqueued_at')
+
+    def __init__(self, owner, signature=None):
+        self.owner = owner
+        self.signature = signature
+        # 다른 스레드의 이벤트 루프에서 슬롯을 넘겨받을 수 있도록 concurrent.futures.Future를 사용합니다.
+        self.future = concurrent.futures.Future()
+        self.enqueued_at = time.monotonic()
+
+
+class FairShareScheduler:
+    """
+    ComfyUI 생성 작업의 동시 실행 수를 max_in_flight로 제한하는 공정 분배 스케줄러입니다.
+    - 슬롯이 없으면 요청은 소유자(대화 session_id)별 대기열에 들어가고, 슬롯이 비면 소유자들을 라운드 로빈으로 돌며 하나씩 넘겨줍니다.
+      한 사용자가 요청을 연달아 보내도 다른 사용자의 요청은 그 사이사이에 실행됩니다.
+    - 전체 대기 수가 max_queued, 소유자별 대기 수가 max_queued_per_owner에 이르면 GenerationQueueFull을 발생시킵니다.
+    - 모델 친화도: 요청의 모델 시그니처(워크플로우의 로더 노드)가 마지막으로 보낸 작업과 다르면, 같은 시그니처의 대기 요청을
+      먼저 보내 ComfyUI가 VRAM의 가중치를 바꾸는 횟수를 줄입니다. 다른 모델의 요청이 affinity_max_wait초 넘게 기다렸거나
+      연속으로 affinity_max_batch번 밀렸으면 라운드 로빈 차례대로 보냅니다 (기아 방지).
+    """
+
+    def __init__(self, max_in_flight=2, max_queued=32, max_queued_per_owner=4, expected_service_time=30.0,
+                 affinity_max_wait=60.0, affinity_max_batch=8):
+        """
+        :param max_in_flight: 동시에 ComfyUI로 보낼 수 있는 최대 작업 수
+        :param max_queued: 전체 대기열 크기
+        :param max_queued_per_owner: 소유자 하나가 대기열에 넣을 수 있는 최대 요청 수
+        :param expected_service_time: 작업 시간 측정값이 없을 때 Retry-After 계산에 사용하는 작업 시간 (초)
+        :param affinity_max_wait: 다른 모델의 요청이 친화도 때문에 밀려 기다릴 수 있는 최대 시간 (초)
+        :param affinity_max_batch: 다른 모델의 요청을 앞질러 같은 모델의 요청을 연속으로 보낼 수 있는 최대 횟수 (0이면 친화도 사용 안 함)
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max_queued
+        self.max_queued_per_owner = max_queued_per_owner
+        self.affinity_max_wait = affinity_max_wait
+        self.affinity_max_batch = affinity_max_batch
+        self._lock = threading.Lock()
+        self._queues = OrderedDict() # owner -> deque[_Waiter]. 순서가 라운드 로빈 차례입니다.
+        self._queued = 0
+        self._in_flight = 0
+        self._service_time = expected_service_time
+        self._waits = deque(maxlen=WAIT_SAMPLES_MAX)
+        self._signature = None # 마지막으로 보낸 작업의 모델 시그니처 (VRAM에 올라가 있다고 보는 모델)
+        self._affinity_run = 0 # 다른 모델의 요청을 앞질러 연속으로 보낸 횟수
+        self.admitted = 0
+        self.rejected = 0
+        self.model_swaps = 0
+        self.swaps_avoided = 0
+
+    # --- 입장 제어 ---
+
+    def check_admission(self, owner=None):
+        """지금 요청하면 거절될 상황이면 GenerationQueueFull을 발생시킵니다 (슬롯을 잡지는 않습니다)."""
+        with self._lock:
+            if self._must_wait():
+                self._check_queue_locked(owner)
+
+    def _must_wait(self):
+        return self._in_flight >= self.max_in_flight or self._queued > 0
+
+    def _check_queue_locked(self, owner):
+        if self._queued >= self.max_queued:
+            reason = f"generation queue is full ({self._queued} waiting)"
+        elif len(self._queues.get(owner, ())) >= self.max_queued_per_owner:
+            reason = f"too many queued requests for this conversation ({self.max_queued_per_owner} waiting)"
+        else:
+            return
+        self.rejected += 1
+        raise GenerationQueueFull(reason, self._retry_after_locked())
+
+    def _retry_after_locked(self):
+        # 앞선 대기 요청과 이 요청이 모두 슬롯을 얻을 때까지의 예상 시간
+        rounds = (self._queued + 1) / self.max_in_flight
+        return max(1, min(RETRY_AFTER_MAX, math.ceil(self._service_time * rounds)))
+
+    # --- 슬롯 ---
+
+    async def acquire(self, owner=None, signature=None):
+        """
+        슬롯을 하나 얻을 때까지 기다립니다. 사용이 끝나면 release()를 호출해야 합니다 (slot() 사용 권장).
+        :param signature: 작업이 사용하는 모델 시그니처 (WorkflowTemplate.model_signature). None이면 어떤 모델과도 묶입니다.
+        :raises GenerationQueueFull: 대기열이 가득 찬 경우
+        """
+        await self.wait(self.reserve(owner, signature))
+
+    def reserve(self, owner=None, signature=None):
+        """
+        [추가] 슬롯을 예약합니다 (동기 함수). 대기열 한도 확인과 대기열 등록이 한 번에 일어나므로, 다른 스레드에서 작업을 넣는
+        생성 워커 풀이 거절(429) 여부를 제출 시점에 바로 알 수 있습니다. 반환한 예약은 wait()로 기다립니다.
+        :raises GenerationQueueFull: 대기열이 가득 찬 경우
+        """
+        waiter = _Waiter(owner, signature)
+        with self._lock:
+            if not self._must_wait():
+                self._in_flight += 1
+                self.admitted += 1
+                self._waits.append(0.0)
+                self._affinity_run = 0 # 기다리는 요청이 없으므로 앞지른 요청도 없습니다.
+                self._switch_signature_locked(signature)
+                waiter.future.set_running_or_notify_cancel()
+                waiter.future.set_result(None)
+                return waiter
+            self._check_queue_locked(owner)
+            self._queues.setdefault(owner, deque()).append(waiter)
+            self._queued += 1
+            queued = self._queued
+        logger.info(f"Generation slot busy ({self._in_flight}/{self.max_in_flight} in flight); queued request for {owner} ({queued} waiting).")
+        return waiter
+
+    async def wait(self, waiter):
+        """reserve()로 예약한 슬롯을 넘겨받을 때까지 기다립니다. 기다리는 중 취소되면 예약을 거둬들입니다."""
+        if waiter.future.done():
+            return
+        try:
+            await asyncio.wrap_future(waiter.future)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter):
+        with self._lock:
+            queue = self._queues.get(waiter.owner)
+            if queue is not None and waiter in queue:
+                # 아직 대기 중: 대기열에서만 빼면 됩니다.
+                queue.remove(waiter)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[waiter.owner]
+                return
+            granted = waiter.future.done() and not waiter.future.cancelled()
+        if granted:
+            # 슬롯을 넘겨받은 직후 취소되었으므로 다음 요청에 넘겨줍니다.
+            self.release()
+
+    def release(self, service_time=None):
+        """슬롯을 반납하고 다음 차례의 대기 요청에 넘겨줍니다. service_time은 작업에 걸린 시간(초)입니다."""
+        with self._lock:
+            self._in_flight -= 1
+            if service_time is not None:
+                self._service_time += SERVICE_TIME_ALPHA * (service_time - self._service_time)
+            self._dispatch_locked()
+
+    def _matches(self, signature):
+        return signature is None or self._signature is None or signature == self._signature
+
+    def _switch_signature_locked(self, signature):
+        if signature is None:
+            return
+        if self._signature is not None and signature != self._signature:
+            self.model_swaps += 1
+            self._affinity_run = 0
+        self._signature = signature
+
+    def _pick_owner_locked(self, now):
+        """
+        다음에 슬롯을 넘겨줄 소유자를 고릅니다. 기본은 라운드 로빈 차례(첫 소유자)이고, 그 요청의 모델이 마지막으로 보낸 작업과 다르면
+        같은 모델을 쓰는 다른 소유자의 맨 앞 요청을 먼저 보냅니다. 소유자별 요청 순서는 바뀌지 않습니다.
+        """
+        first_owner, first_queue = next(iter(self._queues.items()))
+        if self._matches(first_queue[0].signature) or self._affinity_run >= self.affinity_max_batch:
+            return first_owner
+        # 기아 방지: 다른 모델의 요청이 너무 오래 기다렸으면 더 미루지 않습니다.
+        oldest_other = min(queue[0].enqueued_at for queue in self._queues.values() if not self._matches(queue[0].signature))
+        if now - oldest_other >= self.affinity_max_wait:
+            return first_owner
+        for owner, queue in self._queues.items():
+            if self._matches(queue[0].signature):
+                self._affinity_run += 1
+                self.swaps_avoided += 1
+                return owner
+        return first_owner
+
+    def _dispatch_locked(self):
+        now = time.monotonic()
+        while self._in_flight < self.max_in_flight and self._queues:
+            owner = self._pick_owner_locked(now)
+            queue = self._queues[owner]
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(owner) # 다음 차례는 다른 소유자
+            else:
+                del self._queues[owner]
+            # 취소된 대기 요청은 건너뜁니다.
+            if not waiter.future.set_running_or_notify_cancel():
+                continue
+            self._in_flight += 1
+            self.admitted += 1
+            self._waits.append(now - waiter.enqueued_at)
+            self._switch_signature_locked(waiter.signature)
+            waiter.future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, owner=None, signature=None):
+        """슬롯을 얻어 블록을 실행하고 반납합니다. 블록 실행 시간은 Retry-After 예측에 반영됩니다."""
+        await self.acquire(owner, signature)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    # --- 모니터링 ---
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            now = time.monotonic()
+            oldest = min((q[0].enqueued_at for q in self._queues.values()), default=None)
+            return {
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+                'queued': self._queued,
+                'max_queued': self.max_queued,
+                'queued_owners': len(self._queues),
+                'oldest_wait_seconds': round(now - oldest, 3) if oldest is not None else 0.0,
+                'wait_avg_seconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'wait_p95_seconds': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                'service_time_seconds': round(self._service_time, 3),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'model_swaps': self.model_swaps,
+                'model_swaps_avoided': self.swaps_avoided,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_generation_scheduler():
+    """이미지 생성 작업에 사용하는 프로세스 전역 스케줄러를 반환합니다 (settings.COMFYUI_MAX_IN_FLIGHT 등)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FairShareScheduler(
+                    max_in_flight=getattr(settings, 'COMFYUI_MAX_IN_FLIGHT', 2),
+                    max_queued=getattr(settings, 'COMFYUI_MAX_QUEUED', 32),
+                    max_queued_per_owner=getattr(settings, 'COMFYUI_MAX_QUEUED_PER_CONVERSATION', 4),
+                    expected_service_time=getattr(settings, 'COMFYUI_EXPECTED_GENERATION_SECONDS', 30),
+                    affinity_max_wait=getattr(settings, 'COMFYUI_MODEL_AFFINITY_MAX_WAIT', 60),
+                    affinity_max_batch=getattr(settings, 'COMFYUI_MODEL_AFFINITY_MAX_BATCH', 8),
+                )
+    return _scheduler
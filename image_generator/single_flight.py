@@ -0,0 +1,123 @@
+# image_generator/single_flight.py
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """같은 키로 진행 중인 작업 하나와 그 결과를 기다리는 요청 수입니다."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.task = None
+        # 이벤트 루프가 다른 요청도 기다릴 수 있도록 concurrent.futures.Future로 결과를 전달합니다.
+        self.future = concurrent.futures.Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    같은 키의 작업이 이미 진행 중이면 새로 실행하지 않고 진행 중인 작업의 결과를 함께 기다리게 합니다.
+    - 작업의 결과/예외는 기다리던 모든 요청에 그대로 전달됩니다.
+    - 기다리던 요청 하나가 취소되어도 작업은 계속되고, 모든 요청이 취소되었을 때만 작업을 취소합니다.
+    - 작업이 끝나면 키를 즉시 비우므로, 이후 같은 요청은 새 작업을 시작합니다 (결과 재사용은 result_cache 담당).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def run(self, key, coro_factory):
+        """
+        :param key: 요청을 구분하는 정규화된 키
+        :param coro_factory: 작업 코루틴을 만드는 인자 없는 함수 (키당 한 번만 호출됩니다)
+        :return: 작업의 결과
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight(loop)
+                flight.task = loop.create_task(self._execute(key, flight, coro_factory))
+                self._flights[key] = flight
+                self.started += 1
+            else:
+                self.coalesced += 1
+                logger.info(f"Joining in-flight generation {key[:12]} ({flight.waiters} request(s) already waiting).")
+            flight.waiters += 1
+
+        cancelled = False
+        try:
+            # shield: 이 요청이 취소되어도 공유 future 자체는 취소되지 않도록 합니다.
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            self._leave(key, flight, cancelled)
+
+    def _leave(self, key, flight, cancelled=False):
+        with self._lock:
+            flight.waiters -= 1
+            abandon = cancelled and flight.waiters == 0 and not flight.future.done()
+            if abandon and self._flights.get(key) is flight:
+                # 새로 들어오는 요청은 취소 중인 작업에 합류하지 않고 새 작업을 시작합니다.
+                del self._flights[key]
+        if abandon:
+            self.cancelled += 1
+            logger.info(f"All requests waiting on generation {key[:12]} were cancelled; cancelling the job.")
+            flight.loop.call_soon_threadsafe(flight.task.cancel)
+
+    async def _execute(self, key, flight, coro_factory):
+        try:
+            result = await coro_factory()
+        except Exception as e:
+            self._forget(key, flight)
+            flight.future.set_exception(e)
+            # 예외는 기다리는 요청들에게 전달되었으므로 태스크에서는 다시 발생시키지 않습니다.
+            return
+        except BaseException: # 취소(CancelledError) 등
+            self._forget(key, flight)
+            flight.future.cancel()
+            raise
+        self._forget(key, flight)
+        flight.future.set_result(result)
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'waiting': sum(f.waiters for f in self._flights.values()),
+                'started': self.started,
+                'coalesced': self.coalesced,
+                'cancelled': self.cancelled,
+            }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """이미지 생성 요청에 사용하는 프로세스 전역 SingleFlight를 반환합니다."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
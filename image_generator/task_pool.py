@@ -0,0 +1,177 @@
+# image_generator/task_pool.py
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .comfy_api_client import close_comfy_clients
+from .scheduler import FairShareScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationWorkerPool:
+    """
+    이미지 생성 작업을 HTTP 요청과 분리해 실행하는 asyncio 워커 풀입니다.
+    전용 스레드의 이벤트 루프에서 최대 max_workers개의 작업을 동시에 실행하므로,
+    요청은 task_id만 받고 바로 끝나며 열린 연결 수와 요청 처리 워커 점유 시간이 GPU 작업 시간에 비례하지 않습니다.
+    요청마다 이벤트 루프가 다른 WSGI에서도 작업이 요청보다 오래 살아 있도록 루프를 직접 소유합니다.
+    [수정] 실행을 기다리는 작업은 FIFO 대신 FairShareScheduler(워커 수만큼의 슬롯)에 들어가므로, 생성 스케줄러와 같은 규칙으로
+    소유자(대화)별 라운드 로빈, 소유자별/전체 대기 한도(넘으면 submit()이 GenerationQueueFull), 모델 친화도 순서로 시작됩니다.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, max_pending_per_owner=4, expected_job_time=30.0,
+                 affinity_max_wait=60.0, affinity_max_batch=8):
+        """
+        :param max_workers: 동시에 실행하는 작업 수 (ComfyUI 동시 실행 수는 생성 스케줄러가 따로 제한합니다)
+        :param max_pending: 실행을 기다리는 작업의 최대 수
+        :param max_pending_per_owner: 소유자(대화) 하나가 기다리게 할 수 있는 최대 작업 수
+        :param expected_job_time: 측정값이 없을 때 Retry-After 계산에 쓰는 작업 시간 (초)
+        :param affinity_max_wait, affinity_max_batch: 모델 친화도 설정 (FairShareScheduler 참고)
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self._slots = FairShareScheduler(
+            max_in_flight=self.max_workers, max_queued=max_pending, max_queued_per_owner=max_pending_per_owner,
+            expected_service_time=expected_job_time, affinity_max_wait=affinity_max_wait, affinity_max_batch=affinity_max_batch,
+        )
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._jobs = set() # 실행 중/대기 중인 작업 태스크 (이벤트 루프는 태스크를 약하게만 참조합니다)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _start_locked(self):
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            ready.set()
+            loop.run_forever()
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='generation-worker-pool', daemon=True)
+        self._thread.start()
+        ready.wait()
+        logger.info(f"Started generation worker pool ({self.max_workers} workers, {self.max_pending} pending max).")
+
+    def check_admission(self, owner=None):
+        """지금 제출하면 거절될 상황이면 GenerationQueueFull을 발생시킵니다 (자리를 잡지는 않습니다)."""
+        self._slots.check_admission(owner)
+
+    def submit(self, task_id, coro_factory, owner=None, signature=None):
+        """
+        coro_factory()가 만드는 코루틴을 워커 풀에서 실행하도록 대기열에 넣고 바로 반환합니다.
+        코루틴은 차례가 되어 실행을 시작할 때 만들어지며, 결과와 상태 기록은 코루틴이 직접 처리해야 합니다.
+        :param owner: 작업을 요청한 대화의 session_id (라운드 로빈과 소유자별 대기 한도의 단위)
+        :param signature: 작업이 사용할 모델 시그니처 (모델 친화도, None이면 어떤 모델과도 묶입니다)
+        :raises GenerationQueueFull: 전체 또는 소유자의 대기열이 가득 찬 경우
+        """
+        waiter = self._slots.reserve(owner, signature)
+        with self._lock:
+            self._start_locked()
+            self.submitted += 1
+            loop = self._loop
+        loop.call_soon_threadsafe(self._start_job, loop, str(task_id), waiter, coro_factory)
+
+    def _start_job(self, loop, task_id, waiter, coro_factory):
+        job = loop.create_task(self._run(task_id, waiter, coro_factory), name=f'generation-task-{task_id}')
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _run(self, task_id, waiter, coro_factory):
+        await self._slots.wait(waiter)
+        started = time.monotonic()
+        failed = True
+        try:
+            # 작업을 별도 태스크로 실행합니다. 작업이 취소(버려진 작업)되어도 슬롯은 반납되고 다음 작업이 시작됩니다.
+            job = asyncio.ensure_future(coro_factory())
+            await asyncio.wait([job])
+            failed = job.cancelled() or job.exception() is not None
+            if not job.cancelled() and job.exception() is not None:
+                logger.error(f"Generation task {task_id} raised an unhandled exception.", exc_info=job.exception())
+        finally:
+            self._slots.release(time.monotonic() - started)
+            with self._lock:
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+    def shutdown(self, timeout=10.0):
+        """
+        [추가] 워커 풀의 이벤트 루프를 멈춥니다. 루프에 남은 작업을 취소하고, 루프에서 만든 ComfyUI HTTP 연결 풀을 닫은 뒤 루프를 닫습니다.
+        프로세스가 끝날 때(atexit) 호출되며, 이후 submit()은 새 루프를 시작합니다.
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Generation worker pool did not shut down cleanly: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        logger.info("Stopped generation worker pool.")
+
+    async def _close(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await close_comfy_clients()
+
+    def stats(self):
+        slots = self._slots.stats()
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'running': slots['in_flight'],
+                'pending': slots['queued'],
+                'max_pending': self.max_pending,
+                'pending_owners': slots['queued_owners'],
+                'oldest_wait_seconds': slots['oldest_wait_seconds'],
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': slots['rejected'],
+                'job_time_seconds': slots['service_time_seconds'],
+                'model_swaps_avoided': slots['model_swaps_avoided'],
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_generation_worker_pool():
+    """
+    이미지 생성 작업을 실행하는 프로세스 전역 워커 풀을 반환합니다
+    (settings.GENERATION_WORKERS, GENERATION_MAX_PENDING_TASKS, COMFYUI_MAX_QUEUED_PER_CONVERSATION, COMFYUI_MODEL_AFFINITY_*).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = GenerationWorkerPool(
+                    max_workers=getattr(settings, 'GENERATION_WORKERS', 4),
+                    max_pending=getattr(settings, 'GENERATION_MAX_PENDING_TASKS', 64),
+                    max_pending_per_owner=getattr(settings, 'COMFYUI_MAX_QUEUED_PER_CONVERSATION', 4),
+                    expected_job_time=getattr(settings, 'COMFYUI_EXPECTED_GENERATION_SECONDS', 30),
+                    affinity_max_wait=getattr(settings, 'COMFYUI_MODEL_AFFINITY_MAX_WAIT', 60),
+                    affinity_max_batch=getattr(settings, 'COMFYUI_MODEL_AFFINITY_MAX_BATCH', 8),
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
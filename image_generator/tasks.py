@@ -0,0 +1,70 @@
+# image_generator/tasks.py
+
+import logging
+
+from asgiref.sync import async_to_sync
+from celery import shared_task
+
+from llm_cores.gemma_service import get_docent_response
+from llm_cores.translation_service import translate_text
+
+from .comfy_api_client import close_comfy_clients
+from .image_logic_parser import GENERATION_MODE_DEFAULT
+
+logger = logging.getLogger(__name__)
+
+# 작업별 큐 이름. settings.CELERY_TASK_ROUTES와 CELERY_WORKER_QUEUES가 이 이름을 사용합니다.
+# 큐마다 워커를 따로 띄우면 GPU(생성), CPU(번역), I/O(도슨트) 작업을 서로 다른 프로세스/호스트에서 따로 늘릴 수 있습니다.
+GENERATION_QUEUE = 'generation'
+TRANSLATION_QUEUE = 'translation'
+DOCENT_QUEUE = 'docent'
+
+
+@shared_task
+def debug_add(x, y):
+    """브로커/워커/결과 백엔드 연결 확인용 태스크입니다 (test_celery_task.py)."""
+    return x + y
+
+
+@shared_task(name='image_generator.tasks.generate_image')
+def generate_image(task_id, conversation_id, user_message, uploaded_image_path, num_images=1, deterministic=None,
+                   generation_mode=GENERATION_MODE_DEFAULT):
+    """
+    이미지 생성 작업 하나를 실행합니다 (generation 큐, GPU 워커).
+    워커 풀(task_pool)에서 실행할 때와 같은 _generate_image_task_runner를 사용하므로, 상태는 task_status_<task_id> 캐시에,
+    결과는 대화에 기록됩니다. 웹 서버와 워커가 같은 캐시(Redis 등)와 MEDIA_ROOT를 공유해야 합니다.
+    상태 조회는 웹 서버 프로세스에서 일어나므로 워커에서는 버려진 작업 감시를 하지 않습니다.
+    """
+    from .views import _generate_image_task_runner # views가 이 모듈을 불러오므로 순환 import를 피합니다.
+
+    async def run():
+        try:
+            await _generate_image_task_runner(
+                task_id, conversation_id, user_message, uploaded_image_path, num_images, deterministic, generation_mode,
+                watch_abandonment=False,
+            )
+        finally:
+            # [수정] async_to_sync는 호출마다 새 이벤트 루프를 쓰므로, 루프가 끝나기 전에 그 루프에서 만든 ComfyUI 연결 풀을 닫습니다.
+            await close_comfy_clients()
+
+    async_to_sync(run)()
+    return task_id
+
+
+@shared_task(name='image_generator.tasks.translate')
+def translate(text, source_lang, target_lang='en'):
+    """텍스트를 번역합니다 (translation 큐, CPU 워커). 번역 모델은 워커 프로세스마다 한 번 로딩됩니다."""
+    return translate_text(text, source_lang, target_lang)
+
+
+@shared_task(name='image_generator.tasks.docent_reply')
+def docent_reply(prompt, image_data_base64=None):
+    """도슨트 응답을 생성합니다 (docent 큐, I/O 워커). 대부분의 시간을 Ollama 응답 대기에 씁니다."""
+    return get_docent_response(prompt, image_data_base64)
+
+
+@shared_task(name='image_generator.tasks.sweep_media')
+def sweep_media():
+    """고아 미디어 파일을 정리합니다 (default 큐). settings.MEDIA_GC_INTERVAL이 있으면 Celery beat가 주기적으로 실행합니다."""
+    from .media_gc import sweeper_from_settings
+    return sweeper_from_settings().sweep()
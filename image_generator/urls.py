@@ -20,6 +20,12 @@ urlpatterns = [
     # [추가됨] 이미지 생성 작업 상태 확인 API 엔드포인트
     # <uuid:task_id>는 UUID 형식의 task_id를 캡처합니다.
     path('api/tasks/<uuid:task_id>/status/', views.check_task_status_api, name='check_task_status'),
+    # [추가] 이미지 생성 진행 상황 스트림 (Server-Sent Events)
+    path('api/tasks/<uuid:task_id>/events/', views.task_events_api, name='task_events'),
+    # [추가] 배치 이미지 생성 (프롬프트 목록 x 파라미터 그리드, NDJSON 스트림)
+    path('api/batch_generate/', views.batch_generate_api, name='batch_generate'),
+    # [추가됨] ComfyUI 큐 상태 확인 API 엔드포인트
+    path('api/comfyui/queue/', views.comfyui_queue_status_api, name='comfyui_queue_status'),
     path('api/conversations/', views.get_conversations_api, name='api_conversations'),
     path('api/conversations/<uuid:conversation_id>/', views.get_conversation_history_api, name='api_conversation_history'),
     # [재추가됨] delete_oldest_conversations_api 함수 경로
@@ -1,12 +1,15 @@
 import threading
 import asyncio # asyncio를 사용하기 위해 임포트
+import queue
 import uuid
 import base64 # Base64 인코딩을 위해 임포트
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
 from django.core.cache import cache
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage # FileSystemStorage 대신 default_storage 사용
 from django.shortcuts import render
 from .models import GeneratedImage, Conversation, Message # Conversation, Message 모델 임포트 추가
@@ -23,10 +26,25 @@ import logging
 from asgiref.sync import sync_to_async # [추가] 동기 함수를 비동기 컨텍스트에서 실행하기 위함
 
 
-from llm_cores.translation_service import translate_text
+from llm_cores.translation_service import translate_text, translation_batch_stats
 from llm_cores.gemma_service import get_docent_response # Gemma 서비스 임포트
 
-from .image_logic_parser import generate_image_based_on_json_logic
+from .image_logic_parser import generate_image_single_flight, input_image_max_side, model_signature_for, GENERATION_MODES, GENERATION_MODE_DEFAULT, GENERATION_MODE_CONTROLNET
+from .image_normalization import normalize_image_async
+from .image_derivatives import ORIGINAL_SIZE, derivative_sizes, ensure_derivatives
+from .output_codec import get_output_codec
+from .comfy_api_client import close_comfy_clients
+from .comfy_backends import get_backend_router
+from .result_cache import get_result_cache
+from .control_maps import get_control_map_cache
+from .single_flight import get_single_flight
+from .progress import get_progress_hub, TERMINAL_STATUSES
+from .scheduler import GenerationQueueFull, get_generation_scheduler
+from .cancellation import get_job_tracker, get_task_watchdog
+from .task_pool import get_generation_worker_pool
+from llm_cores.translation_cache import get_translation_cache
+from .tasks import generate_image
+from .batch import expand_jobs, run_batch, run_batch_sync
 from llm_cores.positive_prompts import POSITIVE_PROMPT_MAP
 from llm_cores.negative_prompts import NEGATIVE_PROMPT_MAP
 
@@ -38,6 +56,20 @@ COMFYUI_API_URL = getattr(settings, 'COMFYUI_API_URL', 'http://localhost:8188')
 COMFYUI_HISTORY_URL = getattr(settings, 'COMFYUI_HISTORY_URL', 'http://localhost:8188/history')
 COMFYUI_IMAGE_URL = getattr(settings, 'COMFYUI_IMAGE_URL', 'http://localhost:8188/view')
 COMFYUI_INPUT_DIR = getattr(settings, 'COMFYUI_INPUT_DIR', os.path.join(settings.MEDIA_ROOT, 'comfyui_input'))
+COMFYUI_MAX_IMAGES_PER_REQUEST = getattr(settings, 'COMFYUI_MAX_IMAGES_PER_REQUEST', 4)
+# 작업 진행 SSE 스트림의 keep-alive 주석 간격 및 최대 연결 시간 (초)
+TASK_EVENTS_HEARTBEAT = getattr(settings, 'TASK_EVENTS_HEARTBEAT', 15)
+TASK_EVENTS_MAX_DURATION = getattr(settings, 'TASK_EVENTS_MAX_DURATION', 600)
+# [추가] 진행 스트림이 공유 캐시의 작업 상태를 다시 읽는 간격 (초). 다른 프로세스(Celery 워커)에서 끝난 작업의 완료도 전달합니다.
+TASK_EVENTS_STATUS_POLL = getattr(settings, 'TASK_EVENTS_STATUS_POLL', 2)
+# [추가] 작업 상태 캐시의 보관 시간 (초). 오래 대기/실행되는 작업의 PENDING/RUNNING 상태가 만료되지 않도록 충분히 길게 둡니다.
+TASK_STATUS_TTL = getattr(settings, 'TASK_STATUS_TTL', 6 * 60 * 60)
+# 상태 조회/진행 스트림 없이 이 시간(초)이 지나면 작업을 버려진 것으로 보고 취소합니다
+TASK_ABANDON_TIMEOUT = getattr(settings, 'TASK_ABANDON_TIMEOUT', 30)
+# 도슨트(Ollama 비전 모델)로 보내는 이미지의 최대 크기 (긴 변, 픽셀)
+OLLAMA_IMAGE_MAX_SIDE = getattr(settings, 'OLLAMA_IMAGE_MAX_SIDE', 896)
+# 이미지 생성 작업을 실행할 곳: 'local'(이 프로세스의 워커 풀) 또는 'celery'(generation 큐의 Celery 워커)
+GENERATION_TASK_BACKEND = getattr(settings, 'GENERATION_TASK_BACKEND', 'local')
 
 
 # --- HTML 페이지 뷰 함수들 (urls.py에 명시된 대로 복원) ---
@@ -260,9 +292,17 @@ async def delete_oldest_conversations_api(request): # [수정] async def로 변
 @csrf_exempt
 @require_GET
 async def api_get_images(request): # [수정] async def로 변경
+    """
+    전시 이미지 목록을 반환합니다.
+    [추가] size=thumb|medium|full이면 url이 해당 크기의 WebP 파생 이미지를 가리키고(없으면 이때 만듭니다),
+    size=original(기본값)이면 원본 PNG를 가리킵니다. variants에는 만들어진 모든 크기의 URL/크기가 들어 있어 srcset에 쓸 수 있습니다.
+    """
     search_query = request.GET.get('search', '')
     selected_style = request.GET.get('style', '')
     sort_order = request.GET.get('sort', 'latest')
+    size = request.GET.get('size', ORIGINAL_SIZE)
+    if size != ORIGINAL_SIZE and size not in derivative_sizes():
+        return JsonResponse({'status': 'error', 'message': f"size는 {', '.join([ORIGINAL_SIZE, *derivative_sizes()])} 중 하나여야 합니다."}, status=400)
 
     # [수정] filter 쿼리셋을 먼저 생성
     images_queryset = GeneratedImage.objects.filter(is_showcase=True)
@@ -292,13 +332,27 @@ async def api_get_images(request): # [수정] async def로 변경
         images_queryset = await sync_to_async(images_queryset.order_by)('created_at')
 
     image_list = []
+    images = await sync_to_async(list)(images_queryset) # 쿼리셋을 리스트로 변환하여 순회
+    if size != ORIGINAL_SIZE:
+        # [추가] 파생 이미지가 없는 이미지만 프로세스 풀에서 한꺼번에 만듭니다 (이미 있으면 바로 반환).
+        await asyncio.gather(*(ensure_derivatives(img) for img in images))
     # [수정] 순회도 비동기 컨텍스트에서 안전하게
-    for img in await sync_to_async(list)(images_queryset): # 쿼리셋을 리스트로 변환하여 순회
+    for img in images:
+        # GeneratedImage 모델에 image 필드가 아닌 image_file 필드가 있으므로 수정
+        # [수정] url 속성 접근도 sync_to_async (람다 사용)
+        original_url = await sync_to_async(lambda: img.image_file.url)()
+        variants = {
+            name: {'url': default_storage.url(d['name']), 'width': d['width'], 'height': d['height']}
+            for name, d in (img.derivatives or {}).items()
+        }
+        selected = variants.get(size) or {'url': original_url, 'width': img.width, 'height': img.height}
         image_list.append({
             'id': str(img.id),
-            # GeneratedImage 모델에 image 필드가 아닌 image_file 필드가 있으므로 수정
-            # [수정] url 속성 접근도 sync_to_async (람다 사용)
-            'url': await sync_to_async(lambda: img.image_file.url)(), 
+            'url': selected['url'],
+            'width': selected['width'],
+            'height': selected['height'],
+            'original_url': original_url,
+            'variants': variants,
             'title': img.title,
             'description': img.description,
             'prompt': img.prompt,
@@ -343,6 +397,27 @@ async def process_request_api(request): # [수정] async def로 변경
         user_image_data_base64 = data.get('image_data', None) # Base64 문자열 (Data URL 포함 가능)
         conversation_id = data.get('conversation_id')
         current_mode = data.get('current_mode', 'curator')
+        # [추가] 한 번에 생성할 이미지 수 (1 ~ COMFYUI_MAX_IMAGES_PER_REQUEST)
+        try:
+            num_images = int(data.get('num_images') or 1)
+        except (TypeError, ValueError):
+            return JsonResponse({'status': 'error', 'message': 'num_images는 정수여야 합니다.'}, status=400)
+        num_images = max(1, min(num_images, COMFYUI_MAX_IMAGES_PER_REQUEST))
+        # [추가] 결정적 시드/결과 캐시 사용 여부 (지정하지 않으면 settings.COMFYUI_DETERMINISTIC_SEED)
+        deterministic = data.get('deterministic')
+        # [추가] 생성 방식 ('default' 또는 입력 이미지의 윤곽/깊이 맵으로 구도를 유지하는 'controlnet')
+        generation_mode = data.get('generation_mode') or GENERATION_MODE_DEFAULT
+        if generation_mode not in GENERATION_MODES:
+            return JsonResponse({'status': 'error', 'message': f"generation_mode는 {', '.join(GENERATION_MODES)} 중 하나여야 합니다."}, status=400)
+        if generation_mode == GENERATION_MODE_CONTROLNET and current_mode == 'image_generation' and not user_image_data_base64:
+            return JsonResponse({'status': 'error', 'message': 'ControlNet 생성에는 이미지가 필요합니다.'}, status=400)
+        # [추가] 클라이언트가 정한 작업 ID. /api/tasks/<task_id>/events/ (SSE)로 진행 상황을 받을 수 있습니다.
+        task_id = data.get('task_id')
+        if task_id is not None:
+            try:
+                task_id = str(uuid.UUID(str(task_id)))
+            except ValueError:
+                return JsonResponse({'status': 'error', 'message': 'task_id는 UUID여야 합니다.'}, status=400)
 
         logger.info(f"Received request: Mode='{current_mode}', Conversation ID='{conversation_id}', User message='{user_message[:50]}'")
         if user_image_data_base64:
@@ -363,6 +438,13 @@ async def process_request_api(request): # [수정] async def로 변경
             conversation = await sync_to_async(Conversation.objects.get)(session_id=conversation_id)
             logger.info(f"Continuing conversation with ID: {conversation_id}")
 
+        # [추가] 생성 대기열이 가득 찼으면 메시지를 저장하기 전에 바로 429로 거절합니다.
+        # [수정] 대기 작업은 워커 풀의 대화별 대기열에 쌓이므로 워커 풀로 판단하며, 새 대화도 자기 session_id로 확인하도록
+        # 대화를 만든 뒤에 확인합니다. Celery 모드에서는 대기 작업이 generation 큐에 쌓이고 워커 프로세스마다 자신의
+        # 스케줄러가 동시 실행 수를 제한하므로 이 프로세스에서 판단하지 않습니다.
+        if current_mode == 'image_generation' and GENERATION_TASK_BACKEND != 'celery':
+            get_generation_worker_pool().check_admission(conversation_id)
+
         # 사용자 메시지 저장
         # [수정] create() 메서드를 sync_to_async로 래핑
         await sync_to_async(Message.objects.create)(
@@ -377,7 +459,9 @@ async def process_request_api(request): # [수정] async def로 변경
         image_file_path = None # 내부 저장 경로
 
         # 강화된 Base64 데이터 클리닝 로직
+        # [수정] Base64는 여기서 한 번만 디코딩하고, 모드별로 필요한 크기로 정규화해 사용합니다.
         cleaned_image_data_for_ollama = None
+        user_image_bytes = None
         if isinstance(user_image_data_base64, str) and user_image_data_base64.strip() and \
            user_image_data_base64.strip().lower() not in ['null', 'undefined']:
             if "," in user_image_data_base64:
@@ -389,7 +473,7 @@ async def process_request_api(request): # [수정] async def로 변경
             
             try:
                 # Base64 디코딩 시 유효성 검사 (실제 데이터가 아닌 경우 오류 방지)
-                base64.b64decode(cleaned_image_data_for_ollama, validate=True)
+                user_image_bytes = base64.b64decode(cleaned_image_data_for_ollama, validate=True)
                 logger.info("Cleaned image data for Ollama is valid Base64.")
             except Exception as e:
                 logger.error(f"Cleaned image data for Ollama is NOT valid Base64: {e}. Data (first 50 chars): {cleaned_image_data_for_ollama[:50]}", exc_info=True)
@@ -400,6 +484,11 @@ async def process_request_api(request): # [수정] async def로 변경
 
         if current_mode == 'curator':
             # --- 도슨트 모드 처리 ---
+            # [추가] 휴대폰 사진 원본 대신 비전 모델 입력 크기로 줄인 이미지를 보냅니다.
+            if user_image_bytes is not None:
+                normalized = await _normalize_upload(user_image_bytes, OLLAMA_IMAGE_MAX_SIDE)
+                if normalized is not None:
+                    cleaned_image_data_for_ollama = base64.b64encode(normalized.content).decode('ascii')
             # [수정] get_docent_response는 동기 함수이므로 sync_to_async로 래핑하고 await
             docent_response = await sync_to_async(get_docent_response)(user_message, cleaned_image_data_for_ollama)
             response_text = docent_response
@@ -407,50 +496,53 @@ async def process_request_api(request): # [수정] async def로 변경
 
         elif current_mode == 'image_generation':
             # --- 이미지 생성 모드 처리 ---
+            # [수정] 생성은 워커 풀에서 실행하고, 요청은 task_id만 받아 바로 끝납니다 (202).
+            # 클라이언트는 /api/tasks/<task_id>/events/ (SSE) 또는 /api/tasks/<task_id>/status/로 결과를 받고,
+            # 결과 메시지는 작업이 끝날 때 대화에 저장됩니다.
+            temp_image_file_path = None
+            if user_image_bytes is not None: # Base64 데이터가 있을 경우
+                try:
+                    # [추가] 워크플로우가 실제로 쓰는 해상도로 줄이고 EXIF 방향을 적용한 이미지를 저장합니다.
+                    image_bytes, extension = user_image_bytes, '.jpg'
+                    normalized = await _normalize_upload(user_image_bytes, input_image_max_side(generation_mode))
+                    if normalized is not None:
+                        image_bytes, extension = normalized.content, normalized.extension
+                    # [수정] 스토리지 이름은 MEDIA_ROOT 기준 상대 경로여야 합니다 (절대 경로는 SuspiciousFileOperation으로 거부됨).
+                    temp_file_name = f"temp_uploads/temp_upload_{uuid.uuid4()}{extension}"
+
+                    # [수정] default_storage.save를 사용하여 ContentFile로 저장 (디렉토리는 스토리지가 만듭니다)
+                    temp_image_file_path = await sync_to_async(default_storage.save)(temp_file_name, ContentFile(image_bytes))
+                    logger.info(f"Temporary image saved for image generation: {temp_image_file_path}")
+                except Exception as e:
+                    logger.error(f"Error saving temporary image for image generation: {e}", exc_info=True)
+                    temp_image_file_path = None
+
+            if task_id is None:
+                task_id = str(uuid.uuid4())
+            await _set_task_status(task_id, 'PENDING', '이미지 생성 대기 중입니다.', conversation_id=conversation_id)
             try:
-                temp_image_file_path = None
-                if cleaned_image_data_for_ollama: # Base64 데이터가 있을 경우
-                    try:
-                        image_bytes = base64.b64decode(cleaned_image_data_for_ollama)
-                        temp_file_name = f"temp_upload_{uuid.uuid4()}.jpg" 
-                        temp_image_file_path = os.path.join(settings.MEDIA_ROOT, 'temp_uploads', temp_file_name)
-                        
-                        # [수정] os.makedirs도 sync_to_async로 래핑
-                        await sync_to_async(os.makedirs)(os.path.dirname(temp_image_file_path), exist_ok=True)
-
-                        # [수정] default_storage.save를 사용하여 ContentFile로 저장
-                        saved_file_name = await sync_to_async(default_storage.save)(temp_image_file_path, ContentFile(image_bytes))
-                        temp_image_file_path = saved_file_name # 저장된 실제 경로로 업데이트
-                        logger.info(f"Temporary image saved for image generation: {temp_image_file_path}")
-                    except Exception as e:
-                        logger.error(f"Error saving temporary image for image generation: {e}", exc_info=True)
-                        temp_image_file_path = None
-
-                image_gen_result = await generate_image_based_on_json_logic(
-                    user_input=user_message,
-                    uploaded_image_path=temp_image_file_path, # 저장된 임시 파일 경로 전달
-                    mode=current_mode, 
-                    positive_categories=extract_categories_from_text(user_message)[0],
-                    negative_categories=extract_categories_from_text(user_message)[1]
-                )
-                # [수정] default_storage.url도 sync_to_async로 래핑
-                image_url = await sync_to_async(default_storage.url)(image_gen_result['image_file_path'])
-                image_file_path = image_gen_result['image_file_path']
-                response_text = "이미지가 성공적으로 생성되었습니다!"
-
-            except Exception as e:
-                logger.error(f"Error during image generation: {e}", exc_info=True)
-                response_text = f"이미지 생성 중 오류가 발생했습니다: {e}"
-                image_url = None
-            finally:
-                # [수정] default_storage.exists와 default_storage.delete도 sync_to_async로 래핑
-                if temp_image_file_path and await sync_to_async(default_storage.exists)(temp_image_file_path):
-                    try:
-                        await sync_to_async(default_storage.delete)(temp_image_file_path)
-                        logger.info(f"Temporary image deleted: {temp_image_file_path}")
-                    except Exception as e:
-                        logger.warning(f"Error deleting temporary image {temp_image_file_path}: {e}")
-
+                if GENERATION_TASK_BACKEND == 'celery':
+                    # [추가] generation 큐의 Celery 워커(다른 프로세스/호스트)에서 실행합니다.
+                    await sync_to_async(generate_image.apply_async)(
+                        args=[task_id, conversation_id, user_message, temp_image_file_path, num_images, deterministic, generation_mode],
+                        task_id=task_id,
+                    )
+                else:
+                    # [수정] 대화별 차례와 모델 친화도로 시작 순서를 정하도록 소유자와 모델 시그니처를 함께 넘깁니다.
+                    get_generation_worker_pool().submit(task_id, lambda: _generate_image_task_runner(
+                        task_id, conversation_id, user_message, temp_image_file_path, num_images, deterministic, generation_mode),
+                        owner=conversation_id, signature=model_signature_for(generation_mode, temp_image_file_path is not None))
+            except GenerationQueueFull as e:
+                await _set_task_status(task_id, 'FAILED', str(e), conversation_id=conversation_id)
+                await _delete_temp_upload(temp_image_file_path)
+                raise
+            logger.info(f"Queued image generation task {task_id} for conversation {conversation_id}.")
+            return JsonResponse({
+                'status': 'processing',
+                'task_id': task_id,
+                'response': '이미지 생성 요청이 접수되었습니다. 완료되면 결과를 보여 드릴게요.',
+                'conversation_id': conversation_id,
+            }, status=202)
             # ---------------------------
 
         # 챗봇 응답 저장
@@ -468,12 +560,23 @@ async def process_request_api(request): # [수정] async def로 변경
             'status': 'success',
             'response': response_text,
             'image_url': image_url,
+            'image_urls': [image_url] if image_url else [],
             'conversation_id': conversation_id
         })
 
     except json.JSONDecodeError:
         logger.error("Invalid JSON received in process_request_api", exc_info=True)
         return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+    except GenerationQueueFull as e:
+        # [추가] 백프레셔: 클라이언트가 Retry-After 뒤에 다시 시도하도록 429를 반환합니다.
+        logger.warning(f"Image generation rejected for conversation {conversation_id}: {e}")
+        response = JsonResponse({
+            'status': 'error',
+            'message': f'이미지 생성 요청이 많아 잠시 후 다시 시도해 주세요. ({e.retry_after}초 후)',
+            'retry_after': e.retry_after,
+        }, status=429)
+        response['Retry-After'] = str(e.retry_after)
+        return response
     except Exception as e:
         logger.critical(f"Unexpected error in process_request_api: {e}", exc_info=True)
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -487,6 +590,7 @@ async def check_task_status_api(request, task_id): # [수정] async def로 변
     비동기 이미지 생성 작업의 상태를 캐시에서 조회하여 반환합니다.
     프론트엔드에서 이 API를 주기적으로 폴링하여 작업 완료 여부를 확인합니다.
     """
+    get_task_watchdog().touch(task_id) # [추가] 클라이언트가 아직 결과를 기다리고 있음을 기록
     # [수정] cache.get도 sync_to_async로 래핑
     status_data = await sync_to_async(cache.get)(f"task_status_{task_id}")
     if status_data:
@@ -503,54 +607,350 @@ async def check_task_status_api(request, task_id): # [수정] async def로 변
         }, status=200)
 
 
-# 이미지 생성 완료 처리 내부 함수 (비동기)
-async def _generate_image_task_runner(task_id, conversation_id, original_prompt, uploaded_image_path, current_mode, positive_categories, negative_categories): # [수정] uploaded_image_file -> uploaded_image_path
+async def _set_task_status(task_id, status, message, image_url=None, image_urls=None, conversation_id=None):
     """
-    실제 이미지 생성 로직을 비동기적으로 실행하고 결과를 캐시에 저장합니다.
-    이 함수는 별도의 스레드에서 실행됩니다.
+    작업 상태를 task_status_<task_id> 캐시에 기록하고, 완료 상태면 SSE 구독자에게 최종 status 이벤트를 보냅니다.
     """
-    image_url = None
-    status = "FAILED"
-    message_for_frontend = "이미지 생성 중 알 수 없는 오류가 발생했습니다."
+    status_data = {
+        'status': status,
+        'message': message,
+        'image_url': image_url,
+        'image_urls': image_urls or ([image_url] if image_url else []),
+        'conversation_id': conversation_id,
+    }
+    await sync_to_async(cache.set)(f"task_status_{task_id}", status_data, timeout=TASK_STATUS_TTL)
+    if status in TERMINAL_STATUSES:
+        get_progress_hub().finish(task_id, status_data)
+    return status_data
+
 
+def _sse_event(event, data):
+    """Server-Sent Events 형식의 메시지 하나를 만듭니다."""
+    if event == 'preview':
+        data = {'image': f"data:{data['mime']};base64,{base64.b64encode(data['image']).decode('ascii')}"}
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _task_event_stream(task_id, previews):
+    hub = get_progress_hub()
+    # 상태 확인 전에 구독해야 그 사이에 끝난 작업의 완료 이벤트를 놓치지 않습니다.
+    subscription = hub.subscribe(task_id, previews=previews)
     try:
-        if current_mode == 'image_generation':
-            try:
-                result = await generate_image_based_on_json_logic(
-                    user_input=original_prompt, 
-                    uploaded_image_path=uploaded_image_path, # [수정] 파일 객체 대신 경로 전달
-                    mode=current_mode, 
-                    positive_categories=positive_categories, 
-                    negative_categories=negative_categories
-                )
-                # [수정] default_storage.url도 sync_to_async로 래핑
-                image_url = await sync_to_async(default_storage.url)(result['image_file_path']) # 저장된 이미지의 URL 가져오기
-                status = "COMPLETED"
-                message_for_frontend = "이미지 생성이 완료되었습니다!"
-            except Exception as e:
-                message_for_frontend = f"이미지 생성 서비스에서 오류가 발생했습니다: {str(e)}"
-                status = "FAILED"
-                logger.error(f"Error during image generation for task {task_id}: {e}", exc_info=True)
-        else:
-            message_for_frontend = "현재 모드에서는 이미지 생성을 지원하지 않습니다."
-            status = "FAILED"
+        # 스트림이 열려 있는 동안에는 작업이 버려진 것으로 취급되지 않습니다.
+        with get_task_watchdog().watching(task_id):
+            yield "retry: 2000\n\n"
+            status_data = await sync_to_async(cache.get)(f"task_status_{task_id}")
+            if status_data:
+                yield _sse_event('status', status_data)
+                if status_data.get('status') in TERMINAL_STATUSES:
+                    return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + TASK_EVENTS_MAX_DURATION
+            next_heartbeat = loop.time() + TASK_EVENTS_HEARTBEAT
+            while loop.time() < deadline:
+                try:
+                    event, data = await asyncio.wait_for(subscription.get(), min(TASK_EVENTS_STATUS_POLL, TASK_EVENTS_HEARTBEAT))
+                except asyncio.TimeoutError:
+                    # [수정] 완료 이벤트는 작업을 실행한 프로세스의 허브로만 전달되므로(Celery 워커, 다른 웹 워커)
+                    # 공유 캐시의 상태를 주기적으로 다시 읽어 바뀌었으면 보냅니다.
+                    current = await sync_to_async(cache.get)(f"task_status_{task_id}")
+                    if current and current != status_data:
+                        status_data = current
+                        next_heartbeat = loop.time() + TASK_EVENTS_HEARTBEAT
+                        yield _sse_event('status', current)
+                        if current.get('status') in TERMINAL_STATUSES:
+                            return
+                    elif loop.time() >= next_heartbeat:
+                        next_heartbeat = loop.time() + TASK_EVENTS_HEARTBEAT
+                        yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(event, data)
+                if event == 'status' and data.get('status') in TERMINAL_STATUSES:
+                    return
+    finally:
+        subscription.close()
+
+
+def _task_event_stream_sync(task_id, previews):
+    # _task_event_stream과 같은 내용을 이벤트 루프 없이 (WSGI 스레드에서) 보냅니다.
+    subscription = get_progress_hub().subscribe(task_id, previews=previews)
+    try:
+        with get_task_watchdog().watching(task_id):
+            yield "retry: 2000\n\n"
+            status_data = cache.get(f"task_status_{task_id}")
+            if status_data:
+                yield _sse_event('status', status_data)
+                if status_data.get('status') in TERMINAL_STATUSES:
+                    return
+            deadline = time.monotonic() + TASK_EVENTS_MAX_DURATION
+            next_heartbeat = time.monotonic() + TASK_EVENTS_HEARTBEAT
+            while time.monotonic() < deadline:
+                try:
+                    event, data = subscription.get_blocking(min(TASK_EVENTS_STATUS_POLL, TASK_EVENTS_HEARTBEAT))
+                except queue.Empty:
+                    current = cache.get(f"task_status_{task_id}")
+                    if current and current != status_data:
+                        status_data = current
+                        next_heartbeat = time.monotonic() + TASK_EVENTS_HEARTBEAT
+                        yield _sse_event('status', current)
+                        if current.get('status') in TERMINAL_STATUSES:
+                            return
+                    elif time.monotonic() >= next_heartbeat:
+                        next_heartbeat = time.monotonic() + TASK_EVENTS_HEARTBEAT
+                        yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(event, data)
+                if event == 'status' and data.get('status') in TERMINAL_STATUSES:
+                    return
+    finally:
+        subscription.close()
 
+
+# 이미지 생성 작업 진행 상황 스트림 API (Server-Sent Events)
+@csrf_exempt
+@require_GET
+async def task_events_api(request, task_id):
+    """
+    ComfyUI의 진행 이벤트를 작업 하나에 대해 SSE로 중계합니다. 폴링(check_task_status_api) 대신 하나의 연결로 받습니다.
+    - event: queued     {prompt_id}
+    - event: executing  {node, class_type}
+    - event: progress   {value, max, node} (KSampler 단계 k/N)
+    - event: preview    {image: data URL} (?previews=1일 때만, ComfyUI에 미리보기가 켜져 있어야 함)
+    - event: status     check_task_status_api와 같은 형식. COMPLETED/FAILED를 보내면 스트림을 닫습니다.
+    """
+    task_id = str(task_id)
+    previews = request.GET.get('previews') in ('1', 'true')
+    if isinstance(request, ASGIRequest):
+        stream = _task_event_stream(task_id, previews)
+    else:
+        # [수정] WSGI(runserver)는 비동기 이터레이터를 끝까지 모은 뒤에 보내므로 동기 제너레이터로 스트리밍합니다.
+        # 청크를 바로 써야 연결이 끊긴 클라이언트도 heartbeat 시점에 감지됩니다.
+        stream = _task_event_stream_sync(task_id, previews)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # nginx 등 프록시 버퍼링 방지
+    return response
+
+
+def _ndjson(event):
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+async def _batch_stream(temp_image_file_path, **kwargs):
+    try:
+        async for event in run_batch(**kwargs):
+            yield _ndjson(event)
+    finally:
+        await _delete_temp_upload(temp_image_file_path)
+
+
+def _batch_stream_sync(temp_image_file_path, **kwargs):
+    # _batch_stream과 같은 내용을 WSGI 스레드에서 보냅니다 (배치는 run_batch_sync의 전용 스레드에서 실행됩니다).
+    try:
+        for event in run_batch_sync(**kwargs):
+            yield _ndjson(event)
+    finally:
+        if temp_image_file_path and default_storage.exists(temp_image_file_path):
+            default_storage.delete(temp_image_file_path)
+
+
+# 배치 이미지 생성 API (프롬프트 목록 x 파라미터 그리드, NDJSON 스트림)
+@csrf_exempt
+@require_POST
+async def batch_generate_api(request):
+    """
+    프롬프트 목록과 파라미터 그리드의 모든 조합을 생성합니다. 요청 예:
+      {"prompts": ["해변의 등대", "눈 덮인 마을"],
+       "grid": {"seed": [1, 2], "cfg": [7, 9], "denoise": [0.6], "style": ["impressionism_style", ["ghibli_style", "texture_detail"]]},
+       "image_data": "<선택, Base64>", "generation_mode": "default", "num_images": 1, "deterministic": null}
+    조합은 최대 BATCH_MAX_JOBS개이며 최대 BATCH_MAX_PARALLEL개씩 ComfyUI로 보냅니다. 같은 프롬프트는 한 번만 번역하고,
+    입력 이미지는 한 번만 정규화/저장해 모든 작업이 함께 씁니다.
+    응답은 application/x-ndjson 스트림으로, 한 줄에 이벤트 하나씩 batch -> (작업이 끝나는 순서대로) job -> summary를 보냅니다.
+    결과는 대화에 저장하지 않습니다.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+    generation_mode = data.get('generation_mode') or GENERATION_MODE_DEFAULT
+    if generation_mode not in GENERATION_MODES:
+        return JsonResponse({'status': 'error', 'message': f"generation_mode는 {', '.join(GENERATION_MODES)} 중 하나여야 합니다."}, status=400)
+    try:
+        num_images = max(1, min(int(data.get('num_images') or 1), COMFYUI_MAX_IMAGES_PER_REQUEST))
+        jobs = expand_jobs(data.get('prompts') or data.get('prompt'), data.get('grid'), categorize=extract_categories_from_text)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    image_bytes = None
+    image_data = data.get('image_data')
+    if isinstance(image_data, str) and image_data.strip() and image_data.strip().lower() not in ['null', 'undefined']:
+        try:
+            image_bytes = base64.b64decode(image_data.split(',', 1)[-1], validate=True)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'image_data가 올바른 Base64가 아닙니다.'}, status=400)
+    if generation_mode == GENERATION_MODE_CONTROLNET and image_bytes is None:
+        return JsonResponse({'status': 'error', 'message': 'ControlNet 생성에는 이미지가 필요합니다.'}, status=400)
+
+    temp_image_file_path = None
+    if image_bytes is not None:
+        extension = '.jpg'
+        normalized = await _normalize_upload(image_bytes, input_image_max_side(generation_mode))
+        if normalized is not None:
+            image_bytes, extension = normalized.content, normalized.extension
+        temp_image_file_path = await sync_to_async(default_storage.save)(
+            f"temp_uploads/temp_upload_{uuid.uuid4()}{extension}", ContentFile(image_bytes))
+
+    options = {
+        'jobs': jobs,
+        'uploaded_image_path': temp_image_file_path,
+        'generation_mode': generation_mode,
+        'num_images': num_images,
+        'deterministic': data.get('deterministic'),
+    }
+    logger.info(f"Starting batch generation: {len(jobs)} jobs, mode '{generation_mode}'")
+    if isinstance(request, ASGIRequest):
+        stream = _batch_stream(temp_image_file_path, **options)
+    else:
+        # WSGI(runserver)는 비동기 이터레이터를 끝까지 모은 뒤에 보내므로 동기 제너레이터로 스트리밍합니다.
+        stream = _batch_stream_sync(temp_image_file_path, **options)
+    response = StreamingHttpResponse(stream, content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ComfyUI 큐 상태 확인 API
+@csrf_exempt
+@require_GET
+async def comfyui_queue_status_api(request):
+    """
+    설정된 모든 ComfyUI 백엔드의 /queue, /system_stats를 조회하여 상태와 대기 작업 수를 반환합니다.
+    백엔드별로 회로 차단기 상태와 호출별 응답 시간 p99/적용 중인 타임아웃도 포함합니다 (회로가 열린 백엔드는 조회하지 않습니다).
+    생성 결과 캐시와 ControlNet 전처리 맵 캐시의 적중률, 동일 요청 병합(single-flight), 생성 스케줄러(대기열 길이/대기 시간),
+    작업 취소(취소 수, 절약한 GPU 시간 추정치), 생성 워커 풀(실행/대기 중인 작업 수), 출력 코덱(줄인 바이트 수), 번역 캐시(메모리/디스크 적중 수), 번역 배치(평균 배치 크기) 통계도 함께 반환합니다.
+    """
+    router = get_backend_router()
+    try:
+        await router.refresh(force=True)
+    finally:
+        if not isinstance(request, ASGIRequest):
+            # [수정] WSGI에서는 요청마다 이벤트 루프가 새로 만들어지므로 조회에 쓴 ComfyUI 연결 풀을 여기서 닫습니다.
+            await close_comfy_clients()
+    backends = router.snapshot()
+    status = 200 if any(b['healthy'] for b in backends) else 503
+    return JsonResponse({
+        'status': 'success' if status == 200 else 'error',
+        'backends': backends,
+        'pending': sum(b['queue_depth'] for b in backends if b['healthy']),
+        'result_cache': get_result_cache().stats(),
+        'control_map_cache': get_control_map_cache().stats(),
+        'single_flight': get_single_flight().stats(),
+        'scheduler': get_generation_scheduler().stats(),
+        'cancellation': {**get_job_tracker().stats(), **get_task_watchdog().stats()},
+        'generation_workers': get_generation_worker_pool().stats(),
+        'output_codec': get_output_codec().stats(),
+        'translation_cache': get_translation_cache().stats(),
+        'translation_batching': translation_batch_stats(),
+    }, status=status)
+
+
+async def _normalize_upload(image_bytes, max_side):
+    """업로드된 이미지를 워커 풀에서 정규화합니다. 이미지로 읽을 수 없으면 None을 반환합니다 (호출자는 원본을 사용)."""
+    try:
+        return await normalize_image_async(image_bytes, max_side)
+    except Exception as e: # 손상된 파일, 지원하지 않는 형식, 너무 큰 이미지(DecompressionBombError) 등
+        logger.warning(f"Could not normalize uploaded image ({len(image_bytes)} bytes): {e}")
+        return None
+
+
+async def _delete_temp_upload(temp_image_file_path, cancelled=False):
+    """생성에 쓴 임시 업로드 파일을 지웁니다."""
+    # [수정] default_storage.exists와 default_storage.delete도 sync_to_async로 래핑
+    if not temp_image_file_path or not await sync_to_async(default_storage.exists)(temp_image_file_path):
+        return
+    try:
+        await sync_to_async(default_storage.delete)(temp_image_file_path)
+        logger.info(f"Temporary image deleted: {temp_image_file_path}")
+        if cancelled:
+            get_job_tracker().record_temp_files_removed()
     except Exception as e:
-        message_for_frontend = f"이미지 생성 중 심각한 오류가 발생했습니다: {str(e)}"
-        status = "FAILED"
-        logger.error(f"Error in _generate_image_task_runner for task {task_id}: {e}", exc_info=True)
+        logger.warning(f"Error deleting temporary image {temp_image_file_path}: {e}")
+
+
+# 이미지 생성 작업 실행 함수 (비동기)
+async def _generate_image_task_runner(task_id, conversation_id, user_message, uploaded_image_path, num_images=1, deterministic=None, generation_mode=GENERATION_MODE_DEFAULT, watch_abandonment=True):
+    """
+    [수정] 워커 풀(task_pool)에서 이미지 생성 작업 하나를 실행합니다.
+    상태를 RUNNING -> COMPLETED/FAILED로 task_status_<task_id> 캐시에 기록하고, 결과(또는 오류) 메시지를 대화에 저장합니다.
+    클라이언트가 TASK_ABANDON_TIMEOUT 동안 상태를 조회하지 않고 진행 스트림도 열어 두지 않으면 버려진 작업으로 보고
+    생성을 취소합니다 (ComfyUI 작업도 대기열에서 제거/중단). 상태 조회가 다른 프로세스에서 일어나는 Celery 워커에서는
+    watch_abandonment=False로 감시하지 않습니다.
+    """
+    image_urls = []
+    image_file_paths = []
+    status = 'FAILED'
+    cancelled = False
+    if watch_abandonment:
+        get_task_watchdog().register(task_id, asyncio.current_task())
+    await _set_task_status(task_id, 'RUNNING', '이미지를 생성하고 있습니다.', conversation_id=conversation_id)
+    try:
+        positive_categories, negative_categories = extract_categories_from_text(user_message)
+        # 동시에 들어온 같은 요청은 하나의 ComfyUI 작업 결과를 함께 받습니다.
+        result = await generate_image_single_flight(
+            user_input=user_message,
+            uploaded_image_path=uploaded_image_path,
+            mode='image_generation',
+            positive_categories=positive_categories,
+            negative_categories=negative_categories,
+            num_images=num_images,
+            deterministic=deterministic,
+            task_id=task_id,
+            owner=conversation_id,
+            generation_mode=generation_mode,
+        )
+        # 스토리지 이름(MEDIA_ROOT 기준 상대 경로)으로 URL을 만듭니다.
+        image_urls = [await sync_to_async(default_storage.url)(name) for name in result['image_names']]
+        image_file_paths = result['image_file_paths']
+        status = 'COMPLETED'
+        message = "이미지가 성공적으로 생성되었습니다!"
+    except asyncio.CancelledError:
+        if not get_task_watchdog().is_abandoned(task_id):
+            raise # 워커 풀 종료
+        cancelled = True
+        logger.info(f"Image generation task {task_id} was abandoned by the client and cancelled.")
+        message = f"이미지 생성이 취소되었습니다: {TASK_ABANDON_TIMEOUT}초 동안 상태 확인이 없어 작업을 취소했습니다."
+    except Exception as e:
+        logger.error(f"Error during image generation for task {task_id}: {e}", exc_info=True)
+        message = f"이미지 생성 중 오류가 발생했습니다: {e}"
     finally:
-        # [수정] cache.set도 sync_to_async로 래핑
-        await sync_to_async(cache.set)(f"task_status_{task_id}", {
-            "status": status,
-            "image_url": image_url,
-            "message": message_for_frontend,
-            "conversation_id": conversation_id,
-            "original_prompt": original_prompt,
-            "style": "default"
-        }, timeout=300)
-
-        await _handle_image_generation_completion(task_id, status, image_url, message_for_frontend, conversation_id, original_prompt, "default")
+        get_task_watchdog().unregister(task_id)
+        await _delete_temp_upload(uploaded_image_path, cancelled=cancelled)
+
+    # 결과를 대화에 먼저 저장한 뒤 완료 상태를 알립니다 (클라이언트는 완료 후 대화 기록을 다시 읽습니다).
+    try:
+        conversation = await sync_to_async(Conversation.objects.get)(session_id=conversation_id)
+        await sync_to_async(Message.objects.create)(
+            conversation=conversation,
+            sender='ai',
+            text=message,
+            image_file_path=image_file_paths[0] if image_file_paths else None,
+            image_url=image_urls[0] if image_urls else None,
+            timestamp=timezone.now()
+        )
+        # 나머지 이미지는 대화 기록에서도 보이도록 이미지 메시지로 이어서 저장합니다.
+        for extra_url, extra_path in zip(image_urls[1:], image_file_paths[1:]):
+            await sync_to_async(Message.objects.create)(
+                conversation=conversation,
+                sender='ai',
+                text='',
+                image_file_path=extra_path,
+                image_url=extra_url,
+                timestamp=timezone.now()
+            )
+    except Exception as e:
+        logger.error(f"Could not save the result of task {task_id} to conversation {conversation_id}: {e}", exc_info=True)
+    await _set_task_status(task_id, status, message, image_url=image_urls[0] if image_urls else None,
+                           image_urls=image_urls, conversation_id=conversation_id)
 
 
 async def _handle_image_generation_completion(task_id, status, image_url, message_from_task, conversation_id, original_prompt, style):
@@ -0,0 +1,319 @@
+# image_generator/workflow_templates.py
+
+import json
+import logging
+import os
+import threading
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+# 워크플로우 JSON 파일 이름 (comfyui_workflows/ 디렉토리 기준)
+TEXT_TO_IMAGE_WORKFLOW = 'text_to_image.json'
+IMAGE_TO_IMAGE_WORKFLOW = 'image_to_image.json'
+CONTROLNET_WORKFLOW = 'i2i_controlnet.json'
+
+# 프롬프트 텍스트를 받는 입력 이름 (CLIPTextEncode는 'text', CLIPTextEncodeLumina2는 'user_prompt')
+PROMPT_INPUT_NAMES = ('text', 'user_prompt')
+
+# 패치 플랜 슬롯 이름 -> (노드 class_type, 입력 이름)
+# 프롬프트 슬롯은 KSampler의 positive/negative 연결을 따라가서 찾습니다.
+SIMPLE_SLOTS = {
+    'seed': ('KSampler', 'seed'),
+    'denoise': ('KSampler', 'denoise'),
+    'cfg': ('KSampler', 'cfg'),
+    'ipadapter_weight': ('IPAdapterAdvanced', 'weight'),
+    'load_image': ('LoadImage', 'image'),
+    'batch_size': ('EmptyLatentImage', 'batch_size'),
+}
+
+# 모든 워크플로우에 반드시 있어야 하는 슬롯
+REQUIRED_SLOTS = ('positive_prompt', 'negative_prompt', 'seed')
+
+# ControlNet 적용 노드 (이 노드의 'image' 입력에 연결된 노드가 전처리기입니다)
+CONTROLNET_APPLY_CLASS_TYPES = ('ControlNetApply', 'ControlNetApplyAdvanced', 'ControlNetApplySD3')
+# 전처리기 출력을 받아 오기 위해 붙이는 PreviewImage 노드 ID의 접미사
+CONTROL_MAP_OUTPUT_SUFFIX = '_control_map'
+
+# VRAM에 가중치를 올리는 모델 로더 노드. 이 노드들의 입력값(모델 파일 이름)이 워크플로우의 모델 시그니처입니다.
+MODEL_LOADER_CLASS_TYPES = ('CheckpointLoaderSimple', 'IPAdapterModelLoader', 'CLIPVisionLoader', 'ControlNetLoader')
+
+
+def control_map_output_id(node_id):
+    """전처리기 node_id의 출력을 받는 PreviewImage 노드 ID를 반환합니다 (ComfyUI 출력 딕셔너리의 키)."""
+    return f"{node_id}{CONTROL_MAP_OUTPUT_SUFFIX}"
+
+
+class WorkflowTemplateError(ValueError):
+    """워크플로우 JSON이 올바르지 않거나 필요한 노드를 찾을 수 없을 때 발생합니다."""
+
+
+def _resolve_prompt_target(nodes, link):
+    """
+    KSampler의 positive/negative 입력 링크를 따라가 프롬프트 텍스트를 받는 노드를 찾습니다.
+    ControlNetApplyAdvanced처럼 conditioning을 전달만 하는 노드는 건너뜁니다.
+    :return: (node_id, input_name) 또는 None
+    """
+    visited = set()
+    while isinstance(link, list) and len(link) >= 2:
+        node_id = str(link[0])
+        if node_id in visited or node_id not in nodes:
+            return None
+        visited.add(node_id)
+        inputs = nodes[node_id].get('inputs', {})
+        for input_name in PROMPT_INPUT_NAMES:
+            if input_name in inputs and not isinstance(inputs[input_name], list):
+                return node_id, input_name
+        # conditioning 전달 노드: 출력 0은 positive, 출력 1은 negative 입력에서 옵니다.
+        if 'positive' in inputs and 'negative' in inputs:
+            link = inputs['positive'] if link[1] == 0 else inputs['negative']
+        elif 'conditioning' in inputs:
+            link = inputs['conditioning']
+        else:
+            return None
+    return None
+
+
+def compile_patch_plan(nodes):
+    """
+    워크플로우 그래프를 분석하여 요청마다 값을 주입할 위치(패치 플랜)를 계산합니다.
+    :param nodes: ComfyUI API 형식의 노드 딕셔너리 ('prompt' 키 아래의 내용)
+    :return: {슬롯 이름: ((node_id, input_name), ...)} 딕셔너리
+    """
+    plan = {}
+
+    for node_id, node in nodes.items():
+        if not isinstance(node, dict) or 'class_type' not in node:
+            raise WorkflowTemplateError(f"Node '{node_id}' has no 'class_type'.")
+        for input_name, value in node.get('inputs', {}).items():
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) \
+                    and isinstance(value[1], int) and value[0] not in nodes:
+                raise WorkflowTemplateError(
+                    f"Node '{node_id}' input '{input_name}' references missing node '{value[0]}'."
+                )
+
+    for slot, (class_type, input_name) in SIMPLE_SLOTS.items():
+        targets = tuple(
+            (node_id, input_name)
+            for node_id, node in nodes.items()
+            if node['class_type'] == class_type and input_name in node.get('inputs', {})
+        )
+        if targets:
+            plan[slot] = targets
+
+    for node_id, node in nodes.items():
+        if node['class_type'] != 'KSampler':
+            continue
+        inputs = node.get('inputs', {})
+        for polarity in ('positive', 'negative'):
+            target = _resolve_prompt_target(nodes, inputs.get(polarity))
+            if target:
+                plan.setdefault(f'{polarity}_prompt', ())
+                plan[f'{polarity}_prompt'] += (target,)
+
+    missing = [slot for slot in REQUIRED_SLOTS if slot not in plan]
+    if missing:
+        raise WorkflowTemplateError(f"Workflow is missing required injection points: {', '.join(missing)}")
+
+    return plan
+
+
+def find_control_preprocessors(nodes):
+    """
+    ControlNet 적용 노드의 'image' 입력에 연결된 전처리기 노드(Canny, 깊이 등) ID를 찾습니다.
+    이미 LoadImage로 맵을 읽는 경우는 전처리기가 아니므로 제외합니다.
+    :return: 노드 ID 튜플 (워크플로우에 나온 순서)
+    """
+    found = []
+    for node in nodes.values():
+        if node['class_type'] not in CONTROLNET_APPLY_CLASS_TYPES:
+            continue
+        link = node.get('inputs', {}).get('image')
+        if not (isinstance(link, list) and len(link) == 2):
+            continue
+        node_id = str(link[0])
+        if nodes[node_id]['class_type'] != 'LoadImage' and node_id not in found:
+            found.append(node_id)
+    return tuple(found)
+
+
+def find_input_resolution(nodes):
+    """
+    입력 이미지(LoadImage)가 실제로 쓰이는 최대 해상도(긴 변, 픽셀)를 추정합니다.
+    입력 이미지를 VAEEncode로 latent로 만드는 워크플로우는 입력 해상도가 곧 생성 해상도이므로 None을 반환합니다 (호출자가 기본값 사용).
+    그 외에는 EmptyLatentImage의 width/height와 전처리기의 resolution 입력 중 최댓값이며, 입력 이미지가 없으면 None입니다.
+    """
+    load_image_ids = {node_id for node_id, node in nodes.items() if node['class_type'] == 'LoadImage'}
+    if not load_image_ids:
+        return None
+    sizes = []
+    for node in nodes.values():
+        inputs = node.get('inputs', {})
+        if node['class_type'] == 'VAEEncode':
+            pixels = inputs.get('pixels')
+            if isinstance(pixels, list) and str(pixels[0]) in load_image_ids:
+                return None
+        elif node['class_type'] == 'EmptyLatentImage':
+            sizes += [inputs.get('width'), inputs.get('height')]
+        elif isinstance(inputs.get('resolution'), int):
+            sizes.append(inputs['resolution'])
+    sizes = [size for size in sizes if isinstance(size, int)]
+    return max(sizes) if sizes else None
+
+
+def find_model_signature(nodes):
+    """
+    워크플로우가 VRAM에 올리는 모델 조합(체크포인트, IPAdapter, CLIP Vision, ControlNet)을 구합니다.
+    시그니처가 같은 작업끼리는 ComfyUI가 가중치를 다시 로드하지 않습니다.
+    :return: ((class_type, 모델 파일 이름), ...) 정렬된 튜플. 로더 노드가 없으면 None
+    """
+    models = set()
+    for node in nodes.values():
+        if node['class_type'] not in MODEL_LOADER_CLASS_TYPES:
+            continue
+        for value in node.get('inputs', {}).values():
+            if isinstance(value, str):
+                models.add((node['class_type'], value))
+    return tuple(sorted(models)) or None
+
+
+class WorkflowTemplate:
+    """
+    한 번 로드·검증·컴파일된 워크플로우 템플릿입니다.
+    원본 그래프는 읽기 전용으로 보관하고, 요청마다 instantiate()로 패치 대상 노드만 복사합니다.
+    """
+
+    def __init__(self, name, path, mtime, nodes):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self._nodes = nodes
+        self.nodes = MappingProxyType(nodes)
+        self.patch_plan = MappingProxyType(compile_patch_plan(nodes))
+        # 패치 대상 노드 ID 집합 (이 노드들만 요청마다 복사됩니다)
+        self._patched_node_ids = frozenset(
+            node_id for targets in self.patch_plan.values() for node_id, _ in targets
+        )
+        # ControlNet 전처리기 노드 ID (전처리 맵 캐시 대상)
+        self.control_preprocessors = find_control_preprocessors(nodes)
+        # 입력 이미지를 이 크기(긴 변)로 줄여도 결과가 달라지지 않는 해상도 (None이면 알 수 없음)
+        self.input_resolution = find_input_resolution(nodes)
+        # 이 워크플로우가 VRAM에 올리는 모델 조합 (스케줄러가 같은 모델의 작업을 묶어 실행하는 데 사용)
+        self.model_signature = find_model_signature(nodes)
+
+    def has_slot(self, slot):
+        return slot in self.patch_plan
+
+    def instantiate(self, **values):
+        """
+        템플릿의 구조적 복사본을 만들고 패치 플랜에 따라 값을 주입합니다.
+        패치되지 않는 노드는 원본 템플릿과 공유되므로 반환된 그래프를 직접 수정하지 마세요.
+        :param values: 슬롯 이름=값 (예: positive_prompt="...", seed=123). None 값은 무시됩니다.
+        :return: ComfyUI /prompt API에 보낼 노드 딕셔너리
+        """
+        workflow = dict(self._nodes)
+        for node_id in self._patched_node_ids:
+            node = workflow[node_id]
+            workflow[node_id] = {**node, 'inputs': dict(node['inputs'])}
+
+        for slot, value in values.items():
+            if value is None:
+                continue
+            targets = self.patch_plan.get(slot)
+            if not targets:
+                logger.warning(f"Workflow '{self.name}' has no injection point for '{slot}'; ignoring.")
+                continue
+            for node_id, input_name in targets:
+                workflow[node_id]['inputs'][input_name] = value
+        return workflow
+
+
+    def apply_control_maps(self, workflow, cached_maps=None, capture=()):
+        """
+        instantiate()가 만든 그래프에서 ControlNet 전처리 단계를 캐시와 연결합니다.
+        - cached_maps의 전처리기 노드는 저장된 맵을 읽는 LoadImage 노드로 바꿔 전처리를 건너뜁니다.
+        - capture의 전처리기 노드에는 PreviewImage 노드(control_map_output_id)를 붙여 맵을 출력으로 받습니다.
+        교체한 노드도 출력 0이 IMAGE이므로 ControlNet 적용 노드의 연결은 그대로 둡니다.
+        :param cached_maps: {전처리기 node_id: LoadImage에 넣을 파일 이름}
+        :param capture: 출력을 받아 올 전처리기 node_id 목록
+        :return: workflow (같은 딕셔너리를 수정해 반환)
+        """
+        for node_id, filename in (cached_maps or {}).items():
+            workflow[node_id] = {'class_type': 'LoadImage', 'inputs': {'image': filename}}
+        for node_id in capture:
+            workflow[control_map_output_id(node_id)] = {'class_type': 'PreviewImage', 'inputs': {'images': [node_id, 0]}}
+        return workflow
+
+
+def load_workflow_template(name, path):
+    """워크플로우 JSON 파일을 읽어 WorkflowTemplate으로 컴파일합니다."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"JSON config file not found: {path}")
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise WorkflowTemplateError(f"Workflow file is not a JSON object: {path}")
+    # 'prompt' 키가 없으면 파일 전체를 워크플로우 그래프로 사용합니다.
+    nodes = data.get('prompt', data)
+    template = WorkflowTemplate(name, path, mtime, nodes)
+    logger.info(f"Compiled workflow template '{name}' ({len(nodes)} nodes, slots: {sorted(template.patch_plan)})")
+    return template
+
+
+class WorkflowTemplateRegistry:
+    """
+    워크플로우 템플릿 레지스트리입니다.
+    시작 시 preload()로 모든 워크플로우를 컴파일해 두고, get() 호출 시 파일 mtime이 바뀌었으면 다시 로드합니다.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def preload(self, names=None):
+        if names is None:
+            if not os.path.isdir(self.directory):
+                logger.error(f"Workflow directory not found: {self.directory}")
+                return
+            names = sorted(n for n in os.listdir(self.directory) if n.endswith('.json'))
+        for name in names:
+            try:
+                self.get(name)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to preload workflow template '{name}': {e}")
+
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        template = self._templates.get(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            logger.error(f"JSON config file not found: {path}")
+            raise FileNotFoundError(f"JSON config file not found: {path}")
+
+        if template is not None and template.mtime == mtime:
+            return template
+
+        with self._lock:
+            template = self._templates.get(name)
+            if template is None or template.mtime != mtime:
+                if template is not None:
+                    logger.info(f"Workflow file '{name}' changed on disk; reloading template.")
+                template = load_workflow_template(name, path)
+                self._templates[name] = template
+        return template
+
+
+_registry = None
+
+
+def get_workflow_registry():
+    """프로세스 전역 워크플로우 템플릿 레지스트리를 반환합니다."""
+    global _registry
+    if _registry is None:
+        from django.conf import settings
+        directory = getattr(settings, 'COMFYUI_WORKFLOWS_DIR', os.path.join(settings.BASE_DIR, 'comfyui_workflows'))
+        _registry = WorkflowTemplateRegistry(directory)
+    return _registry
@@ -0,0 +1,163 @@
+# llm_cores/translation_batcher.py
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# 문장 끝(마침표/물음표/느낌표, 전각 문장부호 포함) 뒤의 공백 또는 줄바꿈에서 나눕니다.
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?。！？])\s+|\s*\n+\s*')
+
+
+def split_sentences(text, max_chars=200):
+    """
+    max_chars보다 긴 텍스트를 문장 단위로 나눕니다 (짧은 텍스트는 그대로 하나로 둡니다).
+    긴 입력을 문장으로 나누면 배치 안의 패딩이 줄고, MarianMT의 최대 입력 길이(512 토큰)를 넘어 잘리는 일도 없어집니다.
+    """
+    if max_chars is None or len(text) <= max_chars:
+        return [text]
+    sentences = [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text)]
+    return [sentence for sentence in sentences if sentence] or [text]
+
+
+class TranslationBatcher:
+    """
+    번역 모델 하나에 대한 동적 마이크로 배치 계층입니다.
+    여러 스레드(요청 처리, Celery, 배치 생성)에서 들어온 문장을 전용 스레드가 모아, 첫 문장이 들어온 뒤 max_wait초 동안 또는
+    max_batch_size개가 찰 때까지 기다린 다음 파이프라인을 한 번만 호출하고 결과를 기다리던 호출자들에게 나눠 줍니다.
+    CPU 추론이 배치 크기 1로 따로따로 실행되지 않고, 파이프라인(스레드 안전하지 않음)은 항상 한 스레드에서만 호출됩니다.
+    """
+
+    def __init__(self, translate_batch, max_batch_size=16, max_wait=0.005, split_chars=200, name='translation'):
+        """
+        :param translate_batch: 문장 목록 -> 같은 순서의 번역 목록을 반환하는 함수 (파이프라인의 배치 호출)
+        :param max_batch_size: 한 번에 모델에 넣는 최대 문장 수
+        :param max_wait: 첫 문장이 들어온 뒤 다른 문장을 기다리는 최대 시간 (초)
+        :param split_chars: 이보다 긴 입력은 문장 단위로 나눠 넣습니다 (None이면 나누지 않음)
+        """
+        self.translate_batch = translate_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.split_chars = split_chars
+        self.name = name
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self.requests = 0
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.failures = 0 # 따로 다시 번역해도 실패한 문장 수
+        self.batch_retries = 0 # 배치 호출이 실패해 문장마다 다시 번역한 횟수
+        self.busy_seconds = 0.0
+
+    def _ensure_started(self):
+        # fork된 자식 프로세스(Celery prefork 워커 등)에는 스레드가 없으므로 pid가 바뀌었으면 새로 시작합니다.
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name=f'{self.name}-batcher', daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def translate(self, text):
+        """
+        텍스트 하나를 번역합니다. 다른 호출자의 문장과 함께 배치로 실행되며, 결과가 나올 때까지 블로킹합니다.
+        :raises Exception: 이 텍스트의 문장을 (따로 다시 시도해도) 번역하지 못하면 파이프라인의 예외를 그대로 발생시킵니다
+        """
+        segments = split_sentences(text, self.split_chars)
+        pending = self._ensure_started()
+        futures = []
+        for segment in segments:
+            future = Future()
+            pending.put((segment, future))
+            futures.append(future)
+        with self._lock:
+            self.requests += 1
+        return ' '.join(future.result() for future in futures)
+
+    def _collect(self, pending):
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # 기다릴 시간이 지나도 이미 들어와 있는 문장은 함께 넣습니다.
+                batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending):
+        while True:
+            batch = self._collect(pending)
+            # 같은 배치 안의 같은 문장은 한 번만 번역합니다.
+            texts = list(dict.fromkeys(segment for segment, _ in batch))
+            started = time.monotonic()
+            try:
+                results = dict(zip(texts, self._call(texts)))
+            except Exception as e:
+                # [수정] 입력 하나 때문에 배치 전체가 실패했을 수 있으므로 문장마다 따로 다시 번역하고,
+                # 그래도 실패한 문장의 호출자에게만 오류를 전달합니다 (translate_text가 처리).
+                if len(texts) > 1:
+                    logger.warning(f"Batched translation of {len(texts)} sentences failed ({self.name}): {e}; retrying one by one.")
+                    results = self._translate_each(texts)
+                else:
+                    logger.error(f"Translation of a sentence failed ({self.name}): {e}", exc_info=True)
+                    with self._lock:
+                        self.failures += 1
+                    results = {texts[0]: e}
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(texts))
+                self.busy_seconds += time.monotonic() - started
+            for segment, future in batch:
+                result = results[segment]
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _call(self, texts):
+        translations = self.translate_batch(texts)
+        if len(translations) != len(texts):
+            raise RuntimeError(f"translation batch returned {len(translations)} results for {len(texts)} inputs")
+        return translations
+
+    def _translate_each(self, texts):
+        """배치 호출이 실패했을 때 문장을 하나씩 번역합니다. 실패한 문장의 값은 그 예외입니다."""
+        with self._lock:
+            self.batch_retries += 1
+        results = {}
+        for text in texts:
+            try:
+                results[text] = self._call([text])[0]
+            except Exception as e:
+                logger.error(f"Translation of a sentence failed ({self.name}): {e}", exc_info=True)
+                with self._lock:
+                    self.failures += 1
+                results[text] = e
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+                'requests': self.requests,
+                'batches': self.batches,
+                'sentences': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'failures': self.failures,
+                'batch_retries': self.batch_retries,
+                'busy_seconds': round(self.busy_seconds, 3),
+            }
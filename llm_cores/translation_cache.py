@@ -0,0 +1,254 @@
+# llm_cores/translation_cache.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 메모리에서 적중한 횟수를 디스크의 hits 열에 한 번에 반영하는 단위 (적중마다 쓰지 않습니다)
+HIT_FLUSH_THRESHOLD = 64
+# 디스크 항목 수를 확인해 정리하는 간격 (저장 횟수)
+DISK_TRIM_INTERVAL = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    source_lang TEXT NOT NULL,
+    text TEXT NOT NULL,
+    model TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (source_lang, text, model)
+)
+"""
+
+
+def normalize_text(text):
+    """캐시 키용으로 텍스트를 정규화합니다 (유니코드 NFC, 앞뒤/연속 공백 정리)."""
+    return ' '.join(unicodedata.normalize('NFC', text or '').split())
+
+
+class TranslationCache:
+    """
+    번역 결과의 2단계 캐시입니다. 키는 (원본 언어, 정규화된 텍스트, 모델 이름)입니다.
+    - 1단계: 프로세스 안의 LRU (max_entries개). 적중하면 SQLite도 읽지 않습니다.
+    - 2단계: SQLite 파일(path). 재시작 후에도 남고, 같은 파일을 쓰는 여러 워커 프로세스(runserver, Celery translation 큐 등)가
+      함께 씁니다. WAL 모드라 읽기는 쓰기를 기다리지 않습니다.
+    적중 횟수는 디스크에 모아서 기록하며, warm()은 가장 많이 쓰인 항목을 1단계에 미리 올립니다.
+    SQLite 오류(잠김, 디스크 문제 등)는 기록만 하고 번역은 계속되도록 캐시 미스로 처리합니다.
+    """
+
+    def __init__(self, path=None, max_entries=1024, max_disk_entries=100000, timeout=5.0):
+        """
+        :param path: SQLite 파일 경로 (None이면 2단계를 쓰지 않습니다)
+        :param max_entries: 1단계 LRU 크기 (0이면 1단계를 쓰지 않습니다)
+        :param max_disk_entries: 디스크에 보관할 최대 항목 수 (넘으면 적게/오래전에 쓰인 항목부터 지웁니다)
+        :param timeout: 다른 프로세스가 쓰는 중일 때 기다리는 시간 (초)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.timeout = timeout
+        self._entries = OrderedDict() # (source_lang, text, model) -> translation
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending_hits = Counter()
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+        self.warm_loaded = 0
+
+    @staticmethod
+    def key(source_lang, text, model):
+        return (source_lang, normalize_text(text), model)
+
+    def _connect(self, create=False):
+        """스레드/프로세스별 SQLite 연결을 반환합니다. 파일이 없고 create=False면 None을 반환합니다."""
+        if self.path is None:
+            return None
+        connection = getattr(self._local, 'connection', None)
+        # fork된 자식 프로세스는 부모의 연결을 물려받으므로 pid가 바뀌었으면 새로 엽니다.
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        if not create and not os.path.exists(self.path):
+            return None
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(_SCHEMA)
+        connection.execute('CREATE INDEX IF NOT EXISTS translations_hits ON translations (hits DESC, last_used DESC)')
+        self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _remember(self, key, translation):
+        # self._lock을 잡은 상태에서 호출합니다.
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = translation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_error(self, action, error):
+        with self._lock:
+            self.disk_errors += 1
+        logger.warning(f"Translation cache could not {action} {self.path}: {error}")
+
+    def get(self, source_lang, text, model):
+        """캐시된 번역을 반환합니다. 없으면 None을 반환합니다."""
+        key = self.key(source_lang, text, model)
+        flush = False
+        with self._lock:
+            translation = self._entries.get(key)
+            if translation is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                self._pending_hits[key] += 1
+                flush = sum(self._pending_hits.values()) >= HIT_FLUSH_THRESHOLD
+        if translation is not None:
+            if flush:
+                self.flush_hits()
+            return translation
+
+        row = None
+        try:
+            connection = self._connect()
+            if connection is not None:
+                row = connection.execute(
+                    'SELECT translation FROM translations WHERE source_lang = ? AND text = ? AND model = ?', key).fetchone()
+                if row is not None:
+                    connection.execute(
+                        'UPDATE translations SET hits = hits + 1, last_used = ? WHERE source_lang = ? AND text = ? AND model = ?',
+                        (time.time(), *key))
+        except sqlite3.Error as e:
+            self._disk_error('read', e)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0])
+        return row[0]
+
+    def put(self, source_lang, text, model, translation):
+        key = self.key(source_lang, text, model)
+        with self._lock:
+            self._remember(key, translation)
+            self._puts += 1
+            trim = self._puts % DISK_TRIM_INTERVAL == 0
+        try:
+            connection = self._connect(create=True)
+            if connection is None:
+                return
+            now = time.time()
+            connection.execute(
+                'INSERT INTO translations (source_lang, text, model, translation, hits, created_at, last_used) '
+                'VALUES (?, ?, ?, ?, 0, ?, ?) '
+                'ON CONFLICT (source_lang, text, model) DO UPDATE SET translation = excluded.translation, last_used = excluded.last_used',
+                (*key, translation, now, now))
+            if trim:
+                self._trim(connection)
+        except sqlite3.Error as e:
+            self._disk_error('write', e)
+
+    def _trim(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+        if count > self.max_disk_entries:
+            connection.execute(
+                'DELETE FROM translations WHERE rowid IN '
+                '(SELECT rowid FROM translations ORDER BY hits ASC, last_used ASC LIMIT ?)', (count - self.max_disk_entries,))
+            logger.info(f"Trimmed {count - self.max_disk_entries} entries from the translation cache {self.path}")
+
+    def flush_hits(self):
+        """1단계에서 적중한 횟수를 디스크의 hits 열에 반영합니다 (warm()이 많이 쓰인 항목을 고르는 데 사용합니다)."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, Counter()
+        if not pending:
+            return
+        try:
+            connection = self._connect()
+            if connection is None:
+                return
+            now = time.time()
+            connection.executemany(
+                'UPDATE translations SET hits = hits + ?, last_used = ? WHERE source_lang = ? AND text = ? AND model = ?',
+                [(count, now, *key) for key, count in pending.items()])
+        except sqlite3.Error as e:
+            self._disk_error('update hit counts in', e)
+
+    def warm(self, limit=None):
+        """
+        디스크에서 가장 많이 쓰인 항목 limit개(기본: 1단계 크기)를 1단계 LRU에 올립니다. 시작 시 한 번 호출합니다.
+        :return: 올린 항목 수
+        """
+        limit = self.max_entries if limit is None else min(limit, self.max_entries)
+        if limit <= 0:
+            return 0
+        try:
+            connection = self._connect()
+            if connection is None:
+                return 0
+            rows = connection.execute(
+                'SELECT source_lang, text, model, translation FROM translations ORDER BY hits DESC, last_used DESC LIMIT ?',
+                (limit,)).fetchall()
+        except sqlite3.Error as e:
+            self._disk_error('warm-load', e)
+            return 0
+        with self._lock:
+            # 덜 쓰인 항목부터 넣어 가장 많이 쓰인 항목이 LRU에서 가장 늦게 밀려나게 합니다.
+            for source_lang, text, model, translation in reversed(rows):
+                self._remember((source_lang, text, model), translation)
+            self.warm_loaded += len(rows)
+        logger.info(f"Warm-loaded {len(rows)} translations from {self.path}")
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending_hits.clear()
+
+    def stats(self):
+        """모니터링용 적중률 통계를 반환합니다."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'path': self.path,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'warm_loaded': self.warm_loaded,
+                'disk_errors': self.disk_errors,
+            }
+
+
+_translation_cache = None
+_translation_cache_lock = threading.Lock()
+
+
+def get_translation_cache():
+    """settings로 구성된 프로세스 전역 번역 캐시를 반환합니다 (TRANSLATION_CACHE_PATH, TRANSLATION_CACHE_MAX_ENTRIES 등)."""
+    global _translation_cache
+    if _translation_cache is None:
+        with _translation_cache_lock:
+            if _translation_cache is None:
+                from django.conf import settings
+                _translation_cache = TranslationCache(
+                    path=getattr(settings, 'TRANSLATION_CACHE_PATH', None),
+                    max_entries=getattr(settings, 'TRANSLATION_CACHE_MAX_ENTRIES', 1024),
+                    max_disk_entries=getattr(settings, 'TRANSLATION_CACHE_MAX_DISK_ENTRIES', 100000),
+                )
+    return _translation_cache
@@ -4,7 +4,10 @@ from transformers import pipeline
 import os
 import torch
 import logging
+import threading
 from django.conf import settings # [추가 부분] settings 참조를 위해 임포트
+from llm_cores.translation_cache import get_translation_cache # [추가] 번역 결과 캐시 (메모리 LRU + SQLite)
+from llm_cores.translation_batcher import TranslationBatcher # [추가] 동시 번역 요청의 마이크로 배치
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +17,8 @@ TARGET_LANG_CODE = 'en'
 
 # 각 언어 쌍별 번역 모델 인스턴스를 저장할 딕셔너리
 _translators = {}
+# [추가] 모델별 로딩 잠금: 같은 모델을 동시에 두 번 불러오지 않고, 다른 언어의 로딩은 서로 기다리지 않습니다.
+_load_locks = {}
 
 # 지원하는 원본 언어 및 해당 언어에서 영어로의 모델 이름 매핑
 # 이 딕셔너리는 '원본언어' -> 'Helsinki-NLP/opus-mt-원본언어-en' 형태로 구성되어 있습니다.
@@ -57,21 +62,60 @@ def get_translator_instance_for_lang(source_lang: str) -> pipeline:
         # cache_dir = os.path.join(base_dir, 'translation_models_cache')
         # os.makedirs(cache_dir, exist_ok=True)
 
-        try:
-            # device=0 if torch.cuda.is_available() else -1: GPU 사용 가능 시 GPU, 아니면 CPU
-            # [수정 부분] cache_dir 인자 제거
-            _translators[model_key] = pipeline(
-                "translation", 
-                model=model_name, 
-                device=0 if torch.cuda.is_available() else -1
-            )
-            logger.info(f"Successfully loaded translation model: {model_name}")
-        except Exception as e:
-            logger.error(f"Error loading translation model {model_name}: {e}", exc_info=True)
-            raise # 모델 로딩 실패 시 예외 다시 발생
+        with _load_locks.setdefault(model_key, threading.Lock()):
+            if model_key in _translators: # 기다리는 동안 다른 스레드가 불러옴
+                return _translators[model_key]
+            try:
+                # device=0 if torch.cuda.is_available() else -1: GPU 사용 가능 시 GPU, 아니면 CPU
+                # [수정 부분] cache_dir 인자 제거
+                _translators[model_key] = pipeline(
+                    "translation", 
+                    model=model_name, 
+                    device=0 if torch.cuda.is_available() else -1
+                )
+                logger.info(f"Successfully loaded translation model: {model_name}")
+            except Exception as e:
+                logger.error(f"Error loading translation model {model_name}: {e}", exc_info=True)
+                raise # 모델 로딩 실패 시 예외 다시 발생
 
     return _translators[model_key]
 
+# [추가] 언어 모델별 마이크로 배치 계층 (모델 키 -> TranslationBatcher)
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_translation_batcher(source_lang: str) -> TranslationBatcher:
+    """
+    원본 언어 모델의 배치 계층을 반환합니다. 동시에 들어온 번역 요청을 모아 파이프라인을 한 번에 호출합니다
+    (settings.TRANSLATION_BATCH_MAX_SIZE, TRANSLATION_BATCH_MAX_WAIT_MS, TRANSLATION_BATCH_SPLIT_CHARS).
+    """
+    model_key = f"{source_lang}-{TARGET_LANG_CODE}"
+    batcher = _batchers.get(model_key)
+    if batcher is not None:
+        return batcher
+    # 모델 로딩은 오래 걸리므로 잠금 밖에서 합니다 (한 언어의 첫 로딩이 다른 언어의 번역을 막지 않습니다).
+    translator = get_translator_instance_for_lang(source_lang)
+    with _batchers_lock:
+        if model_key not in _batchers:
+            max_batch_size = getattr(settings, 'TRANSLATION_BATCH_MAX_SIZE', 16)
+            _batchers[model_key] = TranslationBatcher(
+                lambda texts: [result['translation_text'] for result in translator(texts, batch_size=len(texts))],
+                max_batch_size=max_batch_size,
+                max_wait=getattr(settings, 'TRANSLATION_BATCH_MAX_WAIT_MS', 5) / 1000,
+                split_chars=getattr(settings, 'TRANSLATION_BATCH_SPLIT_CHARS', 200),
+                name=model_key,
+            )
+        return _batchers[model_key]
+
+
+def translation_batch_stats() -> dict:
+    """모델별 배치 통계 (평균 배치 크기 등)를 반환합니다."""
+    with _batchers_lock:
+        batchers = dict(_batchers)
+    return {model_key: batcher.stats() for model_key, batcher in batchers.items()}
+
+
 # [수정 부분] translate_text 함수
 def translate_text(text: str, source_lang: str, target_lang: str) -> str:
     """
@@ -86,6 +130,14 @@ def translate_text(text: str, source_lang: str, target_lang: str) -> str:
         logger.warning(f"Unsupported target language code '{target_lang}'. This service can only translate TO English ('{TARGET_LANG_CODE}').")
         return f"Unsupported target language code '{target_lang}'. This service can only translate TO English ('{TARGET_LANG_CODE}')."
 
+    # [추가] 같은 문장(정규화 후)은 모델을 불러오거나 실행하지 않고 캐시의 번역을 반환합니다.
+    model_name = LANGUAGE_MODELS.get(source_lang)
+    cache = get_translation_cache()
+    if model_name:
+        cached = cache.get(source_lang, text, model_name)
+        if cached is not None:
+            return cached
+
     try:
         # 요청된 언어에 대한 번역기 인스턴스 가져오기
         translator = get_translator_instance_for_lang(source_lang)
@@ -96,12 +148,18 @@ def translate_text(text: str, source_lang: str, target_lang: str) -> str:
         #     logger.error("Translation service is unavailable for this language. Model failed to load.")
         #     return "Translation service is unavailable for this language. Model failed to load."
 
-        # Hugging Face pipeline을 사용하여 번역 수행
-        # [수정 부분] src_lang과 tgt_lang을 제거하고 텍스트만 전달
-        translated_result = translator(text)
-        
-        # 번역 결과는 보통 리스트의 첫 번째 요소에 'translation_text' 키로 존재
-        return translated_result[0]['translation_text']
+        if getattr(settings, 'TRANSLATION_BATCH_MAX_SIZE', 16) > 1:
+            # [추가] 다른 요청의 문장과 모아서 한 번의 배치 호출로 번역합니다 (긴 입력은 문장 단위로 나눕니다).
+            translation = get_translation_batcher(source_lang).translate(text)
+        else:
+            # Hugging Face pipeline을 사용하여 번역 수행
+            # [수정 부분] src_lang과 tgt_lang을 제거하고 텍스트만 전달
+            translated_result = translator(text)
+
+            # 번역 결과는 보통 리스트의 첫 번째 요소에 'translation_text' 키로 존재
+            translation = translated_result[0]['translation_text']
+        cache.put(source_lang, text, model_name, translation) # 오류 메시지는 캐시하지 않습니다
+        return translation
     except ValueError as ve: 
         # get_translator_instance_for_lang에서 발생한 지원하지 않는 언어 오류 처리
         logger.error(f"Translation error: {ve}", exc_info=True)
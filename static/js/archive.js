@@ -26,6 +26,7 @@ document.addEventListener('DOMContentLoaded', function() {
         if (searchTerm) queryParams.append('search', searchTerm);
         if (selectedStyle) queryParams.append('style', selectedStyle);
         if (selectedSort) queryParams.append('sort', selectedSort);
+        queryParams.append('size', 'thumb'); // 그리드에는 WebP 썸네일을 받습니다 (원본은 original_url).
 
         const apiUrl = `/api/images/?${queryParams.toString()}`;
         console.log("Constructed API URL:", apiUrl); // API 호출 URL 로그
@@ -41,7 +42,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const data = await response.json();
             console.log("API Response Data:", data); // API 응답 데이터 로그
             // JSON 데이터를 바로 렌더링에 사용
-            return data;
+            return data.images || [];
         } catch (error) {
             console.error("Error fetching images:", error);
             // 사용자에게 오류 메시지 표시
@@ -63,11 +64,16 @@ document.addEventListener('DOMContentLoaded', function() {
             const galleryItem = document.createElement('div');
             galleryItem.classList.add('gallery-item', 'animate__animated', 'animate__fadeIn');
 
-            const imageUrl = image.image_file; // API 응답에서 'image_file' 키를 사용합니다.
+            const imageUrl = image.url; // size=thumb로 요청한 썸네일 URL
+            // 화면 밀도가 높으면 medium 크기를 쓰도록 srcset을 만듭니다.
+            const srcset = ['thumb', 'medium']
+                .filter(name => image.variants && image.variants[name])
+                .map(name => `${image.variants[name].url} ${image.variants[name].width}w`)
+                .join(', ');
 
             // 디버깅: 이미지 URL이 유효한지 확인
             if (!imageUrl) {
-                console.warn("Missing image_file URL for image ID:", image.id, image.title);
+                console.warn("Missing image URL for image ID:", image.id, image.title);
                 // 이미지가 없으면 플레이스홀더를 표시하거나 건너뛰기
                 galleryItem.innerHTML = `<div class="placeholder-image">이미지 없음</div><div class="gallery-item-info"><h3>${image.title}</h3><p class="prompt">${image.prompt}</p></div>`;
                 galleryContainer.appendChild(galleryItem);
@@ -75,12 +81,12 @@ document.addEventListener('DOMContentLoaded', function() {
             }
 
             galleryItem.innerHTML = `
-                <img src="${imageUrl}" alt="${image.title}">
+                <img src="${imageUrl}" ${srcset ? `srcset="${srcset}" sizes="(max-width: 600px) 50vw, 320px"` : ''} ${image.width ? `width="${image.width}" height="${image.height}"` : ''} loading="lazy" alt="${image.title}">
                 <div class="gallery-item-info">
                     <h3>${image.title}</h3>
                     <p class="prompt">${image.prompt}</p>
                     <div class="metadata">
-                        <span><i class="bi bi-eye"></i> ${image.views || 0}</span> <span><i class="bi bi-heart"></i> ${image.likes || 0}</span> </div>
+                        <span><i class="bi bi-eye"></i> ${image.view_count || image.views || 0}</span> <span><i class="bi bi-heart"></i> ${image.likes || 0}</span> </div>
                 </div>
             `;
             galleryContainer.appendChild(galleryItem);
@@ -164,6 +164,45 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // [추가] 로딩 스피너 옆에 진행 상황(예: "KSampler 12/20") 표시
+    function updateSpinnerProgress(text) {
+        const spinner = document.getElementById('loading-spinner');
+        if (!spinner) return;
+        let label = spinner.querySelector('.progress-label');
+        if (!label) {
+            label = document.createElement('span');
+            label.classList.add('progress-label');
+            spinner.querySelector('.message-content').appendChild(label);
+        }
+        label.textContent = text;
+    }
+
+    // [추가] 이미지 생성 진행 이벤트(SSE) 구독. EventSource를 지원하지 않으면 null을 반환합니다.
+    // onStatus는 서버가 최종 상태(COMPLETED/FAILED)를 보냈을 때 호출됩니다.
+    function watchTaskProgress(taskId, onStatus) {
+        if (!window.EventSource) return null;
+        const source = new EventSource(`/api/tasks/${taskId}/events/`);
+        let currentNode = null;
+        source.addEventListener('queued', () => updateSpinnerProgress('대기 중...'));
+        source.addEventListener('executing', (e) => {
+            const data = JSON.parse(e.data);
+            currentNode = data.class_type || data.node;
+            if (currentNode) updateSpinnerProgress(`${currentNode} 실행 중...`);
+        });
+        source.addEventListener('progress', (e) => {
+            const data = JSON.parse(e.data);
+            updateSpinnerProgress(`${data.class_type || currentNode || '생성'} ${data.value}/${data.max}`);
+        });
+        source.addEventListener('status', (e) => {
+            const data = JSON.parse(e.data);
+            if (data.status === 'COMPLETED' || data.status === 'FAILED') {
+                source.close();
+                if (onStatus) onStatus(data);
+            }
+        });
+        return source;
+    }
+
     // 4. 메시지 전송 및 비동기 처리 함수 (가장 중요!)
     async function sendMessage() {
         const userMessage = userInput.value.trim(); // 사용자 입력 텍스트를 그대로 사용
@@ -187,6 +226,13 @@ document.addEventListener('DOMContentLoaded', function() {
             image_data: null // 이미지가 없을 경우 기본값을 명시적으로 null로 설정
         };
 
+        // [추가] 이미지 생성 모드에서는 작업 ID를 미리 정해 응답을 기다리는 동안 진행 상황을 받습니다.
+        let progressSource = null;
+        if (currentMode === 'image_generation' && window.crypto && crypto.randomUUID) {
+            dataToSend.task_id = crypto.randomUUID();
+            progressSource = watchTaskProgress(dataToSend.task_id);
+        }
+
         let imageDataPromise = Promise.resolve(null); // Promise로 래핑하여 비동기 처리
 
         if (selectedImageFile) {
@@ -250,6 +296,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 // 큐레이터 모드처럼 즉시 응답이 오는 경우
                 hideLoadingSpinner();
                 displayMessage('ai', data.response, data.image_url); // [수정] data.ai_response 대신 data.response 사용
+                // [추가] 여러 장을 생성한 경우 나머지 이미지도 이어서 표시
+                (data.image_urls || []).slice(1).forEach(url => displayMessage('ai', '', url));
                 // [수정] 새 대화가 생성된 경우 currentConversationId 업데이트 및 대화 목록 새로고침
                 if (currentConversationId === 'new-chat' && data.conversation_id) {
                     currentConversationId = data.conversation_id;
@@ -273,42 +321,45 @@ document.addEventListener('DOMContentLoaded', function() {
             console.error('Error sending message:', error);
             displayMessage('ai', `오류 발생: ${error.message || '메시지를 전송할 수 없습니다.'}`);
         } finally {
+            if (progressSource) progressSource.close(); // [추가] 응답을 받았으므로 진행 상황 구독 종료
             sendButton.disabled = false; // 전송 완료 후 버튼 활성화
             userInput.focus(); // 메시지 전송 후 입력 필드에 포커스 설정
         }
     }
     // [중요 수정 부분 끝]
 
-    // 5. 작업 상태 폴링 함수 (이미지 생성 등 비동기 작업용)
+    // 5. 작업 상태 확인 함수 (이미지 생성 등 비동기 작업용)
+    // [수정] 진행 이벤트 스트림(SSE)으로 상태를 받고, 지원하지 않거나 연결이 끊기면 2초 폴링으로 전환합니다.
     async function pollTaskStatus(taskId) {
+        let finished = false;
+        const onStatus = async (data) => {
+            if (finished) return;
+            finished = true;
+            await handleTaskStatus(taskId, data);
+        };
+        const source = watchTaskProgress(taskId, onStatus);
+        if (!source) {
+            startPolling(taskId, onStatus);
+            return;
+        }
+        source.onerror = () => {
+            if (finished) return;
+            source.close();
+            startPolling(taskId, onStatus);
+        };
+    }
+
+    function startPolling(taskId, onStatus) {
         const pollInterval = setInterval(async () => {
             try {
                 const response = await fetch(`/api/tasks/${taskId}/status/`);
                 const data = await response.json();
                 console.log(`Task ${taskId} status:`, data.status, data.message);
-
-                if (data.status === 'COMPLETED') { // 'SUCCESS' 대신 'COMPLETED' 사용
+                if (data.status === 'COMPLETED' || data.status === 'FAILED') {
                     clearInterval(pollInterval);
-                    hideLoadingSpinner();
-                    displayMessage('ai', data.message, data.image_url);
-                    // 대화 ID는 이미 sendMessage에서 업데이트되었으므로 여기서는 메시지 목록만 새로고침
-                    if (currentConversationId) {
-                        await loadMessages(currentConversationId); // [수정] 완료 후 메시지 목록 새로고침
-                    }
-                    // [추가 부분] 이미지 생성 완료 후 대화 목록 새로고침 및 정리
-                    loadConversations(false); // 전체 초기화 후 로드
-                    checkAndCleanConversations();
-                    userInput.focus(); // 작업 완료 후 입력 필드에 포커스 설정
-                } else if (data.status === 'FAILED') { // 'FAILURE' 대신 'FAILED' 사용
-                    clearInterval(pollInterval);
-                    hideLoadingSpinner();
-                    displayMessage('ai', `작업 실패: ${data.message}`);
-                    // 실패 메시지는 이미 표시되었으므로 메시지 목록 새로고침은 생략
-                    userInput.focus(); // 작업 실패 후 입력 필드에 포커스 설정
-                } else {
-                    // PENDING 또는 PROCESSING 상태, 계속 폴링
-                    // 필요하다면 진행률 업데이트 로직 추가 (예: 스피너 옆에 % 표시)
+                    await onStatus(data);
                 }
+                // PENDING 또는 PROCESSING 상태, 계속 폴링
             } catch (error) {
                 clearInterval(pollInterval);
                 hideLoadingSpinner();
@@ -319,6 +370,26 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 2000); // 2초마다 폴링
     }
 
+    async function handleTaskStatus(taskId, data) {
+        if (data.status === 'COMPLETED') { // 'SUCCESS' 대신 'COMPLETED' 사용
+            hideLoadingSpinner();
+            displayMessage('ai', data.message, data.image_url);
+            // 대화 ID는 이미 sendMessage에서 업데이트되었으므로 여기서는 메시지 목록만 새로고침
+            if (currentConversationId) {
+                await loadMessages(currentConversationId); // [수정] 완료 후 메시지 목록 새로고침
+            }
+            // [추가 부분] 이미지 생성 완료 후 대화 목록 새로고침 및 정리
+            loadConversations(false); // 전체 초기화 후 로드
+            checkAndCleanConversations();
+            userInput.focus(); // 작업 완료 후 입력 필드에 포커스 설정
+        } else if (data.status === 'FAILED') { // 'FAILURE' 대신 'FAILED' 사용
+            hideLoadingSpinner();
+            displayMessage('ai', `작업 실패: ${data.message}`);
+            // 실패 메시지는 이미 표시되었으므로 메시지 목록 새로고침은 생략
+            userInput.focus(); // 작업 실패 후 입력 필드에 포커스 설정
+        }
+    }
+
     // [추가 부분 시작] 대화 기록 관리 함수들
 
     // 대화 기록을 로드하고 UI에 표시하는 함수